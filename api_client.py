@@ -2,9 +2,10 @@
 Python client library for Manim Video Generation API
 """
 
+import json
 import requests
 import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator
 from enum import Enum
 
 
@@ -93,12 +94,53 @@ class ManimVideoClient:
         response.raise_for_status()
         return response.json()
     
+    def stream_events(self, job_id: Optional[str] = None, read_timeout: float = 60) -> Iterator[Dict[str, Any]]:
+        """
+        Follow job updates pushed by the server (Server-Sent Events)
+        
+        Args:
+            job_id: Job to follow, or None for every job
+            read_timeout: Seconds without data (including keep-alives) before giving up
+        
+        Yields:
+            Events as {"event": name, "data": payload}. "status" events carry
+            the same body as get_status(); a single-job stream ends after the
+            job completes, fails or is deleted.
+        
+        Example:
+            >>> for event in client.stream_events(job_id):
+            ...     print(event['data']['progress']['percentage'])
+        """
+        url = f"{self.base_url}/api/jobs/{job_id}/events" if job_id else f"{self.base_url}/api/events"
+        with self.session.get(
+            url,
+            stream=True,
+            headers={"Accept": "text/event-stream"},
+            timeout=(10, read_timeout)
+        ) as response:
+            response.raise_for_status()
+            event, data = "message", []
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    field, _, value = line.partition(":")
+                    value = value[1:] if value.startswith(" ") else value
+                    if field == "event":
+                        event = value
+                    elif field == "data":
+                        data.append(value)
+                    continue
+                # A blank line ends the event; comments (keep-alives) carry no data
+                if data:
+                    yield {"event": event, "data": json.loads("\n".join(data))}
+                event, data = "message", []
+    
     def wait_for_completion(
         self,
         job_id: str,
         poll_interval: int = 5,
         timeout: Optional[int] = None,
-        callback: Optional[callable] = None
+        callback: Optional[callable] = None,
+        stream: bool = False
     ) -> Dict[str, Any]:
         """
         Wait for job to complete
@@ -108,6 +150,8 @@ class ManimVideoClient:
             poll_interval: Seconds between status checks
             timeout: Maximum seconds to wait (None = no timeout)
             callback: Optional function called with status on each poll
+            stream: Receive updates pushed by the server instead of polling;
+                falls back to polling if the stream breaks
         
         Returns:
             Final job status
@@ -123,6 +167,21 @@ class ManimVideoClient:
         """
         start_time = time.time()
         
+        if stream:
+            try:
+                for event in self.stream_events(job_id):
+                    if event["event"] != "status":
+                        break
+                    status = event["data"]
+                    if callback:
+                        callback(status)
+                    if status['status'] in [JobStatus.COMPLETED, JobStatus.FAILED]:
+                        return status
+                    if timeout and (time.time() - start_time > timeout):
+                        raise TimeoutError(f"Job did not complete within {timeout} seconds")
+            except requests.RequestException:
+                pass
+        
         while True:
             status = self.get_status(job_id)
             
@@ -225,7 +284,8 @@ class ManimVideoClient:
         output_path: str,
         quality: QualityLevel = QualityLevel.HIGH,
         poll_interval: int = 5,
-        progress_callback: Optional[callable] = None
+        progress_callback: Optional[callable] = None,
+        stream: bool = False
     ) -> Dict[str, Any]:
         """
         Complete workflow: create, wait, and download
@@ -236,6 +296,7 @@ class ManimVideoClient:
             quality: Video quality
             poll_interval: Status check interval
             progress_callback: Optional progress callback
+            stream: Receive progress pushed by the server instead of polling
         
         Returns:
             Final job status
@@ -262,7 +323,8 @@ class ManimVideoClient:
         result = self.wait_for_completion(
             job_id,
             poll_interval=poll_interval,
-            callback=progress_callback
+            callback=progress_callback,
+            stream=stream
         )
         
         if result['status'] == JobStatus.COMPLETED:
@@ -287,7 +349,7 @@ def main():
     )
     parser.add_argument(
         "command",
-        choices=["create", "status", "download", "list", "generate"],
+        choices=["create", "status", "download", "list", "generate", "watch"],
         help="Command to execute"
     )
     parser.add_argument("--prompt", help="Animation prompt")
@@ -299,6 +361,11 @@ def main():
         default="high",
         help="Video quality"
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Follow progress pushed by the server instead of polling"
+    )
     parser.add_argument(
         "--url",
         default="http://localhost:8000",
@@ -356,8 +423,18 @@ def main():
             args.prompt,
             args.output,
             QualityLevel(args.quality),
-            progress_callback=progress
+            progress_callback=progress,
+            stream=args.stream
         )
+    
+    elif args.command == "watch":
+        # Follow one job (--job-id) or every job
+        for event in client.stream_events(args.job_id):
+            data = event['data']
+            if event['event'] == "status":
+                print(f"{data['job_id'][:8]} [{data['progress']['percentage']:3d}%] {data['status']}: {data['progress']['message']}")
+            else:
+                print(f"{event['event']}: {data}")
 
 
 if __name__ == "__main__":
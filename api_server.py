@@ -10,23 +10,36 @@ Features:
 - Error handling
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, File, UploadFile
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Request, WebSocket, File, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from enum import Enum
 import uuid
 import os
 import time
-import json
 import re
-import subprocess
+import shutil
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 import asyncio
 import logging
 
-from manimator.api.animation_generation import generate_animation_response
+from manimator.api.animation_generation import agenerate_animation_response, astream_animation_response, codegen_cache_key
+from manimator.utils.llm_client import get_llm_client
+from manimator.utils.render_scheduler import RenderScheduler, QueueFullError, default_render_slots
+from manimator.utils.job_store import JobStore, create_job_store
+from manimator.utils.video_delivery import probe_video_metadata, video_response
+from manimator.utils.job_events import TooManySubscribersError, get_event_broker, relay_store_updates, sse_stream, websocket_stream
+from manimator.utils.job_queue import create_job_queue
+from manimator.utils.job_checkpoint import interrupted_jobs, make_checkpoint, reached, resume_point, write_code
+from manimator.utils.codegen_cache import get_codegen_cache
+from manimator.utils.section_renderer import SectionRenderer, diff_sections, remove_section_files
+from manimator.utils.render_workers import WorkerError, get_worker_pool, warm_workers_enabled
+from manimator.utils.tex_cache import get_tex_cache, manim_command, tex_cache_enabled
+from manimator.utils.tracing import add as trace_add, child_process, collect_store_traces, get_metrics, span, trace, tracing_enabled
 
 # Configure logging
 logging.basicConfig(
@@ -46,6 +59,49 @@ class Config:
     VIDEOS_DIR = BASE_DIR / "media" / "videos"
     MAX_JOB_AGE_DAYS = 7
     
+    # Job persistence: "sqlite" (default) or "json" (one file per job)
+    JOB_STORE = os.getenv("JOB_STORE", "sqlite")
+    JOBS_DB = Path(os.getenv("JOBS_DB", str(JOBS_DIR / "jobs.db")))
+    
+    # Scheduling: concurrent manim renders, concurrent LLM calls, waiting jobs
+    RENDER_SLOTS = int(os.getenv("RENDER_SLOTS", default_render_slots()))
+    LLM_SLOTS = int(os.getenv("LLM_SLOTS", "4"))
+    MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "20"))
+    
+    # Rendering: "serial" (one manim process) or "sections" (one process per section method)
+    RENDER_MODE = os.getenv("RENDER_MODE", "serial")
+    SECTION_WORKERS = int(os.getenv("SECTION_WORKERS", os.cpu_count() or 2))
+    
+    # Synthesize ElevenLabs narration concurrently before rendering
+    TTS_PREFETCH = os.getenv("TTS_PREFETCH", "1") != "0"
+    
+    # Stream code generation: abort broken output early, start section prefetch while streaming
+    STREAM_CODEGEN = os.getenv("STREAM_CODEGEN", "1") != "0"
+    
+    # Check layout from the scene graph (no pixels) and fix it before the first render
+    LAYOUT_PROBE = os.getenv("LAYOUT_PROBE", "1") != "0"
+    LAYOUT_PROBE_FIXES = int(os.getenv("LAYOUT_PROBE_FIXES", "2"))
+    
+    # Verification renders use a cheap preview tier; the job's quality is rendered once at the end
+    PREVIEW_RENDERS = os.getenv("PREVIEW_RENDERS", "1") != "0"
+    PREVIEW_QUALITY = os.getenv("PREVIEW_QUALITY", "low")
+    PREVIEW_FRAME_RATE = int(os.getenv("PREVIEW_FRAME_RATE", "0"))  # 0 keeps the tier's own rate
+    
+    # Verification input: "stills" (last frame of each play, no video encoding) or "video"
+    VERIFY_MODE = os.getenv("VERIFY_MODE", "stills")
+    STILL_FRAMES_MAX = int(os.getenv("STILL_FRAMES_MAX", "12"))
+    
+    # Job queue: "local" runs jobs in this process; "sqlite" or "redis" leaves them to queue_worker.py processes
+    JOB_QUEUE = os.getenv("JOB_QUEUE", "local")
+    JOB_QUEUE_DB = Path(os.getenv("JOB_QUEUE_DB", str(JOBS_DIR / "queue.db")))
+    JOB_QUEUE_URL = os.getenv("JOB_QUEUE_URL", "redis://localhost:6379/0")
+    
+    # Re-queue jobs a previous process left unfinished; they resume from their last checkpoint
+    RESUME_JOBS = os.getenv("RESUME_JOBS", "1") != "0"
+    
+    # Push endpoints: seconds between keep-alives on idle event streams
+    EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", "15"))
+    
     # Ensure directories exist
     JOBS_DIR.mkdir(exist_ok=True)
     VIDEOS_DIR.mkdir(parents=True, exist_ok=True)
@@ -59,6 +115,7 @@ class JobStatus(str, Enum):
     """Job status enumeration"""
     PENDING = "pending"
     GENERATING_CODE = "generating_code"
+    PREFETCHING_TTS = "prefetching_tts"
     RENDERING = "rendering"
     VERIFYING = "verifying"  # New status
     COMPLETED = "completed"
@@ -87,6 +144,14 @@ QUALITY_FLAGS = {
     QualityLevel.ULTRA: "-pqk",
 }
 
+# Output subdirectory manim writes each quality to
+QUALITY_DIRS = {
+    QualityLevel.LOW: "480p15",
+    QualityLevel.MEDIUM: "720p30",
+    QualityLevel.HIGH: "1080p60",
+    QualityLevel.ULTRA: "2160p60",
+}
+
 
 class VideoRequest(BaseModel):
     """Request model for video generation"""
@@ -94,6 +159,8 @@ class VideoRequest(BaseModel):
     quality: QualityLevel = Field(default=QualityLevel.HIGH, description="Video quality level")
     category: AnimationCategory = Field(default=AnimationCategory.MATHEMATICAL, description="Animation category")
     scene_name: Optional[str] = Field(default=None, description="Custom scene class name (auto-generated if not provided)")
+    priority: int = Field(default=0, ge=0, le=10, description="Scheduling priority (higher runs first, equal priorities are FIFO)")
+    bypass_cache: bool = Field(default=False, description="Always call the LLM instead of reusing cached code for an identical prompt")
     
     class Config:
         json_schema_extra = {
@@ -123,6 +190,9 @@ class JobStatusResponse(BaseModel):
     error: Optional[str] = None
     video_url: Optional[str] = None
     duration: Optional[float] = None
+    video: Optional[Dict[str, Any]] = None
+    timings: Optional[Dict[str, Any]] = None
+    trace: Optional[Dict[str, Any]] = None
 
 
 # ============================================================================
@@ -132,21 +202,11 @@ class JobStatusResponse(BaseModel):
 class JobManager:
     """Manages video generation jobs"""
     
-    def __init__(self):
-        self.jobs: Dict[str, Dict] = {}
-        self._load_existing_jobs()
+    def __init__(self, store: Optional[JobStore] = None):
+        self.store = store or create_job_store(Config.JOB_STORE, Config.JOBS_DIR, Config.JOBS_DB)
+        self.events = get_event_broker()
     
-    def _load_existing_jobs(self):
-        """Load existing jobs from disk"""
-        for job_file in Config.JOBS_DIR.glob("*.json"):
-            try:
-                with open(job_file) as f:
-                    job_data = json.load(f)
-                    self.jobs[job_data["job_id"]] = job_data
-            except Exception as e:
-                print(f"Error loading job {job_file}: {e}")
-    
-    def create_job(self, prompt: str, quality: QualityLevel, category: AnimationCategory = AnimationCategory.MATHEMATICAL, scene_name: Optional[str] = None) -> str:
+    def create_job(self, prompt: str, quality: QualityLevel, category: AnimationCategory = AnimationCategory.MATHEMATICAL, scene_name: Optional[str] = None, bypass_cache: bool = False) -> str:
         """Create a new job"""
         job_id = str(uuid.uuid4())
         
@@ -160,6 +220,7 @@ class JobManager:
             "category": category.value,
             "quality": quality,
             "scene_name": scene_name,
+            "bypass_cache": bypass_cache,
             "created_at": datetime.now().isoformat(),
             "updated_at": datetime.now().isoformat(),
             "progress": {
@@ -172,18 +233,20 @@ class JobManager:
             "code_path": None,
         }
         
-        self.jobs[job_id] = job_data
-        self._save_job(job_id)
+        self.store.put(job_data)
+        self.events.publish(job_data)
         return job_id
     
     def update_job(self, job_id: str, **kwargs):
         """Update job data"""
-        if job_id not in self.jobs:
+        job = self.store.get(job_id)
+        if job is None:
             raise ValueError(f"Job {job_id} not found")
         
-        self.jobs[job_id].update(kwargs)
-        self.jobs[job_id]["updated_at"] = datetime.now().isoformat()
-        self._save_job(job_id)
+        job.update(kwargs)
+        job["updated_at"] = datetime.now().isoformat()
+        self.store.put(job)
+        self.events.publish(job)
         
         # Log progress updates
         if "progress" in kwargs:
@@ -191,22 +254,32 @@ class JobManager:
     
     def get_job(self, job_id: str) -> Optional[Dict]:
         """Get job data"""
-        return self.jobs.get(job_id)
-    
-    def _save_job(self, job_id: str):
-        """Save job data to disk"""
-        job_file = Config.JOBS_DIR / f"{job_id}.json"
-        with open(job_file, 'w') as f:
-            json.dump(self.jobs[job_id], f, indent=2)
-    
-    def list_jobs(self, limit: int = 50) -> List[Dict]:
-        """List all jobs"""
-        jobs = sorted(
-            self.jobs.values(),
-            key=lambda x: x["created_at"],
-            reverse=True
-        )
-        return jobs[:limit]
+        return self.store.get(job_id)
+    
+    def delete_job(self, job_id: str) -> bool:
+        """Delete job data"""
+        deleted = self.store.delete(job_id)
+        if deleted:
+            self.events.publish_deleted(job_id)
+        return deleted
+    
+    def list_jobs(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        status: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> List[Dict]:
+        """List jobs, most recent first"""
+        return self.store.list(limit=limit, offset=offset, status=status, category=category)
+    
+    def count_jobs(self, status: Optional[str] = None, category: Optional[str] = None) -> int:
+        """Count jobs matching the filters"""
+        return self.store.count(status=status, category=category)
+    
+    def counts(self, dimension: str = "status") -> Dict[str, int]:
+        """Job counts grouped by status or category"""
+        return self.store.counts(dimension)
 
 
 # ============================================================================
@@ -218,12 +291,42 @@ from manimator.utils.visual_analyzer import create_visual_analyzer
 class VideoGenerator:
     """Handles video generation workflow"""
     
-    def __init__(self, job_manager: JobManager):
+    def __init__(self, job_manager: JobManager, scheduler: RenderScheduler):
         self.job_manager = job_manager
+        self.scheduler = scheduler
         self.analyzer = create_visual_analyzer()  # Initialize analyzer
     
     async def generate_video(self, job_id: str):
-        """Generate video for a job"""
+        """Generate video for a job, recording its stage trace"""
+        root = None
+        try:
+            with trace("generate_video", job_id=job_id) as root:
+                await self._generate_video(job_id)
+        finally:
+            if root is not None:
+                self._store_trace(job_id, root)
+            self._remove_section_files(job_id)
+    
+    def _remove_section_files(self, job_id: str):
+        """Drop the section modules and section cache of a finished job"""
+        job = self.job_manager.get_job(job_id)
+        # An interrupted job keeps them, so its resumed render can reuse sections
+        if job is None or not job.get("code_path") or job["status"] not in (JobStatus.COMPLETED, JobStatus.FAILED):
+            return
+        remove_section_files(Path(job["code_path"]), Config.VIDEOS_DIR)
+    
+    def _store_trace(self, job_id: str, root):
+        """Save a finished trace on the job and add it to /metrics"""
+        job = self.job_manager.get_job(job_id)
+        if job is None:
+            return
+        outcome = job["status"].value if isinstance(job["status"], Enum) else job["status"]
+        root.attrs["status"] = outcome
+        get_metrics().observe_trace(root, outcome)
+        self.job_manager.update_job(job_id, trace=root.to_dict())
+    
+    async def _generate_video(self, job_id: str):
+        """Run the generation pipeline for a job"""
         job = self.job_manager.get_job(job_id)
         if not job:
             return
@@ -232,81 +335,66 @@ class VideoGenerator:
         
         max_regenerations = 1
         regeneration_count = 0
+        timings: Dict[str, Any] = {}
+        started = time.monotonic()
+        preview = self._uses_preview(job["quality"])
+        video_path = None
+        verification = []
         
-        while regeneration_count <= max_regenerations:
+        # An interrupted job picks up after its last completed stage
+        checkpoint = resume_point(job)
+        resume = checkpoint
+        if checkpoint is not None:
+            logger.info(f"♻️ Resuming job {job_id[:8]}... from checkpoint '{checkpoint['stage']}'")
+            regeneration_count = checkpoint.get("regeneration", 0)
+            code = checkpoint["code"]
+            code_file = Path(checkpoint["code_path"])
+            verification = job.get("verification", [])
+            timings["resumed_from"] = checkpoint["stage"]
+            if reached(checkpoint, "rendered"):
+                video_path = Path(checkpoint["video_path"])
+        
+        while regeneration_count <= max_regenerations and not reached(checkpoint, "verified"):
             try:
-                # Stage 1: Generate Manim code
-                # If this is a regeneration, we append a critical instruction
-                current_prompt = job["prompt"]
-                if regeneration_count > 0:
-                    logger.warning(f"🔄 Regeneration Attempt {regeneration_count}/{max_regenerations}...")
-                    current_prompt += "\n\nCRITICAL: Previous generation had persistent visual layout issues (overlaps/cutoffs). Ensure STRICT adherence to safe zones and spacing."
-                    
-                    self.job_manager.update_job(
-                        job_id,
-                        status=JobStatus.GENERATING_CODE,
-                        progress={
-                            "stage": "regenerating_code",
-                            "percentage": 10,
-                            "message": f"Regenerating scene (Attempt {regeneration_count})..."
-                        }
-                    )
-                else:
-                    self.job_manager.update_job(
-                        job_id,
-                        status=JobStatus.GENERATING_CODE,
-                        progress={
-                            "stage": "generating_code",
-                            "percentage": 10,
-                            "message": "Generating Manim code using AI..."
-                        }
-                    )
-                
-                logger.info(f"🤖 Generating Manim code for job {job_id[:8]}...")
-                code = await self._generate_code(current_prompt, job.get("category", "mathematical"))
+                # Stage 1: Generate Manim code (unless resuming with code already on disk)
+                if resume is None:
+                    code, code_file = await self._new_code(job_id, job, regeneration_count, max_regenerations, timings)
                 
-                logger.info(f"✅ Code generation complete for job {job_id[:8]}...")
+                # Stage 2: Probe layout without rendering, fixing issues up front
+                if not reached(resume, "layout_checked"):
+                    with self._timed(timings, "layout_probe"):
+                        code = await self._probe_layout(job_id, code, code_file, job["scene_name"])
+                    self._checkpoint(job_id, "layout_checked", code_file, code, regeneration=regeneration_count)
                 
-                # Save code
-                code_file = Config.BASE_DIR / f"scene_{job_id}.py"
-                with open(code_file, 'w') as f:
-                    f.write(code)
+                # Stage 3: Synthesize narration ahead of the render (cached lines are skipped)
+                with self._timed(timings, "tts_prefetch"):
+                    await self._prefetch_tts(job_id, code)
                 
-                logger.info(f"💾 Code saved to {code_file.name}")
+                # Fix passes a resumed job already applied
+                first_attempt = resume.get("verify_attempt", 0) if resume else 0
+                resume = None
                 
-                self.job_manager.update_job(
-                    job_id,
-                    code_path=str(code_file),
-                    progress={
-                        "stage": "code_generated",
-                        "percentage": 30,
-                        "message": "Code generated successfully"
-                    }
-                )
-                
-                # Stage 2: Render video (Pass 1)
-                logger.info(f"🎥 Starting Manim rendering (Pass 1) for job {job_id[:8]}...")
+                # Stage 4: Render for verification (Pass 1: stills or a preview-tier video)
+                logger.info(f"🎥 Starting Manim rendering (Pass {first_attempt + 1}) for job {job_id[:8]}...")
                 self.job_manager.update_job(
                     job_id,
                     status=JobStatus.RENDERING,
                     progress={
                         "stage": "rendering",
                         "percentage": 40,
-                        "message": "Rendering video (Pass 1)..."
+                        "message": f"Rendering preview (Pass {first_attempt + 1})..." if preview else f"Rendering video (Pass {first_attempt + 1})..."
                     }
                 )
                 
-                video_path = await self._render_video(
-                    code_file,
-                    job["scene_name"],
-                    job["quality"]
+                video_path, frames = await self._verification_render(
+                    job_id, job, code_file, attempt=first_attempt, preview=preview, timings=timings
                 )
                 
-                # Stage 3: Visual Verification Loop (Gemini Fixes)
+                # Stage 5: Visual Verification Loop (Gemini Fixes)
                 max_retries = 5
                 verification_passed = False
                 
-                for i in range(max_retries):
+                for i in range(first_attempt, max_retries):
                     logger.info(f"👁️ Visual Verification Loop {i+1}/{max_retries} for job {job_id[:8]}...")
                     self.job_manager.update_job(
                         job_id,
@@ -319,11 +407,18 @@ class VideoGenerator:
                     )
                     
                     # Run analysis and fix (using Gemini for fixes now)
-                    final_code, report = self.analyzer.analyze_and_fix(
-                        code,
-                        video_path,
-                        max_iterations=1 # Analyze once per loop iteration
-                    )
+                    with self._timed(timings, "verification"):
+                        final_code, report = await self._analyze_and_fix(code, video_path, frames)
+                    
+                    analysis = report.get("final_analysis", {})
+                    verification.append({
+                        "regeneration": regeneration_count,
+                        "attempt": i + 1,
+                        "issues": len(analysis.get("issues", [])),
+                        "quality": analysis.get("overall_quality"),
+                        "changes": len(report.get("changes_applied", [])),
+                    })
+                    self.job_manager.update_job(job_id, verification=verification)
                     
                     # If code is unchanged, we are good
                     if final_code == code:
@@ -333,26 +428,40 @@ class VideoGenerator:
                     
                     # Issues found, applying fixes
                     logger.info(f"🛠️ Issues found! Applying fixes using Claude and re-rendering (Attempt {i+1})...")
+                    # Only video verification re-renders through the section cache
+                    if Config.RENDER_MODE == "sections" and Config.VERIFY_MODE == "video":
+                        diff = diff_sections(code, final_code, job["scene_name"])
+                        if diff["splittable"] and not diff["shared_changed"]:
+                            logger.info(f"  ├─ Fix touched sections: {', '.join(diff['changed']) or 'none'}")
                     code = final_code
                     
                     # Save fixed code
-                    with open(code_file, 'w') as f:
-                        f.write(code)
+                    write_code(code_file, code)
+                    self._checkpoint(
+                        job_id, "verifying", code_file, code,
+                        regeneration=regeneration_count, verify_attempt=i + 1
+                    )
                     
-                    # Re-render
-                    video_path = await self._render_video(
-                        code_file,
-                        job["scene_name"],
-                        job["quality"]
+                    # Fixes may reword narration; fetch only what is not cached yet
+                    with self._timed(timings, "tts_prefetch"):
+                        await self._prefetch_tts(job_id, code)
+                    
+                    # Re-render (section mode only re-renders the sections the fix changed)
+                    video_path, frames = await self._verification_render(
+                        job_id, job, code_file, attempt=i + 1, preview=preview, timings=timings
                     )
                 
                 if verification_passed:
                     # Success! Break the outer regeneration loop
+                    self._checkpoint(job_id, "verified", code_file, code, regeneration=regeneration_count, passed=True)
                     break
                 else:
                     # Verification failed after max retries (Gemini couldn't fix it)
                     logger.warning(f"⚠️ Layout issues persisted after {max_retries} Gemini fix attempts.")
                     
+                    # This response should not be served again
+                    self._forget_cached_code(job_id)
+                    
                     # Trigger Claude Fallback (Regeneration)
                     regeneration_count += 1
                     if regeneration_count <= max_regenerations:
@@ -361,10 +470,13 @@ class VideoGenerator:
                     else:
                         logger.error("❌ Max regenerations exceeded. Failing job.")
                         logger.info("⚠️ Accepting best effort video.")
+                        self._checkpoint(job_id, "verified", code_file, code, regeneration=max_regenerations, passed=False)
                         break
             
             except Exception as e:
                 logger.error(f"Error in generation loop: {e}")
+                self._forget_cached_code(job_id)
+                shutil.rmtree(self._stills_dir(job_id), ignore_errors=True)
                 self.job_manager.update_job(
                     job_id,
                     status=JobStatus.FAILED,
@@ -377,14 +489,66 @@ class VideoGenerator:
                 )
                 return
 
-        # Stage 4: Complete
+        shutil.rmtree(self._stills_dir(job_id), ignore_errors=True)
+        
+        # Stage 6: Render once at the requested quality
+        if not reached(checkpoint, "rendered") and (preview or video_path is None):
+            logger.info(f"🎥 Verification done; rendering final {job['quality']} video for job {job_id[:8]}...")
+            self.job_manager.update_job(
+                job_id,
+                status=JobStatus.RENDERING,
+                progress={
+                    "stage": "final_render",
+                    "percentage": 95,
+                    "message": f"Rendering final video ({job['quality']})..."
+                }
+            )
+            try:
+                with self._timed(timings, "final_render"):
+                    video_path = await self._render_video(
+                        code_file,
+                        job["scene_name"],
+                        job["quality"],
+                        job_id=job_id,
+                        attempt=-1
+                    )
+            except Exception as e:
+                logger.error(f"Final render failed: {e}")
+                self._forget_cached_code(job_id)
+                self.job_manager.update_job(
+                    job_id,
+                    status=JobStatus.FAILED,
+                    error=str(e),
+                    timings=timings,
+                    progress={
+                        "stage": "failed",
+                        "percentage": 0,
+                        "message": f"Final render failed: {str(e)}"
+                    }
+                )
+                return
+        self._checkpoint(job_id, "rendered", code_file, code, video_path=str(video_path))
+        
+        timings["total"] = round(time.monotonic() - started, 2)
+        if timings.get("final_render"):
+            # What the verification renders would have cost at the final quality
+            renders = timings.get("preview_render_count", 0) + timings.get("still_frames_count", 0)
+            spent = timings.get("preview_render", 0) + timings.get("still_frames", 0)
+            timings["estimated_saved"] = round(renders * timings["final_render"] - spent, 2)
+        logger.info(f"⏱️ Stage timings for job {job_id[:8]}: {timings}")
+        
+        # Stage 7: Complete
         logger.info(f"🎉 Video generation complete for job {job_id[:8]}!")
         logger.info(f"📁 Video saved to: {video_path}")
         
+        # Probed once here so status polls never touch the file
+        video_metadata = await asyncio.to_thread(probe_video_metadata, video_path)
         self.job_manager.update_job(
             job_id,
             status=JobStatus.COMPLETED,
             video_path=str(video_path),
+            video_metadata=video_metadata,
+            timings=timings,
             progress={
                 "stage": "completed",
                 "percentage": 100,
@@ -392,14 +556,207 @@ class VideoGenerator:
             }
         )
     
-    async def _generate_code(self, prompt: str, category: str = "mathematical") -> str:
-        """Generate Manim code from prompt"""
-        # Run in thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
+    def _forget_cached_code(self, job_id: str):
+        """Evict the job's generated code from the codegen cache after it failed"""
+        job = self.job_manager.get_job(job_id)
+        cache = get_codegen_cache()
+        if job is None or cache is None or not job.get("codegen_cache_key"):
+            return
+        if cache.delete(job["codegen_cache_key"]):
+            logger.info(f"🗑️ Dropped the cached code of job {job_id[:8]}... from the codegen cache")
+    
+    async def _new_code(
+        self,
+        job_id: str,
+        job: Dict[str, Any],
+        regeneration_count: int,
+        max_regenerations: int,
+        timings: Dict[str, Any]
+    ):
+        """Generate the scene code and save it; returns (code, code_file)"""
+        # If this is a regeneration, we append a critical instruction
+        current_prompt = job["prompt"]
+        if regeneration_count > 0:
+            logger.warning(f"🔄 Regeneration Attempt {regeneration_count}/{max_regenerations}...")
+            current_prompt += "\n\nCRITICAL: Previous generation had persistent visual layout issues (overlaps/cutoffs). Ensure STRICT adherence to safe zones and spacing."
+            
+            self.job_manager.update_job(
+                job_id,
+                status=JobStatus.GENERATING_CODE,
+                progress={
+                    "stage": "regenerating_code",
+                    "percentage": 10,
+                    "message": f"Regenerating scene (Attempt {regeneration_count})..."
+                }
+            )
+        else:
+            self.job_manager.update_job(
+                job_id,
+                status=JobStatus.GENERATING_CODE,
+                progress={
+                    "stage": "generating_code",
+                    "percentage": 10,
+                    "message": "Generating Manim code using AI..."
+                }
+            )
+        
+        logger.info(f"🤖 Generating Manim code for job {job_id[:8]}...")
+        use_cache = not job.get("bypass_cache", False)
+        with self._timed(timings, "code_generation"):
+            code = await self._generate_code(
+                current_prompt,
+                job.get("category", "mathematical"),
+                use_cache=use_cache,
+                job_id=job_id
+            )
+        
+        logger.info(f"✅ Code generation complete for job {job_id[:8]}...")
+        if use_cache:
+            # Kept on the job so a failure later (even after a restart) can evict the response
+            self.job_manager.update_job(
+                job_id, codegen_cache_key=codegen_cache_key(current_prompt, job.get("category", "mathematical"))
+            )
+        
+        # Save code
+        code_file = Config.BASE_DIR / f"scene_{job_id}.py"
+        write_code(code_file, code)
+        
+        logger.info(f"💾 Code saved to {code_file.name}")
+        
+        self.job_manager.update_job(
+            job_id,
+            code_path=str(code_file),
+            checkpoint=make_checkpoint("code_generated", code_file, code, regeneration=regeneration_count),
+            progress={
+                "stage": "code_generated",
+                "percentage": 30,
+                "message": "Code generated successfully"
+            }
+        )
+        return code, code_file
+    
+    def _checkpoint(self, job_id: str, stage: str, code_file: Path, code: str, **state):
+        """Record a completed stage so an interrupted job resumes after it"""
+        self.job_manager.update_job(job_id, checkpoint=make_checkpoint(stage, code_file, code, **state))
+    
+    @staticmethod
+    @contextmanager
+    def _timed(timings: Dict[str, Any], stage: str):
+        """Add the block's wall time to timings[stage], count the runs and trace it as a span"""
+        start = time.monotonic()
+        try:
+            with span(stage):
+                yield
+        finally:
+            timings[stage] = round(timings.get(stage, 0) + time.monotonic() - start, 2)
+            timings[f"{stage}_count"] = timings.get(f"{stage}_count", 0) + 1
+    
+    def _uses_preview(self, quality: QualityLevel) -> bool:
+        """Whether verification renders at a cheaper tier than the final quality"""
+        if not Config.PREVIEW_RENDERS:
+            return False
+        return self._preview_quality(quality) != quality or bool(Config.PREVIEW_FRAME_RATE)
+    
+    @staticmethod
+    def _preview_quality(quality: QualityLevel) -> QualityLevel:
+        """Preview tier for a job, never above the job's own quality"""
+        order = list(QualityLevel)
+        preview = QualityLevel(Config.PREVIEW_QUALITY)
+        return min(preview, QualityLevel(quality), key=order.index)
+    
+    async def _probe_layout(self, job_id: str, code: str, code_file: Path, scene_name: str) -> str:
+        """Check the scene graph for overlaps/cutoffs and fix them before rendering"""
+        if not Config.LAYOUT_PROBE:
+            return code
+        from manimator.utils.layout_probe import LayoutProbeError, probe_layout_async
+        
+        for attempt in range(Config.LAYOUT_PROBE_FIXES + 1):
+            self.job_manager.update_job(
+                job_id,
+                status=JobStatus.VERIFYING,
+                progress={
+                    "stage": "probing_layout",
+                    "percentage": 32,
+                    "message": f"Checking layout without rendering (Attempt {attempt + 1})..."
+                }
+            )
+            try:
+                async with self.scheduler.render_slot():
+                    report = await probe_layout_async(code_file, scene_name, cwd=Config.BASE_DIR)
+            except LayoutProbeError as e:
+                # The full render reports construction errors with complete logs
+                logger.warning(f"Layout probe skipped: {e}")
+                return code
+            
+            if not report["has_issues"]:
+                logger.info(f"📐 Layout probe passed ({report['steps']} steps in {report['seconds']}s)")
+                return code
+            if attempt == Config.LAYOUT_PROBE_FIXES:
+                logger.warning(f"📐 Layout probe still finds {len(report['issues'])} issues; leaving them to visual verification")
+                return code
+            
+            logger.info(f"📐 Layout probe found {len(report['issues'])} issues; fixing before the first render")
+            async with self.scheduler.llm_slot():
+                fixed_code, _ = await self.analyzer.asuggest_fixes(report, code)
+            if fixed_code == code:
+                return code
+            code = fixed_code
+            write_code(code_file, code)
+        return code
+    
+    async def _prefetch_tts(self, job_id: str, code: str):
+        """Synthesize all voiceover blocks concurrently into the audio cache"""
+        if not Config.TTS_PREFETCH:
+            return
+        try:
+            from manimator.services.tts_prefetch import extract_voiceovers, prefetch_voiceovers
+        except ImportError as e:
+            logger.warning(f"Voiceover prefetch unavailable: {e}")
+            return
+        
+        plan = extract_voiceovers(code)
+        if plan is None or not plan.texts:
+            return
+        
+        loop = asyncio.get_running_loop()
+        
+        def report(done: int, total: int):
+            loop.call_soon_threadsafe(
+                lambda: self.job_manager.update_job(
+                    job_id,
+                    status=JobStatus.PREFETCHING_TTS,
+                    progress={
+                        "stage": "prefetching_tts",
+                        "percentage": 30 + int(10 * done / total),
+                        "message": f"Synthesizing voiceovers ({done}/{total})..."
+                    }
+                )
+            )
+        
+        stats = await loop.run_in_executor(
             None,
-            lambda p=prompt, c=category: generate_animation_response(p, c)
+            lambda: prefetch_voiceovers(code, Config.BASE_DIR, progress=report)
         )
+        logger.info(
+            f"🔊 Voiceover prefetch: {stats['fetched']} fetched, {stats['cached']} cached, "
+            f"{stats['failed']} failed, {stats['skipped']} skipped, "
+            f"{stats.get('http', {}).get('retries', 0)} retries in {stats['seconds']}s"
+        )
+    
+    async def _generate_code(
+        self,
+        prompt: str,
+        category: str = "mathematical",
+        use_cache: bool = True,
+        job_id: Optional[str] = None
+    ) -> str:
+        """Generate Manim code from prompt"""
+        if Config.STREAM_CODEGEN:
+            response = await self._stream_code(prompt, category, use_cache, job_id)
+        else:
+            # LLM slot keeps model calls off the render slots
+            async with self.scheduler.llm_slot():
+                response = await agenerate_animation_response(prompt, category, use_cache=use_cache)
         
         # Extract Python code from markdown
         pattern = r'```python\n(.*?)```'
@@ -411,82 +768,262 @@ class VideoGenerator:
             # Try without code block
             return response
     
-    async def _render_video(self, code_file: Path, scene_name: str, quality: QualityLevel) -> Path:
+    async def _stream_code(self, prompt: str, category: str, use_cache: bool, job_id: Optional[str]) -> str:
+        """Stream code generation and prefetch finished sections while the rest is written"""
+        try:
+            from manimator.services.section_prefetch import SectionPrefetcher
+            prefetcher = SectionPrefetcher(Config.BASE_DIR, tts=Config.TTS_PREFETCH, tex=tex_cache_enabled())
+        except ImportError as e:
+            logger.warning(f"Section prefetch unavailable: {e}")
+            prefetcher = None
+        
+        def on_method(method):
+            if prefetcher is None:
+                return
+            prefetcher.on_method(method)
+            if job_id:
+                self.job_manager.update_job(
+                    job_id,
+                    progress={
+                        "stage": "generating_code",
+                        "percentage": 10,
+                        "message": f"Generating Manim code ({prefetcher.stats['sections']} methods written)..."
+                    }
+                )
+        
+        async with self.scheduler.llm_slot():
+            response = await astream_animation_response(
+                prompt,
+                category,
+                use_cache=use_cache,
+                on_method=on_method,
+                on_discard=prefetcher.discard if prefetcher is not None else None
+            )
+        
+        if prefetcher is not None:
+            stats = await prefetcher.drain()
+            logger.info(
+                f"⚡ Streamed {stats['sections']} methods; prefetched {stats['tts_fetched']} voiceovers "
+                f"and {stats['tex_compiled']} formulas during generation"
+            )
+        return response
+    
+    async def _analyze_and_fix(self, code: str, video_path: Optional[Path], frames: Optional[List[Path]] = None):
+        """Run the vision check and code fix (one pass) without blocking the event loop"""
+        async with self.scheduler.llm_slot():
+            return await self.analyzer.aanalyze_and_fix(code, video_path, frame_paths=frames)
+    
+    def _stills_dir(self, job_id: str) -> Path:
+        return Config.BASE_DIR / "media" / "stills" / job_id
+    
+    async def _verification_render(
+        self,
+        job_id: str,
+        job: Dict[str, Any],
+        code_file: Path,
+        attempt: int,
+        preview: bool,
+        timings: Dict[str, Any]
+    ):
+        """
+        Render what the verification step looks at
+        
+        In stills mode only the last frame of each play() is drawn, with no
+        video encoding; if that fails a preview video is rendered instead.
+        
+        Returns:
+            Tuple of (video_path, frame_paths); exactly one is set
+        """
+        if Config.VERIFY_MODE == "stills":
+            from manimator.utils.still_frames import StillFrameError, render_still_frames_async, sample_frames
+            
+            out_dir = self._stills_dir(job_id) / f"attempt_{attempt}"
+            try:
+                with self._timed(timings, "still_frames"):
+                    async with self.scheduler.render_slot():
+                        manifest = await render_still_frames_async(
+                            code_file,
+                            job["scene_name"],
+                            out_dir,
+                            quality=self._preview_quality(job["quality"]).value,
+                            cwd=Config.BASE_DIR
+                        )
+                frames = sample_frames(manifest["frames"], Config.STILL_FRAMES_MAX)
+                logger.info(
+                    f"🖼️ Rendered {len(manifest['frames'])} stills in {manifest['seconds']}s, "
+                    f"verifying {len(frames)}"
+                )
+                return None, [Path(frame["path"]) for frame in frames]
+            except StillFrameError as e:
+                logger.warning(f"Still-frame render failed, rendering a preview video instead: {e}")
+        
+        with self._timed(timings, "preview_render" if preview else "render"):
+            video_path = await self._render_video(
+                code_file,
+                job["scene_name"],
+                job["quality"],
+                job_id=job_id,
+                attempt=attempt,
+                preview=preview
+            )
+        return video_path, None
+    
+    async def _render_video(
+        self,
+        code_file: Path,
+        scene_name: str,
+        quality: QualityLevel,
+        job_id: Optional[str] = None,
+        attempt: int = 0,
+        preview: bool = False
+    ) -> Path:
+        """
+        Render video using Manim, holding render slots
+        
+        In section mode, unchanged sections are reused from earlier renders
+        and the reused/re-rendered split is recorded in the job's render_history.
+        Preview renders use the PREVIEW_QUALITY tier (and PREVIEW_FRAME_RATE
+        in serial mode) instead of the job's quality.
+        """
+        frame_rate = 0
+        if preview:
+            quality = self._preview_quality(quality)
+            frame_rate = Config.PREVIEW_FRAME_RATE
+        
+        if Config.RENDER_MODE == "sections":
+            # Each section process takes its own render slot
+            renderer = SectionRenderer(
+                cwd=Config.BASE_DIR,
+                videos_dir=Config.VIDEOS_DIR,
+                max_workers=Config.SECTION_WORKERS,
+                slot=self.scheduler.render_slot,
+                env=self._manim_env()
+            )
+            result = await renderer.render(
+                code_file,
+                QUALITY_FLAGS[quality],
+                QUALITY_DIRS[quality],
+                scene_name=scene_name
+            )
+            if result is not None:
+                logger.info(
+                    f"📹 Section-parallel render complete: {result.video_path.name} "
+                    f"({len(result.rerendered)} rendered, {len(result.reused)} reused)"
+                )
+                if job_id:
+                    job = self.job_manager.get_job(job_id)
+                    history = job.get("render_history", []) if job else []
+                    history.append({"attempt": attempt, "preview": preview, **result.summary()})
+                    self.job_manager.update_job(job_id, render_history=history)
+                return result.video_path
+        
+        async with self.scheduler.render_slot():
+            with span("manim", quality=QualityLevel(quality).value, warm=warm_workers_enabled()):
+                if warm_workers_enabled():
+                    return await self._run_warm(code_file, scene_name, quality, frame_rate)
+                return await self._run_manim(code_file, scene_name, quality, frame_rate)
+    
+    async def _run_warm(self, code_file: Path, scene_name: str, quality: QualityLevel, frame_rate: int = 0) -> Path:
+        """Render video on a warm worker that already has manim imported"""
+        pool = get_worker_pool(cwd=Config.BASE_DIR)
+        logger.info(f"🎬 Rendering {code_file.name} on a warm manim worker")
+        try:
+            result = await pool.render_async(
+                code_file,
+                scene_name,
+                quality.value,
+                media_dir=Config.BASE_DIR / "media",
+                cwd=str(Config.BASE_DIR),
+                config={"frame_rate": frame_rate} if frame_rate else None,
+                env={"PATH": self._manim_env()["PATH"]}
+            )
+        except WorkerError as e:
+            for record in e.logs[-20:]:
+                logger.warning(f"  ⚠️  {record['message']}")
+            raise Exception(str(e))
+        
+        logger.info(
+            f"📹 Rendered {result['scene_class']} in {result['seconds']:.1f}s "
+            f"(worker RSS {result['rss_mb']:.0f} MB)"
+        )
+        trace_add("child_peak_rss_bytes", int(result["rss_mb"] * 1024 * 1024))
+        return Path(result["video_path"])
+    
+    def _manim_env(self) -> Dict[str, str]:
+        """Environment for manim subprocesses, with the LaTeX path"""
+        env = os.environ.copy()
+        latex_path = "/Library/TeX/texbin"
+        if latex_path not in env.get("PATH", ""):
+            env["PATH"] = f"{latex_path}:{env.get('PATH', '')}"
+        return env
+    
+    async def _run_manim(self, code_file: Path, scene_name: str, quality: QualityLevel, frame_rate: int = 0) -> Path:
         """Render video using Manim with real-time progress"""
         quality_flag = QUALITY_FLAGS[quality]
+        quality_dir = QUALITY_DIRS[quality]
         
-        cmd = [
-            "manim",
-            quality_flag,
+        cmd = manim_command() + [quality_flag]
+        if frame_rate:
+            cmd += ["--frame_rate", str(frame_rate)]
+            quality_dir = f"{quality_dir.split('p')[0]}p{frame_rate}"
+        cmd += [
             str(code_file),
             scene_name
         ]
         
         logger.info(f"🎬 Executing: {' '.join(cmd)}")
         
-        # Prepare environment with LaTeX path
-        env = os.environ.copy()
-        latex_path = "/Library/TeX/texbin"
-        if latex_path not in env.get("PATH", ""):
-            env["PATH"] = f"{latex_path}:{env.get('PATH', '')}"
-        
         # Run subprocess with streaming output
         process = await asyncio.create_subprocess_exec(
             *cmd,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.STDOUT,  # Merge stderr into stdout
             cwd=str(Config.BASE_DIR),
-            env=env
+            env=self._manim_env()
         )
         
         # Stream output in real-time
         output_lines = []
         last_animation_num = 0
         
-        while True:
-            line = await process.stdout.readline()
-            if not line:
-                break
+        async with child_process(process.pid):
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
             
-            line_text = line.decode('utf-8').strip()
-            output_lines.append(line_text)
+                line_text = line.decode('utf-8').strip()
+                output_lines.append(line_text)
             
-            # Parse and log Manim progress
-            if "Animation" in line_text and "Partial movie file" in line_text:
-                # Extract animation number
-                import re
-                match = re.search(r'Animation (\d+)', line_text)
-                if match:
-                    anim_num = int(match.group(1))
-                    # Only log every 10th animation to avoid spam
-                    if anim_num % 10 == 0 or anim_num != last_animation_num:
-                        logger.info(f"  ├─ Rendering animation {anim_num}...")
-                        last_animation_num = anim_num
+                # Parse and log Manim progress
+                if "Animation" in line_text and "Partial movie file" in line_text:
+                    # Extract animation number
+                    import re
+                    match = re.search(r'Animation (\d+)', line_text)
+                    if match:
+                        anim_num = int(match.group(1))
+                        # Only log every 10th animation to avoid spam
+                        if anim_num % 10 == 0 or anim_num != last_animation_num:
+                            logger.info(f"  ├─ Rendering animation {anim_num}...")
+                            last_animation_num = anim_num
             
-            elif "Rendered" in line_text and "Played" in line_text:
-                # Final summary
-                logger.info(f"  └─ {line_text}")
+                elif "Rendered" in line_text and "Played" in line_text:
+                    # Final summary
+                    logger.info(f"  └─ {line_text}")
             
-            elif "INFO" in line_text and ("File ready" in line_text or "Combining" in line_text):
-                logger.info(f"  ├─ {line_text}")
+                elif "INFO" in line_text and ("File ready" in line_text or "Combining" in line_text):
+                    logger.info(f"  ├─ {line_text}")
             
-            elif "WARNING" in line_text or "ERROR" in line_text:
-                logger.warning(f"  ⚠️  {line_text}")
+                elif "WARNING" in line_text or "ERROR" in line_text:
+                    logger.warning(f"  ⚠️  {line_text}")
         
-        await process.wait()
+            await process.wait()
         
         if process.returncode != 0:
             error_output = '\n'.join(output_lines[-20:])  # Last 20 lines
             raise Exception(f"Manim rendering failed:\n{error_output}")
         
         # Find generated video
-        quality_dir = {
-            QualityLevel.LOW: "480p15",
-            QualityLevel.MEDIUM: "720p30",
-            QualityLevel.HIGH: "1080p60",
-            QualityLevel.ULTRA: "2160p60"
-        }[quality]
-        
         video_dir = Config.VIDEOS_DIR / code_file.stem / quality_dir
         
         # Search for the actual video file (class name may differ from scene_name)
@@ -516,7 +1053,58 @@ app = FastAPI(
 
 # Initialize managers
 job_manager = JobManager()
-video_generator = VideoGenerator(job_manager)
+render_scheduler = RenderScheduler(
+    render_slots=Config.RENDER_SLOTS,
+    llm_slots=Config.LLM_SLOTS,
+    max_queued=Config.MAX_QUEUED_JOBS
+)
+video_generator = VideoGenerator(job_manager, render_scheduler)
+
+# Shared queue for separate render workers (None: jobs run in this process)
+QUEUE_NAME = "2d"
+job_queue = create_job_queue(Config.JOB_QUEUE, Config.JOB_QUEUE_DB, Config.JOB_QUEUE_URL)
+if job_queue is not None and Config.JOB_STORE == "json":
+    # The JSON store indexes jobs in memory once per process; workers would
+    # never see jobs the API created after they started
+    raise ValueError("JOB_STORE=json cannot be shared with queue workers; use JOB_STORE=sqlite with JOB_QUEUE")
+
+
+@app.on_event("startup")
+async def start_event_relay():
+    """Publish progress written by queue workers to this process's event streams"""
+    if job_queue is not None:
+        asyncio.get_running_loop().create_task(relay_store_updates(job_manager.store, job_manager.events))
+        if tracing_enabled():
+            # Workers trace jobs in their own processes; fold their saved traces into /metrics
+            asyncio.get_running_loop().create_task(collect_store_traces(job_manager.store))
+
+
+@app.on_event("startup")
+async def resume_interrupted_jobs():
+    """Re-queue jobs that were running when the previous process stopped"""
+    # With a shared queue, expired worker leases re-deliver jobs instead
+    if job_queue is not None or not Config.RESUME_JOBS:
+        return
+    running = [JobStatus.PENDING, JobStatus.GENERATING_CODE, JobStatus.PREFETCHING_TTS, JobStatus.RENDERING, JobStatus.VERIFYING]
+    jobs = interrupted_jobs(job_manager, [status.value for status in running])
+    for job in jobs:
+        job_id = job["job_id"]
+        stage = (job.get("checkpoint") or {}).get("stage", "the start")
+        job_manager.update_job(
+            job_id,
+            status=JobStatus.PENDING,
+            progress={"stage": "queued", "percentage": 0, "message": f"Resuming after a restart (from {stage})"}
+        )
+        render_scheduler.submit(job_id, lambda job_id=job_id: video_generator.generate_video(job_id), force=True)
+    if jobs:
+        logger.info(f"♻️ Re-queued {len(jobs)} interrupted jobs")
+
+
+def _queue_position(job_id: str) -> Optional[int]:
+    """Position of a waiting job in the render scheduler or the shared queue"""
+    if job_queue is not None:
+        return job_queue.position(job_id)
+    return render_scheduler.position(job_id)
 
 
 # ============================================================================
@@ -534,36 +1122,81 @@ async def root():
             "create_video": "POST /api/videos",
             "get_status": "GET /api/jobs/{job_id}",
             "download_video": "GET /api/videos/{job_id}",
-            "list_jobs": "GET /api/jobs"
+            "list_jobs": "GET /api/jobs",
+            "metrics": "GET /metrics"
         }
     }
 
 
 @app.post("/api/videos", response_model=JobResponse)
-async def create_video(request: VideoRequest, background_tasks: BackgroundTasks):
+async def create_video(request: VideoRequest):
     """
     Create a new video generation job
     
-    The job is processed asynchronously in the background.
+    The job is queued and processed asynchronously by the render scheduler.
     Use the returned job_id to check status and download the video.
+    Returns 429 with a Retry-After header when the queue is full.
     """
+    if job_queue is not None:
+        if job_queue.stats(QUEUE_NAME)["queued"] >= Config.MAX_QUEUED_JOBS:
+            raise HTTPException(
+                status_code=429,
+                detail="Render queue is full. Please retry later.",
+                headers={"Retry-After": str(job_queue.retry_after(QUEUE_NAME))}
+            )
+    elif not render_scheduler.has_capacity():
+        retry_after = render_scheduler.retry_after()
+        raise HTTPException(
+            status_code=429,
+            detail="Render queue is full. Please retry later.",
+            headers={"Retry-After": str(retry_after)}
+        )
+    
     # Create job
     job_id = job_manager.create_job(
         prompt=request.prompt,
         quality=request.quality,
         category=request.category,
-        scene_name=request.scene_name
+        scene_name=request.scene_name,
+        bypass_cache=request.bypass_cache
     )
     
     logger.info(f"📝 New job created: {job_id} (quality: {request.quality})")
     
-    # Start generation in background
-    background_tasks.add_task(video_generator.generate_video, job_id)
+    if job_queue is not None:
+        # A queue worker picks it up
+        position = job_queue.enqueue(job_id, QUEUE_NAME, priority=request.priority)
+        return JobResponse(
+            job_id=job_id,
+            status=JobStatus.PENDING,
+            message=f"Job created successfully. Queued at position {position}.",
+            created_at=datetime.now().isoformat()
+        )
+    
+    # Queue generation behind the render scheduler
+    try:
+        position = render_scheduler.submit(
+            job_id,
+            lambda: video_generator.generate_video(job_id),
+            priority=request.priority
+        )
+    except QueueFullError as e:
+        job_manager.update_job(
+            job_id,
+            status=JobStatus.FAILED,
+            error=str(e),
+            progress={"stage": "rejected", "percentage": 0, "message": str(e)}
+        )
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     
     return JobResponse(
         job_id=job_id,
         status=JobStatus.PENDING,
-        message="Job created successfully. Video generation started.",
+        message=f"Job created successfully. Queued at position {position}.",
         created_at=datetime.now().isoformat()
     )
 
@@ -580,44 +1213,155 @@ async def get_job_status(job_id: str):
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
+    return await _status_response(job)
+
+
+async def _status_response(job: Dict) -> JobStatusResponse:
+    """Build the status response for a job record (status endpoint and events)"""
+    job_id = job["job_id"]
     video_url = None
     duration = None
+    video = None
+    progress = job["progress"]
+    
+    if job["status"] == JobStatus.PENDING:
+        position = _queue_position(job_id)
+        if position is not None:
+            progress = {
+                **progress,
+                "queue_position": position,
+                "message": f"Waiting for a render slot (position {position} in queue)"
+            }
     
     if job["status"] == JobStatus.COMPLETED and job.get("video_path"):
         video_url = f"/api/videos/{job_id}"
         
-        # Get video duration if available
-        try:
-            video_path = Path(job["video_path"])
-            if video_path.exists():
-                result = subprocess.run(
-                    ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-                     "-of", "default=noprint_wrappers=1:nokey=1", str(video_path)],
-                    capture_output=True,
-                    text=True
-                )
-                duration = float(result.stdout.strip())
-        except:
-            pass
+        video = job.get("video_metadata")
+        if video is None and Path(job["video_path"]).exists():
+            # Jobs completed before metadata was stored: probe once, off the event loop
+            video = await asyncio.to_thread(probe_video_metadata, Path(job["video_path"]))
+            if video is not None:
+                job_manager.update_job(job_id, video_metadata=video)
+        duration = video.get("duration") if video else None
     
     return JobStatusResponse(
         job_id=job_id,
         status=job["status"],
-        progress=job["progress"],
+        progress=progress,
         created_at=job["created_at"],
         updated_at=job["updated_at"],
         error=job.get("error"),
         video_url=video_url,
-        duration=duration
+        duration=duration,
+        video=video,
+        timings=job.get("timings"),
+        trace=job.get("trace")
+    )
+
+
+async def _event_payload(job: Dict) -> Dict:
+    return jsonable_encoder(await _status_response(job))
+
+
+def _subscribe(job_id: Optional[str] = None):
+    try:
+        return job_manager.events.subscribe(job_id)
+    except TooManySubscribersError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def _event_source(body) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Stream a video job's progress as Server-Sent Events
+    
+    Sends the current status first, then one "status" event (same body as
+    GET /api/jobs/{job_id}) per update, and ends once the job completes,
+    fails or is deleted. Replaces polling the status endpoint.
+    """
+    # Subscribe before reading the job so no update falls in between
+    subscription = _subscribe(job_id)
+    job = job_manager.get_job(job_id)
+    if not job:
+        subscription.close()
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return _event_source(sse_stream(
+        subscription, [job], _event_payload,
+        terminal=[JobStatus.COMPLETED, JobStatus.FAILED],
+        keepalive=Config.EVENTS_KEEPALIVE
+    ))
+
+
+@app.get("/api/events")
+async def all_job_events():
+    """
+    Stream updates of every video job as Server-Sent Events
+    
+    A client that falls too far behind receives a "lagged" event and is
+    disconnected; it should reconnect and list jobs to resynchronize.
+    """
+    return _event_source(sse_stream(
+        _subscribe(), [], _event_payload,
+        terminal=[],
+        keepalive=Config.EVENTS_KEEPALIVE
+    ))
+
+
+@app.websocket("/api/jobs/{job_id}/ws")
+async def job_events_ws(websocket: WebSocket, job_id: str):
+    """WebSocket variant of /api/jobs/{job_id}/events ({"event", "data"} messages)"""
+    await websocket.accept()
+    try:
+        subscription = job_manager.events.subscribe(job_id)
+    except TooManySubscribersError:
+        await websocket.close(code=1013)
+        return
+    job = job_manager.get_job(job_id)
+    if not job:
+        subscription.close()
+        await websocket.close(code=1008, reason="Job not found")
+        return
+    
+    await websocket_stream(
+        websocket, subscription, [job], _event_payload,
+        terminal=[JobStatus.COMPLETED, JobStatus.FAILED],
+        keepalive=Config.EVENTS_KEEPALIVE
+    )
+
+
+@app.websocket("/api/events/ws")
+async def all_job_events_ws(websocket: WebSocket):
+    """WebSocket variant of /api/events"""
+    await websocket.accept()
+    try:
+        subscription = job_manager.events.subscribe()
+    except TooManySubscribersError:
+        await websocket.close(code=1013)
+        return
+    
+    await websocket_stream(
+        websocket, subscription, [], _event_payload,
+        terminal=[],
+        keepalive=Config.EVENTS_KEEPALIVE
     )
 
 
 @app.get("/api/videos/{job_id}")
-async def download_video(job_id: str):
+async def download_video(job_id: str, request: Request):
     """
     Download the generated video file
     
-    Returns the MP4 file if the job is completed successfully.
+    Returns the MP4 file if the job is completed successfully. Supports
+    Range requests (206) and ETag/If-None-Match (304) so players can seek.
     """
     job = job_manager.get_job(job_id)
     
@@ -635,24 +1379,29 @@ async def download_video(job_id: str):
     if not video_path.exists():
         raise HTTPException(status_code=404, detail="Video file not found")
     
-    return FileResponse(
-        video_path,
-        media_type="video/mp4",
-        filename=f"{job['scene_name']}.mp4"
-    )
+    return video_response(request, video_path, filename=f"{job['scene_name']}.mp4")
 
 
 @app.get("/api/jobs")
-async def list_jobs(limit: int = 50):
+async def list_jobs(
+    limit: int = 50,
+    offset: int = 0,
+    status: Optional[JobStatus] = None,
+    category: Optional[AnimationCategory] = None
+):
     """
-    List all video generation jobs
+    List video generation jobs
     
-    Returns a list of jobs sorted by creation time (most recent first).
+    Returns a page of jobs sorted by creation time (most recent first),
+    optionally filtered by status and category. "total" is the number of
+    jobs matching the filters.
     """
-    jobs = job_manager.list_jobs(limit=limit)
+    jobs = job_manager.list_jobs(limit=limit, offset=offset, status=status, category=category)
     
     return {
-        "total": len(jobs),
+        "total": job_manager.count_jobs(status=status, category=category),
+        "limit": limit,
+        "offset": offset,
         "jobs": jobs
     }
 
@@ -674,18 +1423,20 @@ async def delete_job(job_id: str):
         except:
             pass
     
-    # Delete code file
+    # Delete code file and what section renders left behind
     if job.get("code_path"):
         try:
             Path(job["code_path"]).unlink(missing_ok=True)
+            remove_section_files(Path(job["code_path"]), Config.VIDEOS_DIR)
         except:
             pass
     
-    # Delete job data
-    job_file = Config.JOBS_DIR / f"{job_id}.json"
-    job_file.unlink(missing_ok=True)
+    # Drop it from the shared queue if no worker has claimed it yet
+    if job_queue is not None:
+        job_queue.cancel(job_id)
     
-    del job_manager.jobs[job_id]
+    # Delete job data
+    job_manager.delete_job(job_id)
     
     return {"message": "Job deleted successfully", "job_id": job_id}
 
@@ -693,17 +1444,50 @@ async def delete_job(job_id: str):
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    status_counts = job_manager.counts("status")
+    codegen_cache = get_codegen_cache()
+    tex_cache = get_tex_cache()
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "jobs": {
-            "total": len(job_manager.jobs),
-            "pending": len([j for j in job_manager.jobs.values() if j["status"] == JobStatus.PENDING]),
-            "processing": len([j for j in job_manager.jobs.values() if j["status"] in [JobStatus.GENERATING_CODE, JobStatus.RENDERING]]),
-            "completed": len([j for j in job_manager.jobs.values() if j["status"] == JobStatus.COMPLETED]),
-            "failed": len([j for j in job_manager.jobs.values() if j["status"] == JobStatus.FAILED])
-        }
+            "total": sum(status_counts.values()),
+            "pending": status_counts.get(JobStatus.PENDING.value, 0),
+            "processing": status_counts.get(JobStatus.GENERATING_CODE.value, 0) + status_counts.get(JobStatus.PREFETCHING_TTS.value, 0) + status_counts.get(JobStatus.RENDERING.value, 0),
+            "completed": status_counts.get(JobStatus.COMPLETED.value, 0),
+            "failed": status_counts.get(JobStatus.FAILED.value, 0)
+        },
+        "scheduler": render_scheduler.stats(),
+        "queue": job_queue.stats(QUEUE_NAME) if job_queue else {"backend": "local"},
+        "llm": get_llm_client().stats(),
+        "events": job_manager.events.stats(),
+        "codegen_cache": codegen_cache.stats() if codegen_cache else {"enabled": False},
+        "tex_cache": tex_cache.stats() if tex_cache else {"enabled": False},
+        "render_workers": dict(get_worker_pool(cwd=Config.BASE_DIR).stats) if warm_workers_enabled() else {"enabled": False}
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics
+    
+    Per-stage histograms over the traces of jobs run by this process
+    (with JOB_QUEUE, also those queue workers saved on job records since
+    this process started). Aggregates are per API process and reset when it
+    restarts. Also reports current job, scheduler and LLM gauges.
+    """
+    status_counts = job_manager.counts("status")
+    scheduler = render_scheduler.stats()
+    llm = get_llm_client().stats()
+    gauges = {
+        "manimator_jobs": ("Jobs by status", [({"status": status}, count) for status, count in status_counts.items()]),
+        "manimator_render_queued": ("Jobs waiting for the render scheduler", [({}, scheduler["queued"])]),
+        "manimator_render_slots_in_use": ("Render slots in use", [({}, scheduler["render_in_use"])]),
+        "manimator_llm_in_flight": ("LLM calls in flight", [({"model": model}, gauge["in_flight"]) for model, gauge in llm.items()]),
+        "manimator_llm_waiting": ("LLM calls waiting for a slot", [({"model": model}, gauge["waiting"]) for model, gauge in llm.items()]),
     }
+    return PlainTextResponse(get_metrics().render(gauges), media_type="text/plain; version=0.0.4")
 
 
 # ============================================================================
@@ -7,25 +7,32 @@ Supports all STEM visualizations: mathematical, scientific, geometric, and data
 Server runs on port 8001 (2D server on 8000)
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Request, WebSocket, BackgroundTasks
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from enum import Enum
 import uuid
 import os
-import json
 import re
-import subprocess
 from datetime import datetime
 from pathlib import Path
 import asyncio
 import logging
 
 from manimator.threed.api.animation_generation_3d import (
-    generate_3d_animation_response,
-    generate_3d_animation_with_category
+    agenerate_3d_animation_response,
+    agenerate_3d_animation_with_category
 )
+from manimator.utils.job_store import JobStore, create_job_store
+from manimator.utils.video_delivery import probe_video_metadata, video_response
+from manimator.utils.job_events import TooManySubscribersError, get_event_broker, relay_store_updates, sse_stream, websocket_stream
+from manimator.utils.job_queue import create_job_queue
+from manimator.utils.job_checkpoint import interrupted_jobs, make_checkpoint, reached, resume_point, write_code
+from manimator.utils.llm_client import get_llm_client
+from manimator.utils.tex_cache import get_tex_cache, manim_command
+from manimator.utils.tracing import child_process, collect_store_traces, get_metrics, span, trace, tracing_enabled
 
 # Configure logging
 logging.basicConfig(
@@ -45,6 +52,21 @@ class Config:
     VIDEOS_DIR = BASE_DIR / "media" / "videos"
     MAX_JOB_AGE_DAYS = 7
     
+    # Job persistence: "sqlite" (default) or "json" (one file per job)
+    JOB_STORE = os.getenv("JOB_STORE", "sqlite")
+    JOBS_DB = Path(os.getenv("JOBS_DB", str(JOBS_DIR / "jobs.db")))
+    
+    # Job queue: "local" runs jobs in this process; "sqlite" or "redis" leaves them to queue_worker.py processes
+    JOB_QUEUE = os.getenv("JOB_QUEUE", "local")
+    JOB_QUEUE_DB = Path(os.getenv("JOB_QUEUE_DB", str(JOBS_DIR / "queue.db")))
+    JOB_QUEUE_URL = os.getenv("JOB_QUEUE_URL", "redis://localhost:6379/0")
+    
+    # Restart jobs a previous process left unfinished; they resume from their last checkpoint
+    RESUME_JOBS = os.getenv("RESUME_JOBS", "1") != "0"
+    
+    # Push endpoints: seconds between keep-alives on idle event streams
+    EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", "15"))
+    
     # Ensure directories exist
     JOBS_DIR.mkdir(exist_ok=True)
     VIDEOS_DIR.mkdir(parents=True, exist_ok=True)
@@ -126,6 +148,8 @@ class JobStatusResponse(BaseModel):
     error: Optional[str] = None
     video_url: Optional[str] = None
     duration: Optional[float] = None
+    video: Optional[Dict[str, Any]] = None
+    trace: Optional[Dict[str, Any]] = None
 
 
 # ============================================================================
@@ -135,19 +159,9 @@ class JobStatusResponse(BaseModel):
 class JobManager:
     """Manages 3D video generation jobs"""
     
-    def __init__(self):
-        self.jobs: Dict[str, Dict] = {}
-        self._load_existing_jobs()
-    
-    def _load_existing_jobs(self):
-        """Load existing jobs from disk"""
-        for job_file in Config.JOBS_DIR.glob("*.json"):
-            try:
-                with open(job_file) as f:
-                    job_data = json.load(f)
-                    self.jobs[job_data["job_id"]] = job_data
-            except Exception as e:
-                logger.error(f"Error loading job {job_file}: {e}")
+    def __init__(self, store: Optional[JobStore] = None):
+        self.store = store or create_job_store(Config.JOB_STORE, Config.JOBS_DIR, Config.JOBS_DB)
+        self.events = get_event_broker()
     
     def create_job(
         self,
@@ -181,18 +195,20 @@ class JobManager:
             "code_path": None,
         }
         
-        self.jobs[job_id] = job_data
-        self._save_job(job_id)
+        self.store.put(job_data)
+        self.events.publish(job_data)
         return job_id
     
     def update_job(self, job_id: str, **kwargs):
         """Update job data"""
-        if job_id not in self.jobs:
+        job = self.store.get(job_id)
+        if job is None:
             raise ValueError(f"Job {job_id} not found")
         
-        self.jobs[job_id].update(kwargs)
-        self.jobs[job_id]["updated_at"] = datetime.now().isoformat()
-        self._save_job(job_id)
+        job.update(kwargs)
+        job["updated_at"] = datetime.now().isoformat()
+        self.store.put(job)
+        self.events.publish(job)
         
         # Log progress updates
         if "progress" in kwargs:
@@ -200,22 +216,32 @@ class JobManager:
     
     def get_job(self, job_id: str) -> Optional[Dict]:
         """Get job data"""
-        return self.jobs.get(job_id)
-    
-    def _save_job(self, job_id: str):
-        """Save job data to disk"""
-        job_file = Config.JOBS_DIR / f"{job_id}.json"
-        with open(job_file, 'w') as f:
-            json.dump(self.jobs[job_id], f, indent=2)
-    
-    def list_jobs(self, limit: int = 50) -> List[Dict]:
-        """List all jobs"""
-        jobs = sorted(
-            self.jobs.values(),
-            key=lambda x: x["created_at"],
-            reverse=True
-        )
-        return jobs[:limit]
+        return self.store.get(job_id)
+    
+    def delete_job(self, job_id: str) -> bool:
+        """Delete job data"""
+        deleted = self.store.delete(job_id)
+        if deleted:
+            self.events.publish_deleted(job_id)
+        return deleted
+    
+    def list_jobs(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        status: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> List[Dict]:
+        """List jobs, most recent first"""
+        return self.store.list(limit=limit, offset=offset, status=status, category=category)
+    
+    def count_jobs(self, status: Optional[str] = None, category: Optional[str] = None) -> int:
+        """Count jobs matching the filters"""
+        return self.store.count(status=status, category=category)
+    
+    def counts(self, dimension: str = "status") -> Dict[str, int]:
+        """Job counts grouped by status or category"""
+        return self.store.counts(dimension)
 
 
 # ============================================================================
@@ -229,73 +255,114 @@ class VideoGenerator3D:
         self.job_manager = job_manager
     
     async def generate_video(self, job_id: str):
-        """Generate 3D video for a job"""
+        """Generate 3D video for a job, recording its stage trace"""
+        root = None
+        try:
+            with trace("generate_video", job_id=job_id) as root:
+                await self._generate_video(job_id)
+        finally:
+            if root is not None:
+                self._store_trace(job_id, root)
+    
+    def _store_trace(self, job_id: str, root):
+        """Save a finished trace on the job and add it to /metrics"""
+        job = self.job_manager.get_job(job_id)
+        if job is None:
+            return
+        outcome = job["status"].value if isinstance(job["status"], Enum) else job["status"]
+        root.attrs["status"] = outcome
+        get_metrics().observe_trace(root, outcome)
+        self.job_manager.update_job(job_id, trace=root.to_dict())
+    
+    async def _generate_video(self, job_id: str):
+        """Run the 3D generation pipeline for a job"""
         job = self.job_manager.get_job(job_id)
         if not job:
             return
         
         logger.info(f"🎬 Starting 3D video generation for job {job_id[:8]}... (Category: {job['category']})")
         
+        # An interrupted job picks up after its last completed stage
+        checkpoint = resume_point(job)
+        if checkpoint is not None:
+            logger.info(f"♻️ Resuming 3D job {job_id[:8]}... from checkpoint '{checkpoint['stage']}'")
+        
         try:
-            # Stage 1: Generate Manim 3D code
-            logger.info(f"🤖 Generating 3D Manim code for job {job_id[:8]}...")
-            self.job_manager.update_job(
-                job_id,
-                status=JobStatus.GENERATING_CODE,
-                progress={
-                    "stage": "generating_code",
-                    "percentage": 10,
-                    "message": "Generating 3D Manim code using AI..."
-                }
-            )
-            
-            code = await self._generate_code(job["prompt"], job["category"])
-            
-            logger.info(f"✅ 3D code generation complete for job {job_id[:8]}...")
-            
-            # Save code
-            code_file = Config.BASE_DIR / f"scene_3d_{job_id}.py"
-            with open(code_file, 'w') as f:
-                f.write(code)
-            
-            logger.info(f"💾 Code saved to {code_file.name}")
-            
-            self.job_manager.update_job(
-                job_id,
-                code_path=str(code_file),
-                progress={
-                    "stage": "code_generated",
-                    "percentage": 30,
-                    "message": "3D code generated successfully"
-                }
-            )
-            
-            # Stage 2: Render 3D video
-            logger.info(f"🎥 Starting 3D Manim rendering for job {job_id[:8]}... (this may take several minutes)")
-            self.job_manager.update_job(
-                job_id,
-                status=JobStatus.RENDERING,
-                progress={
-                    "stage": "rendering",
-                    "percentage": 40,
-                    "message": "Rendering 3D video with Manim..."
-                }
-            )
+            if checkpoint is not None:
+                code = checkpoint["code"]
+                code_file = Path(checkpoint["code_path"])
+            else:
+                # Stage 1: Generate Manim 3D code
+                logger.info(f"🤖 Generating 3D Manim code for job {job_id[:8]}...")
+                self.job_manager.update_job(
+                    job_id,
+                    status=JobStatus.GENERATING_CODE,
+                    progress={
+                        "stage": "generating_code",
+                        "percentage": 10,
+                        "message": "Generating 3D Manim code using AI..."
+                    }
+                )
+                
+                with span("code_generation"):
+                    code = await self._generate_code(job["prompt"], job["category"])
+                
+                logger.info(f"✅ 3D code generation complete for job {job_id[:8]}...")
+                
+                # Save code
+                code_file = Config.BASE_DIR / f"scene_3d_{job_id}.py"
+                write_code(code_file, code)
+                
+                logger.info(f"💾 Code saved to {code_file.name}")
+                
+                self.job_manager.update_job(
+                    job_id,
+                    code_path=str(code_file),
+                    checkpoint=make_checkpoint("code_generated", code_file, code),
+                    progress={
+                        "stage": "code_generated",
+                        "percentage": 30,
+                        "message": "3D code generated successfully"
+                    }
+                )
             
-            video_path = await self._render_video(
-                code_file,
-                job["scene_name"],
-                job["quality"]
-            )
+            if reached(checkpoint, "rendered"):
+                video_path = Path(checkpoint["video_path"])
+            else:
+                # Stage 2: Render 3D video
+                logger.info(f"🎥 Starting 3D Manim rendering for job {job_id[:8]}... (this may take several minutes)")
+                self.job_manager.update_job(
+                    job_id,
+                    status=JobStatus.RENDERING,
+                    progress={
+                        "stage": "rendering",
+                        "percentage": 40,
+                        "message": "Rendering 3D video with Manim..."
+                    }
+                )
+                
+                with span("final_render"):
+                    video_path = await self._render_video(
+                        code_file,
+                        job["scene_name"],
+                        job["quality"]
+                    )
+                self.job_manager.update_job(
+                    job_id,
+                    checkpoint=make_checkpoint("rendered", code_file, code, video_path=str(video_path))
+                )
             
             # Stage 3: Complete
             logger.info(f"🎉 3D video rendering complete for job {job_id[:8]}!")
             logger.info(f"📁 Video saved to: {video_path}")
             
+            # Probed once here so status polls never touch the file
+            video_metadata = await asyncio.to_thread(probe_video_metadata, video_path)
             self.job_manager.update_job(
                 job_id,
                 status=JobStatus.COMPLETED,
                 video_path=str(video_path),
+                video_metadata=video_metadata,
                 progress={
                     "stage": "completed",
                     "percentage": 100,
@@ -318,21 +385,10 @@ class VideoGenerator3D:
     
     async def _generate_code(self, prompt: str, category: STEMCategory) -> str:
         """Generate 3D Manim code from prompt"""
-        loop = asyncio.get_event_loop()
-        
         if category != STEMCategory.GENERAL:
-            response = await loop.run_in_executor(
-                None,
-                generate_3d_animation_with_category,
-                prompt,
-                category
-            )
+            response = await agenerate_3d_animation_with_category(prompt, category)
         else:
-            response = await loop.run_in_executor(
-                None,
-                generate_3d_animation_response,
-                prompt
-            )
+            response = await agenerate_3d_animation_response(prompt)
         
         # Extract Python code from markdown
         pattern = r'```python\n(.*?)```'
@@ -347,8 +403,7 @@ class VideoGenerator3D:
         """Render 3D video using Manim with real-time progress"""
         quality_flag = QUALITY_FLAGS[quality]
         
-        cmd = [
-            "manim",
+        cmd = manim_command() + [
             quality_flag,
             str(code_file),
             scene_name
@@ -368,34 +423,35 @@ class VideoGenerator3D:
         output_lines = []
         last_animation_num = 0
         
-        while True:
-            line = await process.stdout.readline()
-            if not line:
-                break
+        async with child_process(process.pid):
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
             
-            line_text = line.decode('utf-8').strip()
-            output_lines.append(line_text)
+                line_text = line.decode('utf-8').strip()
+                output_lines.append(line_text)
             
-            # Parse and log Manim progress
-            if "Animation" in line_text and "Partial movie file" in line_text:
-                import re
-                match = re.search(r'Animation (\d+)', line_text)
-                if match:
-                    anim_num = int(match.group(1))
-                    if anim_num % 10 == 0 or anim_num != last_animation_num:
-                        logger.info(f"  ├─ Rendering 3D animation {anim_num}...")
-                        last_animation_num = anim_num
+                # Parse and log Manim progress
+                if "Animation" in line_text and "Partial movie file" in line_text:
+                    import re
+                    match = re.search(r'Animation (\d+)', line_text)
+                    if match:
+                        anim_num = int(match.group(1))
+                        if anim_num % 10 == 0 or anim_num != last_animation_num:
+                            logger.info(f"  ├─ Rendering 3D animation {anim_num}...")
+                            last_animation_num = anim_num
             
-            elif "Rendered" in line_text and "Played" in line_text:
-                logger.info(f"  └─ {line_text}")
+                elif "Rendered" in line_text and "Played" in line_text:
+                    logger.info(f"  └─ {line_text}")
             
-            elif "INFO" in line_text and ("File ready" in line_text or "Combining" in line_text):
-                logger.info(f"  ├─ {line_text}")
+                elif "INFO" in line_text and ("File ready" in line_text or "Combining" in line_text):
+                    logger.info(f"  ├─ {line_text}")
             
-            elif "WARNING" in line_text or "ERROR" in line_text:
-                logger.warning(f"  ⚠️  {line_text}")
+                elif "WARNING" in line_text or "ERROR" in line_text:
+                    logger.warning(f"  ⚠️  {line_text}")
         
-        await process.wait()
+            await process.wait()
         
         if process.returncode != 0:
             error_output = '\n'.join(output_lines[-20:])
@@ -434,6 +490,44 @@ app = FastAPI(
 job_manager = JobManager()
 video_generator = VideoGenerator3D(job_manager)
 
+# Shared queue for separate render workers (None: jobs run in this process)
+QUEUE_NAME = "3d"
+job_queue = create_job_queue(Config.JOB_QUEUE, Config.JOB_QUEUE_DB, Config.JOB_QUEUE_URL)
+if job_queue is not None and Config.JOB_STORE == "json":
+    # The JSON store indexes jobs in memory once per process; workers would
+    # never see jobs the API created after they started
+    raise ValueError("JOB_STORE=json cannot be shared with queue workers; use JOB_STORE=sqlite with JOB_QUEUE")
+
+
+@app.on_event("startup")
+async def resume_interrupted_jobs():
+    """Restart jobs that were running when the previous process stopped"""
+    # With a shared queue, expired worker leases re-deliver jobs instead
+    if job_queue is not None or not Config.RESUME_JOBS:
+        return
+    running = [JobStatus.PENDING, JobStatus.GENERATING_CODE, JobStatus.RENDERING]
+    jobs = interrupted_jobs(job_manager, [status.value for status in running])
+    for job in jobs:
+        stage = (job.get("checkpoint") or {}).get("stage", "the start")
+        job_manager.update_job(
+            job["job_id"],
+            status=JobStatus.PENDING,
+            progress={"stage": "queued", "percentage": 0, "message": f"Resuming after a restart (from {stage})"}
+        )
+        asyncio.get_running_loop().create_task(video_generator.generate_video(job["job_id"]))
+    if jobs:
+        logger.info(f"♻️ Resumed {len(jobs)} interrupted 3D jobs")
+
+
+@app.on_event("startup")
+async def start_event_relay():
+    """Publish progress written by queue workers to this process's event streams"""
+    if job_queue is not None:
+        asyncio.get_running_loop().create_task(relay_store_updates(job_manager.store, job_manager.events))
+        if tracing_enabled():
+            # Workers trace jobs in their own processes; fold their saved traces into /metrics
+            asyncio.get_running_loop().create_task(collect_store_traces(job_manager.store))
+
 
 # ============================================================================
 # Endpoints
@@ -452,7 +546,8 @@ async def root():
             "create_3d_video": "POST /api/3d-videos",
             "get_status": "GET /api/3d-jobs/{job_id}",
             "download_video": "GET /api/3d-videos/{job_id}",
-            "list_jobs": "GET /api/3d-jobs"
+            "list_jobs": "GET /api/3d-jobs",
+            "metrics": "GET /metrics"
         }
     }
 
@@ -475,14 +570,20 @@ async def create_3d_video(request: Video3DRequest, background_tasks: BackgroundT
     
     logger.info(f"📝 New 3D job created: {job_id} (quality: {request.quality}, category: {request.category})")
     
-    # Start generation in background
-    background_tasks.add_task(video_generator.generate_video, job_id)
+    if job_queue is not None:
+        # A queue worker picks it up
+        position = job_queue.enqueue(job_id, QUEUE_NAME)
+        message = f"3D video job created successfully. Queued at position {position}."
+    else:
+        # Start generation in background
+        background_tasks.add_task(video_generator.generate_video, job_id)
+        message = "3D video job created successfully. Generation started."
     
     return JobResponse(
         job_id=job_id,
         status=JobStatus.PENDING,
         category=request.category,
-        message="3D video job created successfully. Generation started.",
+        message=message,
         created_at=datetime.now().isoformat()
     )
 
@@ -499,25 +600,26 @@ async def get_job_status(job_id: str):
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
+    return await _status_response(job)
+
+
+async def _status_response(job: Dict) -> JobStatusResponse:
+    """Build the status response for a job record (status endpoint and events)"""
+    job_id = job["job_id"]
     video_url = None
     duration = None
+    video = None
     
     if job["status"] == JobStatus.COMPLETED and job.get("video_path"):
         video_url = f"/api/3d-videos/{job_id}"
         
-        # Get video duration if available
-        try:
-            video_path = Path(job["video_path"])
-            if video_path.exists():
-                result = subprocess.run(
-                    ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-                     "-of", "default=noprint_wrappers=1:nokey=1", str(video_path)],
-                    capture_output=True,
-                    text=True
-                )
-                duration = float(result.stdout.strip())
-        except:
-            pass
+        video = job.get("video_metadata")
+        if video is None and Path(job["video_path"]).exists():
+            # Jobs completed before metadata was stored: probe once, off the event loop
+            video = await asyncio.to_thread(probe_video_metadata, Path(job["video_path"]))
+            if video is not None:
+                job_manager.update_job(job_id, video_metadata=video)
+        duration = video.get("duration") if video else None
     
     return JobStatusResponse(
         job_id=job_id,
@@ -528,16 +630,115 @@ async def get_job_status(job_id: str):
         updated_at=job["updated_at"],
         error=job.get("error"),
         video_url=video_url,
-        duration=duration
+        duration=duration,
+        video=video,
+        trace=job.get("trace")
+    )
+
+
+async def _event_payload(job: Dict) -> Dict:
+    return jsonable_encoder(await _status_response(job))
+
+
+def _subscribe(job_id: Optional[str] = None):
+    try:
+        return job_manager.events.subscribe(job_id)
+    except TooManySubscribersError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def _event_source(body) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/3d-jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Stream a 3D video job's progress as Server-Sent Events
+    
+    Sends the current status first, then one "status" event (same body as
+    GET /api/3d-jobs/{job_id}) per update, and ends once the job completes,
+    fails or is deleted. Replaces polling the status endpoint.
+    """
+    # Subscribe before reading the job so no update falls in between
+    subscription = _subscribe(job_id)
+    job = job_manager.get_job(job_id)
+    if not job:
+        subscription.close()
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return _event_source(sse_stream(
+        subscription, [job], _event_payload,
+        terminal=[JobStatus.COMPLETED, JobStatus.FAILED],
+        keepalive=Config.EVENTS_KEEPALIVE
+    ))
+
+
+@app.get("/api/3d-events")
+async def all_job_events():
+    """
+    Stream updates of every 3D video job as Server-Sent Events
+    
+    A client that falls too far behind receives a "lagged" event and is
+    disconnected; it should reconnect and list jobs to resynchronize.
+    """
+    return _event_source(sse_stream(
+        _subscribe(), [], _event_payload,
+        terminal=[],
+        keepalive=Config.EVENTS_KEEPALIVE
+    ))
+
+
+@app.websocket("/api/3d-jobs/{job_id}/ws")
+async def job_events_ws(websocket: WebSocket, job_id: str):
+    """WebSocket variant of /api/3d-jobs/{job_id}/events ({"event", "data"} messages)"""
+    await websocket.accept()
+    try:
+        subscription = job_manager.events.subscribe(job_id)
+    except TooManySubscribersError:
+        await websocket.close(code=1013)
+        return
+    job = job_manager.get_job(job_id)
+    if not job:
+        subscription.close()
+        await websocket.close(code=1008, reason="Job not found")
+        return
+    
+    await websocket_stream(
+        websocket, subscription, [job], _event_payload,
+        terminal=[JobStatus.COMPLETED, JobStatus.FAILED],
+        keepalive=Config.EVENTS_KEEPALIVE
+    )
+
+
+@app.websocket("/api/3d-events/ws")
+async def all_job_events_ws(websocket: WebSocket):
+    """WebSocket variant of /api/3d-events"""
+    await websocket.accept()
+    try:
+        subscription = job_manager.events.subscribe()
+    except TooManySubscribersError:
+        await websocket.close(code=1013)
+        return
+    
+    await websocket_stream(
+        websocket, subscription, [], _event_payload,
+        terminal=[],
+        keepalive=Config.EVENTS_KEEPALIVE
     )
 
 
 @app.get("/api/3d-videos/{job_id}")
-async def download_video(job_id: str):
+async def download_video(job_id: str, request: Request):
     """
     Download the generated 3D video file
     
-    Returns the MP4 file if the job is completed successfully.
+    Returns the MP4 file if the job is completed successfully. Supports
+    Range requests (206) and ETag/If-None-Match (304) so players can seek.
     """
     job = job_manager.get_job(job_id)
     
@@ -555,24 +756,29 @@ async def download_video(job_id: str):
     if not video_path.exists():
         raise HTTPException(status_code=404, detail="3D video file not found")
     
-    return FileResponse(
-        video_path,
-        media_type="video/mp4",
-        filename=f"{job['scene_name']}_3D.mp4"
-    )
+    return video_response(request, video_path, filename=f"{job['scene_name']}_3D.mp4")
 
 
 @app.get("/api/3d-jobs")
-async def list_jobs(limit: int = 50):
+async def list_jobs(
+    limit: int = 50,
+    offset: int = 0,
+    status: Optional[JobStatus] = None,
+    category: Optional[STEMCategory] = None
+):
     """
-    List all 3D video generation jobs
+    List 3D video generation jobs
     
-    Returns a list of jobs sorted by creation time (most recent first).
+    Returns a page of jobs sorted by creation time (most recent first),
+    optionally filtered by status and category. "total" is the number of
+    jobs matching the filters.
     """
-    jobs = job_manager.list_jobs(limit=limit)
+    jobs = job_manager.list_jobs(limit=limit, offset=offset, status=status, category=category)
     
     return {
-        "total": len(jobs),
+        "total": job_manager.count_jobs(status=status, category=category),
+        "limit": limit,
+        "offset": offset,
         "jobs": jobs
     }
 
@@ -599,11 +805,12 @@ async def delete_job(job_id: str):
         except:
             pass
     
-    # Delete job data
-    job_file = Config.JOBS_DIR / f"{job_id}.json"
-    job_file.unlink(missing_ok=True)
+    # Drop it from the shared queue if no worker has claimed it yet
+    if job_queue is not None:
+        job_queue.cancel(job_id)
     
-    del job_manager.jobs[job_id]
+    # Delete job data
+    job_manager.delete_job(job_id)
     
     return {"message": "3D job deleted successfully", "job_id": job_id}
 
@@ -611,24 +818,51 @@ async def delete_job(job_id: str):
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    status_counts = job_manager.counts("status")
+    category_counts = job_manager.counts("category")
+    tex_cache = get_tex_cache()
     return {
         "status": "healthy",
         "service": "3D Video Generation",
         "timestamp": datetime.now().isoformat(),
         "jobs": {
-            "total": len(job_manager.jobs),
-            "pending": len([j for j in job_manager.jobs.values() if j["status"] == JobStatus.PENDING]),
-            "processing": len([j for j in job_manager.jobs.values() if j["status"] in [JobStatus.GENERATING_CODE, JobStatus.RENDERING]]),
-            "completed": len([j for j in job_manager.jobs.values() if j["status"] == JobStatus.COMPLETED]),
-            "failed": len([j for j in job_manager.jobs.values() if j["status"] == JobStatus.FAILED])
+            "total": sum(status_counts.values()),
+            "pending": status_counts.get(JobStatus.PENDING.value, 0),
+            "processing": status_counts.get(JobStatus.GENERATING_CODE.value, 0) + status_counts.get(JobStatus.RENDERING.value, 0),
+            "completed": status_counts.get(JobStatus.COMPLETED.value, 0),
+            "failed": status_counts.get(JobStatus.FAILED.value, 0)
         },
         "categories": {
-            "mathematical": len([j for j in job_manager.jobs.values() if j.get("category") == "mathematical"]),
-            "scientific": len([j for j in job_manager.jobs.values() if j.get("category") == "scientific"]),
-            "geometric": len([j for j in job_manager.jobs.values() if j.get("category") == "geometric"]),
-            "data": len([j for j in job_manager.jobs.values() if j.get("category") == "data"]),
-        }
+            "mathematical": category_counts.get("mathematical", 0),
+            "scientific": category_counts.get("scientific", 0),
+            "geometric": category_counts.get("geometric", 0),
+            "data": category_counts.get("data", 0),
+        },
+        "tex_cache": tex_cache.stats() if tex_cache else {"enabled": False},
+        "queue": job_queue.stats(QUEUE_NAME) if job_queue else {"backend": "local"},
+        "llm": get_llm_client().stats(),
+        "events": job_manager.events.stats()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics
+    
+    Per-stage histograms over the traces of 3D jobs run by this process
+    (with JOB_QUEUE, also those queue workers saved on job records since
+    this process started). Aggregates are per API process and reset when it
+    restarts. Also reports current job and LLM gauges.
+    """
+    status_counts = job_manager.counts("status")
+    llm = get_llm_client().stats()
+    gauges = {
+        "manimator_jobs": ("Jobs by status", [({"status": status}, count) for status, count in status_counts.items()]),
+        "manimator_llm_in_flight": ("LLM calls in flight", [({"model": model}, gauge["in_flight"]) for model, gauge in llm.items()]),
+        "manimator_llm_waiting": ("LLM calls waiting for a slot", [({"model": model}, gauge["waiting"]) for model, gauge in llm.items()]),
     }
+    return PlainTextResponse(get_metrics().render(gauges), media_type="text/plain; version=0.0.4")
 
 
 # ============================================================================
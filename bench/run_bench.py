@@ -0,0 +1,554 @@
+"""
+End-to-End Benchmark
+
+Replays the checked-in scenes through the real generation pipeline
+(api_server's JobManager, RenderScheduler and VideoGenerator: code
+generation, layout probe, TTS prefetch, verification renders, vision
+checks, final render) with the model and speech services replaced by
+deterministic local stubs, so runs are repeatable and cost nothing.
+
+- LLM and vision calls go to manimator.utils.llm_stub through litellm.
+  Each case's prompt carries a "Benchmark case: <scene>" marker, and the
+  stub answers with that scene_*.py file.
+- ElevenLabs calls go to manimator.services.elevenlabs_stub.
+- manim, LaTeX and ffmpeg run for real, so a full build environment is
+  needed.
+
+Each concurrency level runs in a fresh process: N clients submit jobs
+back to back until --jobs jobs are done. For every level the results
+contain throughput (jobs/hour), p50/p95 job latency, per-stage times from
+the job traces, peak memory (API process and render subprocesses), LLM
+token counts and failures. They are saved as JSON together with the
+commit and configuration, so two runs can be compared:
+
+Usage:
+    python -m bench.run_bench --levels 1,2,4 --jobs 8 --latency 5
+    python -m bench.run_bench compare bench/results/old.json bench/results/new.json
+
+Pipeline settings (RENDER_SLOTS, RENDER_MODE, VERIFY_MODE, MANIM_WARM_WORKERS,
+...) come from the environment as for the API server and are recorded in
+the results.
+"""
+
+import argparse
+import ast
+import asyncio
+import importlib
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from manimator.utils.layout_probe import REPORT_MARKER
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = BASE_DIR / "bench" / "results"
+
+# Pipeline settings recorded with every result
+CONFIG_ENV = (
+    "RENDER_SLOTS", "LLM_SLOTS", "MAX_QUEUED_JOBS", "RENDER_MODE", "SECTION_WORKERS",
+    "TTS_PREFETCH", "STREAM_CODEGEN", "LAYOUT_PROBE", "PREVIEW_RENDERS", "PREVIEW_QUALITY",
+    "VERIFY_MODE", "STILL_FRAMES_MAX", "MANIM_WARM_WORKERS", "TEX_CACHE", "LLM_CONCURRENCY",
+)
+
+# Headline metrics checked by compare: (path, higher is better)
+HEADLINE_METRICS = (
+    ("throughput_per_hour", True),
+    ("latency.p50", False),
+    ("latency.p95", False),
+    ("memory.api_peak_rss_bytes", False),
+    ("memory.subprocess_peak_rss_bytes", False),
+)
+
+FALLBACK_PROMPT = "Create an educational animation video with visualization"
+
+
+@dataclass
+class BenchCase:
+    """One scene to replay: the prompt sent and the code the stub answers with."""
+    case_id: str
+    scene_file: str
+    scene_name: str
+    prompt: str
+
+
+def _scene_class(code: str) -> Optional[str]:
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and any("Scene" in ast.unparse(base) for base in node.bases):
+            return node.name
+    return None
+
+
+def _prompts(base_dir: Path) -> List[str]:
+    """Prompts of the checked-in job records and prompt files."""
+    prompts = []
+    for path in sorted(base_dir.glob("job_*.json")):
+        try:
+            prompt = json.loads(path.read_text()).get("prompt")
+        except (OSError, ValueError):
+            continue
+        if prompt:
+            prompts.append(prompt)
+    for path in sorted(base_dir.glob("*_prompt.txt")):
+        prompts.append(path.read_text().strip())
+    return prompts or [FALLBACK_PROMPT]
+
+
+def load_cases(base_dir: Path = BASE_DIR, pattern: str = "scene_*.py", limit: int = 0) -> List[BenchCase]:
+    """
+    Benchmark cases from the scene files in the repository.
+
+    Files without a Scene subclass (or that do not parse) are skipped.
+    Prompts are taken from the checked-in job records in turn.
+
+    Args:
+        base_dir: Repository root
+        pattern: Glob for scene files
+        limit: Max cases (0 for all)
+
+    Returns:
+        Cases in file name order
+    """
+    from manimator.utils.llm_stub import CASE_MARKER
+
+    prompts = _prompts(base_dir)
+    cases = []
+    for path in sorted(base_dir.glob(pattern)):
+        scene_name = _scene_class(path.read_text())
+        if scene_name is None:
+            continue
+        prompt = prompts[len(cases) % len(prompts)]
+        cases.append(BenchCase(
+            case_id=path.stem,
+            scene_file=str(path),
+            scene_name=scene_name,
+            prompt=f"{prompt}\n\n{CASE_MARKER} {path.stem}",
+        ))
+        if limit and len(cases) == limit:
+            break
+    return cases
+
+
+# ============================================================================
+# Statistics
+# ============================================================================
+
+def percentile(values: Sequence[float], fraction: float) -> Optional[float]:
+    """Linearly interpolated percentile (fraction in 0..1), None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _summary(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 3),
+        "p50": round(percentile(values, 0.5), 3),
+        "p95": round(percentile(values, 0.95), 3),
+        "max": round(max(values), 3),
+    }
+
+
+def _walk(span: Dict[str, Any]):
+    yield span
+    for child in span.get("children", ()):
+        yield from _walk(child)
+
+
+def summarize_level(concurrency: int, elapsed: float, jobs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate the job results of one level.
+
+    Args:
+        concurrency: Clients submitting jobs
+        elapsed: Wall seconds for all jobs
+        jobs: Per-job results from _run_job
+
+    Returns:
+        Level result (see the module docstring)
+    """
+    completed = [job for job in jobs if job["status"] == "completed"]
+    stage_walls: Dict[str, List[float]] = {}
+    stage_child_cpu: Dict[str, float] = {}
+    subprocess_peak = 0
+    totals: Dict[str, float] = {}
+    for job in jobs:
+        trace = job.get("trace")
+        if not trace:
+            continue
+        for span in _walk(trace):
+            stage_walls.setdefault(span["name"], []).append(span["wall"])
+            counters = span.get("counters", {})
+            if "child_cpu_seconds" in counters:
+                stage_child_cpu[span["name"]] = stage_child_cpu.get(span["name"], 0) + counters["child_cpu_seconds"]
+        for counter, value in trace.get("totals", {}).items():
+            if counter == "child_peak_rss_bytes":
+                subprocess_peak = max(subprocess_peak, value)
+            else:
+                totals[counter] = totals.get(counter, 0) + value
+
+    stages = {}
+    for name, walls in sorted(stage_walls.items()):
+        stages[name] = {**_summary(walls), "total": round(sum(walls), 3)}
+        if name in stage_child_cpu:
+            stages[name]["child_cpu_seconds"] = round(stage_child_cpu[name], 3)
+
+    errors: Dict[str, int] = {}
+    for job in jobs:
+        if job["status"] != "completed":
+            message = " ".join((job.get("error") or job["status"]).split())[:200]
+            errors[message] = errors.get(message, 0) + 1
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "concurrency": concurrency,
+        "jobs": len(jobs),
+        "completed": len(completed),
+        "failed": len(jobs) - len(completed),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_hour": round(len(completed) / elapsed * 3600, 2) if elapsed else None,
+        "latency": _summary([job["seconds"] for job in completed]),
+        "stages": stages,
+        "memory": {
+            "api_peak_rss_bytes": own.ru_maxrss * rss_unit,
+            "subprocess_peak_rss_bytes": int(subprocess_peak),
+            "largest_subprocess_rss_bytes": children.ru_maxrss * rss_unit,
+        },
+        "cpu": {
+            "api_seconds": round(own.ru_utime + own.ru_stime, 3),
+            "subprocess_seconds": round(children.ru_utime + children.ru_stime, 3),
+        },
+        "llm": {counter: round(value) for counter, value in totals.items() if counter != "child_cpu_seconds"},
+        "errors": errors,
+    }
+
+
+# ============================================================================
+# One level (runs in its own process)
+# ============================================================================
+
+async def _run_job(server, case: BenchCase, quality: str, keep_outputs: bool) -> Dict[str, Any]:
+    """Submit one job like POST /api/videos does and wait for it to finish."""
+    job_manager = server.job_manager
+    job_id = job_manager.create_job(
+        case.prompt,
+        server.QualityLevel(quality),
+        server.AnimationCategory.MATHEMATICAL,
+        scene_name=case.scene_name,
+        bypass_cache=True,
+    )
+    started = time.monotonic()
+    seconds = None
+    terminal = (server.JobStatus.COMPLETED, server.JobStatus.FAILED)
+    with job_manager.events.subscribe(job_id) as subscription:
+        while True:
+            try:
+                server.render_scheduler.submit(job_id, lambda: server.video_generator.generate_video(job_id))
+                break
+            except server.QueueFullError:
+                await asyncio.sleep(1)
+        while True:
+            job = job_manager.get_job(job_id)
+            # The trace is written right after the final status; wait one event for it
+            if job["status"] in terminal and ("trace" in job or seconds is not None):
+                break
+            if job["status"] in terminal:
+                seconds = time.monotonic() - started
+            await subscription.next(timeout=5)
+    if seconds is None:
+        seconds = time.monotonic() - started
+
+    if not keep_outputs:
+        Path(job.get("code_path") or server.Config.BASE_DIR / f"scene_{job_id}.py").unlink(missing_ok=True)
+        shutil.rmtree(server.Config.VIDEOS_DIR / f"scene_{job_id}", ignore_errors=True)
+        shutil.rmtree(server.video_generator._stills_dir(job_id), ignore_errors=True)
+
+    status = job["status"].value if hasattr(job["status"], "value") else job["status"]
+    return {
+        "case": case.case_id,
+        "status": status,
+        "seconds": round(seconds, 3),
+        "error": job.get("error"),
+        "timings": job.get("timings"),
+        "trace": job.get("trace"),
+    }
+
+
+async def run_level(cases: List[BenchCase], concurrency: int, jobs: int, quality: str, keep_outputs: bool) -> Dict[str, Any]:
+    """
+    Run jobs through the pipeline from concurrency clients.
+
+    Args:
+        cases: Cases to cycle through
+        concurrency: Clients, each submitting its next job when the last one ends
+        jobs: Jobs to run in total
+        quality: Final render quality
+        keep_outputs: Keep code files and videos
+
+    Returns:
+        Level result
+    """
+    server = importlib.import_module("api_server")
+    pending = deque(cases[i % len(cases)] for i in range(jobs))
+    results: List[Dict[str, Any]] = []
+
+    async def client():
+        while pending:
+            results.append(await _run_job(server, pending.popleft(), quality, keep_outputs))
+
+    started = time.monotonic()
+    await asyncio.gather(*(client() for _ in range(max(1, concurrency))))
+    level = summarize_level(concurrency, time.monotonic() - started, results)
+    level["per_job"] = [{key: job[key] for key in ("case", "status", "seconds", "timings")} for job in results]
+    return level
+
+
+def _level_main(args):
+    """Child process: run one level and print its result after REPORT_MARKER."""
+    cases = [BenchCase(**case) for case in json.loads(Path(args.cases_file).read_text())]
+    level = asyncio.run(run_level(cases, args.concurrency, args.jobs, args.quality, args.keep_outputs))
+    print(REPORT_MARKER)
+    print(json.dumps(level))
+
+
+# ============================================================================
+# Orchestration
+# ============================================================================
+
+def _git(*command: str) -> str:
+    try:
+        return subprocess.run(["git", *command], cwd=BASE_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def _spawn_level(cases_file: Path, concurrency: int, jobs: int, args, env: Dict[str, str]) -> Dict[str, Any]:
+    command = [
+        sys.executable, "-m", "bench.run_bench", "level",
+        "--cases-file", str(cases_file),
+        "--concurrency", str(concurrency),
+        "--jobs", str(jobs),
+        "--quality", args.quality,
+        "--log-level", args.log_level,
+    ]
+    if args.keep_outputs:
+        command.append("--keep-outputs")
+    result = subprocess.run(command, cwd=BASE_DIR, env=env, stdout=subprocess.PIPE, text=True)
+    if REPORT_MARKER not in result.stdout:
+        raise RuntimeError(f"Level {concurrency} exited with {result.returncode} without a report")
+    return json.loads(result.stdout.rsplit(REPORT_MARKER, 1)[1].strip().splitlines()[0])
+
+
+def run(args) -> Dict[str, Any]:
+    """Run the warm-up and every level against fresh stubs; returns the results."""
+    from manimator.services.elevenlabs_stub import run_stub_server as run_tts_stub
+    from manimator.utils.llm_stub import run_stub_server as run_llm_stub
+
+    cases = load_cases(BASE_DIR, args.scenes, args.cases)
+    if not cases:
+        raise SystemExit(f"No scenes match {args.scenes}")
+    levels = [int(level) for level in args.levels.split(",")]
+
+    with tempfile.TemporaryDirectory(prefix="manimator-bench-") as workdir, \
+            run_llm_stub(latency=args.latency, vision_latency=args.vision_latency, issue_rate=args.issue_rate) as llm, \
+            run_tts_stub(latency=args.tts_latency) as tts:
+        for case in cases:
+            llm.register(case.case_id, Path(case.scene_file).read_text())
+        cases_file = Path(workdir) / "cases.json"
+        cases_file.write_text(json.dumps([asdict(case) for case in cases]))
+
+        env = {
+            **os.environ,
+            "OPENAI_API_BASE": llm.base_url,
+            "OPENAI_BASE_URL": llm.base_url,
+            "OPENAI_API_KEY": "stub",
+            "CODE_GEN_MODEL": "openai/bench-code",
+            "VISUAL_MODEL": "openai/bench-vision",
+            "ELEVENLABS_BASE_URL": tts.base_url,
+            "ELEVENLABS_API_KEY": "stub",
+            "JOB_QUEUE": "local",
+            "RESUME_JOBS": "0",
+            "TRACING": "1",
+        }
+
+        # One pass over every case first, so all levels see warm Tex, section and audio caches
+        warmup = None
+        if args.warmup:
+            print(f"🔥 Warm-up: {len(cases)} jobs")
+            warmup = _spawn_level(cases_file, 1, len(cases), args, {**env, "JOBS_DB": f"{workdir}/warmup.db"})
+
+        results = []
+        for concurrency in levels:
+            before = dict(llm.counts)
+            print(f"⏱️ Concurrency {concurrency}: {args.jobs} jobs")
+            level = _spawn_level(cases_file, concurrency, args.jobs, args, {**env, "JOBS_DB": f"{workdir}/level-{concurrency}.db"})
+            level["stub_requests"] = {key: llm.counts[key] - before.get(key, 0) for key in llm.counts}
+            results.append(level)
+            print(
+                f"   {level['completed']}/{level['jobs']} completed, {level['throughput_per_hour']} jobs/h, "
+                f"p50 {level['latency'].get('p50')}s, p95 {level['latency'].get('p95')}s"
+            )
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "settings": {
+            "cases": [case.case_id for case in cases],
+            "jobs_per_level": args.jobs,
+            "quality": args.quality,
+            "llm_latency": args.latency,
+            "vision_latency": args.vision_latency if args.vision_latency is not None else args.latency,
+            "tts_latency": args.tts_latency,
+            "issue_rate": args.issue_rate,
+            "warmup": args.warmup,
+            "env": {name: os.environ[name] for name in CONFIG_ENV if name in os.environ},
+        },
+        "warmup": {key: warmup[key] for key in ("completed", "failed", "elapsed_seconds")} if warmup else None,
+        "levels": results,
+    }
+
+
+# ============================================================================
+# Comparison
+# ============================================================================
+
+def _lookup(level: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = level
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value if isinstance(value, (int, float)) else None
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Print a per-level comparison of two results.
+
+    Args:
+        base: Earlier result
+        new: Later result
+        threshold: Relative change of a headline metric that counts as a regression
+
+    Returns:
+        Regressions, as "c<concurrency> <metric>" strings
+    """
+    print(f"base {base['commit'][:10]}{'+' if base.get('dirty') else ''} ({base['created_at']})")
+    print(f"new  {new['commit'][:10]}{'+' if new.get('dirty') else ''} ({new['created_at']})")
+    if base.get("settings", {}).get("env") != new.get("settings", {}).get("env"):
+        print("⚠️  Pipeline settings differ between the runs")
+
+    regressions = []
+    base_levels = {level["concurrency"]: level for level in base["levels"]}
+    for level in new["levels"]:
+        old = base_levels.get(level["concurrency"])
+        if old is None:
+            continue
+        print(f"\nconcurrency {level['concurrency']}")
+        metrics = list(HEADLINE_METRICS) + [
+            (f"stages.{stage}.mean", False) for stage in level["stages"] if stage in old["stages"]
+        ]
+        for path, higher_is_better in metrics:
+            before, after = _lookup(old, path), _lookup(level, path)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            flag = ""
+            if (path, higher_is_better) in HEADLINE_METRICS and worse > threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"c{level['concurrency']} {path}")
+            print(f"  {path:<45} {before:>14.2f} {after:>14.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark with stubbed LLM and TTS services")
+    commands = parser.add_subparsers(dest="command")
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("base", help="Earlier result JSON")
+    compare_parser.add_argument("new", help="Later result JSON")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="Relative change counted as a regression")
+
+    level_parser = commands.add_parser("level", help=argparse.SUPPRESS)
+    level_parser.add_argument("--cases-file", required=True)
+    level_parser.add_argument("--concurrency", type=int, required=True)
+    level_parser.add_argument("--jobs", type=int, required=True)
+    level_parser.add_argument("--quality", default="low")
+    level_parser.add_argument("--log-level", default="WARNING")
+    level_parser.add_argument("--keep-outputs", action="store_true")
+
+    parser.add_argument("--levels", default="1,2,4", help="Comma-separated concurrency levels")
+    parser.add_argument("--jobs", type=int, default=8, help="Jobs per level")
+    parser.add_argument("--cases", type=int, default=4, help="Scenes to replay (0 for all)")
+    parser.add_argument("--scenes", default="scene_*.py", help="Glob of scene files, relative to the repository")
+    parser.add_argument("--quality", default="low", choices=["low", "medium", "high", "production"])
+    parser.add_argument("--latency", type=float, default=5.0, help="Seconds per code model call")
+    parser.add_argument("--vision-latency", type=float, default=None, help="Seconds per vision call (default: --latency)")
+    parser.add_argument("--tts-latency", type=float, default=0.3, help="Seconds per ElevenLabs request")
+    parser.add_argument("--issue-rate", type=float, default=0.0, help="Fraction of vision checks that report an overlap")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="Skip the warm-up pass")
+    parser.add_argument("--keep-outputs", action="store_true", help="Keep generated code and videos")
+    parser.add_argument("--log-level", default="WARNING", help="Log level of the pipeline processes")
+    parser.add_argument("--output", default=None, help="Result file (default: bench/results/<time>-<commit>.json)")
+    args = parser.parse_args()
+
+    if args.command == "level":
+        # Before api_server's own basicConfig, which then keeps this level
+        logging.basicConfig(level=args.log_level, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        return _level_main(args)
+
+    if args.command == "compare":
+        base = json.loads(Path(args.base).read_text())
+        new = json.loads(Path(args.new).read_text())
+        regressions = compare(base, new, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions above {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+        return
+
+    result = run(args)
+    output = Path(args.output) if args.output else RESULTS_DIR / (
+        f"{datetime.now():%Y%m%d-%H%M%S}-{(result['commit'] or 'unknown')[:10]}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"📊 Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
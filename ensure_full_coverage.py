@@ -126,13 +126,6 @@ def main():
         print(f"   Frame paths saved in memory: {len(frame_paths)} total")
         print("\nNext step: Run fix_scene_layout.py to analyze frames for overlaps")
     
-    # Clean up extracted frames
-    print("\n🧹 Cleaning up extracted frames...")
-    for frame in frame_paths:
-        if frame.exists():
-            frame.unlink()
-    print("✅ Cleanup complete")
-    
     print("\n" + "=" * 80)
 
 if __name__ == "__main__":
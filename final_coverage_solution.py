@@ -128,13 +128,6 @@ def main():
         print("  - Equation overlaps")
         print("  - Graph overlaps")
     
-    # Clean up
-    print("\n🧹 Cleaning up extracted frames...")
-    for frame in frame_paths:
-        if frame.exists():
-            frame.unlink()
-    print("✅ Cleanup complete")
-    
     print("\n" + "=" * 80)
     
     return success
@@ -143,10 +143,6 @@ def fix_layout():
         
         print("  - Analyzing frames...")
         analysis = analyzer.analyze_frames(frame_paths)
-        
-        # Clean up frames
-        for frame in frame_paths:
-            frame.unlink()
             
         print(f"  - Analysis result: {json.dumps(analysis, indent=2)}")
         
@@ -1,19 +1,70 @@
+import logging
 import os
+from typing import Callable, List, Optional
+
 import litellm
 from fastapi import HTTPException
 
 from ..utils.system_prompts import get_system_prompt
 from ..utils.code_postprocessor import post_process_code
 from ..utils.dual_model_config import DualModelConfig
+from ..utils.codegen_cache import CodegenCache, get_codegen_cache
+from ..utils.llm_client import get_llm_client
+from ..utils.stream_parser import IncrementalSceneParser, StreamAbort, StreamedMethod
+
+logger = logging.getLogger(__name__)
+
+
+def _build_messages(prompt: str, category: str) -> list:
+    """System and user messages for a generation request."""
+    return [
+        {
+            "role": "system",
+            "content": get_system_prompt(category),
+        },
+        {
+            "role": "user",
+            "content": f"""{prompt}
+
+CRITICAL REMINDERS:
+1. The animation MUST be at least 5 MINUTES (300 seconds) long
+2. Create 8-12 separate method functions for different sections
+3. Each voiceover block should have 15-30 seconds of narration
+4. Include detailed explanations, examples, and step-by-step derivations
+5. Do NOT create short animations - make it comprehensive and educational
+
+Make sure the objects or text in the generated code are not overlapping at any point in the video. Make sure that each scene is properly cleaned up before transitioning to the next scene.""",
+        },
+    ]
+
+
+def codegen_cache_key(prompt: str, category: str = "mathematical") -> str:
+    """Code generation cache key of a request, as used by the generate functions.
+
+    Args:
+        prompt (str): User's request for an animation
+        category (str): Animation category used to pick the system prompt
+
+    Returns:
+        str: Key for CodegenCache.get/put/delete
+    """
+    messages = _build_messages(prompt, category)
+    return CodegenCache.make_key(
+        messages[0]["content"], messages[1]["content"], category, DualModelConfig.get_code_model()
+    )
 
 
-def generate_animation_response(prompt: str, category: str = "mathematical") -> str:
+def generate_animation_response(prompt: str, category: str = "mathematical", use_cache: bool = True) -> str:
     """Generate Manim animation code from a text prompt.
 
-    Uses Claude 4.5 Sonnet for code generation (best at coding).
+    Uses Claude 4.5 Sonnet for code generation (best at coding). Raw model
+    output is cached on disk keyed by system prompt, user prompt, category
+    and model, so identical resubmissions skip the LLM call.
 
     Args:
         prompt (str): User's request for an animation
+        category (str): Animation category used to pick the system prompt
+        use_cache (bool): Set to False to bypass the code generation cache
 
     Returns:
         str: Generated Manim animation code (post-processed)
@@ -23,29 +74,20 @@ def generate_animation_response(prompt: str, category: str = "mathematical") ->
     """
 
     try:
-        system_prompt = get_system_prompt(category)
-        messages = [
-            {
-                "role": "system",
-                "content": system_prompt,
-            },
-            {
-                "role": "user",
-                "content": f"""{prompt}
-
-CRITICAL REMINDERS:
-1. The animation MUST be at least 5 MINUTES (300 seconds) long
-2. Create 8-12 separate method functions for different sections
-3. Each voiceover block should have 15-30 seconds of narration
-4. Include detailed explanations, examples, and step-by-step derivations
-5. Do NOT create short animations - make it comprehensive and educational
-
-Make sure the objects or text in the generated code are not overlapping at any point in the video. Make sure that each scene is properly cleaned up before transitioning to the next scene.""",
-            },
-        ]
+        messages = _build_messages(prompt, category)
         
-        # Use Claude 4.5 Sonnet for code generation
-        raw_code = DualModelConfig.generate_with_claude(messages)
+        cache = get_codegen_cache() if use_cache else None
+        cache_key = None
+        raw_code = None
+        if cache is not None:
+            cache_key = codegen_cache_key(prompt, category)
+            raw_code = cache.get(cache_key)
+
+        if raw_code is None:
+            # Use Claude 4.5 Sonnet for code generation
+            raw_code = DualModelConfig.generate_with_claude(messages)
+            if cache is not None:
+                cache.put(cache_key, raw_code)
         
         # Post-process the code to fix common issues
         processed_code = post_process_code(raw_code)
@@ -55,3 +97,160 @@ Make sure the objects or text in the generated code are not overlapping at any p
         raise HTTPException(
             status_code=500, detail=f"Failed to generate animation response: {str(e)}"
         )
+
+
+async def agenerate_animation_response(prompt: str, category: str = "mathematical", use_cache: bool = True) -> str:
+    """Async version of generate_animation_response.
+
+    The model call runs on the event loop through the shared LLM client
+    instead of occupying a worker thread for minutes.
+
+    Args:
+        prompt (str): User's request for an animation
+        category (str): Animation category used to pick the system prompt
+        use_cache (bool): Set to False to bypass the code generation cache
+
+    Returns:
+        str: Generated Manim animation code (post-processed)
+
+    Raises:
+        HTTPException: If code generation fails
+    """
+
+    try:
+        messages = _build_messages(prompt, category)
+
+        cache = get_codegen_cache() if use_cache else None
+        cache_key = None
+        raw_code = None
+        if cache is not None:
+            cache_key = codegen_cache_key(prompt, category)
+            raw_code = cache.get(cache_key)
+
+        if raw_code is None:
+            raw_code = await DualModelConfig.agenerate_with_claude(messages)
+            if cache is not None:
+                cache.put(cache_key, raw_code)
+
+        return post_process_code(raw_code)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to generate animation response: {str(e)}"
+        )
+
+
+async def astream_animation_response(
+    prompt: str,
+    category: str = "mathematical",
+    use_cache: bool = True,
+    on_method: Optional[Callable[[StreamedMethod], None]] = None,
+    max_attempts: Optional[int] = None,
+    on_discard: Optional[Callable[[List[StreamedMethod]], None]] = None,
+) -> str:
+    """Generate Manim animation code, validating it while it streams in.
+
+    Tokens are fed to an IncrementalSceneParser as they arrive. When the
+    stream shows an unusable structure (no VoiceoverScene subclass, a
+    finished method that does not parse) the request is dropped right
+    away and retried instead of waiting for the rest of the file; a stream
+    that fails outright (network, rate limit) is retried too. On the last
+    attempt the parser's verdict no longer stops the stream: the whole
+    response is read and left to the pipeline's own checks, as without
+    streaming. Every finished method is passed to on_method, so later
+    stages can start on it early; when an attempt is dropped, the methods
+    it reported are passed to on_discard. A cache hit replays the cached
+    code through the parser.
+
+    Args:
+        prompt (str): User's request for an animation
+        category (str): Animation category used to pick the system prompt
+        use_cache (bool): Set to False to bypass the code generation cache
+        on_method (callable): Called with each finished StreamedMethod
+        max_attempts (int): Streams to try (default: STREAM_CODEGEN_ATTEMPTS or 2)
+        on_discard (callable): Called with the methods of a dropped attempt
+
+    Returns:
+        str: Generated Manim animation code (post-processed)
+
+    Raises:
+        HTTPException: If code generation fails
+    """
+
+    if max_attempts is None:
+        max_attempts = int(os.getenv("STREAM_CODEGEN_ATTEMPTS", "2"))
+    max_attempts = max(1, max_attempts)
+
+    try:
+        messages = _build_messages(prompt, category)
+        model = DualModelConfig.get_code_model()
+
+        cache = get_codegen_cache() if use_cache else None
+        cache_key = None
+        if cache is not None:
+            cache_key = codegen_cache_key(prompt, category)
+            raw_code = cache.get(cache_key)
+            if raw_code is not None:
+                parser = IncrementalSceneParser(on_method)
+                try:
+                    parser.feed(raw_code)
+                    parser.finish()
+                except StreamAbort:
+                    pass
+                return post_process_code(raw_code)
+
+        raw_code = ""
+        for attempt in range(1, max_attempts + 1):
+            last = attempt == max_attempts
+            methods: List[StreamedMethod] = []
+
+            def report(method: StreamedMethod, methods: List[StreamedMethod] = methods):
+                methods.append(method)
+                if on_method is not None:
+                    on_method(method)
+
+            parser = IncrementalSceneParser(report)
+            raw_code = ""
+            verdict = None
+            stream = get_llm_client().astream(model, messages)
+            try:
+                async for delta in stream:
+                    raw_code += delta
+                    if verdict is None:
+                        try:
+                            parser.feed(delta)
+                        except StreamAbort as e:
+                            if not last:
+                                raise
+                            verdict = e
+                if verdict is None:
+                    parser.finish()
+            except StreamAbort as e:
+                if last:
+                    verdict = e
+                else:
+                    logger.warning(f"Code generation attempt {attempt} aborted after {len(parser.lines)} lines: {e}")
+                    if on_discard is not None and methods:
+                        on_discard(methods)
+                    continue
+            except Exception as e:
+                if last:
+                    raise
+                logger.warning(f"Code generation attempt {attempt} failed: {e}")
+                if on_discard is not None and methods:
+                    on_discard(methods)
+                continue
+            finally:
+                await stream.aclose()
+
+            if verdict is not None:
+                # Not cached: a later request should get a fresh try
+                logger.warning(f"Code generation attempt {attempt} looks unusable ({verdict}); keeping it for the pipeline's checks")
+            elif cache is not None:
+                cache.put(cache_key, raw_code)
+            break
+
+        return post_process_code(raw_code)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to generate animation response: {str(e)}"
+        )
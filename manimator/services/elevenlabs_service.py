@@ -7,12 +7,69 @@ Falls back to gTTS if ElevenLabs is unavailable or API quota is exceeded.
 
 import os
 import hashlib
+import random
+import threading
+import time
 import requests
+from email.utils import parsedate_to_datetime
 from pathlib import Path
 from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
 from manim_voiceover.services.base import SpeechService
 
 
+# Statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Process-wide keep-alive session for ElevenLabs requests.
+    
+    Reusing one pooled session saves a TCP and TLS handshake per utterance.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = int(os.getenv("ELEVENLABS_POOL_SIZE", "10"))
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """
+    Seconds to wait according to the rate-limit headers, if any.
+    
+    Understands Retry-After (seconds or HTTP date) and the reset headers
+    some gateways send instead.
+    """
+    value = headers.get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    for name in ("RateLimit-Reset", "X-RateLimit-Reset"):
+        value = headers.get(name)
+        if value:
+            try:
+                reset = float(value)
+            except ValueError:
+                continue
+            # Either seconds from now or an absolute epoch timestamp
+            return max(0.0, reset - time.time()) if reset > 1e9 else reset
+    return None
+
+
 class ElevenLabsService(SpeechService):
     """
     ElevenLabs text-to-speech service for Manim animations.
@@ -27,6 +84,10 @@ class ElevenLabsService(SpeechService):
     Environment Variables:
         ELEVENLABS_API_KEY: Your ElevenLabs API key (required)
         ELEVENLABS_VOICE_ID: Default voice ID (optional, defaults to "Rachel")
+        ELEVENLABS_BASE_URL: API base URL (e.g. a local stub server)
+        ELEVENLABS_CONNECT_TIMEOUT / ELEVENLABS_READ_TIMEOUT: Seconds (5 / 60)
+        ELEVENLABS_MAX_RETRIES: Retries on 429/5xx and network errors (4)
+        ELEVENLABS_POOL_SIZE: Keep-alive connections per host (10)
     
     Example:
         >>> from manimator.services import ElevenLabsService
@@ -55,6 +116,7 @@ class ElevenLabsService(SpeechService):
         use_speaker_boost: bool = True,
         api_key: Optional[str] = None,
         cache_dir: Optional[str] = None,
+        session: Optional[requests.Session] = None,
         **kwargs
     ):
         """
@@ -72,6 +134,7 @@ class ElevenLabsService(SpeechService):
             use_speaker_boost: Boost low-frequency audio for better clarity
             api_key: ElevenLabs API key (or from ELEVENLABS_API_KEY env var)
             cache_dir: Directory for caching audio files
+            session: requests session to use (defaults to the shared pooled one)
         """
         super().__init__(**kwargs)
         
@@ -109,7 +172,29 @@ class ElevenLabsService(SpeechService):
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
         # API configuration
-        self.base_url = "https://api.elevenlabs.io/v1"
+        self.base_url = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io/v1").rstrip("/")
+        self.session = session
+        self.timeout = (
+            float(os.getenv("ELEVENLABS_CONNECT_TIMEOUT", "5")),
+            float(os.getenv("ELEVENLABS_READ_TIMEOUT", "60")),
+        )
+        self.max_retries = int(os.getenv("ELEVENLABS_MAX_RETRIES", "4"))
+        self.backoff_base = 0.5
+        self.backoff_cap = 30.0
+        
+        # Per-service counters (see get_stats)
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "responses": 0,
+            "successes": 0,
+            "retries": 0,
+            "failures": 0,
+            "fallbacks": 0,
+            "cache_hits": 0,
+            "latency_total": 0.0,
+            "latency_max": 0.0,
+        }
         
         # Fallback to gTTS
         self.use_fallback = False
@@ -139,6 +224,7 @@ class ElevenLabsService(SpeechService):
         # Check cache first
         cache_path = self._get_cache_path(text)
         if cache_path.exists():
+            self._count("cache_hits")
             # Return just the filename, manim-voiceover will prepend cache_dir
             return {
                 "original_audio": cache_path.name,
@@ -147,12 +233,8 @@ class ElevenLabsService(SpeechService):
             }
         
         try:
-            # Call ElevenLabs API
-            audio_data = self._call_api(text)
-            
-            # Save to cache
-            with open(cache_path, 'wb') as f:
-                f.write(audio_data)
+            # Call ElevenLabs API and save to cache
+            self._write_cache(cache_path, self._call_api(text))
             
             # Return just the filename
             return {
@@ -164,8 +246,36 @@ class ElevenLabsService(SpeechService):
         except Exception as e:
             print(f"⚠️  ElevenLabs API error: {e}")
             print("   Falling back to gTTS...")
+            self._count("fallbacks")
             return self._use_fallback(text, cache_dir=cache_dir, path=path, **kwargs)
     
+    def prefetch(self, text: str) -> bool:
+        """
+        Synthesize text into the cache ahead of rendering.
+        
+        Unlike generate_from_text, errors are raised instead of falling back
+        to gTTS, so the render can still retry ElevenLabs for that block.
+        
+        Args:
+            text: Narration text, normalized the way manim-voiceover passes it
+        
+        Returns:
+            True if audio was fetched, False if it was already cached
+        """
+        cache_path = self._get_cache_path(text)
+        if cache_path.exists():
+            self._count("cache_hits")
+            return False
+        self._write_cache(cache_path, self._call_api(text))
+        return True
+    
+    def _write_cache(self, cache_path: Path, audio_data: bytes):
+        """Write audio atomically so a concurrent reader never sees a partial file"""
+        partial = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(partial, 'wb') as f:
+            f.write(audio_data)
+        os.replace(partial, cache_path)
+    
     def _call_api(self, text: str) -> bytes:
         """
         Call ElevenLabs API to generate speech.
@@ -195,14 +305,68 @@ class ElevenLabsService(SpeechService):
             }
         }
         
-        response = requests.post(url, json=payload, headers=headers)
+        http = self.session or get_http_session()
         
-        if response.status_code != 200:
-            raise Exception(
-                f"ElevenLabs API error {response.status_code}: {response.text}"
-            )
+        attempt = 0
+        while True:
+            self._count("requests")
+            started = time.monotonic()
+            retry_after = None
+            try:
+                response = http.post(url, json=payload, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = Exception(f"ElevenLabs request failed: {e}")
+            else:
+                self._record_latency(time.monotonic() - started)
+                if response.status_code == 200:
+                    self._count("successes")
+                    return response.content
+                error = Exception(
+                    f"ElevenLabs API error {response.status_code}: {response.text}"
+                )
+                if response.status_code not in RETRY_STATUSES:
+                    self._count("failures")
+                    raise error
+                retry_after = parse_retry_after(response.headers)
+            
+            if attempt >= self.max_retries:
+                self._count("failures")
+                raise error
+            attempt += 1
+            self._count("retries")
+            time.sleep(self._backoff(attempt, retry_after))
+    
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the server asked for"""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_cap * 4))
+        return delay
+    
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[name] += amount
+    
+    def _record_latency(self, seconds: float):
+        with self._stats_lock:
+            self.stats["responses"] += 1
+            self.stats["latency_total"] += seconds
+            self.stats["latency_max"] = max(self.stats["latency_max"], seconds)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get request counters for this service.
         
-        return response.content
+        Returns:
+            Dictionary with request/retry/failure/fallback counts and latency
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        responses = stats["responses"]
+        stats["latency_avg"] = round(stats["latency_total"] / responses, 3) if responses else 0.0
+        stats["latency_total"] = round(stats["latency_total"], 3)
+        stats["latency_max"] = round(stats["latency_max"], 3)
+        return stats
     
     def _use_fallback(self, text: str, cache_dir: Optional[str] = None, path: Optional[str] = None, **kwargs) -> dict:
         """
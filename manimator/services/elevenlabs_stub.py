@@ -0,0 +1,232 @@
+"""
+ElevenLabs Stub Server
+
+Minimal local stand-in for the ElevenLabs text-to-speech endpoint, for
+benchmarking and exercising ElevenLabsService offline. It answers
+POST /v1/text-to-speech/<voice_id> with a few bytes of fake MP3 data after
+a configurable latency. It can also inject rate limiting (429 with
+Retry-After) and server errors to exercise the retry path. The tests in
+tests/test_elevenlabs_service.py run the service against it.
+
+Usage:
+    python -m manimator.services.elevenlabs_stub --port 8010 --latency 0.2
+    ELEVENLABS_BASE_URL=http://127.0.0.1:8010/v1 ELEVENLABS_API_KEY=stub python api_server.py
+
+    # Benchmark the service against an in-process stub
+    python -m manimator.services.elevenlabs_stub --bench 50 --error-rate 0.2
+
+Example:
+    >>> with run_stub_server(latency=0.05, fail_first=2) as stub:
+    ...     os.environ["ELEVENLABS_BASE_URL"] = stub.base_url
+    ...     service = ElevenLabsService(api_key="stub", cache_dir=tmp)
+    ...     service.prefetch("Hello")
+    ...     print(service.get_stats()["retries"], stub.counts)
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+# An MPEG audio frame header followed by padding; enough for cache files
+FAKE_MP3 = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+
+class StubServer(ThreadingHTTPServer):
+    """HTTP server holding the stub's behaviour knobs and request counters."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        fail_first: int = 0,
+        fail_status: int = 429,
+        retry_after: float = 0.1,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def pick_response(self) -> int:
+        """Decide the status code for the next request."""
+        with self.lock:
+            self.counts["requests"] += 1
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                self.counts["rate_limited" if self.fail_status == 429 else "errors"] += 1
+                return self.fail_status
+            roll = self.random.random()
+            if roll < self.rate_limit_rate:
+                self.counts["rate_limited"] += 1
+                return 429
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.counts["errors"] += 1
+                return 503
+            self.counts["ok"] += 1
+            return 200
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def do_POST(self):
+        server: StubServer = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if not self.path.startswith("/v1/text-to-speech/"):
+            return self._reply(404, b'{"detail": "not found"}', "application/json")
+        if not self.headers.get("xi-api-key"):
+            return self._reply(401, b'{"detail": "missing api key"}', "application/json")
+        try:
+            json.loads(body or b"{}")["text"]
+        except (ValueError, KeyError):
+            return self._reply(422, b'{"detail": "text required"}', "application/json")
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        status = server.pick_response()
+        if status == 429:
+            return self._reply(
+                429, b'{"detail": "rate limited"}', "application/json",
+                {"Retry-After": f"{server.retry_after:g}"}
+            )
+        if status != 200:
+            return self._reply(status, b'{"detail": "unavailable"}', "application/json")
+        return self._reply(200, FAKE_MP3, "audio/mpeg")
+
+    def _reply(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def run_stub_server(host: str = "127.0.0.1", port: int = 0, **options):
+    """
+    Run a stub server on a background thread for the duration of the block.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free one)
+        **options: latency, error_rate, rate_limit_rate, fail_first,
+            fail_status, retry_after and seed, see StubServer
+
+    Yields:
+        The running StubServer (use .base_url and .counts)
+    """
+    server = StubServer((host, port), **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def benchmark(requests_count: int, workers: int, **options) -> Dict[str, object]:
+    """Synthesize distinct texts through ElevenLabsService against a local stub."""
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+
+    from manimator.services.elevenlabs_service import ElevenLabsService
+
+    with run_stub_server(**options) as stub, tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["ELEVENLABS_BASE_URL"] = stub.base_url
+        service = ElevenLabsService(api_key="stub", cache_dir=cache_dir)
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(
+                lambda i: _try_prefetch(service, f"Benchmark sentence number {i}."),
+                range(requests_count)
+            ))
+        elapsed = time.monotonic() - started
+        return {
+            "requests": requests_count,
+            "workers": workers,
+            "seconds": round(elapsed, 3),
+            "per_second": round(requests_count / elapsed, 2) if elapsed else None,
+            "failed": results.count(False),
+            "service": service.get_stats(),
+            "stub": dict(stub.counts),
+        }
+
+
+def _try_prefetch(service, text: str) -> bool:
+    try:
+        service.prefetch(text)
+        return True
+    except Exception:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local ElevenLabs stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--fail-first", type=int, default=0, help="Answer the first N requests with --fail-status")
+    parser.add_argument("--fail-status", type=int, default=429, help="Status for the first N requests (429 or a 5xx)")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After seconds on 429")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--bench", type=int, default=0, help="Run N requests through ElevenLabsService and exit")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent requests for --bench")
+    args = parser.parse_args()
+
+    options = dict(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        fail_first=args.fail_first,
+        fail_status=args.fail_status,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    if args.bench:
+        print(json.dumps(benchmark(args.bench, args.workers, **options), indent=2))
+        return
+
+    server = StubServer((args.host, args.port), **options)
+    print(f"ElevenLabs stub listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Section Prefetch
+
+Starts voiceover synthesis and Tex compilation for a scene's sections
+while the rest of the scene is still being generated.
+
+IncrementalSceneParser reports every method as soon as the stream has
+finished it. For each new method:
+
+- The finished methods so far (construct, which sets up the speech
+  service, normally comes first) are handed to prefetch_voiceovers in a
+  thread. Narration that is already cached is skipped, so repeated passes
+  only synthesize the new section's blocks.
+- Its literal MathTex/Tex formulas are compiled into the shared Tex cache
+  by `python -m manimator.utils.tex_cache precompile -` in a subprocess,
+  which keeps manim out of the API process.
+
+Methods of a stream attempt that was dropped are withdrawn with
+discard(), so later voiceover passes only cover the code that is kept.
+Passes of each kind run one at a time; sections that finish while a pass
+is running are picked up by the next one. Failures are logged and never
+affect generation: the regular prefetch and the render redo whatever was
+missed.
+"""
+
+import ast
+import asyncio
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from manimator.services.tts_prefetch import prefetch_voiceovers
+from manimator.utils.stream_parser import StreamedMethod
+from manimator.utils.tex_cache import extract_formulas
+from manimator.utils.tracing import child_process, span
+
+logger = logging.getLogger(__name__)
+
+
+class SectionPrefetcher:
+    """
+    Runs TTS prefetch and Tex precompilation on streamed methods.
+
+    Example:
+        >>> prefetcher = SectionPrefetcher(Config.BASE_DIR)
+        >>> code = await astream_animation_response(
+        ...     prompt, on_method=prefetcher.on_method, on_discard=prefetcher.discard
+        ... )
+        >>> stats = await prefetcher.drain()
+    """
+
+    def __init__(self, cwd: Path, tts: bool = True, tex: bool = True):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            cwd: Directory the render runs in (audio cache, Tex cache config)
+            tts: Prefetch voiceovers
+            tex: Precompile formulas
+        """
+        self.cwd = Path(cwd)
+        self.tts = tts
+        self.tex = tex
+        self.stats: Dict[str, Any] = {
+            "sections": 0,
+            "tts_passes": 0, "tts_fetched": 0, "tts_failed": 0,
+            "tex_passes": 0, "tex_compiled": 0, "tex_cached": 0, "tex_failed": 0,
+        }
+
+        self._methods: List[StreamedMethod] = []
+        self._seen: Set[str] = set()
+        self._formulas: Set[Tuple[str, str]] = set()
+        self._tts_dirty = False
+        self._tex_pending: List[str] = []
+        self._tts_task: Optional[asyncio.Task] = None
+        self._tex_task: Optional[asyncio.Task] = None
+
+    def on_method(self, method: StreamedMethod):
+        """Parser callback; must be called from inside the running event loop."""
+        # A retried stream reports the same methods again
+        if method.source in self._seen:
+            return
+        self._seen.add(method.source)
+        self._methods.append(method)
+        self.stats["sections"] += 1
+
+        if self.tts:
+            self._tts_dirty = True
+            if self._tts_task is None or self._tts_task.done():
+                self._tts_task = asyncio.get_running_loop().create_task(self._run_tts())
+
+        if self.tex:
+            new = [f for f in extract_formulas(method.source) if f not in self._formulas]
+            if new:
+                self._formulas.update(new)
+                self._tex_pending.append(method.source)
+                if self._tex_task is None or self._tex_task.done():
+                    self._tex_task = asyncio.get_running_loop().create_task(self._run_tex())
+
+    def discard(self, methods: List[StreamedMethod]):
+        """Withdraw the methods of a dropped stream attempt from later passes."""
+        dropped = {method.source for method in methods}
+        kept = [method for method in self._methods if method.source not in dropped]
+        self.stats["sections"] -= len(self._methods) - len(kept)
+        self._methods = kept
+        self._seen -= dropped
+        self._tex_pending = [source for source in self._tex_pending if source not in dropped]
+
+    async def drain(self) -> Dict[str, Any]:
+        """Wait for running passes (including queued sections) and return the stats."""
+        tasks = [t for t in (self._tts_task, self._tex_task) if t is not None]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return self.stats
+
+    async def _run_tts(self):
+        while self._tts_dirty and self.tts:
+            self._tts_dirty = False
+            code = "\n\n".join(m.source for m in self._methods)
+            try:
+                result = await asyncio.to_thread(prefetch_voiceovers, code, self.cwd)
+            except Exception as e:
+                logger.warning(f"Section voiceover prefetch failed: {e}")
+                return
+            self.stats["tts_passes"] += 1
+            self.stats["tts_fetched"] += result["fetched"]
+            self.stats["tts_failed"] += result["failed"]
+            if result["total"] and "http" not in result:
+                # Narration found but no service could be built (e.g. no API key)
+                self.tts = False
+
+    async def _run_tex(self):
+        while self._tex_pending and self.tex:
+            source = "\n".join(self._tex_pending)
+            self._tex_pending = []
+            try:
+                with span("tex_precompile"):
+                    process = await asyncio.create_subprocess_exec(
+                        sys.executable, "-m", "manimator.utils.tex_cache", "precompile", "-",
+                        cwd=str(self.cwd),
+                        stdin=asyncio.subprocess.PIPE,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.STDOUT,
+                    )
+                    async with child_process(process.pid):
+                        stdout, _ = await process.communicate(source.encode("utf-8"))
+                lines = stdout.decode("utf-8", errors="replace").strip().splitlines()
+                counts = ast.literal_eval(lines[-1]) if process.returncode == 0 and lines else None
+            except Exception as e:
+                logger.warning(f"Section Tex precompile failed: {e}")
+                return
+            if not isinstance(counts, dict):
+                logger.warning(f"Section Tex precompile exited with {process.returncode}")
+                self.tex = False
+                return
+            self.stats["tex_passes"] += 1
+            self.stats["tex_compiled"] += counts["compiled"]
+            self.stats["tex_cached"] += counts["cached"]
+            self.stats["tex_failed"] += counts["failed"]
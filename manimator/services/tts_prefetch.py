@@ -0,0 +1,196 @@
+"""
+Voiceover Prefetch
+
+Synthesizes every narration block of a generated scene before rendering.
+
+Without this, manim-voiceover asks the speech service for audio only when
+the renderer reaches each `with self.voiceover(...)` block, so a long scene
+stalls on dozens of serial ElevenLabs round trips. Here the narration
+strings are pulled out of the code statically, the same ElevenLabsService
+the scene constructs is rebuilt (so cache keys match), and the audio is
+fetched concurrently into its MD5 cache over the shared keep-alive
+session. The render then only hits the cache.
+
+Only literal `text=` strings can be prefetched; f-strings and variables are
+counted as skipped and synthesized during the render as before.
+
+Environment Variables:
+    TTS_PREFETCH: Set to "0" to disable prefetching
+    TTS_PREFETCH_WORKERS: Concurrent synthesis requests (default: 4)
+"""
+
+import ast
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Constructors the generated code uses to build the ElevenLabs service
+SERVICE_FACTORIES = {"ElevenLabsService", "create_elevenlabs_service"}
+
+
+def tts_prefetch_enabled() -> bool:
+    """Whether the generation pipeline should prefetch voiceovers."""
+    return os.getenv("TTS_PREFETCH", "1") != "0"
+
+
+@dataclass
+class VoiceoverPlan:
+    """Narration found in a scene and how its speech service is built."""
+    factory: str
+    service_kwargs: Dict[str, Any]
+    texts: List[str] = field(default_factory=list)
+    skipped: int = 0
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace the way manim-voiceover does before synthesis."""
+    return " ".join(text.split())
+
+
+def extract_voiceovers(code: str) -> Optional[VoiceoverPlan]:
+    """
+    Find the ElevenLabs service setup and narration strings in scene code.
+
+    Args:
+        code: Generated Manim code
+
+    Returns:
+        VoiceoverPlan, or None if the code does not parse, does not use
+        ElevenLabs, or builds the service from non-literal arguments
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    plan: Optional[VoiceoverPlan] = None
+    texts: List[str] = []
+    skipped = 0
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        func = node.func
+
+        if isinstance(func, ast.Name) and func.id in SERVICE_FACTORIES and plan is None:
+            try:
+                kwargs = {kw.arg: ast.literal_eval(kw.value) for kw in node.keywords if kw.arg}
+                if node.args:
+                    # Both constructors take the voice as their first argument
+                    kwargs["voice_id" if func.id == "ElevenLabsService" else "voice"] = ast.literal_eval(node.args[0])
+            except ValueError:
+                return None
+            plan = VoiceoverPlan(factory=func.id, service_kwargs=kwargs)
+
+        elif isinstance(func, ast.Attribute) and func.attr == "voiceover":
+            value = next((kw.value for kw in node.keywords if kw.arg == "text"), None)
+            if value is None and node.args:
+                value = node.args[0]
+            if isinstance(value, ast.Constant) and isinstance(value.value, str):
+                texts.append(normalize_text(value.value))
+            elif value is not None:
+                skipped += 1
+
+    if plan is None:
+        return None
+    plan.texts = list(dict.fromkeys(t for t in texts if t))
+    plan.skipped = skipped
+    return plan
+
+
+def build_service(plan: VoiceoverPlan, cwd: Path, session: Optional[requests.Session] = None):
+    """
+    Recreate the scene's ElevenLabsService outside of manim.
+
+    Args:
+        plan: Result of extract_voiceovers
+        cwd: Directory the render runs in (relative cache dirs resolve here)
+        session: HTTP session (defaults to the service's shared pooled one)
+
+    Returns:
+        ElevenLabsService writing to the same cache the render will read
+    """
+    from manimator.services.elevenlabs_service import ElevenLabsService, create_elevenlabs_service
+
+    if plan.factory == "create_elevenlabs_service":
+        service = create_elevenlabs_service(**plan.service_kwargs)
+        service.cache_dir = Path(cwd) / service.cache_dir
+        service.cache_dir.mkdir(parents=True, exist_ok=True)
+        service.session = session
+        return service
+
+    kwargs = dict(plan.service_kwargs)
+    kwargs["cache_dir"] = str(Path(cwd) / kwargs.get("cache_dir", "media/voiceover/elevenlabs"))
+    return ElevenLabsService(session=session, **kwargs)
+
+
+def prefetch_voiceovers(
+    code: str,
+    cwd: Path,
+    max_workers: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Synthesize all literal narration blocks of a scene into the audio cache.
+
+    Args:
+        code: Generated Manim code
+        cwd: Directory the render runs in
+        max_workers: Concurrent requests (default: TTS_PREFETCH_WORKERS)
+        progress: Called with (done, total) after each uncached block finishes
+
+    Returns:
+        Dictionary with total, cached, fetched, failed, skipped, seconds and
+        the service's HTTP counters under "http"
+    """
+    started = time.monotonic()
+    stats = {"total": 0, "cached": 0, "fetched": 0, "failed": 0, "skipped": 0, "seconds": 0.0}
+
+    plan = extract_voiceovers(code)
+    if plan is None:
+        return stats
+    stats["total"] = len(plan.texts)
+    stats["skipped"] = plan.skipped
+
+    service = None
+    try:
+        try:
+            service = build_service(plan, cwd)
+        except ValueError as e:
+            # Missing API key: the render will fall back to gTTS on its own
+            logger.warning(f"Skipping voiceover prefetch: {e}")
+            return stats
+
+        missing = [t for t in plan.texts if not service._get_cache_path(t).exists()]
+        stats["cached"] = len(plan.texts) - len(missing)
+        if not missing:
+            return stats
+
+        workers = max_workers or int(os.getenv("TTS_PREFETCH_WORKERS", "4"))
+        done = 0
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(service.prefetch, text): text for text in missing}
+            for future in as_completed(futures):
+                try:
+                    fetched = future.result()
+                    key = "fetched" if fetched else "cached"
+                except Exception as e:
+                    logger.warning(f"Voiceover prefetch failed for {futures[future][:40]!r}...: {e}")
+                    key = "failed"
+                stats[key] += 1
+                done += 1
+                if progress:
+                    progress(done, len(missing))
+        return stats
+    finally:
+        if service is not None:
+            stats["http"] = service.get_stats()
+        stats["seconds"] = round(time.monotonic() - started, 2)
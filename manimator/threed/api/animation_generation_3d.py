@@ -12,6 +12,47 @@ import litellm
 
 from .prompts_3d import get_3d_system_prompt, get_3d_examples, SYSTEM_PROMPT_3D
 from manimator.utils.code_postprocessor import post_process_code
+from manimator.utils.llm_client import get_llm_client
+
+
+def _build_messages(user_prompt: str, include_examples: bool = True) -> list:
+    """System and user messages for a 3D generation request."""
+    # Build system prompt
+    system_prompt = get_3d_system_prompt()
+    
+    if include_examples:
+        examples = get_3d_examples()
+        examples_text = "\n\n".join([
+            f"## {name.upper()} EXAMPLE\n{code}"
+            for name, code in examples.items()
+        ])
+        system_prompt += f"\n\nHERE ARE SOME EXAMPLES:\n\n{examples_text}"
+    
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"""Create a complete, runnable Manim 3D animation for the following request:
+
+{user_prompt}
+
+Requirements:
+1. Use ThreeDScene as base class
+2. Include voiceover narration
+3. Set appropriate camera angles
+4. Make it educational and visually appealing
+5. Include mathematical equations if relevant
+6. Use smooth animations and camera movements
+7. Aim for 2-5 minutes duration (or as specified)
+
+Generate ONLY the Python code, nothing else."""}
+    ]
+
+
+def _extract_code(raw_code: str) -> str:
+    """Strip a markdown fence and post-process the generated code."""
+    pattern = r'```python\n(.*?)```'
+    match = re.search(pattern, raw_code, re.DOTALL)
+    code = match.group(1) if match else raw_code
+    return post_process_code(code)
 
 
 def generate_3d_animation_response(
@@ -34,35 +75,7 @@ def generate_3d_animation_response(
         HTTPException: If code generation fails
     """
     try:
-        # Build system prompt
-        system_prompt = get_3d_system_prompt()
-        
-        if include_examples:
-            examples = get_3d_examples()
-            examples_text = "\n\n".join([
-                f"## {name.upper()} EXAMPLE\n{code}"
-                for name, code in examples.items()
-            ])
-            system_prompt += f"\n\nHERE ARE SOME EXAMPLES:\n\n{examples_text}"
-        
-        # Build messages
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"""Create a complete, runnable Manim 3D animation for the following request:
-
-{user_prompt}
-
-Requirements:
-1. Use ThreeDScene as base class
-2. Include voiceover narration
-3. Set appropriate camera angles
-4. Make it educational and visually appealing
-5. Include mathematical equations if relevant
-6. Use smooth animations and camera movements
-7. Aim for 2-5 minutes duration (or as specified)
-
-Generate ONLY the Python code, nothing else."""}
-        ]
+        messages = _build_messages(user_prompt, include_examples)
         
         # Use specified model or default
         if model is None:
@@ -76,20 +89,7 @@ Generate ONLY the Python code, nothing else."""}
         )
         
         raw_code = response.choices[0].message.content
-        
-        # Extract code if wrapped in markdown
-        pattern = r'```python\n(.*?)```'
-        match = re.search(pattern, raw_code, re.DOTALL)
-        
-        if match:
-            code = match.group(1)
-        else:
-            code = raw_code
-        
-        # Post-process the code to fix common issues
-        processed_code = post_process_code(code)
-        
-        return processed_code
+        return _extract_code(raw_code)
         
     except Exception as e:
         raise HTTPException(
@@ -114,6 +114,11 @@ def generate_3d_animation_with_category(
     Returns:
         Generated Python code
     """
+    return generate_3d_animation_response(_category_prompt(user_prompt, category), model=model)
+
+
+def _category_prompt(user_prompt: str, category: str) -> str:
+    """Append the STEM category focus to the user's description."""
     category_prompts = {
         "mathematical": "Focus on mathematical accuracy and clear visualization of mathematical concepts.",
         "scientific": "Focus on scientific accuracy, realistic models, and clear explanations.",
@@ -121,10 +126,46 @@ def generate_3d_animation_with_category(
         "data": "Focus on clear data representation, appropriate chart types, and data-driven insights."
     }
     
-    enhanced_prompt = f"""{user_prompt}
+    return f"""{user_prompt}
 
 CATEGORY: {category.upper()}
 {category_prompts.get(category, '')}
 """
+
+
+async def agenerate_3d_animation_response(
+    user_prompt: str,
+    model: Optional[str] = None,
+    include_examples: bool = True
+) -> str:
+    """
+    Async version of generate_3d_animation_response.
     
-    return generate_3d_animation_response(enhanced_prompt, model=model)
+    The model call runs on the event loop through the shared LLM client
+    instead of occupying a worker thread.
+    
+    Raises:
+        HTTPException: If code generation fails
+    """
+    try:
+        messages = _build_messages(user_prompt, include_examples)
+        raw_code = await get_llm_client().complete(
+            model or os.getenv("CODE_GEN_MODEL"),
+            messages,
+            num_retries=2
+        )
+        return _extract_code(raw_code)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate 3D animation: {str(e)}"
+        )
+
+
+async def agenerate_3d_animation_with_category(
+    user_prompt: str,
+    category: str,
+    model: Optional[str] = None
+) -> str:
+    """Async version of generate_3d_animation_with_category."""
+    return await agenerate_3d_animation_response(_category_prompt(user_prompt, category), model=model)
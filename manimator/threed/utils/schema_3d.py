@@ -9,6 +9,9 @@ import subprocess
 from pathlib import Path
 from typing import Optional
 
+from manimator.utils.render_workers import WorkerError, get_worker_pool, warm_workers_enabled
+from manimator.utils.tex_cache import manim_command
+
 
 class ManimProcessor3D:
     """Processor for rendering 3D Manim scenes"""
@@ -54,8 +57,7 @@ class ManimProcessor3D:
         quality_dir = quality_dirs.get(quality, "1080p60")
         
         # Build command
-        cmd = [
-            "manim",
+        cmd = manim_command() + [
             quality_flag,
             "--media_dir",
             temp_dir,
@@ -63,6 +65,15 @@ class ManimProcessor3D:
             scene_name,
         ]
         
+        if warm_workers_enabled():
+            # Render on a warm worker that already has manim imported
+            try:
+                result = get_worker_pool().render(scene_file, scene_name, quality, media_dir=temp_dir)
+                return result["video_path"]
+            except WorkerError as e:
+                print(f"Manim rendering failed: {e}")
+                return None
+        
         try:
             # Run manim
             result = subprocess.run(
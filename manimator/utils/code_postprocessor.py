@@ -4,8 +4,21 @@ Code post-processor for AI-generated Manim code.
 Fixes common issues like indexed SurroundingRectangle calls and layout problems.
 """
 
+import os
 import re
-from typing import List
+from typing import Dict, List, Tuple
+
+from .code_rewriter import rewrite_code
+
+# Header comment explaining post-processing
+POST_PROCESS_HEADER = """# NOTE: This code has been automatically post-processed to fix common issues:
+# - Indexed SurroundingRectangle calls have been disabled
+# - Layout spacing has been adjusted to prevent overlaps
+# - Axis labels have been positioned to stay within frame
+# - Font sizes have been capped to prevent massive text
+# Undefined color constants have been replaced with standard Manim colors.
+
+"""
 
 
 def extract_code_from_markdown(text: str) -> str:
@@ -269,13 +282,51 @@ def post_process_code(code: str) -> str:
     Returns:
         Cleaned and fixed code
     """
-    # Check if we need to add header (before making changes)
-    has_undefined_colors = bool(re.search(r'\b(ORANGE|RED|BLUE|GREEN|YELLOW|PURPLE|PINK|TEAL|GRAY)_[A-Z]\b', code))
+    code, _ = post_process_code_with_changes(code)
+    return code
+
+
+def post_process_code_with_changes(code: str, engine: str = None) -> Tuple[str, List[Dict]]:
+    """
+    Post-process code and report what was changed.
+    
+    The AST rewriter (see code_rewriter) applies every fix in one tree walk
+    and leaves strings, comments and untouched lines alone. Code that does
+    not parse goes through the regex pipeline instead.
+    
+    Args:
+        code: Raw generated code (may have markdown fences)
+        engine: "ast" or "regex" (defaults to the POSTPROCESS_ENGINE env var, "ast")
+    
+    Returns:
+        Tuple of (fixed_code, list of {"rule", "line", "before", "after"}
+        dicts; empty for the regex pipeline)
+    """
+    engine = engine or os.getenv("POSTPROCESS_ENGINE", "ast")
     
     # Step 1: Extract code from markdown if needed
     code = extract_code_from_markdown(code)
     
-    # Step 2: Apply fixes in order
+    # Step 2: Apply fixes
+    if engine == "ast":
+        try:
+            fixed, changes = rewrite_code(code)
+        except SyntaxError:
+            pass
+        else:
+            rules = {change.rule for change in changes}
+            if rules & {"surrounding_rectangle", "undefined_color"}:
+                fixed = POST_PROCESS_HEADER + fixed
+            return fixed, [change.to_dict() for change in changes]
+    
+    return _post_process_regex(code), []
+
+
+def _post_process_regex(code: str) -> str:
+    """Whole-string regex pipeline (fallback for code that does not parse)."""
+    # Check if we need to add header (before making changes)
+    has_undefined_colors = bool(re.search(r'\b(ORANGE|RED|BLUE|GREEN|YELLOW|PURPLE|PINK|TEAL|GRAY)_[A-Z]\b', code))
+    
     code = fix_missing_imports(code)
     code = fix_undefined_colors(code)
     code = fix_surrounding_rectangles(code)
@@ -295,19 +346,9 @@ def post_process_code(code: str) -> str:
 """
         code = warning_header + code
     
-    # Add header comment explaining post-processing
-    header = """# NOTE: This code has been automatically post-processed to fix common issues:
-# - Indexed SurroundingRectangle calls have been disabled
-# - Layout spacing has been adjusted to prevent overlaps
-# - Axis labels have been positioned to stay within frame
-# - Font sizes have been capped to prevent massive text
-# Undefined color constants have been replaced with standard Manim colors.
-
-"""
-    
     # Only add header if we actually made changes
     if '# Auto-disabled:' in code or '# Auto-fix:' in code or '# Warning:' in code or '# Note:' in code or '# ⚠️  SYNTAX ERROR DETECTED:' in code or has_undefined_colors:
-        code = header + code
+        code = POST_PROCESS_HEADER + code
     
     return code
 
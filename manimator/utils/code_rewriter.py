@@ -0,0 +1,611 @@
+"""
+AST Code Rewriter
+
+Single-pass, rule-based rewriter behind code_postprocessor.post_process_code.
+
+The regex pipeline ran one whole-string pass per fix (imports, colours,
+SurroundingRectangle, a dozen layout patterns), re-scanned every disabled
+variable on every line and could not tell code from strings or comments.
+Here the code is parsed once and a single tree walk hands every node to
+the rules registered for its type. Rules do not rebuild the tree; they
+record text edits against the node's source span, so lines no rule touched
+come out byte-for-byte identical (comments and formatting included).
+
+Every applied edit is reported as a CodeChange with its line number.
+
+The gain is modest: --bench measures about 1.4x over the regex pipeline
+in total on the checked-in scenes (1.2-1.4x on the large files), and the
+one ast.parse is now the biggest single cost. The result is only parsed
+again when a disabled statement shared its line with other code.
+
+Usage:
+    fixed, changes = rewrite_code(code)
+
+    # Compare against the regex pipeline on the checked-in scenes
+    python -m manimator.utils.code_rewriter --bench
+"""
+
+import argparse
+import ast
+import json
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Colour variants the generated code invents -> valid Manim colours
+COLOR_VARIANT = re.compile(r'(ORANGE|RED|BLUE|GREEN|YELLOW|PURPLE|PINK|TEAL|GRAY)_[A-Z]')
+COLOR_ALIASES = {"LIGHT_BLUE": "TEAL_B", "LIGHT_RED": "RED_A", "LIGHT_GREEN": "GREEN_A"}
+
+# Comments left on statements the rewriter disables
+DISABLED_INDEXED = "  # Auto-disabled: indexed SurroundingRectangle"
+DISABLED_DEPENDENT = "  # Auto-disabled: uses disabled SurroundingRectangle"
+
+# Node fields that never hold child nodes (names, flags, load/store context)
+_SCALAR_FIELDS = frozenset({
+    "id", "ctx", "attr", "arg", "name", "asname", "module", "level",
+    "kind", "conversion", "is_async", "type_comment", "tag",
+})
+
+
+@dataclass
+class CodeChange:
+    """One edit applied to the code."""
+    rule: str
+    line: int
+    before: str
+    after: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"rule": self.rule, "line": self.line, "before": self.before, "after": self.after}
+
+
+@dataclass
+class _Edit:
+    start: int
+    end: int
+    text: str
+    change: CodeChange
+    order: int
+
+
+class RewriteContext:
+    """Source positions, pending edits and shared state for one rewrite."""
+
+    def __init__(self, code: str):
+        self.code = code
+        self.lines = code.split("\n")
+        self.line_starts = [0]
+        for line in self.lines[:-1]:
+            self.line_starts.append(self.line_starts[-1] + len(line) + 1)
+        self.edits: List[_Edit] = []
+        self.statements: List[ast.stmt] = []  # innermost statement last
+        self.bodies: List[Tuple[ast.AST, List[ast.stmt]]] = []
+        self.disabled: Dict[int, _Edit] = {}
+        self.disabled_vars = set()
+        self.shared_line_disabled = False  # a disabled statement shares a line with other code
+        self.has_axes = False
+        self.tree: Optional[ast.Module] = None
+        self.parent: Optional[ast.AST] = None  # parent of the node being checked
+
+    # -- positions -----------------------------------------------------------
+
+    def offset(self, lineno: int, col: int) -> int:
+        """Character offset of an AST (line, UTF-8 byte column) position."""
+        line = self.lines[lineno - 1]
+        if not line.isascii():
+            col = len(line.encode("utf-8")[:col].decode("utf-8", errors="ignore"))
+        return self.line_starts[lineno - 1] + col
+
+    def span(self, node: ast.AST) -> Tuple[int, int]:
+        return (
+            self.offset(node.lineno, node.col_offset),
+            self.offset(node.end_lineno, node.end_col_offset),
+        )
+
+    def source(self, node: ast.AST) -> str:
+        start, end = self.span(node)
+        return self.code[start:end]
+
+    # -- edits ---------------------------------------------------------------
+
+    def replace(self, node: ast.AST, text: str, rule: str) -> _Edit:
+        """Replace the source of node with text."""
+        start, end = self.span(node)
+        return self._add(start, end, text, rule, node.lineno, self.code[start:end])
+
+    def insert(self, offset: int, text: str, rule: str, lineno: int) -> _Edit:
+        """Insert text at a character offset."""
+        return self._add(offset, offset, text, rule, lineno, "")
+
+    def _add(self, start: int, end: int, text: str, rule: str, lineno: int, before: str) -> _Edit:
+        edit = _Edit(start, end, text, CodeChange(rule, lineno, before, text), len(self.edits))
+        self.edits.append(edit)
+        return edit
+
+    def disable(self, statement: ast.stmt, comment: str, rule: str):
+        """Comment out every line of a statement."""
+        if id(statement) in self.disabled:
+            return
+        first, last = statement.lineno, statement.end_lineno
+        lines = self.lines[first - 1:last]
+        start, end = self.span(statement)
+        if (self.code[self.line_starts[first - 1]:start].strip()
+                or self.code[end:self.line_starts[last - 1] + len(lines[-1])].strip().split("#")[0].strip()):
+            # e.g. "if x: rect = ..." or "a = 1; rect = ...": commenting the
+            # lines out takes other code with it
+            self.shared_line_disabled = True
+        indent = lines[0][:len(lines[0]) - len(lines[0].lstrip())]
+        commented = [
+            line[:len(line) - len(line.lstrip())] + "# " + line.lstrip() if line.strip() else line
+            for line in lines
+        ]
+        commented[0] += comment
+        start = self.line_starts[first - 1]
+        end = self.line_starts[last - 1] + len(self.lines[last - 1])
+        edit = self._add(start, end, "\n".join(commented), rule, first, lines[0].strip())
+        edit.change.after = indent + "# " + lines[0].strip()
+        self.disabled[id(statement)] = edit
+
+        # Names bound by a disabled assignment are unusable further down too
+        targets = getattr(statement, "targets", None) or [getattr(statement, "target", None)]
+        for target in targets:
+            if isinstance(target, ast.Name):
+                self.disabled_vars.add(target.id)
+
+    def apply(self) -> Tuple[str, List[CodeChange]]:
+        """Apply the edits, keeping the earliest rule where spans overlap."""
+        self._fill_empty_bodies()
+        accepted: List[_Edit] = []
+        for edit in sorted(self.edits, key=lambda e: (e.start, -e.end, e.order)):
+            if accepted and edit.start < accepted[-1].end:
+                continue
+            if accepted and edit.start == edit.end == accepted[-1].start == accepted[-1].end:
+                continue
+            accepted.append(edit)
+
+        parts, position = [], 0
+        for edit in accepted:
+            parts.append(self.code[position:edit.start])
+            parts.append(edit.text)
+            position = edit.end
+        parts.append(self.code[position:])
+        changes = sorted((e.change for e in accepted), key=lambda c: c.line)
+        return "".join(parts), changes
+
+    def _fill_empty_bodies(self):
+        """Keep blocks whose every statement was disabled syntactically valid."""
+        for owner, body in self.bodies:
+            if isinstance(owner, ast.Module) or id(owner) in self.disabled:
+                continue
+            if body and all(id(stmt) in self.disabled for stmt in body):
+                last = self.disabled[id(body[-1])]
+                first_line = self.lines[body[0].lineno - 1]
+                indent = first_line[:len(first_line) - len(first_line.lstrip())]
+                last.text += "\n" + indent + "pass"
+
+
+# ============================================================================
+# Rules
+# ============================================================================
+
+class RewriteRule:
+    """
+    A fix applied during the tree walk.
+
+    check() runs for every node whose type is in node_types, finish() once
+    after the walk (for fixes that depend on the whole module).
+    """
+    name = "rule"
+    node_types: Tuple[type, ...] = ()
+
+    def check(self, node: ast.AST, ctx: RewriteContext):
+        pass
+
+    def finish(self, ctx: RewriteContext):
+        pass
+
+
+def _number(node: ast.AST) -> Optional[float]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return node.value
+    return None
+
+
+def _name(node: ast.AST) -> str:
+    """Trailing identifier of a Name or attribute chain ("" otherwise)."""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return ""
+
+
+def _method(node: ast.Call) -> str:
+    return node.func.attr if isinstance(node.func, ast.Attribute) else ""
+
+
+def _keyword(node: ast.Call, name: str) -> Optional[ast.keyword]:
+    return next((kw for kw in node.keywords if kw.arg == name), None)
+
+
+class MissingImportRule(RewriteRule):
+    """Add `import random` when random.* is used without it."""
+    name = "missing_import"
+    node_types = (ast.Attribute, ast.Import)
+
+    def __init__(self):
+        self.used_at: Optional[int] = None
+        self.imported = False
+
+    def check(self, node, ctx):
+        if isinstance(node, ast.Import):
+            self.imported = self.imported or any(alias.name == "random" for alias in node.names)
+        elif isinstance(node.value, ast.Name) and node.value.id == "random" and self.used_at is None:
+            self.used_at = node.lineno
+
+    def finish(self, ctx):
+        if self.used_at is None or self.imported:
+            return
+        module = ctx.tree
+        imports = [s for s in module.body if isinstance(s, (ast.Import, ast.ImportFrom))]
+        if imports:
+            line = imports[-1].end_lineno
+            offset = ctx.line_starts[line - 1] + len(ctx.lines[line - 1])
+            ctx.insert(offset, "\nimport random", self.name, line + 1)
+        else:
+            ctx.insert(0, "import random\n", self.name, 1)
+
+
+class ColorRule(RewriteRule):
+    """Replace invented colour constants (ORANGE_B, LIGHT_BLUE, ...)."""
+    name = "undefined_color"
+    node_types = (ast.Name,)
+
+    def check(self, node, ctx):
+        replacement = COLOR_ALIASES.get(node.id)
+        if replacement is None and COLOR_VARIANT.fullmatch(node.id):
+            replacement = node.id.split("_")[0]
+        if replacement:
+            ctx.replace(node, replacement, self.name)
+
+
+class SurroundingRectangleRule(RewriteRule):
+    """
+    Disable SurroundingRectangle calls on indexed MathTex parts.
+
+    MathTex indexing is unpredictable, so `SurroundingRectangle(eq[0][5])`
+    is commented out, together with later statements that use its variable.
+    """
+    name = "surrounding_rectangle"
+    node_types = (ast.Call, ast.Name)
+
+    @staticmethod
+    def _indexed(node: ast.AST) -> bool:
+        while isinstance(node, ast.Subscript):
+            index = node.slice
+            if _number(index) is not None:
+                return True
+            if isinstance(index, ast.Slice) and _number(index.lower) is not None:
+                return True
+            node = node.value
+        return False
+
+    def check(self, node, ctx):
+        if not ctx.statements:
+            return
+        if isinstance(node, ast.Call):
+            if _name(node.func) == "SurroundingRectangle" and node.args and self._indexed(node.args[0]):
+                ctx.disable(ctx.statements[-1], DISABLED_INDEXED, self.name)
+        elif isinstance(node.ctx, ast.Load) and node.id in ctx.disabled_vars:
+            ctx.disable(ctx.statements[-1], DISABLED_DEPENDENT, self.name)
+
+
+class AxisLengthRule(RewriteRule):
+    """Shrink numeric x_length/y_length so graphs stay inside the frame."""
+    name = "axis_length"
+    node_types = (ast.keyword,)
+    LIMITS = {"x_length": "7", "y_length": "4"}
+
+    def check(self, node, ctx):
+        limit = self.LIMITS.get(node.arg)
+        if limit is not None and _number(node.value) is not None and ctx.source(node.value) != limit:
+            ctx.replace(node.value, limit, self.name)
+
+
+class AxesPositionRule(RewriteRule):
+    """Move axes/planes down to leave room for titles."""
+    name = "axes_position"
+    node_types = (ast.Call,)
+
+    def __init__(self):
+        self.pending: List[Tuple[ast.Call, _Edit]] = []
+
+    def check(self, node, ctx):
+        if _name(node.func) in ("Axes", "NumberPlane"):
+            ctx.has_axes = True
+        if _method(node) == "move_to" and re.search(r"(axes|plane)$", _name(node.func.value)):
+            args = node.args + [kw.value for kw in node.keywords]
+            if args and ctx.source(node).split("(", 1)[1] != "DOWN * 1.5)":
+                start = ctx.span(args[0])[0]
+                end = ctx.span(node)[1] - 1
+                edit = ctx._add(start, end, "DOWN * 1.5", self.name, node.lineno, ctx.code[start:end])
+                self.pending.append((node, edit))
+
+    def finish(self, ctx):
+        if not ctx.has_axes:
+            for _, edit in self.pending:
+                ctx.edits.remove(edit)
+
+
+class AxisLabelRule(RewriteRule):
+    """Keep axis labels off the axes: y labels LEFT and shifted, x labels shifted down."""
+    name = "axis_label"
+    node_types = (ast.Call,)
+
+    def check(self, node, ctx):
+        method = _method(node)
+        if method not in ("get_y_axis_label", "get_x_axis_label") or not node.args:
+            return
+        parent = ctx.parent
+        if isinstance(parent, ast.Attribute) and parent.attr == "shift":
+            return
+
+        if method == "get_x_axis_label":
+            end = ctx.span(node)[1]
+            ctx.insert(end, ".shift(DOWN * 0.8)", self.name, node.end_lineno)
+        elif len(node.args) + len(node.keywords) > 1:
+            start = ctx.span(node.args[0])[1]
+            end = ctx.span(node)[1]
+            ctx._add(start, end, ", direction=LEFT).shift(LEFT * 0.8)", self.name, node.lineno, ctx.code[start:end])
+
+
+class TitleBuffRule(RewriteRule):
+    """to_edge(UP) gets buff=1.0 so equations clear the title area."""
+    name = "title_buff"
+    node_types = (ast.Call,)
+
+    def check(self, node, ctx):
+        if _method(node) != "to_edge" or len(node.args) != 1 or _name(node.args[0]) != "UP":
+            return
+        buff = _keyword(node, "buff")
+        if buff is None:
+            ctx.insert(ctx.span(node.args[0])[1], ", buff=1.0", self.name, node.lineno)
+        elif 0.1 <= (_number(buff.value) or 0) < 1.0:
+            ctx.replace(buff.value, "1.0", self.name)
+
+
+class FontSizeRule(RewriteRule):
+    """Cap font sizes (>= 40 -> 36, 38-39 -> 32)."""
+    name = "font_size"
+    node_types = (ast.keyword,)
+
+    def check(self, node, ctx):
+        if node.arg != "font_size":
+            return
+        size = _number(node.value)
+        if size is None:
+            return
+        if size >= 40:
+            ctx.replace(node.value, "36", self.name)
+        elif size >= 38:
+            ctx.replace(node.value, "32", self.name)
+
+
+class VerticalMarginRule(RewriteRule):
+    """Clamp DOWN * 3..9 in move_to and UP * 3.x anywhere to the safe zone."""
+    name = "vertical_margin"
+    node_types = (ast.BinOp,)
+
+    def check(self, node, ctx):
+        if not isinstance(node.op, ast.Mult):
+            return
+        direction, factor = _name(node.left), _number(node.right)
+        if factor is None or not isinstance(node.left, ast.Name):
+            return
+        if direction == "UP" and 3 <= factor < 4:
+            ctx.replace(node, "UP * 2.5", self.name)
+        elif direction == "DOWN" and 3 <= factor < 10:
+            parent = ctx.parent
+            if isinstance(parent, ast.Call) and _method(parent) == "move_to" and parent.args[:1] == [node]:
+                ctx.replace(node, "DOWN * 2.5", self.name)
+
+
+class ArrowLabelRule(RewriteRule):
+    """Labels placed UP of arrows/vectors go RIGHT so they do not hit the title."""
+    name = "arrow_label"
+    node_types = (ast.Call,)
+
+    def check(self, node, ctx):
+        if _method(node) != "next_to" or not node.args:
+            return
+        if not re.search(r"arrow|vector", _name(node.args[0]), re.IGNORECASE):
+            return
+        direction = node.args[1] if len(node.args) > 1 else getattr(_keyword(node, "direction"), "value", None)
+        if isinstance(direction, ast.Name) and direction.id == "UP":
+            ctx.replace(direction, "RIGHT", self.name)
+
+
+def default_rules() -> List[RewriteRule]:
+    """Fresh rule instances in priority order (earlier wins on overlapping edits)."""
+    return [
+        SurroundingRectangleRule(),
+        MissingImportRule(),
+        ColorRule(),
+        AxisLengthRule(),
+        AxesPositionRule(),
+        AxisLabelRule(),
+        TitleBuffRule(),
+        FontSizeRule(),
+        VerticalMarginRule(),
+        ArrowLabelRule(),
+    ]
+
+
+# ============================================================================
+# Tree walk
+# ============================================================================
+
+class CodeRewriter(ast.NodeVisitor):
+    """Walks the tree once, dispatching each node to the rules for its type."""
+
+    def __init__(self, rules: Optional[List[RewriteRule]] = None):
+        self.rules = rules if rules is not None else default_rules()
+        self.dispatch: Dict[type, List[Callable]] = {}
+        for rule in self.rules:
+            for node_type in rule.node_types:
+                self.dispatch.setdefault(node_type, []).append(rule.check)
+        # Node type -> fields that can hold child nodes, filled on first sight
+        self.child_fields: Dict[type, Tuple[str, ...]] = {ast.Constant: ()}
+
+    def rewrite(self, code: str) -> Tuple[str, List[CodeChange]]:
+        """
+        Apply all rules to code.
+
+        Returns:
+            (rewritten code, applied changes sorted by line)
+
+        Raises:
+            SyntaxError: If code does not parse, or if commenting out a
+                statement that shares a line with other code left code
+                that does not parse
+        """
+        ctx = RewriteContext(code)
+        ctx.tree = ast.parse(code)
+        self.ctx = ctx
+        self.visit(ctx.tree)
+        for rule in self.rules:
+            rule.finish(ctx)
+        result, changes = ctx.apply()
+        if ctx.shared_line_disabled:
+            # Commenting out whole lines took other code along; re-check the
+            # block structure. Statements alone on their lines are removed
+            # cleanly and emptied bodies get a pass, so they need no re-parse.
+            ast.parse(result)
+        return result, changes
+
+    def visit(self, node: ast.AST, parent: Optional[ast.AST] = None):
+        ctx = self.ctx
+        checks = self.dispatch.get(type(node))
+        if checks:
+            ctx.parent = parent
+            for check in checks:
+                check(node, ctx)
+
+        is_statement = isinstance(node, ast.stmt)
+        if is_statement:
+            ctx.statements.append(node)
+        fields = self.child_fields.get(type(node))
+        if fields is None:
+            fields = tuple(field for field in node._fields if field not in _SCALAR_FIELDS)
+            self.child_fields[type(node)] = fields
+        for field in fields:
+            value = getattr(node, field, None)
+            if type(value) is list:
+                if value and isinstance(value[0], ast.stmt):
+                    ctx.bodies.append((node, value))
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        self.visit(item, node)
+            elif isinstance(value, ast.AST):
+                self.visit(value, node)
+        if is_statement:
+            ctx.statements.pop()
+
+
+def rewrite_code(code: str, rules: Optional[List[RewriteRule]] = None) -> Tuple[str, List[CodeChange]]:
+    """
+    Parse code once and apply every post-processing rule in one walk.
+
+    Args:
+        code: Python source (markdown fences already stripped)
+        rules: Rules to apply (defaults to default_rules())
+
+    Returns:
+        (rewritten code, list of CodeChange)
+
+    Raises:
+        SyntaxError: If the code cannot be parsed (callers fall back to the
+            regex pipeline)
+    """
+    return CodeRewriter(rules).rewrite(code)
+
+
+# ============================================================================
+# Benchmark
+# ============================================================================
+
+def default_bench_files() -> List[Path]:
+    """The large checked-in scenes plus every saved scene_*.py."""
+    root = Path(__file__).resolve().parents[2]
+    files = [root / "scaling_scene.py", root / "generated_scaling_code.py"]
+    files += sorted(root.glob("scene_*.py"))
+    return [f for f in files if f.exists()]
+
+
+def benchmark(files: List[Path], repeat: int = 5) -> Dict[str, Any]:
+    """
+    Time the AST rewriter against the regex pipeline on each file.
+
+    Both paths run the full post_process_code entry point; files that do
+    not parse show the AST engine falling back to the regex pipeline.
+    """
+    from manimator.utils import code_postprocessor
+
+    def best(engine: str, code: str) -> float:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            code_postprocessor.post_process_code_with_changes(code, engine=engine)
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    rows, totals = [], {"regex": 0.0, "ast": 0.0}
+    for path in files:
+        code = path.read_text(encoding="utf-8")
+        _, changes = code_postprocessor.post_process_code_with_changes(code, engine="ast")
+        try:
+            ast.parse(code_postprocessor.extract_code_from_markdown(code))
+            parses = True
+        except SyntaxError:
+            parses = False
+        regex_s, ast_s = best("regex", code), best("ast", code)
+        totals["regex"] += regex_s
+        totals["ast"] += ast_s
+        rows.append({
+            "file": path.name,
+            "lines": code.count("\n") + 1,
+            "parses": parses,
+            "changes": len(changes),
+            "regex_ms": round(regex_s * 1000, 2),
+            "ast_ms": round(ast_s * 1000, 2),
+            "speedup": round(regex_s / ast_s, 2) if ast_s else None,
+        })
+    return {
+        "files": rows,
+        "total_regex_ms": round(totals["regex"] * 1000, 2),
+        "total_ast_ms": round(totals["ast"] * 1000, 2),
+        "speedup": round(totals["regex"] / totals["ast"], 2) if totals["ast"] else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AST post-processing rewriter")
+    parser.add_argument("files", nargs="*", type=Path, help="Files to rewrite (default: checked-in scenes)")
+    parser.add_argument("--bench", action="store_true", help="Compare against the regex pipeline")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions per file for --bench")
+    args = parser.parse_args()
+
+    files = args.files or default_bench_files()
+    if args.bench:
+        print(json.dumps(benchmark(files, args.repeat), indent=2))
+        return
+    for path in files:
+        _, changes = rewrite_code(path.read_text(encoding="utf-8"))
+        for change in changes:
+            print(f"{path.name}:{change.line}: [{change.rule}] {change.before!r} -> {change.after!r}")
+
+
+if __name__ == "__main__":
+    main()
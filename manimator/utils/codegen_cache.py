@@ -0,0 +1,189 @@
+"""
+Code Generation Cache
+
+Persistent, content-addressed cache for LLM code generation responses.
+
+Entries are keyed on a SHA-256 of (system prompt, user prompt, category,
+model), so an identical resubmission skips the multi-minute LLM call while
+any change to the prompt templates or the model naturally misses. Code
+that later fails verification or rendering is deleted again, so a bad
+response is not served to the next identical request.
+
+Environment Variables:
+    CODEGEN_CACHE: Set to "0" to disable the cache
+    CODEGEN_CACHE_PATH: SQLite file (default: <repo>/media/cache/codegen.db)
+    CODEGEN_CACHE_MAX_MB: Size cap before LRU eviction (default: 256)
+    CODEGEN_CACHE_TTL_HOURS: Entry lifetime (default: 168, one week)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+
+
+class CodegenCache:
+    """
+    SQLite-backed LRU/TTL cache for generated code.
+
+    Example:
+        >>> cache = CodegenCache("media/cache/codegen.db")
+        >>> key = cache.make_key(system_prompt, prompt, "mathematical", model)
+        >>> code = cache.get(key)
+        >>> if code is None:
+        ...     code = call_llm()
+        ...     cache.put(key, code)
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_access REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access);
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: float = 7 * 24 * 3600,
+    ):
+        """
+        Open (and create if needed) the cache database.
+
+        Args:
+            db_path: Path to the SQLite file
+            max_bytes: Total size of cached values before LRU eviction
+            ttl_seconds: Age after which an entry is treated as a miss
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.db_path), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def make_key(system_prompt: str, user_prompt: str, category: str, model: str) -> str:
+        """Content hash identifying one code generation request."""
+        payload = json.dumps([system_prompt, user_prompt, category, model], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None on a miss or an expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        """Store a value and evict least recently used entries over the size cap."""
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO entries (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "created_at = excluded.created_at, last_access = excluded.last_access",
+                (key, value, size, now, now),
+            )
+            self._evict_locked(now)
+
+    def delete(self, key: str) -> bool:
+        """Drop one entry (e.g. code that failed later checks). Returns True if it existed."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+
+    def _evict_locked(self, now: float) -> None:
+        cursor = self._conn.execute(
+            "DELETE FROM entries WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        self.evictions += max(cursor.rowcount, 0)
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size for /health."""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+_cache: Optional[CodegenCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_codegen_cache() -> Optional[CodegenCache]:
+    """
+    Process-wide cache configured from the environment.
+
+    Returns:
+        CodegenCache instance, or None if disabled with CODEGEN_CACHE=0
+    """
+    global _cache
+    if os.getenv("CODEGEN_CACHE", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = CodegenCache(
+                Path(os.getenv("CODEGEN_CACHE_PATH", str(BASE_DIR / "media" / "cache" / "codegen.db"))),
+                max_bytes=int(float(os.getenv("CODEGEN_CACHE_MAX_MB", "256")) * 1024 * 1024),
+                ttl_seconds=float(os.getenv("CODEGEN_CACHE_TTL_HOURS", "168")) * 3600,
+            )
+        return _cache
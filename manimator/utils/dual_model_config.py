@@ -4,12 +4,17 @@ Dual Model Configuration for Code Generation + Visual Validation
 Uses:
 - Claude 4.5 Sonnet for code generation (best at coding)
 - Gemini 3 Pro Preview for visual layout validation (multimodal)
+
+The a* variants run on the event loop through the shared AsyncLLMClient
+(per-model concurrency limits, timeouts and gauges, see llm_client).
 """
 
 import os
 from typing import Tuple
 import litellm
 
+from .llm_client import get_llm_client
+
 
 class DualModelConfig:
     """Configuration for dual-model system."""
@@ -90,6 +95,37 @@ class DualModelConfig:
         )
         return response.choices[0].message.content
 
+    
+    @classmethod
+    async def agenerate_with_claude(cls, messages: list, **kwargs) -> str:
+        """Async version of generate_with_claude."""
+        return await get_llm_client().complete(
+            cls.get_code_model(),
+            messages,
+            num_retries=2,
+            **kwargs
+        )
+    
+    @classmethod
+    async def avalidate_with_gemini(cls, messages: list, **kwargs) -> str:
+        """Async version of validate_with_gemini."""
+        return await get_llm_client().complete(
+            cls.get_visual_model(),
+            messages,
+            temperature=0.3,
+            **kwargs
+        )
+    
+    @classmethod
+    async def agenerate_with_gemini(cls, messages: list, **kwargs) -> str:
+        """Async version of generate_with_gemini."""
+        return await get_llm_client().complete(
+            cls.get_visual_model(),
+            messages,
+            temperature=0.3,
+            **kwargs
+        )
+
 
 def get_model_config() -> Tuple[str, str]:
     """
@@ -0,0 +1,189 @@
+"""
+Frame Deduplication
+
+Groups near-identical frames so the vision model sees each layout once.
+
+Educational scenes keep the same layout on screen across many animations,
+so one frame per partial movie file yields long runs of frames that only
+differ by a highlight or a few pixels of motion. Each frame gets a
+difference hash (dHash): the frame is reduced to a small grayscale grid
+and every bit records whether a cell is brighter than its right-hand
+neighbour. Frames whose hashes are within a few bits of a group's
+representative are candidates; a candidate joins the group only if a
+small grayscale thumbnail also shows (almost) no changed pixels, because
+a label appearing on top of another one barely moves a 256-bit hash.
+
+VisualLayoutAnalyzer sends only the representatives and copies each
+reported issue to every frame (and timestamp) of its group.
+
+Environment Variables:
+    VISUAL_DEDUP: Set to "0" to send every frame
+    FRAME_DEDUP_DISTANCE: Max differing hash bits within a group (default: 12 of 256)
+    FRAME_DEDUP_PIXELS: Max changed thumbnail pixels within a group (default: 16)
+"""
+
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from PIL import Image
+
+# Hash grid is HASH_SIZE x HASH_SIZE bits
+HASH_SIZE = 16
+
+# Width of the grayscale thumbnail used to confirm a match
+THUMB_WIDTH = 240
+
+# Gray-level difference at which a thumbnail pixel counts as changed
+THUMB_CHANGE = 24
+
+FrameInput = Union[str, Path, Image.Image, np.ndarray]
+
+
+@dataclass
+class FrameGroup:
+    """Frames sharing one layout; representative is an index into the input list."""
+    representative: int
+    hash: int
+    members: List[int] = field(default_factory=list)
+    thumb: Optional[np.ndarray] = field(default=None, repr=False)
+
+
+def _grayscale(frame: FrameInput) -> Image.Image:
+    if isinstance(frame, np.ndarray):
+        image = Image.fromarray(np.ascontiguousarray(frame[..., :3]).astype(np.uint8))
+    elif isinstance(frame, Image.Image):
+        image = frame
+    else:
+        image = Image.open(frame)
+    return image.convert("L")
+
+
+def dhash(frame: FrameInput, hash_size: int = HASH_SIZE) -> int:
+    """
+    Difference hash of a frame.
+
+    Args:
+        frame: Image path, PIL image or RGB array
+        hash_size: Grid size (the hash has hash_size**2 bits)
+
+    Returns:
+        Hash as an integer
+    """
+    return _dhash(_grayscale(frame), hash_size)
+
+
+def _dhash(gray: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    # BOX averages every source pixel, so small text still moves the cell means
+    cells = np.asarray(gray.resize((hash_size + 1, hash_size), Image.BOX), dtype=np.int16)
+    bits = (cells[:, 1:] > cells[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _thumbnail(gray: Image.Image) -> np.ndarray:
+    height = max(1, round(gray.height * THUMB_WIDTH / gray.width))
+    return np.asarray(gray.resize((THUMB_WIDTH, height), Image.BOX), dtype=np.int16)
+
+
+def _same_layout(a: np.ndarray, b: np.ndarray, max_pixels: int) -> bool:
+    if a.shape != b.shape:
+        return False
+    return int(np.count_nonzero(np.abs(a - b) > THUMB_CHANGE)) <= max_pixels
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits."""
+    return bin(a ^ b).count("1")
+
+
+def group_frames(
+    frames: Sequence[FrameInput],
+    max_distance: Optional[int] = None,
+    max_pixels: Optional[int] = None,
+) -> List[FrameGroup]:
+    """
+    Group near-duplicate frames.
+
+    Each frame joins the closest existing group whose representative is
+    within max_distance hash bits and max_pixels changed thumbnail pixels,
+    otherwise it starts a new group with itself as representative. Frames
+    that cannot be read get a group of their own.
+
+    Args:
+        frames: Frames in scene order
+        max_distance: Hash bit threshold (default: FRAME_DEDUP_DISTANCE)
+        max_pixels: Thumbnail pixel threshold (default: FRAME_DEDUP_PIXELS)
+
+    Returns:
+        Groups in order of their representatives
+    """
+    if max_distance is None:
+        max_distance = int(os.getenv("FRAME_DEDUP_DISTANCE", "12"))
+    if max_pixels is None:
+        max_pixels = int(os.getenv("FRAME_DEDUP_PIXELS", "16"))
+
+    groups: List[FrameGroup] = []
+    for index, frame in enumerate(frames):
+        try:
+            gray = _grayscale(frame)
+            value, thumb = _dhash(gray), _thumbnail(gray)
+        except Exception:
+            groups.append(FrameGroup(representative=index, hash=-1, members=[index]))
+            continue
+
+        candidates = sorted(
+            (hamming(value, group.hash), position)
+            for position, group in enumerate(groups)
+            if group.hash >= 0
+        )
+        match = next(
+            (groups[position] for distance, position in candidates
+             if distance <= max_distance and _same_layout(thumb, groups[position].thumb, max_pixels)),
+            None
+        )
+        if match is None:
+            groups.append(FrameGroup(representative=index, hash=value, members=[index], thumb=thumb))
+        else:
+            match.members.append(index)
+    return groups
+
+
+def expand_issues(
+    issues: List[Dict[str, Any]],
+    groups: List[FrameGroup],
+    timestamps: Optional[Sequence[float]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Map issues reported against representatives back to whole groups.
+
+    Args:
+        issues: Issues whose "frame" is an index into the representatives
+        groups: Result of group_frames
+        timestamps: Optional timestamp per original frame
+
+    Returns:
+        The issues, with "frame" set to the representative's original index
+        and "frames" (and "timestamps") listing every frame in the group
+    """
+    for issue in issues:
+        local = issue.get("frame")
+        if not isinstance(local, int) or not 0 <= local < len(groups):
+            continue
+        group = groups[local]
+        issue["frame"] = group.representative
+        issue["frames"] = list(group.members)
+        if timestamps is not None:
+            issue["timestamps"] = [timestamps[m] for m in group.members]
+    return issues
+
+
+def dedup_summary(groups: List[FrameGroup], total: int) -> Dict[str, Any]:
+    """Counts and ratio for logging and the analysis report."""
+    return {
+        "frames": total,
+        "unique": len(groups),
+        "ratio": round(1 - len(groups) / total, 3) if total else 0.0,
+        "groups": [group.members for group in groups],
+    }
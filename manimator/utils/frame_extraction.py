@@ -0,0 +1,263 @@
+"""
+Frame Extraction
+
+Pulls stills out of rendered videos in one decoder pass, straight into
+memory.
+
+The old path ran ffprobe for the duration and then one ffmpeg process per
+timestamp, each re-opening and re-demuxing the file and writing a PNG to a
+temporary directory. Here each video is opened once and every requested
+frame is decoded from that single pass:
+
+- With PyAV (installed with manim), the container is opened in-process,
+  and the decoder seeks to each timestamp. No processes are launched, even
+  for hundreds of partial movie files.
+- Without PyAV, one ffprobe call reads the stream geometry and one ffmpeg
+  call selects all the frames with a `select` filter, writing raw RGB to
+  a pipe.
+
+Frames come back as ExtractedFrame objects holding RGB NumPy arrays, which
+can be JPEG-encoded in memory for the vision model.
+"""
+
+import io
+import json
+import logging
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+
+@dataclass
+class ExtractedFrame:
+    """One decoded frame."""
+    source: str
+    timestamp: float
+    image: np.ndarray  # H x W x 3, RGB uint8
+
+    def to_jpeg(self, quality: int = 85) -> bytes:
+        return encode_jpeg(self.image, quality)
+
+
+def encode_jpeg(image: np.ndarray, quality: int = 85) -> bytes:
+    """JPEG-encode an RGB array in memory."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def evenly_spaced(duration: float, num_frames: int) -> List[float]:
+    """Timestamps splitting the video into num_frames + 1 equal parts."""
+    return [duration * i / (num_frames + 1) for i in range(1, num_frames + 1)]
+
+
+def _have_av() -> bool:
+    try:
+        import av  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# ============================================================================
+# PyAV backend
+# ============================================================================
+
+def _to_array(frame, max_width: Optional[int]) -> np.ndarray:
+    if max_width and frame.width > max_width:
+        height = int(round(frame.height * max_width / frame.width / 2)) * 2
+        frame = frame.reformat(width=max_width, height=height)
+    return frame.to_ndarray(format="rgb24")
+
+
+def _av_duration(container, stream) -> float:
+    if stream.duration is not None and stream.time_base is not None:
+        return float(stream.duration * stream.time_base)
+    if container.duration is not None:
+        return container.duration / 1_000_000
+    return 0.0
+
+
+def _extract_av(
+    path: Path,
+    timestamps: Optional[Sequence[float]],
+    num_frames: int,
+    last: bool,
+    max_width: Optional[int],
+) -> List[ExtractedFrame]:
+    import av
+
+    frames: List[ExtractedFrame] = []
+    with av.open(str(path)) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+
+        if last:
+            # Partial movie files are short; decode through and keep the final frame
+            final = None
+            for frame in container.decode(stream):
+                final = frame
+            if final is not None:
+                frames.append(ExtractedFrame(str(path), float(final.time or 0.0), _to_array(final, max_width)))
+            return frames
+
+        if timestamps is None:
+            timestamps = evenly_spaced(_av_duration(container, stream), num_frames)
+
+        for target in sorted(timestamps):
+            container.seek(int(target / stream.time_base), stream=stream, backward=True, any_frame=False)
+            chosen = None
+            for frame in container.decode(stream):
+                chosen = frame
+                if frame.time is not None and frame.time >= target:
+                    break
+            if chosen is not None:
+                frames.append(ExtractedFrame(str(path), float(target), _to_array(chosen, max_width)))
+    return frames
+
+
+# ============================================================================
+# ffmpeg backend
+# ============================================================================
+
+def _probe_stream(path: Path) -> dict:
+    """Width, height, frame rate, frame count and duration in one ffprobe call."""
+    result = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=width,height,r_frame_rate,nb_frames,duration:format=duration",
+            "-of", "json", str(path),
+        ],
+        capture_output=True, text=True, check=True,
+    )
+    info = json.loads(result.stdout)
+    stream = info["streams"][0]
+    num, _, den = stream.get("r_frame_rate", "0/1").partition("/")
+    duration = stream.get("duration") or info.get("format", {}).get("duration") or 0
+    return {
+        "width": int(stream["width"]),
+        "height": int(stream["height"]),
+        "fps": float(num) / float(den or 1),
+        "frames": int(stream["nb_frames"]) if str(stream.get("nb_frames", "")).isdigit() else None,
+        "duration": float(duration),
+    }
+
+
+def _extract_ffmpeg(
+    path: Path,
+    timestamps: Optional[Sequence[float]],
+    num_frames: int,
+    last: bool,
+    max_width: Optional[int],
+) -> List[ExtractedFrame]:
+    info = _probe_stream(path)
+    fps = info["fps"] or 30.0
+    total = info["frames"] or max(1, int(info["duration"] * fps))
+
+    if last:
+        timestamps = [max(0.0, (total - 1) / fps)]
+    elif timestamps is None:
+        timestamps = evenly_spaced(info["duration"], num_frames)
+    timestamps = sorted(timestamps)
+    indices = sorted({min(total - 1, int(round(t * fps))) for t in timestamps})
+
+    width, height = info["width"], info["height"]
+    filters = ["select='" + "+".join(f"eq(n\\,{i})" for i in indices) + "'"]
+    if max_width and width > max_width:
+        height = int(round(height * max_width / width / 2)) * 2
+        width = max_width
+        filters.append(f"scale={width}:{height}")
+
+    result = subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-i", str(path),
+            "-vf", ",".join(filters), "-vsync", "0",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1",
+        ],
+        capture_output=True, check=True,
+    )
+    frame_size = width * height * 3
+    count = len(result.stdout) // frame_size
+    images = np.frombuffer(result.stdout[:count * frame_size], dtype=np.uint8).reshape(count, height, width, 3)
+    by_index = dict(zip(indices, images))
+
+    frames = []
+    for t in timestamps:
+        index = min(total - 1, int(round(t * fps)))
+        if index in by_index:
+            frames.append(ExtractedFrame(str(path), float(t), by_index[index]))
+    return frames
+
+
+# ============================================================================
+# Public API
+# ============================================================================
+
+def extract_frames(
+    video_path: PathLike,
+    timestamps: Optional[Sequence[float]] = None,
+    num_frames: int = 1,
+    max_width: Optional[int] = None,
+) -> List[ExtractedFrame]:
+    """
+    Decode frames at several timestamps in one pass over the video.
+
+    Args:
+        video_path: Video file
+        timestamps: Seconds to grab (default: num_frames evenly spaced)
+        num_frames: Number of frames when timestamps is not given
+        max_width: Downscale frames wider than this (keeps aspect ratio)
+
+    Returns:
+        Frames in timestamp order
+    """
+    path = Path(video_path)
+    if _have_av():
+        return _extract_av(path, timestamps, num_frames, False, max_width)
+    return _extract_ffmpeg(path, timestamps, num_frames, False, max_width)
+
+
+def extract_last_frame(video_path: PathLike, max_width: Optional[int] = None) -> Optional[ExtractedFrame]:
+    """Decode the final frame of a video (None if it has no frames)."""
+    path = Path(video_path)
+    backend = _extract_av if _have_av() else _extract_ffmpeg
+    frames = backend(path, None, 1, True, max_width)
+    return frames[0] if frames else None
+
+
+def extract_frames_from_videos(
+    video_files: Sequence[PathLike],
+    max_width: Optional[int] = None,
+) -> List[ExtractedFrame]:
+    """
+    Take the last frame of every video, e.g. each partial movie file.
+
+    With PyAV this opens each file in-process instead of launching ffmpeg
+    per file. Unreadable files are logged and skipped.
+
+    Args:
+        video_files: Videos in the order their frames should be returned
+        max_width: Downscale frames wider than this
+
+    Returns:
+        One frame per readable video
+    """
+    frames = []
+    for video in video_files:
+        try:
+            frame = extract_last_frame(video, max_width)
+        except Exception as e:
+            logger.warning(f"Could not extract a frame from {video}: {e}")
+            continue
+        if frame is not None:
+            frames.append(frame)
+    return frames
@@ -0,0 +1,367 @@
+"""
+Frame Prescreen
+
+Local, model-free layout check run on rendered frames before they are sent
+to the vision model.
+
+Most verification frames are clean, yet every one of them used to cost a
+multi-second multimodal LLM call. This module looks at the pixels directly:
+
+- The background colour is estimated from the frame border.
+- Foreground pixels are grouped into blocks (glyphs of one label merge
+  into one block) with binary dilation plus connected-component labelling.
+- Blocks touching the frame edge are flagged as cut off. Blocks inside the
+  safety margin, blocks mixing several colours, and blocks whose bounding
+  boxes intersect are marked uncertain, because coloured equations, braces
+  and labelled shapes legitimately look like that too.
+- Same-colour text drawn over other text merges into a single block, so
+  text-like blocks are also checked glyph by glyph: a line much taller
+  than its x-height, glyphs run together into wide blobs, glyph baselines
+  split into two rows, or heavier strokes than neighbouring text of the
+  same size all mark the frame uncertain.
+
+The checks err towards "uncertain"; a frame is only clean when none of
+them fires. Issues use the same {"frame", "type", "description"} shape as
+VisualLayoutAnalyzer.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+from scipy import ndimage
+
+# Frames are analysed at this width; enough for label-sized text
+WORK_WIDTH = 480
+
+# Sum of absolute RGB differences above which a pixel is foreground
+FOREGROUND_THRESHOLD = 60
+
+# Safety margin as a fraction of the frame size
+EDGE_MARGIN = 0.02
+
+# Dilation radius as a fraction of the frame height (joins glyphs into words/lines)
+JOIN_RADIUS = 0.012
+
+# Blocks smaller than this fraction of the frame are ignored as noise
+MIN_BLOCK_AREA = 0.0002
+
+# Blocks spanning this fraction of the frame are structure (axes, grids, backdrops)
+STRUCTURE_SPAN = 0.9
+
+# Share of a block's pixels a second colour needs before the block counts as mixed
+MIXED_COLOR_SHARE = 0.15
+
+# Bounding-box intersection (relative to the smaller box) that counts as a collision
+BOX_OVERLAP = 0.3
+
+# Blocks with at least this many glyphs get the text checks below
+MIN_TEXT_GLYPHS = 3
+
+# Ink row taller than this many x-heights is more than one line of text
+TALL_LINE_RATIO = 2.2
+
+# Glyph wider or taller than this many x-heights, or wider than this many
+# times its own height, is several glyphs run together
+MERGED_GLYPH_WIDTH = 2.5
+MERGED_GLYPH_HEIGHT = 1.8
+MERGED_GLYPH_ASPECT = 1.8
+
+# Share of glyphs on a second baseline before the rows count as interleaved
+BASELINE_SPLIT = 0.25
+
+# Stroke weight above this multiple of similar-sized text blocks' median
+INK_RATIO = 1.3
+
+FrameInput = Union[str, Path, Image.Image, np.ndarray]
+
+
+@dataclass
+class FrameReport:
+    """Prescreen verdict for one frame."""
+    frame: int
+    status: str  # "clean", "flagged" or "uncertain"
+    issues: List[Dict[str, Any]] = field(default_factory=list)
+    reasons: List[str] = field(default_factory=list)
+    metrics: Dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "frame": self.frame,
+            "status": self.status,
+            "issues": self.issues,
+            "reasons": self.reasons,
+            "metrics": self.metrics,
+        }
+
+
+def _read_rgb(frame: FrameInput) -> np.ndarray:
+    if isinstance(frame, np.ndarray):
+        return frame[..., :3]
+    image = frame if isinstance(frame, Image.Image) else Image.open(frame)
+    return np.asarray(image.convert("RGB"))
+
+
+def load_frame(frame: FrameInput) -> np.ndarray:
+    """Load a frame as an RGB uint8 array downscaled to WORK_WIDTH."""
+    array = _read_rgb(frame)
+    step = max(1, array.shape[1] // WORK_WIDTH)
+    return np.ascontiguousarray(array[::step, ::step]).astype(np.int16)
+
+
+def estimate_background(pixels: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Most common colour along the frame border.
+
+    Returns:
+        (background RGB, fraction of border pixels matching it)
+    """
+    border = np.concatenate([pixels[0], pixels[-1], pixels[:, 0], pixels[:, -1]])
+    codes = (border // 16) @ np.array([256, 16, 1])
+    mode = np.bincount(codes).argmax()
+    background = border[codes == mode].mean(axis=0)
+    matches = np.abs(border - background).sum(axis=1) <= FOREGROUND_THRESHOLD
+    return background, float(matches.mean())
+
+
+def _color_labels(pixels: np.ndarray, background: np.ndarray) -> np.ndarray:
+    """
+    Colour class of each pixel, invariant to anti-aliasing.
+
+    An anti-aliased edge pixel is the background blended with the fill, so
+    the direction of (pixel - background) does not depend on coverage.
+    """
+    delta = (pixels - background).astype(np.float32)
+    norm = np.linalg.norm(delta, axis=-1, keepdims=True)
+    direction = np.rint(delta / np.maximum(norm, 1e-6) * 3).astype(np.int16) + 3
+    return direction[..., 0] * 49 + direction[..., 1] * 7 + direction[..., 2]
+
+
+def _block_description(box: Tuple[int, int, int, int], height: int, width: int) -> str:
+    y0, y1, x0, x1 = box
+    cx = (x0 + x1) / 2 / width
+    cy = (y0 + y1) / 2 / height
+    horizontal = "left" if cx < 0.33 else "right" if cx > 0.67 else "center"
+    vertical = "top" if cy < 0.33 else "bottom" if cy > 0.67 else "middle"
+    return f"{vertical}-{horizontal} element ({x1 - x0}x{y1 - y0}px at working size)"
+
+
+def _mode(values: np.ndarray) -> int:
+    return int(np.bincount(values).argmax())
+
+
+def _inspect_text(mask: np.ndarray) -> Optional[Tuple[List[str], float, float]]:
+    """
+    Signs of overlapping text inside one block.
+
+    Each run of inked rows is treated as one line; a paragraph joined into
+    one block is checked line by line.
+
+    Args:
+        mask: Foreground pixels of the block's box at full resolution
+
+    Returns:
+        (reasons the block may hold overlapping text, x-height, stroke
+        weight), or None if the block has too few glyphs to be text
+    """
+    inked = np.concatenate([[0], mask.any(axis=1).astype(np.int8), [0]])
+    edges = np.flatnonzero(np.diff(inked))
+    lines = []
+    for top, bottom in zip(edges[0::2], edges[1::2]):
+        glyphs, _ = ndimage.label(mask[top:bottom], structure=np.ones((3, 3), bool))
+        boxes = ndimage.find_objects(glyphs)
+        lines.append((bottom - top, np.array([
+            (box[0].start, box[0].stop, box[1].stop - box[1].start) for box in boxes
+        ], dtype=float).reshape(-1, 3)))
+
+    # Dots, accents and punctuation say nothing about the line
+    every = np.concatenate([glyphs for _, glyphs in lines])
+    all_heights = every[:, 1] - every[:, 0]
+    keep_height = max(3.0, 0.3 * float(np.median(all_heights)))
+    if np.count_nonzero(all_heights >= keep_height) < MIN_TEXT_GLYPHS:
+        return None
+    x_height = float(np.percentile(all_heights[all_heights >= keep_height], 25))
+    reasons = []
+
+    # Overlapping lines fill the gap between them
+    tallest = max(line_height for line_height, _ in lines)
+    if tallest > TALL_LINE_RATIO * x_height:
+        reasons.append(f"text line is {tallest / x_height:.1f}x its x-height")
+
+    merged = 0
+    interleaved = False
+    for _, glyphs in lines:
+        tops, bottoms, widths = glyphs.T
+        heights = bottoms - tops
+        full = heights >= x_height
+        merged += int(np.count_nonzero(
+            full & (
+                (widths > MERGED_GLYPH_WIDTH * x_height)
+                | (heights > MERGED_GLYPH_HEIGHT * x_height)
+                | (widths > MERGED_GLYPH_ASPECT * heights)
+            )
+        ))
+
+        # Two clusters of glyph bottoms are either descenders or a second baseline;
+        # descenders share the x-height line with the other lowercase glyphs
+        order = np.argsort(bottoms[full])
+        ends, starts = bottoms[full][order].astype(int), tops[full][order].astype(int)
+        if ends.size >= 2 * MIN_TEXT_GLYPHS:
+            split = int(np.diff(ends).argmax()) + 1
+            share = min(split, ends.size - split) / ends.size
+            shift = abs(_mode(starts[split:]) - _mode(starts[:split]))
+            gap = ends[split] - ends[split - 1]
+            interleaved |= gap >= 0.25 * x_height and share >= BASELINE_SPLIT and shift >= 0.25 * x_height
+    if merged:
+        reasons.append(f"{merged} glyph(s) run together")
+    if interleaved:
+        reasons.append("glyph baselines are interleaved")
+
+    # Share of ink that survives an erosion; text drawn twice has thicker strokes
+    weight = float(ndimage.binary_erosion(mask, structure=np.ones((2, 2), bool)).sum()) / max(1, int(mask.sum()))
+    return reasons, x_height, weight
+
+
+def prescreen_frame(frame: FrameInput, index: int = 0) -> FrameReport:
+    """
+    Check one frame for cut-off content and likely overlaps.
+
+    Args:
+        frame: Image path, PIL image or RGB array
+        index: Frame index used in the reported issues
+
+    Returns:
+        FrameReport with status "clean", "flagged" or "uncertain"
+    """
+    # Blocks are found at working size; glyphs are inspected at full size
+    source = _read_rgb(frame)
+    step = max(1, source.shape[1] // WORK_WIDTH)
+    pixels = load_frame(source)
+    height, width = pixels.shape[:2]
+    report = FrameReport(frame=index, status="clean")
+
+    background, border_match = estimate_background(pixels)
+    distance = np.abs(pixels - background).sum(axis=-1)
+    foreground = distance > FOREGROUND_THRESHOLD
+    coverage = float(foreground.mean())
+    report.metrics = {"border_match": round(border_match, 3), "coverage": round(coverage, 3)}
+
+    if border_match < 0.9:
+        report.reasons.append("background is not uniform along the border")
+    if coverage > 0.35:
+        report.reasons.append("frame is too busy to judge locally")
+    if not foreground.any():
+        return _finish(report)
+
+    radius = max(1, int(round(height * JOIN_RADIUS)))
+    joined = ndimage.binary_dilation(foreground, structure=np.ones((2 * radius + 1, 2 * radius + 1), bool))
+    labels, _ = ndimage.label(joined)
+    colors = _color_labels(pixels, background)
+    # Judge colours on stroke centres only; anti-aliased and compression-smeared
+    # edges next to a brighter neighbour drift in hue
+    solid_pixels = distance >= 0.6 * ndimage.maximum_filter(distance, size=3)
+
+    margin_x = max(1, int(width * EDGE_MARGIN))
+    margin_y = max(1, int(height * EDGE_MARGIN))
+    min_area = MIN_BLOCK_AREA * height * width
+
+    blocks = []
+    text_blocks = []
+    for label, region in enumerate(ndimage.find_objects(labels), start=1):
+        if region is None:
+            continue
+        mask = (labels[region] == label) & foreground[region]
+        area = int(mask.sum())
+        if area < min_area:
+            continue
+
+        # Tight box around the real pixels, not the dilated halo
+        rows = np.flatnonzero(mask.any(axis=1)) + region[0].start
+        cols = np.flatnonzero(mask.any(axis=0)) + region[1].start
+        box = (int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1)
+        y0, y1, x0, x1 = box
+        if (x1 - x0) >= STRUCTURE_SPAN * width or (y1 - y0) >= STRUCTURE_SPAN * height:
+            continue
+        blocks.append(box)
+        where = _block_description(box, height, width)
+
+        if y0 == 0 or x0 == 0 or y1 == height or x1 == width:
+            sides = [name for name, hit in (
+                ("top", y0 == 0), ("bottom", y1 == height), ("left", x0 == 0), ("right", x1 == width)
+            ) if hit]
+            report.issues.append({
+                "frame": index,
+                "type": "cutoff",
+                "description": f"{where.capitalize()} is cut off at the {'/'.join(sides)} edge of the frame",
+                "source": "prescreen",
+            })
+        elif y0 < margin_y or x0 < margin_x or y1 > height - margin_y or x1 > width - margin_x:
+            report.reasons.append(f"{where} is inside the edge safety margin")
+
+        solid = colors[region][mask & solid_pixels[region]]
+        shares = np.bincount(solid) / max(1, solid.size)
+        if np.count_nonzero(shares >= MIXED_COLOR_SHARE) > 1 and (y1 - y0) < 0.2 * height:
+            report.reasons.append(f"{where} mixes several colours (possible overlapping text)")
+
+        crop = source[y0 * step:y1 * step, x0 * step:x1 * step].astype(np.int16)
+        text = _inspect_text(np.abs(crop - background).sum(axis=-1) > FOREGROUND_THRESHOLD)
+        if text is None:
+            continue
+        text_reasons, x_height, weight = text
+        if text_reasons:
+            report.reasons.append(f"{where}: {'; '.join(text_reasons)} (possible overlapping text)")
+        text_blocks.append((box, x_height, weight))
+
+    # Text drawn over text has heavier strokes than labels of the same size
+    for box, x_height, weight in text_blocks:
+        similar = [w for b, x, w in text_blocks if b != box and abs(x - x_height) <= 0.25 * x_height]
+        if len(similar) < 2:
+            continue
+        typical = float(np.median(similar))
+        if weight > INK_RATIO * typical and weight - typical >= 0.1:
+            report.reasons.append(
+                f"{_block_description(box, height, width)} has heavier strokes than the "
+                "text around it (possible overlapping text)"
+            )
+
+    for i, a in enumerate(blocks):
+        for b in blocks[i + 1:]:
+            overlap_h = min(a[1], b[1]) - max(a[0], b[0])
+            overlap_w = min(a[3], b[3]) - max(a[2], b[2])
+            if overlap_h <= 0 or overlap_w <= 0:
+                continue
+            smaller = min((a[1] - a[0]) * (a[3] - a[2]), (b[1] - b[0]) * (b[3] - b[2]))
+            if overlap_h * overlap_w >= BOX_OVERLAP * smaller:
+                report.reasons.append(
+                    f"{_block_description(a, height, width)} and "
+                    f"{_block_description(b, height, width)} have intersecting bounds"
+                )
+
+    report.metrics["blocks"] = len(blocks)
+    return _finish(report)
+
+
+def _finish(report: FrameReport) -> FrameReport:
+    if report.issues:
+        report.status = "flagged"
+    elif report.reasons:
+        report.status = "uncertain"
+    return report
+
+
+def prescreen_frames(frames: List[FrameInput]) -> List[FrameReport]:
+    """
+    Prescreen a list of frames.
+
+    Frames that cannot be read are reported as uncertain so they still
+    reach the vision model.
+    """
+    reports = []
+    for index, frame in enumerate(frames):
+        try:
+            reports.append(prescreen_frame(frame, index))
+        except Exception as e:
+            reports.append(FrameReport(frame=index, status="uncertain", reasons=[f"prescreen failed: {e}"]))
+    return reports
@@ -0,0 +1,149 @@
+"""
+Job Checkpoints
+
+Lets a job that was interrupted (the API process restarted, a queue
+worker died) resume from its last completed stage instead of starting
+over.
+
+Each pipeline stage that produces something expensive records a
+checkpoint in the job under "checkpoint". A checkpoint holds the stage
+name, the code file it applies to, a SHA-256 of that code, and any
+stage state, e.g. how many verification passes were already done.
+Resuming does not repeat those stages:
+
+- code_generated: the LLM's code is on disk, so no new model call.
+- layout_checked: the layout probe and its fixes are done.
+- verifying: fix passes up to verify_attempt are applied.
+- verified: verification is done; only the final render is left.
+- rendered: the final video exists; only the completion is recorded.
+
+Render artifacts need no bookkeeping of their own. Partial movie files,
+cached sections, Tex SVGs and voiceover audio are cached by content, so
+re-running a render for the same code reuses them.
+
+Code files are written atomically. A crash mid-write therefore never
+leaves truncated code behind. Stages rewrite the code (layout and
+verification fixes) before recording their checkpoint, so a crash in
+between leaves complete code that no longer matches the checkpoint hash;
+such a job resumes from code_generated with the code on disk, redoing the
+checks on it but not the model call.
+"""
+
+import hashlib
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("code_generated", "layout_checked", "verifying", "verified", "rendered")
+
+
+def write_code(code_file: Path, code: str):
+    """Write a file atomically (temp file, fsync, rename)."""
+    code_file = Path(code_file)
+    tmp = code_file.with_name(f".{code_file.name}.tmp")
+    with open(tmp, "w") as f:
+        f.write(code)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, code_file)
+
+
+def _digest(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def make_checkpoint(stage: str, code_file: Path, code: str, **state: Any) -> Dict[str, Any]:
+    """
+    Build the checkpoint record for a completed stage.
+
+    Args:
+        stage: One of STAGES
+        code_file: Code the stage's outputs belong to
+        code: Its contents (hashed to detect later edits)
+        **state: Stage state to restore (e.g. verify_attempt, video_path)
+
+    Returns:
+        Dict to store as job["checkpoint"]
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Unknown checkpoint stage: {stage}")
+    return {
+        "stage": stage,
+        "code_path": str(code_file),
+        "code_sha256": _digest(code),
+        "at": datetime.now().isoformat(),
+        **state,
+    }
+
+
+def reached(checkpoint: Optional[Dict[str, Any]], stage: str) -> bool:
+    """Whether the checkpoint is at or past the given stage."""
+    return checkpoint is not None and STAGES.index(checkpoint["stage"]) >= STAGES.index(stage)
+
+
+def resume_point(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The checkpoint an interrupted job can resume from, with its code loaded.
+
+    Jobs from before checkpoints were recorded resume from their code
+    file if one was saved. If the code changed after the checkpoint was
+    recorded (a fix was written, then the process died), the later stages
+    no longer apply to it and the job resumes from code_generated.
+
+    Args:
+        job: Job record
+
+    Returns:
+        The checkpoint plus "code", or None to start from scratch
+    """
+    checkpoint = job.get("checkpoint")
+    if checkpoint is None and job.get("code_path"):
+        checkpoint = {"stage": "code_generated", "code_path": job["code_path"]}
+    if not checkpoint or checkpoint.get("stage") not in STAGES:
+        return None
+
+    code_file = Path(checkpoint["code_path"])
+    try:
+        code = code_file.read_text()
+    except OSError:
+        logger.warning(f"Checkpoint code {code_file} is gone; starting job {job['job_id'][:8]}... over")
+        return None
+    digest = _digest(code)
+    if checkpoint.get("code_sha256") not in (None, digest):
+        logger.warning(
+            f"{code_file} changed since its {checkpoint['stage']} checkpoint; "
+            f"resuming job {job['job_id'][:8]}... from the code on disk"
+        )
+        checkpoint = {
+            "stage": "code_generated",
+            "code_path": str(code_file),
+            "code_sha256": digest,
+            "regeneration": checkpoint.get("regeneration", 0),
+        }
+
+    checkpoint = dict(checkpoint, code=code)
+    if checkpoint["stage"] == "rendered" and not Path(checkpoint.get("video_path", "")).is_file():
+        checkpoint["stage"] = "verified"
+    return checkpoint
+
+
+def interrupted_jobs(job_manager, statuses: Iterable[str], limit: int = 10000) -> List[Dict[str, Any]]:
+    """
+    Jobs left in a running state, oldest first.
+
+    Args:
+        job_manager: The server's JobManager
+        statuses: Statuses that mean "in progress" (including pending)
+        limit: Max jobs per status
+
+    Returns:
+        Job records
+    """
+    jobs = []
+    for status in statuses:
+        jobs.extend(job_manager.list_jobs(limit=limit, status=status))
+    return sorted(jobs, key=lambda job: job["created_at"])
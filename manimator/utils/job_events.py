@@ -0,0 +1,374 @@
+"""
+Job Events
+
+In-process publish/subscribe for job updates, behind the push endpoints
+(Server-Sent Events and WebSocket) that replace status polling.
+
+JobManager.update_job publishes every job record it writes. Subscribers
+follow a single job or all jobs. Each event is a full snapshot of the
+job, so a subscriber only ever needs the latest record per job:
+
+- Backpressure: a subscriber that falls behind keeps one pending record
+  per job and overwrites it with newer ones. A slow client therefore
+  skips intermediate progress but never misses the final state.
+- A subscriber to all jobs that has more than EVENTS_QUEUE_SIZE distinct
+  jobs pending is dropped with a "lagged" event. It can reconnect and
+  fetch the current state.
+- Open streams are capped at EVENTS_MAX_SUBSCRIBERS per process.
+
+Publishing is cheap when nobody listens, and it is safe from worker
+threads: events are handed to the event loop the subscribers live on.
+
+When jobs run in separate queue workers (JOB_QUEUE), their updates land
+in the shared job store instead. relay_store_updates then follows the
+store's updated_at index and publishes them in the API process.
+
+Environment Variables:
+    EVENTS_QUEUE_SIZE: Jobs a subscriber may have pending before it is dropped (default: 64)
+    EVENTS_MAX_SUBSCRIBERS: Open event streams per process (default: 1000)
+"""
+
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Collection, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Status published when a job record is deleted
+DELETED = "deleted"
+
+
+class TooManySubscribersError(Exception):
+    """Raised when the process already has the maximum number of open streams."""
+
+
+class SubscriberLagged(Exception):
+    """Raised to a subscriber that was dropped for falling too far behind."""
+
+
+class Subscription:
+    """
+    One open event stream.
+
+    Example:
+        >>> with broker.subscribe(job_id) as subscription:
+        ...     job = await subscription.next(timeout=15)
+    """
+
+    def __init__(self, broker: "JobEventBroker", job_id: Optional[str], limit: int):
+        self.broker = broker
+        self.job_id = job_id
+        self.limit = limit
+        self.delivered = 0
+        self.coalesced = 0
+        self.lagged = False
+        self.closed = False
+        self._pending: Dict[str, Dict] = {}
+        self._ready = asyncio.Event()
+
+    def _offer(self, job: Dict):
+        """Queue a record, replacing any undelivered one for the same job."""
+        if self.closed:
+            return
+        key = job["job_id"]
+        if self._pending.pop(key, None) is not None:
+            self.coalesced += 1
+        self._pending[key] = job
+        if len(self._pending) > self.limit:
+            self.lagged = True
+            self._pending.clear()
+            self.broker._drop(self)
+        self._ready.set()
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        Wait for the next job record.
+
+        Args:
+            timeout: Seconds to wait (None waits forever)
+
+        Returns:
+            The oldest pending record, or None if the timeout expired
+
+        Raises:
+            SubscriberLagged: If the subscriber was dropped for falling behind
+        """
+        while not self._pending:
+            if self.lagged:
+                raise SubscriberLagged(f"more than {self.limit} jobs pending")
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        key = next(iter(self._pending))
+        self.delivered += 1
+        return self._pending.pop(key)
+
+    def close(self):
+        """Stop receiving events."""
+        if not self.closed:
+            self.closed = True
+            self.broker._drop(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JobEventBroker:
+    """
+    Fans job records out to subscribers.
+
+    Example:
+        >>> broker = get_event_broker()
+        >>> broker.publish(job)          # from JobManager.update_job
+        >>> subscription = broker.subscribe(job_id)
+    """
+
+    def __init__(self, queue_size: int = 64, max_subscribers: int = 1000):
+        """
+        Initialize the broker.
+
+        Args:
+            queue_size: Jobs a subscriber may have pending before it is dropped
+            max_subscribers: Open subscriptions allowed
+        """
+        self.queue_size = max(1, queue_size)
+        self.max_subscribers = max(1, max_subscribers)
+        self._by_job: Dict[str, Set[Subscription]] = {}
+        self._all: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._count = 0
+        self._published = 0
+        self._lagged = 0
+
+    def subscribe(self, job_id: Optional[str] = None) -> Subscription:
+        """
+        Open a subscription; must be called from inside the running event loop.
+
+        Args:
+            job_id: Job to follow, or None for all jobs
+
+        Returns:
+            The subscription (close it when the stream ends)
+
+        Raises:
+            TooManySubscribersError: If max_subscribers are already open
+        """
+        if self._count >= self.max_subscribers:
+            raise TooManySubscribersError(f"{self._count} event streams already open")
+        self._loop = asyncio.get_running_loop()
+        # A single job only ever has one pending record
+        subscription = Subscription(self, job_id, self.queue_size if job_id is None else 1)
+        if job_id is None:
+            self._all.add(subscription)
+        else:
+            self._by_job.setdefault(job_id, set()).add(subscription)
+        self._count += 1
+        return subscription
+
+    def publish(self, job: Dict):
+        """
+        Deliver a job record to its subscribers. Safe to call from any thread.
+
+        Args:
+            job: Full job record (must contain job_id)
+        """
+        if not self._count or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._dispatch(job)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._dispatch, job)
+
+    def publish_deleted(self, job_id: str):
+        """Tell subscribers that a job record no longer exists."""
+        self.publish({"job_id": job_id, "status": DELETED})
+
+    def _dispatch(self, job: Dict):
+        self._published += 1
+        for subscription in list(self._by_job.get(job["job_id"], ())) + list(self._all):
+            subscription._offer(job)
+
+    def _drop(self, subscription: Subscription):
+        if subscription.lagged and not subscription.closed:
+            self._lagged += 1
+            logger.warning(f"Dropped an event subscriber with {subscription.limit}+ jobs pending")
+        if subscription.job_id is None:
+            found = subscription in self._all
+            self._all.discard(subscription)
+        else:
+            subscribers = self._by_job.get(subscription.job_id, set())
+            found = subscription in subscribers
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._by_job.pop(subscription.job_id, None)
+        if found:
+            self._count -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for /health."""
+        return {
+            "subscribers": self._count,
+            "all_jobs_subscribers": len(self._all),
+            "jobs_followed": len(self._by_job),
+            "published": self._published,
+            "lagged": self._lagged,
+        }
+
+
+# ============================================================================
+# Stream adapters
+# ============================================================================
+
+def format_sse(data: Any, event: Optional[str] = None) -> str:
+    """Encode one Server-Sent Event."""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in json.dumps(data).splitlines())
+    return "\n".join(lines) + "\n\n"
+
+
+async def _events(
+    subscription: Subscription,
+    initial: Iterable[Dict],
+    payload: Callable[[Dict], Awaitable[Dict]],
+    terminal: Collection[str],
+    keepalive: float,
+) -> AsyncIterator[tuple]:
+    """
+    (event name, data) pairs for a subscription, None data for keep-alives.
+
+    A single-job stream ends after the job reaches a terminal status or
+    is deleted.
+    """
+    single = subscription.job_id is not None
+    pending = list(initial)
+    while True:
+        if pending:
+            job = pending.pop(0)
+        else:
+            try:
+                job = await subscription.next(keepalive)
+            except SubscriberLagged as e:
+                yield "lagged", {"detail": str(e)}
+                return
+            if job is None:
+                yield "keepalive", None
+                continue
+        if job["status"] == DELETED:
+            yield DELETED, {"job_id": job["job_id"]}
+        else:
+            yield "status", await payload(job)
+        if single and (job["status"] == DELETED or job["status"] in terminal):
+            return
+
+
+async def sse_stream(
+    subscription: Subscription,
+    initial: Iterable[Dict],
+    payload: Callable[[Dict], Awaitable[Dict]],
+    terminal: Collection[str],
+    keepalive: float,
+) -> AsyncIterator[str]:
+    """
+    Server-Sent Events body for a subscription; closes it when done.
+
+    Args:
+        subscription: Open subscription
+        initial: Records to send first (e.g. the job's current state)
+        payload: Turns a job record into the event's data
+        terminal: Statuses that end a single-job stream
+        keepalive: Seconds of silence before a keep-alive comment
+
+    Yields:
+        Encoded events
+    """
+    try:
+        yield "retry: 3000\n\n"
+        async for event, data in _events(subscription, initial, payload, terminal, keepalive):
+            yield ": keep-alive\n\n" if data is None else format_sse(data, event)
+    finally:
+        subscription.close()
+
+
+async def websocket_stream(
+    websocket,
+    subscription: Subscription,
+    initial: Iterable[Dict],
+    payload: Callable[[Dict], Awaitable[Dict]],
+    terminal: Collection[str],
+    keepalive: float,
+):
+    """
+    Send a subscription's events as JSON messages ({"event", "data"}) until
+    it ends or the client disconnects, then close both.
+
+    Args:
+        websocket: Accepted FastAPI WebSocket
+        subscription: Open subscription
+        initial: Records to send first
+        payload: Turns a job record into the event's data
+        terminal: Statuses that end a single-job stream
+        keepalive: Seconds of silence before a keep-alive message
+    """
+    try:
+        async for event, data in _events(subscription, initial, payload, terminal, keepalive):
+            await websocket.send_json({"event": event, "data": data})
+        await websocket.close()
+    except Exception as e:
+        # Client went away mid-send
+        logger.debug(f"Event WebSocket closed: {e}")
+    finally:
+        subscription.close()
+
+
+async def relay_store_updates(store, broker: JobEventBroker, interval: float = 1.0):
+    """
+    Publish job records that other processes wrote to the shared store.
+
+    Runs until cancelled. The store is only queried while someone is
+    subscribed.
+
+    Args:
+        store: JobStore shared with the queue workers
+        broker: Broker to publish to
+        interval: Seconds between store queries
+    """
+    cursor = datetime.now().isoformat()
+    while True:
+        await asyncio.sleep(interval)
+        if not broker.stats()["subscribers"]:
+            cursor = datetime.now().isoformat()
+            continue
+        try:
+            jobs = await asyncio.to_thread(store.updated_since, cursor)
+        except Exception as e:
+            logger.warning(f"Job event relay query failed: {e}")
+            continue
+        for job in jobs:
+            broker.publish(job)
+            cursor = max(cursor, job["updated_at"])
+
+
+_broker: Optional[JobEventBroker] = None
+
+
+def get_event_broker() -> JobEventBroker:
+    """Get the process-wide broker configured from the environment."""
+    global _broker
+    if _broker is None:
+        _broker = JobEventBroker(
+            queue_size=int(os.getenv("EVENTS_QUEUE_SIZE", "64")),
+            max_subscribers=int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "1000")),
+        )
+    return _broker
@@ -0,0 +1,596 @@
+"""
+Job Queue
+
+Durable work queue between the API servers and separate render workers
+(see queue_worker.py).
+
+With JOB_QUEUE=local (the default) nothing changes: each API server runs
+its own jobs in-process. With a shared queue, the API tier only records
+and enqueues jobs. Any number of `python queue_worker.py` processes claim
+and run them with the same VideoGenerator pipelines. Job records stay in
+the shared SQLite job store; the queue only decides who runs what.
+
+Delivery is at least once:
+
+- A claim gives the worker a lease: a random token that is valid for
+  JOB_LEASE_SECONDS. The worker renews it with heartbeats while the job
+  runs.
+- A lease that is not renewed in time (the worker crashed, was killed or
+  lost the network) expires. The job goes back to the queue for another
+  worker. A worker whose heartbeat is refused stops working on the job,
+  since someone else may already have it.
+- After JOB_MAX_ATTEMPTS expired leases the job is given up on ("dead"),
+  so a job that kills its worker cannot take down the whole fleet.
+
+Backends:
+- SQLiteJobQueue: one WAL-mode database shared by every process on the
+  host (or on a filesystem with working locks). Each claim is a single
+  IMMEDIATE transaction.
+- RedisJobQueue: Redis or any server speaking its protocol (requires the
+  `redis` package). Claims and lease expiry run as Lua scripts.
+
+Environment Variables:
+    JOB_QUEUE: "local" (in-process, default), "sqlite" or "redis"
+    JOB_QUEUE_DB: SQLite queue database (default: <jobs dir>/queue.db)
+    JOB_QUEUE_URL: Redis URL (default: redis://localhost:6379/0)
+    JOB_LEASE_SECONDS: Seconds a claim stays valid without a heartbeat (default: 60)
+    JOB_MAX_ATTEMPTS: Expired leases before a job is given up on (default: 3)
+
+Usage:
+    python -m manimator.utils.job_queue stats jobs/queue.db
+"""
+
+import json
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class Lease:
+    """A claimed job; token proves ownership for heartbeats and completion."""
+    job_id: str
+    queue: str
+    token: str
+    worker: str
+    attempt: int
+    expires: float
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Expired:
+    """A job whose lease ran out: re-queued, or dead after too many attempts."""
+    job_id: str
+    queue: str
+    worker: str
+    attempts: int
+    dead: bool
+
+
+def worker_name() -> str:
+    """Default worker id: host, pid and a short random suffix."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+
+
+class JobQueue:
+    """Interface shared by all queue backends."""
+
+    def __init__(self, lease_seconds: float = 60, max_attempts: int = 3):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+
+    def enqueue(self, job_id: str, queue: str, priority: int = 0, payload: Optional[Dict] = None) -> int:
+        """Queue a job (replacing any queued entry with the same id). Returns its 1-based position."""
+        raise NotImplementedError
+
+    def claim(self, queue: str, worker: str) -> Optional[Lease]:
+        """Lease the highest-priority waiting job, or return None if there is none."""
+        raise NotImplementedError
+
+    def heartbeat(self, lease: Lease) -> bool:
+        """Extend a lease. Returns False if the lease was lost (expired and re-delivered)."""
+        raise NotImplementedError
+
+    def complete(self, lease: Lease) -> bool:
+        """Remove a finished job. Returns False if the lease was lost."""
+        raise NotImplementedError
+
+    def release(self, lease: Lease) -> bool:
+        """Put a claimed job back at the front of the queue (e.g. on worker shutdown)."""
+        raise NotImplementedError
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a job that has not been claimed yet. Returns True if it was waiting."""
+        raise NotImplementedError
+
+    def expire(self) -> List[Expired]:
+        """Re-queue (or give up on) jobs whose lease ran out."""
+        raise NotImplementedError
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position of a waiting job, or None if it is not waiting."""
+        raise NotImplementedError
+
+    def register_worker(self, worker: str, queue: str, capacity: int, running: int) -> None:
+        """Record a worker heartbeat, for stats and Retry-After estimates."""
+        raise NotImplementedError
+
+    def unregister_worker(self, worker: str) -> None:
+        """Forget a worker that shut down cleanly."""
+        raise NotImplementedError
+
+    def stats(self, queue: Optional[str] = None) -> Dict[str, Any]:
+        """Waiting and leased jobs, and live workers, for /health."""
+        raise NotImplementedError
+
+    def retry_after(self, queue: str, job_seconds: float = 300) -> int:
+        """Estimated seconds until a new job would be claimed, from the live worker capacity."""
+        stats = self.stats(queue)
+        waves = (stats["queued"] + 1) / max(1, stats["worker_capacity"])
+        return int(min(3600, max(1, math.ceil(job_seconds * waves))))
+
+
+# ============================================================================
+# SQLite
+# ============================================================================
+
+class SQLiteJobQueue(JobQueue):
+    """
+    SQLite (WAL) queue shared by processes on one host.
+
+    Finished and dead jobs are deleted, so the table only ever holds
+    waiting and running work.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS queue (
+        job_id TEXT PRIMARY KEY,
+        queue TEXT NOT NULL,
+        priority INTEGER NOT NULL DEFAULT 0,
+        seq INTEGER NOT NULL,
+        state TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker TEXT,
+        token TEXT,
+        lease_expires REAL,
+        payload TEXT NOT NULL DEFAULT '{}'
+    );
+    CREATE INDEX IF NOT EXISTS idx_queue_ready ON queue(queue, state, priority DESC, seq);
+    CREATE INDEX IF NOT EXISTS idx_queue_leases ON queue(state, lease_expires);
+
+    CREATE TABLE IF NOT EXISTS workers (
+        worker TEXT PRIMARY KEY,
+        queue TEXT NOT NULL,
+        capacity INTEGER NOT NULL,
+        running INTEGER NOT NULL,
+        last_seen REAL NOT NULL
+    );
+    """
+
+    def __init__(self, db_path: Path, lease_seconds: float = 60, max_attempts: int = 3):
+        """
+        Open (and create if needed) the queue database.
+
+        Args:
+            db_path: Path to the SQLite database file
+            lease_seconds: Seconds a claim stays valid without a heartbeat
+            max_attempts: Expired leases before a job is given up on
+        """
+        super().__init__(lease_seconds, max_attempts)
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=30,
+            check_same_thread=False,
+            isolation_level=None,  # autocommit; explicit BEGIN IMMEDIATE for claims
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def _transaction(self, work):
+        """Run work(conn) inside one write transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, job_id: str, queue: str, priority: int = 0, payload: Optional[Dict] = None) -> int:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO queue (job_id, queue, priority, seq, state, payload) "
+                "VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, queue, priority, time.time_ns(), json.dumps(payload or {})),
+            )
+        return self.position(job_id) or 1
+
+    def claim(self, queue: str, worker: str) -> Optional[Lease]:
+        def work(conn):
+            row = conn.execute(
+                "SELECT job_id, attempts, payload FROM queue WHERE queue = ? AND state = 'queued' "
+                "ORDER BY priority DESC, seq LIMIT 1",
+                (queue,),
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, attempts, payload = row
+            token = uuid.uuid4().hex
+            expires = time.time() + self.lease_seconds
+            conn.execute(
+                "UPDATE queue SET state = 'leased', worker = ?, token = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE job_id = ?",
+                (worker, token, expires, job_id),
+            )
+            return Lease(job_id, queue, token, worker, attempts + 1, expires, json.loads(payload))
+
+        return self._transaction(work)
+
+    def heartbeat(self, lease: Lease) -> bool:
+        expires = time.time() + self.lease_seconds
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE queue SET lease_expires = ? WHERE job_id = ? AND token = ? AND state = 'leased'",
+                (expires, lease.job_id, lease.token),
+            )
+        if cursor.rowcount:
+            lease.expires = expires
+        return cursor.rowcount > 0
+
+    def complete(self, lease: Lease) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM queue WHERE job_id = ? AND token = ?", (lease.job_id, lease.token)
+            )
+        return cursor.rowcount > 0
+
+    def release(self, lease: Lease) -> bool:
+        # seq 0 puts it ahead of everything with the same priority; the attempt is not counted
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE queue SET state = 'queued', worker = NULL, token = NULL, lease_expires = NULL, "
+                "seq = 0, attempts = MAX(0, attempts - 1) WHERE job_id = ? AND token = ?",
+                (lease.job_id, lease.token),
+            )
+        return cursor.rowcount > 0
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM queue WHERE job_id = ? AND state = 'queued'", (job_id,)
+            )
+        return cursor.rowcount > 0
+
+    def expire(self) -> List[Expired]:
+        def work(conn):
+            rows = conn.execute(
+                "SELECT job_id, queue, worker, attempts FROM queue "
+                "WHERE state = 'leased' AND lease_expires < ?",
+                (time.time(),),
+            ).fetchall()
+            expired = []
+            for job_id, queue, worker, attempts in rows:
+                dead = attempts >= self.max_attempts
+                if dead:
+                    conn.execute("DELETE FROM queue WHERE job_id = ?", (job_id,))
+                else:
+                    conn.execute(
+                        "UPDATE queue SET state = 'queued', worker = NULL, token = NULL, "
+                        "lease_expires = NULL WHERE job_id = ?",
+                        (job_id,),
+                    )
+                expired.append(Expired(job_id, queue, worker or "", attempts, dead))
+            return expired
+
+        # Cheap check first so idle workers do not take the write lock every poll
+        with self._lock:
+            due = self._conn.execute(
+                "SELECT 1 FROM queue WHERE state = 'leased' AND lease_expires < ? LIMIT 1",
+                (time.time(),),
+            ).fetchone()
+        return self._transaction(work) if due else []
+
+    def position(self, job_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT queue, priority, seq FROM queue WHERE job_id = ? AND state = 'queued'",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            queue, priority, seq = row
+            ahead = self._conn.execute(
+                "SELECT COUNT(*) FROM queue WHERE queue = ? AND state = 'queued' "
+                "AND (priority > ? OR (priority = ? AND seq < ?))",
+                (queue, priority, priority, seq),
+            ).fetchone()[0]
+        return ahead + 1
+
+    def register_worker(self, worker: str, queue: str, capacity: int, running: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO workers (worker, queue, capacity, running, last_seen) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (worker, queue, capacity, running, time.time()),
+            )
+
+    def unregister_worker(self, worker: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM workers WHERE worker = ?", (worker,))
+
+    def stats(self, queue: Optional[str] = None) -> Dict[str, Any]:
+        where, params = ("WHERE queue = ?", (queue,)) if queue else ("", ())
+        alive_after = time.time() - 2 * self.lease_seconds
+        with self._lock:
+            states = dict(self._conn.execute(
+                f"SELECT state, COUNT(*) FROM queue {where} GROUP BY state", params
+            ).fetchall())
+            workers = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(capacity), 0), COALESCE(SUM(running), 0) FROM workers "
+                f"{where + ' AND' if where else 'WHERE'} last_seen > ?",
+                (*params, alive_after),
+            ).fetchone()
+        return {
+            "backend": "sqlite",
+            "queued": states.get("queued", 0),
+            "leased": states.get("leased", 0),
+            "workers": workers[0],
+            "worker_capacity": workers[1],
+            "worker_running": workers[2],
+        }
+
+
+# ============================================================================
+# Redis
+# ============================================================================
+
+class RedisJobQueue(JobQueue):
+    """
+    Queue on Redis (or a compatible server).
+
+    Keys, under a prefix:
+    - <queue>:ready: sorted set of waiting job ids, scored by priority then age
+    - leases: sorted set of leased job ids, scored by lease expiry
+    - job:<id>: hash with queue, score, attempts, worker, token, payload
+    - workers: hash of worker id -> JSON heartbeat
+    """
+
+    # Waiting jobs are ordered by -priority, then enqueue time
+    _PRIORITY_SCALE = 1e13
+
+    CLAIM = """
+    local ids = redis.call('ZRANGE', KEYS[1], 0, 0)
+    if #ids == 0 then return nil end
+    local id = ids[1]
+    local key = ARGV[4] .. 'job:' .. id
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('ZADD', KEYS[2], ARGV[3], id)
+    local attempts = redis.call('HINCRBY', key, 'attempts', 1)
+    redis.call('HSET', key, 'worker', ARGV[1], 'token', ARGV[2], 'expires', ARGV[3])
+    return {id, attempts, redis.call('HGET', key, 'payload')}
+    """
+
+    HEARTBEAT = """
+    if redis.call('HGET', KEYS[1], 'token') ~= ARGV[1] then return 0 end
+    if not redis.call('ZSCORE', KEYS[2], ARGV[3]) then return 0 end
+    redis.call('ZADD', KEYS[2], ARGV[2], ARGV[3])
+    redis.call('HSET', KEYS[1], 'expires', ARGV[2])
+    return 1
+    """
+
+    COMPLETE = """
+    if redis.call('HGET', KEYS[1], 'token') ~= ARGV[1] then return 0 end
+    redis.call('ZREM', KEYS[2], ARGV[2])
+    redis.call('DEL', KEYS[1])
+    return 1
+    """
+
+    RELEASE = """
+    if redis.call('HGET', KEYS[1], 'token') ~= ARGV[1] then return 0 end
+    redis.call('ZREM', KEYS[2], ARGV[2])
+    redis.call('HINCRBY', KEYS[1], 'attempts', -1)
+    redis.call('HDEL', KEYS[1], 'worker', 'token', 'expires')
+    redis.call('ZADD', KEYS[3], ARGV[3], ARGV[2])
+    return 1
+    """
+
+    EXPIRE = """
+    local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+    local out = {}
+    for _, id in ipairs(ids) do
+        local key = ARGV[3] .. 'job:' .. id
+        local fields = redis.call('HMGET', key, 'queue', 'worker', 'attempts', 'score')
+        redis.call('ZREM', KEYS[1], id)
+        local dead = tonumber(fields[3] or '0') >= tonumber(ARGV[2])
+        if dead then
+            redis.call('DEL', key)
+        else
+            redis.call('HDEL', key, 'worker', 'token', 'expires')
+            redis.call('ZADD', ARGV[3] .. fields[1] .. ':ready', fields[4], id)
+        end
+        table.insert(out, {id, fields[1], fields[2] or '', fields[3] or '0', dead and 1 or 0})
+    end
+    return out
+    """
+
+    def __init__(self, url: str, lease_seconds: float = 60, max_attempts: int = 3, prefix: str = "manimator:"):
+        """
+        Connect to the server.
+
+        Args:
+            url: Redis URL, e.g. "redis://localhost:6379/0"
+            lease_seconds: Seconds a claim stays valid without a heartbeat
+            max_attempts: Expired leases before a job is given up on
+            prefix: Key prefix, so several deployments can share a server
+        """
+        import redis
+
+        super().__init__(lease_seconds, max_attempts)
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._claim = self._redis.register_script(self.CLAIM)
+        self._heartbeat = self._redis.register_script(self.HEARTBEAT)
+        self._complete = self._redis.register_script(self.COMPLETE)
+        self._release = self._redis.register_script(self.RELEASE)
+        self._expire = self._redis.register_script(self.EXPIRE)
+
+    def _ready(self, queue: str) -> str:
+        return f"{self.prefix}{queue}:ready"
+
+    def _job(self, job_id: str) -> str:
+        return f"{self.prefix}job:{job_id}"
+
+    @property
+    def _leases(self) -> str:
+        return f"{self.prefix}leases"
+
+    def enqueue(self, job_id: str, queue: str, priority: int = 0, payload: Optional[Dict] = None) -> int:
+        score = -priority * self._PRIORITY_SCALE + time.time()
+        pipe = self._redis.pipeline()
+        pipe.delete(self._job(job_id))
+        pipe.hset(self._job(job_id), mapping={
+            "queue": queue, "score": score, "attempts": 0, "payload": json.dumps(payload or {}),
+        })
+        pipe.zadd(self._ready(queue), {job_id: score})
+        pipe.execute()
+        return self.position(job_id) or 1
+
+    def claim(self, queue: str, worker: str) -> Optional[Lease]:
+        token = uuid.uuid4().hex
+        expires = time.time() + self.lease_seconds
+        result = self._claim(
+            keys=[self._ready(queue), self._leases],
+            args=[worker, token, expires, self.prefix],
+        )
+        if not result:
+            return None
+        job_id, attempts, payload = result
+        return Lease(job_id, queue, token, worker, int(attempts), expires, json.loads(payload or "{}"))
+
+    def heartbeat(self, lease: Lease) -> bool:
+        expires = time.time() + self.lease_seconds
+        ok = self._heartbeat(keys=[self._job(lease.job_id), self._leases], args=[lease.token, expires, lease.job_id])
+        if ok:
+            lease.expires = expires
+        return bool(ok)
+
+    def complete(self, lease: Lease) -> bool:
+        return bool(self._complete(keys=[self._job(lease.job_id), self._leases], args=[lease.token, lease.job_id]))
+
+    def release(self, lease: Lease) -> bool:
+        score = float(self._redis.hget(self._job(lease.job_id), "score") or 0) - self._PRIORITY_SCALE / 2
+        return bool(self._release(
+            keys=[self._job(lease.job_id), self._leases, self._ready(lease.queue)],
+            args=[lease.token, lease.job_id, score],
+        ))
+
+    def cancel(self, job_id: str) -> bool:
+        queue = self._redis.hget(self._job(job_id), "queue")
+        if queue is None or not self._redis.zrem(self._ready(queue), job_id):
+            return False
+        self._redis.delete(self._job(job_id))
+        return True
+
+    def expire(self) -> List[Expired]:
+        rows = self._expire(keys=[self._leases], args=[time.time(), self.max_attempts, self.prefix])
+        return [
+            Expired(job_id, queue or "", worker, int(attempts), bool(dead))
+            for job_id, queue, worker, attempts, dead in rows
+        ]
+
+    def position(self, job_id: str) -> Optional[int]:
+        queue = self._redis.hget(self._job(job_id), "queue")
+        if queue is None:
+            return None
+        rank = self._redis.zrank(self._ready(queue), job_id)
+        return None if rank is None else rank + 1
+
+    def register_worker(self, worker: str, queue: str, capacity: int, running: int) -> None:
+        self._redis.hset(f"{self.prefix}workers", worker, json.dumps({
+            "queue": queue, "capacity": capacity, "running": running, "last_seen": time.time(),
+        }))
+
+    def unregister_worker(self, worker: str) -> None:
+        self._redis.hdel(f"{self.prefix}workers", worker)
+
+    def stats(self, queue: Optional[str] = None) -> Dict[str, Any]:
+        alive_after = time.time() - 2 * self.lease_seconds
+        workers = [json.loads(w) for w in self._redis.hvals(f"{self.prefix}workers")]
+        workers = [w for w in workers if w["last_seen"] > alive_after and (queue is None or w["queue"] == queue)]
+        if queue:
+            queued = self._redis.zcard(self._ready(queue))
+        else:
+            queued = sum(self._redis.zcard(key) for key in self._redis.scan_iter(f"{self.prefix}*:ready"))
+        return {
+            "backend": "redis",
+            "queued": queued,
+            "leased": self._redis.zcard(self._leases),
+            "workers": len(workers),
+            "worker_capacity": sum(w["capacity"] for w in workers),
+            "worker_running": sum(w["running"] for w in workers),
+        }
+
+
+def create_job_queue(
+    backend: str,
+    db_path: Optional[Path] = None,
+    url: Optional[str] = None,
+) -> Optional[JobQueue]:
+    """
+    Factory function to create a job queue from the environment settings.
+
+    Args:
+        backend: "local" (no shared queue), "sqlite" or "redis"
+        db_path: SQLite queue database
+        url: Redis URL
+
+    Returns:
+        JobQueue instance, or None for "local"
+    """
+    lease_seconds = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+    max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    if backend == "local":
+        return None
+    if backend == "sqlite":
+        return SQLiteJobQueue(db_path or Path("jobs") / "queue.db", lease_seconds, max_attempts)
+    if backend == "redis":
+        return RedisJobQueue(url or "redis://localhost:6379/0", lease_seconds, max_attempts)
+    raise ValueError(f"Unknown job queue backend: {backend}")
+
+
+def main():
+    """Command-line interface for inspecting a SQLite queue."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Job queue maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    stats_parser = subparsers.add_parser("stats", help="Show waiting/leased jobs and live workers")
+    stats_parser.add_argument("db_path", type=Path)
+    expire_parser = subparsers.add_parser("expire", help="Re-queue jobs whose lease ran out")
+    expire_parser.add_argument("db_path", type=Path)
+
+    args = parser.parse_args()
+    queue = SQLiteJobQueue(args.db_path)
+    if args.command == "stats":
+        print(queue.stats())
+    elif args.command == "expire":
+        for item in queue.expire():
+            print(f"{item.job_id}: {'dead' if item.dead else 're-queued'} after {item.attempts} attempts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""
+Job Store
+
+Pluggable persistence for the API servers' job records.
+
+Backends:
+- SQLiteJobStore (default): one WAL-mode database, indexed by status and
+  created_at, with per-status / per-category counters kept up to date by
+  triggers so /health never scans the table.
+- JsonFileJobStore: the original one-JSON-file-per-job layout.
+
+Usage:
+    python -m manimator.utils.job_store import jobs/ jobs/jobs.db
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class JobStore:
+    """Interface shared by all job persistence backends."""
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the job record or None if it does not exist."""
+        raise NotImplementedError
+
+    def put(self, job: Dict) -> None:
+        """Insert or replace a job record (keyed by job["job_id"])."""
+        raise NotImplementedError
+
+    def delete(self, job_id: str) -> bool:
+        """Delete a job record. Returns True if it existed."""
+        raise NotImplementedError
+
+    def list(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+    ) -> List[Dict]:
+        """List jobs, most recent first, optionally filtered."""
+        raise NotImplementedError
+
+    def count(self, status: Optional[str] = None, category: Optional[str] = None) -> int:
+        """Number of jobs matching the filters."""
+        raise NotImplementedError
+
+    def counts(self, dimension: str = "status") -> Dict[str, int]:
+        """Job counts grouped by "status" or "category"."""
+        raise NotImplementedError
+
+    def total(self) -> int:
+        """Total number of jobs."""
+        return sum(self.counts("status").values())
+
+    def updated_since(self, since: str, limit: int = 500) -> List[Dict]:
+        """Jobs whose updated_at is after the given ISO timestamp, oldest update first."""
+        raise NotImplementedError
+
+
+def _enum_value(value) -> Optional[str]:
+    """Normalise str enums and plain strings to their raw value."""
+    if value is None:
+        return None
+    return getattr(value, "value", value)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    SQLite (WAL) job store.
+
+    The full job record is kept as a JSON document; the columns used for
+    filtering and ordering are duplicated alongside it and indexed.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        category TEXT NOT NULL DEFAULT '',
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_jobs_category_created ON jobs(category, created_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs(updated_at);
+
+    CREATE TABLE IF NOT EXISTS job_counts (
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dimension, value)
+    );
+
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+
+    CREATE TRIGGER IF NOT EXISTS jobs_count_insert AFTER INSERT ON jobs BEGIN
+        INSERT INTO job_counts VALUES ('status', NEW.status, 1)
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + 1;
+        INSERT INTO job_counts VALUES ('category', NEW.category, 1)
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS jobs_count_delete AFTER DELETE ON jobs BEGIN
+        UPDATE job_counts SET count = count - 1 WHERE dimension = 'status' AND value = OLD.status;
+        UPDATE job_counts SET count = count - 1 WHERE dimension = 'category' AND value = OLD.category;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS jobs_count_update AFTER UPDATE OF status, category ON jobs
+    WHEN OLD.status IS NOT NEW.status OR OLD.category IS NOT NEW.category BEGIN
+        UPDATE job_counts SET count = count - 1 WHERE dimension = 'status' AND value = OLD.status;
+        UPDATE job_counts SET count = count - 1 WHERE dimension = 'category' AND value = OLD.category;
+        INSERT INTO job_counts VALUES ('status', NEW.status, 1)
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + 1;
+        INSERT INTO job_counts VALUES ('category', NEW.category, 1)
+            ON CONFLICT(dimension, value) DO UPDATE SET count = count + 1;
+    END;
+    """
+
+    UPSERT = """
+    INSERT INTO jobs (job_id, status, category, created_at, updated_at, data)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(job_id) DO UPDATE SET
+        status = excluded.status,
+        category = excluded.category,
+        created_at = excluded.created_at,
+        updated_at = excluded.updated_at,
+        data = excluded.data
+    """
+
+    def __init__(self, db_path: Path):
+        """
+        Open (and create if needed) the job database.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=30,
+            check_same_thread=False,
+            isolation_level=None,  # autocommit; explicit BEGIN for batches
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def _row(self, job: Dict) -> tuple:
+        return (
+            job["job_id"],
+            _enum_value(job.get("status")) or "pending",
+            _enum_value(job.get("category")) or "",
+            job.get("created_at") or "",
+            job.get("updated_at") or job.get("created_at") or "",
+            json.dumps(job, default=_enum_value),
+        )
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, job: Dict) -> None:
+        with self._lock:
+            self._conn.execute(self.UPSERT, self._row(job))
+
+    def put_many(self, jobs: List[Dict]) -> None:
+        """Insert or replace many job records in a single transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(self.UPSERT, [self._row(job) for job in jobs])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def _where(status: Optional[str], category: Optional[str]):
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(_enum_value(status))
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(_enum_value(category))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def list(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+    ) -> List[Dict]:
+        where, params = self._where(status, category)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM jobs {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self, status: Optional[str] = None, category: Optional[str] = None) -> int:
+        if status is None and category is None:
+            return self.total()
+        if category is None:
+            return self.counts("status").get(_enum_value(status), 0)
+        if status is None:
+            return self.counts("category").get(_enum_value(category), 0)
+        where, params = self._where(status, category)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM jobs {where}", params).fetchone()[0]
+
+    def counts(self, dimension: str = "status") -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT value, count FROM job_counts WHERE dimension = ? AND count > 0",
+                (dimension,),
+            ).fetchall()
+        return {value: count for value, count in rows}
+
+    def updated_since(self, since: str, limit: int = 500) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM jobs WHERE updated_at > ? ORDER BY updated_at LIMIT ?",
+                (since, limit),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
+
+    def import_json_dir(self, jobs_dir: Path, force: bool = False) -> int:
+        """
+        One-shot import of legacy jobs/*.json files.
+
+        The import is recorded in the meta table so it only runs once per
+        directory unless force=True. Existing rows are replaced.
+
+        Args:
+            jobs_dir: Directory containing <job_id>.json files
+            force: Re-import even if this directory was imported before
+
+        Returns:
+            Number of jobs imported
+        """
+        jobs_dir = Path(jobs_dir)
+        marker = f"json_import:{jobs_dir.resolve()}"
+        if not force and self.get_meta(marker):
+            return 0
+
+        jobs = []
+        for job_file in jobs_dir.glob("*.json"):
+            try:
+                with open(job_file) as f:
+                    job = json.load(f)
+                if "job_id" in job:
+                    jobs.append(job)
+            except Exception as e:
+                print(f"Error importing job {job_file}: {e}")
+
+        if jobs:
+            self.put_many(jobs)
+        self.set_meta(marker, str(len(jobs)))
+        return len(jobs)
+
+
+class JsonFileJobStore(JobStore):
+    """Legacy store: one indented JSON file per job, indexed in memory."""
+
+    def __init__(self, jobs_dir: Path):
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.jobs: Dict[str, Dict] = {}
+        for job_file in self.jobs_dir.glob("*.json"):
+            try:
+                with open(job_file) as f:
+                    job = json.load(f)
+                self.jobs[job["job_id"]] = job
+            except Exception as e:
+                print(f"Error loading job {job_file}: {e}")
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    def put(self, job: Dict) -> None:
+        self.jobs[job["job_id"]] = dict(job)
+        with open(self.jobs_dir / f"{job['job_id']}.json", "w") as f:
+            json.dump(job, f, indent=2, default=_enum_value)
+
+    def delete(self, job_id: str) -> bool:
+        (self.jobs_dir / f"{job_id}.json").unlink(missing_ok=True)
+        return self.jobs.pop(job_id, None) is not None
+
+    def _filtered(self, status: Optional[str], category: Optional[str]) -> List[Dict]:
+        status, category = _enum_value(status), _enum_value(category)
+        return [
+            job for job in self.jobs.values()
+            if (status is None or _enum_value(job.get("status")) == status)
+            and (category is None or _enum_value(job.get("category")) == category)
+        ]
+
+    def list(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+    ) -> List[Dict]:
+        jobs = sorted(
+            self._filtered(status, category),
+            key=lambda x: x["created_at"],
+            reverse=True
+        )
+        return jobs[offset:offset + limit]
+
+    def count(self, status: Optional[str] = None, category: Optional[str] = None) -> int:
+        return len(self._filtered(status, category))
+
+    def updated_since(self, since: str, limit: int = 500) -> List[Dict]:
+        jobs = sorted(
+            (job for job in self.jobs.values() if (job.get("updated_at") or "") > since),
+            key=lambda x: x["updated_at"]
+        )
+        return jobs[:limit]
+
+    def counts(self, dimension: str = "status") -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            value = _enum_value(job.get(dimension)) or ""
+            counts[value] = counts.get(value, 0) + 1
+        return counts
+
+
+def create_job_store(backend: str, jobs_dir: Path, db_path: Optional[Path] = None) -> JobStore:
+    """
+    Factory function to create a job store.
+
+    The SQLite backend imports any legacy JSON files from jobs_dir the
+    first time it is opened.
+
+    Args:
+        backend: "sqlite" (default) or "json"
+        jobs_dir: Directory of legacy per-job JSON files
+        db_path: SQLite database path (defaults to jobs_dir / "jobs.db")
+
+    Returns:
+        JobStore instance
+    """
+    if backend == "json":
+        return JsonFileJobStore(jobs_dir)
+    if backend != "sqlite":
+        raise ValueError(f"Unknown job store backend: {backend}")
+
+    store = SQLiteJobStore(db_path or Path(jobs_dir) / "jobs.db")
+    imported = store.import_json_dir(jobs_dir)
+    if imported:
+        print(f"📦 Imported {imported} legacy job files from {jobs_dir} into {store.db_path}")
+    return store
+
+
+def main():
+    """Command-line interface for the one-shot JSON importer."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Job store maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="Import jobs/*.json into SQLite")
+    import_parser.add_argument("jobs_dir", type=Path)
+    import_parser.add_argument("db_path", type=Path)
+    import_parser.add_argument("--force", action="store_true", help="Re-import even if done before")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        store = SQLiteJobStore(args.db_path)
+        count = store.import_json_dir(args.jobs_dir, force=args.force)
+        print(f"Imported {count} jobs into {args.db_path} (total: {store.total()})")
+
+
+if __name__ == "__main__":
+    main()
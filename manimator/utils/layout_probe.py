@@ -0,0 +1,466 @@
+"""
+Layout Probe
+
+Finds layout problems in generated scenes without rendering any pixels.
+
+The scene is constructed with Manim's renderer in skip-animations mode and
+with a dry-run config, so every `play`/`wait` runs its animations straight
+to their end state without drawing frames or encoding video. Voiceovers are
+stubbed, so no text-to-speech service is called, and the narration length
+is estimated from the word count. After every step the bounding boxes of
+the text on screen are recorded and checked for:
+
+- out-of-frame content beyond the ±7.1 × ±4 frame
+- text overlapping other text
+
+The report has the same {"has_issues", "issues", "overall_quality"} shape
+that VisualLayoutAnalyzer.suggest_fixes consumes. Each issue's "frame" is
+the index of the play/wait step where the problem first appears.
+
+Manim is imported only inside the probe subprocess:
+
+    python -m manimator.utils.layout_probe scene.py [SceneName]
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from manimator.utils.tracing import child_process
+
+# Frame limits in Manim units (default 16:9 camera frame)
+FRAME_X = 7.1
+FRAME_Y = 4.0
+
+# Ignore overlaps smaller than this fraction of the smaller box
+MIN_OVERLAP_FRACTION = 0.1
+
+# Shapes at least this large relative to the frame are structure (planes,
+# backdrops, full-screen rectangles) and are not checked for cutoff
+STRUCTURE_SPAN = 0.95
+
+# Tolerance in Manim units for boxes touching the frame edge
+EDGE_TOLERANCE = 0.02
+
+# Narration pace used to size stubbed voiceovers
+WORDS_PER_SECOND = 2.5
+
+# Marker that separates the JSON report from manim's own stdout
+REPORT_MARKER = "__LAYOUT_PROBE_REPORT__"
+# Keys the parent reads from a report
+REPORT_KEYS = {"has_issues", "issues", "steps", "seconds"}
+
+Box = Tuple[float, float, float, float]  # (x0, y0, x1, y1)
+
+
+# ============================================================================
+# Probe harness (runs inside the subprocess, imports manim)
+# ============================================================================
+
+class _ProbeTracker:
+    """Stand-in for manim-voiceover's VoiceoverTracker."""
+
+    def __init__(self, scene, text: str):
+        self.scene = scene
+        self.text = text
+        self.duration = max(1.0, len(text.split()) / WORDS_PER_SECOND)
+        self.start_t = scene.probe_time
+        self.end_t = self.start_t + self.duration
+        self.data = {"input_text": text}
+        self.content = text
+
+    def get_remaining_duration(self, buff: float = 0.0) -> float:
+        return max(self.end_t - self.scene.probe_time + buff, 0.0)
+
+    def time_until_bookmark(self, mark: str, buff: float = 0, limit: Optional[float] = None) -> float:
+        # Bookmarks are not resolved without audio; a short positive wait keeps
+        # self.wait(tracker.time_until_bookmark(...)) valid
+        return 0.1
+
+
+@contextmanager
+def stub_voiceover():
+    """Replace manim-voiceover's audio pipeline with silent trackers."""
+    try:
+        from manim_voiceover import VoiceoverScene
+    except ImportError:
+        yield
+        return
+
+    def add_voiceover_text(self, text, **kwargs):
+        self.current_tracker = _ProbeTracker(self, text)
+        return self.current_tracker
+
+    def add_voiceover_ssml(self, ssml, **kwargs):
+        return add_voiceover_text(self, ssml, **kwargs)
+
+    def wait_for_voiceover(self):
+        tracker = getattr(self, "current_tracker", None)
+        if tracker is not None:
+            self.probe_time = max(self.probe_time, tracker.end_t)
+
+    def noop(self, *args, **kwargs):
+        return None
+
+    patched = {
+        "add_voiceover_text": add_voiceover_text,
+        "add_voiceover_ssml": add_voiceover_ssml,
+        "wait_for_voiceover": wait_for_voiceover,
+        "wait_until_bookmark": noop,
+        "set_speech_service": noop,
+    }
+    originals = {name: VoiceoverScene.__dict__.get(name) for name in patched}
+    for name, func in patched.items():
+        setattr(VoiceoverScene, name, func)
+    # Scenes build their speech service before handing it over; make sure a
+    # missing API key does not abort the probe
+    os.environ.setdefault("ELEVENLABS_API_KEY", "layout-probe")
+    try:
+        yield
+    finally:
+        for name, func in originals.items():
+            if func is None:
+                delattr(VoiceoverScene, name)
+            else:
+                setattr(VoiceoverScene, name, func)
+
+
+def instrument_scene(
+    scene_class,
+    on_step: Callable[[Any, str, int], None],
+    before_step: Optional[Callable[[Any, str, int], None]] = None,
+):
+    """
+    Subclass a scene so on_step(scene, kind, index) runs after every play/wait.
+
+    Scene.wait goes through play, so only play is wrapped. before_step, if
+    given, runs with the same arguments before the animation starts. The
+    subclass also keeps `probe_time`, the scene time in seconds, which the
+    renderer does not advance while animations are skipped.
+    """
+    from manim import Wait
+
+    class Instrumented(scene_class):
+        probe_time = 0.0
+        probe_steps = 0
+
+        def play(self, *args, **kwargs):
+            kind = "wait" if len(args) == 1 and isinstance(args[0], Wait) else "play"
+            if before_step is not None:
+                before_step(self, kind, self.probe_steps)
+            super().play(*args, **kwargs)
+            self.probe_time += float(getattr(self, "duration", 0) or 0)
+            on_step(self, kind, self.probe_steps)
+            self.probe_steps += 1
+
+    Instrumented.__name__ = scene_class.__name__
+    Instrumented.__qualname__ = scene_class.__qualname__
+    return Instrumented
+
+
+@contextmanager
+def probe_config(media_dir: Optional[str] = None):
+    """Manim config that skips rendering and writes no files."""
+    import tempfile
+
+    from manim import config, tempconfig
+
+    with tempfile.TemporaryDirectory(prefix="manimator-probe-") as scratch:
+        with tempconfig({}):
+            config.dry_run = True
+            config.write_to_movie = False
+            config.disable_caching = True
+            config.preview = False
+            config.media_dir = media_dir or scratch
+            yield config
+
+
+def _is_text(mobject) -> bool:
+    from manim import DecimalNumber, MarkupText, Paragraph, SingleStringMathTex, Text
+
+    return isinstance(mobject, (Text, MarkupText, Paragraph, SingleStringMathTex, DecimalNumber))
+
+
+def _is_visible(mobject) -> bool:
+    family = mobject.get_family()
+    return any(
+        (m.get_fill_opacity() > 0.01 or m.get_stroke_opacity() > 0.01) and len(m.points) > 0
+        for m in family
+        if hasattr(m, "get_fill_opacity")
+    ) and mobject.width > 1e-3 and mobject.height > 1e-3
+
+
+def _label(mobject) -> str:
+    content = getattr(mobject, "text", None) or getattr(mobject, "tex_string", None)
+    if content is None and hasattr(mobject, "get_value"):
+        content = f"{mobject.get_value():g}"
+    name = type(mobject).__name__
+    if content:
+        content = " ".join(str(content).split())
+        if len(content) > 40:
+            content = content[:37] + "..."
+        return f'{name} "{content}"'
+    return name
+
+
+def _box(mobject) -> Box:
+    return (
+        float(mobject.get_left()[0]),
+        float(mobject.get_bottom()[1]),
+        float(mobject.get_right()[0]),
+        float(mobject.get_top()[1]),
+    )
+
+
+def _screen_objects(scene) -> Tuple[List[Any], List[Any]]:
+    """Visible (text leaves, other top-level mobjects) on screen right now."""
+    from manim import ThreeDScene
+
+    top_level = list(scene.mobjects)
+    if isinstance(scene, ThreeDScene):
+        # Only fixed-in-frame mobjects live in screen coordinates
+        fixed = set(getattr(scene.renderer.camera, "fixed_in_frame_mobjects", []))
+        top_level = [m for m in top_level if m in fixed]
+
+    texts, shapes = [], []
+    for mobject in top_level:
+        if not _is_visible(mobject):
+            continue
+        stack = [mobject]
+        found_text = False
+        while stack:
+            current = stack.pop()
+            if _is_text(current):
+                if _is_visible(current):
+                    texts.append(current)
+                found_text = True
+                continue  # glyphs of a label are not checked against each other
+            stack.extend(current.submobjects)
+        if not found_text:
+            shapes.append(mobject)
+    return texts, shapes
+
+
+def _frame_bounds(scene) -> Box:
+    frame = getattr(scene.renderer.camera, "frame", None)
+    if frame is not None and not hasattr(scene.renderer.camera, "fixed_in_frame_mobjects"):
+        # MovingCameraScene: the visible area follows the camera frame
+        cx, cy = float(frame.get_x()), float(frame.get_y())
+        scale_x = frame.width / 2 / 7.111
+        scale_y = frame.height / 2 / 4.0
+        return (cx - FRAME_X * scale_x, cy - FRAME_Y * scale_y, cx + FRAME_X * scale_x, cy + FRAME_Y * scale_y)
+    return (-FRAME_X, -FRAME_Y, FRAME_X, FRAME_Y)
+
+
+def _overlap_fraction(a: Box, b: Box) -> float:
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return width * height / smaller if smaller > 0 else 0.0
+
+
+class LayoutRecorder:
+    """Collects layout issues step by step, reporting each problem once."""
+
+    def __init__(self):
+        self.issues: List[Dict[str, Any]] = []
+        self.steps = 0
+        self._seen = set()
+
+    def _add(self, key, issue: Dict[str, Any]):
+        if key not in self._seen:
+            self._seen.add(key)
+            self.issues.append(issue)
+
+    def __call__(self, scene, kind: str, index: int):
+        self.steps = index + 1
+        texts, shapes = _screen_objects(scene)
+        bounds = _frame_bounds(scene)
+        when = f"after {kind} #{index + 1} (t={scene.probe_time:.1f}s)"
+
+        frame_width, frame_height = bounds[2] - bounds[0], bounds[3] - bounds[1]
+        structure = [
+            m for m in shapes
+            if m.width >= STRUCTURE_SPAN * frame_width or m.height >= STRUCTURE_SPAN * frame_height
+        ]
+
+        for mobject in texts + [m for m in shapes if m not in structure]:
+            x0, y0, x1, y1 = _box(mobject)
+            sides = [name for name, out in (
+                ("left", x0 < bounds[0] - EDGE_TOLERANCE), ("bottom", y0 < bounds[1] - EDGE_TOLERANCE),
+                ("right", x1 > bounds[2] + EDGE_TOLERANCE), ("top", y1 > bounds[3] + EDGE_TOLERANCE),
+            ) if out]
+            if sides:
+                label = _label(mobject)
+                self._add(("cutoff", label, tuple(sides)), {
+                    "frame": index,
+                    "type": "cutoff",
+                    "description": (
+                        f"{label} extends past the {'/'.join(sides)} edge of the frame {when}: "
+                        f"spans x {x0:.2f}..{x1:.2f}, y {y0:.2f}..{y1:.2f} "
+                        f"(frame is ±{FRAME_X} × ±{FRAME_Y})"
+                    ),
+                    "source": "layout_probe",
+                })
+
+        boxes = [(_label(m), _box(m)) for m in texts]
+        for i, (label_a, a) in enumerate(boxes):
+            for label_b, b in boxes[i + 1:]:
+                if _overlap_fraction(a, b) >= MIN_OVERLAP_FRACTION:
+                    self._add(("overlap", label_a, label_b), {
+                        "frame": index,
+                        "type": "overlap",
+                        "description": (
+                            f"{label_a} overlaps {label_b} {when} "
+                            f"(boxes x {a[0]:.2f}..{a[2]:.2f}, y {a[1]:.2f}..{a[3]:.2f} and "
+                            f"x {b[0]:.2f}..{b[2]:.2f}, y {b[1]:.2f}..{b[3]:.2f})"
+                        ),
+                        "source": "layout_probe",
+                    })
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "has_issues": bool(self.issues),
+            "issues": self.issues,
+            "overall_quality": "good" if not self.issues else "fair" if len(self.issues) <= 2 else "poor",
+            "steps": self.steps,
+            "source": "layout_probe",
+        }
+
+
+def run_probe(code_file: str, scene_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Construct the scene without rendering and return the layout report.
+
+    Must run in a process where importing manim is acceptable (see
+    probe_layout for the subprocess wrapper).
+    """
+    from manimator.utils.render_workers import load_scene_class
+    from manimator.utils.tex_cache import install as install_tex_cache
+
+    started = time.monotonic()
+    recorder = LayoutRecorder()
+    with probe_config(), stub_voiceover():
+        install_tex_cache()
+        scene_class = load_scene_class(str(Path(code_file).resolve()), scene_name, "manimator_layout_probe_scene")
+        # skip_animations lets each scene class build its own renderer/camera
+        # (ThreeDCamera, MovingCamera) while jumping every animation to its end
+        scene = instrument_scene(scene_class, recorder)(skip_animations=True)
+        scene.render()
+    report = recorder.report()
+    report["seconds"] = round(time.monotonic() - started, 2)
+    return report
+
+
+# ============================================================================
+# Parent side
+# ============================================================================
+
+class LayoutProbeError(Exception):
+    """Raised when the scene cannot be constructed (the probe did not finish)."""
+
+
+def _probe_command(code_file: Path, scene_name: Optional[str]) -> List[str]:
+    cmd = [sys.executable, "-m", "manimator.utils.layout_probe", str(code_file)]
+    if scene_name:
+        cmd.append(scene_name)
+    return cmd
+
+
+def _parse_output(output: str, returncode: int) -> Dict[str, Any]:
+    if REPORT_MARKER not in output:
+        tail = "\n".join(output.strip().splitlines()[-20:])
+        raise LayoutProbeError(f"Layout probe exited with {returncode}:\n{tail}")
+    # The report is the line after the marker; anything later (warnings at
+    # interpreter exit, merged stderr) is not part of it
+    lines = output.rsplit(REPORT_MARKER, 1)[1].strip().splitlines()
+    try:
+        report = json.loads(lines[0])
+    except (IndexError, ValueError) as e:
+        raise LayoutProbeError(f"Unreadable layout probe report: {e}") from e
+    if not isinstance(report, dict) or not REPORT_KEYS <= report.keys():
+        raise LayoutProbeError(f"Incomplete layout probe report: {lines[0][:200]}")
+    return report
+
+
+def probe_layout(
+    code_file: Path,
+    scene_name: Optional[str] = None,
+    cwd: Optional[Path] = None,
+    timeout: float = 300,
+) -> Dict[str, Any]:
+    """
+    Run the layout probe in a subprocess.
+
+    Args:
+        code_file: Scene file
+        scene_name: Scene class name (falls back to the only Scene in the file)
+        cwd: Working directory (so relative assets resolve as in the render)
+        timeout: Seconds before the probe is killed
+
+    Returns:
+        Issue report in VisualLayoutAnalyzer's format
+
+    Raises:
+        LayoutProbeError: If the scene fails to construct
+    """
+    try:
+        result = subprocess.run(
+            _probe_command(code_file, scene_name),
+            cwd=str(cwd) if cwd else None,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        raise LayoutProbeError(f"Layout probe timed out after {timeout} seconds")
+    return _parse_output(result.stdout + result.stderr, result.returncode)
+
+
+async def probe_layout_async(
+    code_file: Path,
+    scene_name: Optional[str] = None,
+    cwd: Optional[Path] = None,
+    timeout: float = 300,
+) -> Dict[str, Any]:
+    """Async version of probe_layout."""
+    process = await asyncio.create_subprocess_exec(
+        *_probe_command(code_file, scene_name),
+        cwd=str(cwd) if cwd else None,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    try:
+        async with child_process(process.pid):
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise LayoutProbeError(f"Layout probe timed out after {timeout} seconds")
+    return _parse_output(stdout.decode("utf-8", errors="replace"), process.returncode)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(2)
+    try:
+        report = run_probe(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    except Exception:
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    print(REPORT_MARKER)
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Async LLM Client
+
+Shared entry point for every model call made from the async job pipelines.
+
+The API servers used to wrap the synchronous `litellm.completion` in
+`run_in_executor(None, ...)`, so under load multi-minute model calls took
+up the default thread pool that ffprobe, cache and file work also depend on.
+Here calls go through `litellm.acompletion` on the event loop:
+
+- Each model has its own semaphore, so a burst of vision checks cannot
+  starve code generation (or the other way round).
+- Callers waiting for a model form a bounded queue; once it is full,
+  LLMBusyError is raised instead of piling up more coroutines.
+- Every call has a timeout, enforced by the client as well as passed on
+  to litellm.
+- Per-model gauges (in flight, waiting, latency, failures) are kept for
+  /health.
+
+`astream` yields the completion text as it arrives, for callers that parse
+the output incrementally (see stream_parser).
+
+Inside a job's trace every call is an "llm" span with its token usage
+and request size (see tracing).
+
+Environment Variables:
+    LLM_CONCURRENCY: Concurrent calls per model (default: 4)
+    LLM_MODEL_CONCURRENCY: Per-model overrides, e.g. "anthropic/claude-sonnet-4.5=6,openrouter/qwen/qwen3-vl-235b-a22b-instruct=2"
+    LLM_TIMEOUT: Seconds before a call is abandoned (default: 600)
+    LLM_MAX_WAITING: Calls allowed to wait per model before LLMBusyError (default: 32)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Dict, Optional
+
+import litellm
+
+from manimator.utils import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class LLMBusyError(Exception):
+    """Raised when too many calls are already waiting for a model."""
+
+
+class LLMTimeoutError(Exception):
+    """Raised when a model call exceeds its timeout."""
+
+
+@dataclass
+class ModelGauge:
+    """Live counters for one model."""
+    limit: int
+    in_flight: int = 0
+    waiting: int = 0
+    completed: int = 0
+    failed: int = 0
+    timeouts: int = 0
+    rejected: int = 0
+    cancelled: int = 0
+    last_first_token: float = 0.0
+    last_latency: float = 0.0
+    avg_latency: float = 0.0
+    max_latency: float = 0.0
+
+    def record(self, seconds: float):
+        self.last_latency = round(seconds, 3)
+        self.max_latency = round(max(self.max_latency, seconds), 3)
+        # Exponential moving average, seeded with the first sample
+        if self.completed + self.failed + self.timeouts + self.cancelled <= 1:
+            self.avg_latency = round(seconds, 3)
+        else:
+            self.avg_latency = round(0.8 * self.avg_latency + 0.2 * seconds, 3)
+
+
+def _request_bytes(messages: list) -> int:
+    """Size of the messages as sent (base64 images included)."""
+    return len(json.dumps(messages, default=str).encode("utf-8"))
+
+
+def _record_usage(span: Optional[tracing.Span], usage: Any):
+    """Copy a litellm usage block onto a span."""
+    if span is None or usage is None:
+        return
+    span.add("prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+    span.add("completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    limits = {}
+    for entry in spec.split(","):
+        model, _, value = entry.strip().rpartition("=")
+        if model and value.strip().isdigit():
+            limits[model.strip()] = int(value)
+    return limits
+
+
+class AsyncLLMClient:
+    """
+    litellm.acompletion with per-model limits, timeouts and gauges.
+
+    Example:
+        >>> client = get_llm_client()
+        >>> text = await client.complete("anthropic/claude-sonnet-4.5", messages)
+        >>> client.stats()["anthropic/claude-sonnet-4.5"]["in_flight"]
+        0
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        timeout: float = 600,
+        max_waiting: int = 32,
+        model_limits: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            concurrency: Concurrent calls per model without an override
+            timeout: Default seconds per call
+            max_waiting: Calls allowed to wait per model
+            model_limits: Concurrency overrides keyed by model name
+        """
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.max_waiting = max(0, max_waiting)
+        self.model_limits = model_limits or {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._gauges: Dict[str, ModelGauge] = {}
+
+    def _slot(self, model: str) -> asyncio.Semaphore:
+        if model not in self._semaphores:
+            limit = max(1, self.model_limits.get(model, self.concurrency))
+            self._semaphores[model] = asyncio.Semaphore(limit)
+            self._gauges[model] = ModelGauge(limit=limit)
+        return self._semaphores[model]
+
+    @asynccontextmanager
+    async def _admit(self, model: str, timeout: float):
+        """Hold one of the model's slots and record the call's outcome."""
+        slot = self._slot(model)
+        gauge = self._gauges[model]
+
+        if slot.locked() and gauge.waiting >= self.max_waiting:
+            gauge.rejected += 1
+            raise LLMBusyError(f"{gauge.waiting} calls already waiting for {model}")
+
+        gauge.waiting += 1
+        try:
+            await slot.acquire()
+        finally:
+            gauge.waiting -= 1
+
+        gauge.in_flight += 1
+        started = time.monotonic()
+        try:
+            yield gauge
+        except asyncio.TimeoutError:
+            gauge.timeouts += 1
+            raise LLMTimeoutError(f"{model} did not answer within {timeout} seconds")
+        except Exception:
+            gauge.failed += 1
+            raise
+        except BaseException:
+            # Cancelled task or a stream the caller closed early
+            gauge.cancelled += 1
+            raise
+        else:
+            gauge.completed += 1
+        finally:
+            gauge.record(time.monotonic() - started)
+            gauge.in_flight -= 1
+            slot.release()
+
+    async def acompletion(self, model: str, messages: list, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Call litellm.acompletion under the model's limit.
+
+        Args:
+            model: litellm model name
+            messages: Chat messages
+            timeout: Seconds for this call (default: the client's timeout)
+            **kwargs: Additional parameters for litellm
+
+        Returns:
+            The litellm response
+
+        Raises:
+            LLMBusyError: If max_waiting calls are already queued for the model
+            LLMTimeoutError: If the call does not finish in time
+        """
+        timeout = timeout or self.timeout
+        with tracing.span("llm", model=model) as span:
+            if span is not None:
+                span.add("upload_bytes", _request_bytes(messages))
+            async with self._admit(model, timeout):
+                response = await asyncio.wait_for(
+                    litellm.acompletion(model=model, messages=messages, timeout=timeout, **kwargs),
+                    timeout,
+                )
+            _record_usage(span, getattr(response, "usage", None))
+            return response
+
+    async def astream(self, model: str, messages: list, timeout: Optional[float] = None, **kwargs) -> AsyncIterator[str]:
+        """
+        Stream a completion's text under the model's limit.
+
+        The slot is held until the stream ends or the caller closes the
+        generator (e.g. to abort a response early). The timeout covers the
+        whole stream, not each chunk.
+
+        Args:
+            model: litellm model name
+            messages: Chat messages
+            timeout: Seconds for the whole stream (default: the client's timeout)
+            **kwargs: Additional parameters for litellm
+
+        Yields:
+            Text deltas in order
+
+        Raises:
+            LLMBusyError: If max_waiting calls are already queued for the model
+            LLMTimeoutError: If the stream does not finish in time
+        """
+        timeout = timeout or self.timeout
+        # Not made current: between yields this generator runs in the consumer's context
+        with tracing.span("llm", activate=False, model=model, stream=True) as span:
+            if span is not None:
+                span.add("upload_bytes", _request_bytes(messages))
+            usage = None
+            async with self._admit(model, timeout) as gauge:
+                deadline = time.monotonic() + timeout
+                started = time.monotonic()
+                response = await asyncio.wait_for(
+                    litellm.acompletion(model=model, messages=messages, stream=True, timeout=timeout, **kwargs),
+                    timeout,
+                )
+                chunks = response.__aiter__()
+                first = True
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - time.monotonic()))
+                    except StopAsyncIteration:
+                        break
+                    # Providers that report usage put it on the last chunk
+                    usage = getattr(chunk, "usage", None) or usage
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        continue
+                    if first:
+                        gauge.last_first_token = round(time.monotonic() - started, 3)
+                        if span is not None:
+                            span.attrs["first_token"] = gauge.last_first_token
+                        first = False
+                    yield delta
+            _record_usage(span, usage)
+
+    async def complete(self, model: str, messages: list, **kwargs) -> str:
+        """Like acompletion, but returns the message text."""
+        response = await self.acompletion(model, messages, **kwargs)
+        return response.choices[0].message.content
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Gauges per model for /health."""
+        return {model: asdict(gauge) for model, gauge in self._gauges.items()}
+
+
+_client: Optional[AsyncLLMClient] = None
+
+
+def get_llm_client() -> AsyncLLMClient:
+    """Get the process-wide client configured from the environment."""
+    global _client
+    if _client is None:
+        _client = AsyncLLMClient(
+            concurrency=int(os.getenv("LLM_CONCURRENCY", "4")),
+            timeout=float(os.getenv("LLM_TIMEOUT", "600")),
+            max_waiting=int(os.getenv("LLM_MAX_WAITING", "32")),
+            model_limits=_parse_limits(os.getenv("LLM_MODEL_CONCURRENCY", "")),
+        )
+    return _client
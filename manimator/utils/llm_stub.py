@@ -0,0 +1,289 @@
+"""
+LLM Stub Server
+
+Minimal local stand-in for an OpenAI-compatible chat completions
+endpoint, for benchmarking the generation pipeline offline. litellm talks
+to it like to any OpenAI provider (model "openai/<name>" with
+OPENAI_API_BASE pointing here), so calls go through the real client,
+streaming and all.
+
+Answers are deterministic:
+
+- Code generation: the scene registered for the "Benchmark case: <id>"
+  marker in the prompt, in a ```python fence. Streamed requests get it in
+  line-sized chunks spread over the call's latency.
+- Vision checks (messages with images): a layout report without issues,
+  or with one overlap for a fraction (issue_rate) of requests, chosen by
+  a hash of the request so reruns see the same issues.
+- Fix requests (code model, no marker): the code from the request
+  unchanged, which the pipeline treats as "no automatic fix".
+
+Every response carries a usage block (about 4 characters per token).
+
+Usage:
+    python -m manimator.utils.llm_stub --port 8020 --latency 5 --scenes 'scene_*.py'
+    OPENAI_API_BASE=http://127.0.0.1:8020/v1 OPENAI_API_KEY=stub \\
+        CODE_GEN_MODEL=openai/bench-code VISUAL_MODEL=openai/bench-vision python api_server.py
+
+Example:
+    >>> with run_stub_server(latency=0.5, vision_latency=0.2) as stub:
+    ...     stub.register("scene_1", Path("scene_1.py").read_text())
+    ...     os.environ["OPENAI_API_BASE"] = stub.base_url
+    ...     ...
+    ...     print(stub.counts)
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Appended to a prompt to choose the scene the stub answers with
+CASE_MARKER = "Benchmark case:"
+
+_CASE_PATTERN = re.compile(re.escape(CASE_MARKER) + r"\s*(\S+)")
+_CODE_PATTERN = re.compile(r"```python\n(.*?)```", re.DOTALL)
+
+FALLBACK_SCENE = '''from manim import *
+
+
+class BenchScene(Scene):
+    def construct(self):
+        title = Text("Benchmark")
+        self.play(Write(title))
+        self.wait(1)
+'''
+
+
+class StubServer(ThreadingHTTPServer):
+    """HTTP server holding the stub's scenes, latencies and request counters."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        latency: float = 0.0,
+        vision_latency: Optional[float] = None,
+        issue_rate: float = 0.0,
+        stream_chunks: int = 40,
+    ):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.vision_latency = latency if vision_latency is None else vision_latency
+        self.issue_rate = issue_rate
+        self.stream_chunks = max(1, stream_chunks)
+        self.scenes: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {"requests": 0, "generate": 0, "vision": 0, "fix": 0, "issues": 0, "unknown_case": 0}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def register(self, case_id: str, code: str):
+        """Answer prompts marked with case_id with this scene code."""
+        self.scenes[case_id] = code
+
+    def count(self, key: str):
+        with self.lock:
+            self.counts[key] += 1
+
+    def answer(self, request: Dict) -> tuple:
+        """(kind, content, latency) for a chat completions request."""
+        self.count("requests")
+        messages = request.get("messages", [])
+        text = "\n".join(_text(message.get("content")) for message in messages)
+
+        if any(_has_image(message.get("content")) for message in messages):
+            self.count("vision")
+            digest = hashlib.sha256(text.encode("utf-8")).digest()
+            has_issue = int.from_bytes(digest[:4], "big") / 2 ** 32 < self.issue_rate
+            if has_issue:
+                self.count("issues")
+            return "vision", _vision_report(has_issue), self.vision_latency
+
+        match = _CASE_PATTERN.search(text)
+        if match:
+            self.count("generate")
+            code = self.scenes.get(match.group(1))
+            if code is None:
+                self.count("unknown_case")
+                code = FALLBACK_SCENE
+            return "generate", f"```python\n{code}```", self.latency
+
+        self.count("fix")
+        found = _CODE_PATTERN.search(text)
+        return "fix", f"```python\n{found.group(1) if found else FALLBACK_SCENE}```", self.latency
+
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _has_image(content) -> bool:
+    return isinstance(content, list) and any(
+        isinstance(part, dict) and part.get("type") == "image_url" for part in content
+    )
+
+
+def _vision_report(has_issue: bool) -> str:
+    if has_issue:
+        report = {
+            "has_issues": True,
+            "issues": [{"frame": 0, "type": "overlap", "description": "Stub: title overlaps the first label"}],
+            "overall_quality": "fair",
+        }
+    else:
+        report = {"has_issues": False, "issues": [], "overall_quality": "good"}
+    return f"```json\n{json.dumps(report, indent=2)}\n```"
+
+
+def _chunks(content: str, count: int) -> List[str]:
+    """Split on line boundaries into about count pieces."""
+    lines = content.splitlines(keepends=True)
+    size = max(1, -(-len(lines) // count))
+    return ["".join(lines[i:i + size]) for i in range(0, len(lines), size)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server: StubServer = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._reply(404, {"error": {"message": "not found"}})
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            return self._reply(400, {"error": {"message": "invalid JSON"}})
+
+        _, content, latency = server.answer(request)
+        model = request.get("model", "stub")
+        usage = {
+            "prompt_tokens": len(body) // 4,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": len(body) // 4 + len(content) // 4,
+        }
+        created = int(time.time())
+        completion_id = f"chatcmpl-stub-{server.counts['requests']}"
+
+        if not request.get("stream"):
+            if latency:
+                time.sleep(latency)
+            return self._reply(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        # Server-Sent Events until the connection closes
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        pieces = _chunks(content, server.stream_chunks)
+        delay = latency / len(pieces) if latency else 0
+        for index, piece in enumerate(pieces + [""]):
+            last = index == len(pieces)
+            if delay and not last:
+                time.sleep(delay)
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {} if last else ({"role": "assistant", "content": piece} if index == 0 else {"content": piece}),
+                    "finish_reason": "stop" if last else None,
+                }],
+            }
+            if last:
+                chunk["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _reply(self, status: int, payload: Dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def run_stub_server(host: str = "127.0.0.1", port: int = 0, **options):
+    """
+    Run a stub server on a background thread for the duration of the block.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free one)
+        **options: latency, vision_latency, issue_rate and stream_chunks,
+            see StubServer
+
+    Yields:
+        The running StubServer (register scenes, then use .base_url and .counts)
+    """
+    server = StubServer((host, port), **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible LLM stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8020)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per code model call")
+    parser.add_argument("--vision-latency", type=float, default=None, help="Seconds per vision call (default: --latency)")
+    parser.add_argument("--issue-rate", type=float, default=0.0, help="Fraction of vision checks that report an overlap")
+    parser.add_argument("--scenes", default="scene_*.py", help="Glob of scene files; each answers 'Benchmark case: <file stem>'")
+    args = parser.parse_args()
+
+    server = StubServer(
+        (args.host, args.port),
+        latency=args.latency,
+        vision_latency=args.vision_latency,
+        issue_rate=args.issue_rate,
+    )
+    for path in sorted(glob.glob(args.scenes)):
+        server.register(Path(path).stem, Path(path).read_text())
+    print(f"LLM stub listening on {server.base_url} with {len(server.scenes)} scenes")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Render Scheduler
+
+Bounded admission control for the video generation pipeline.
+
+Jobs wait in a priority queue (FIFO within the same priority) until a job
+slot frees up. Inside a running job, LLM calls and Manim renders draw from
+two separate semaphores, so a slow model call never holds a render slot and
+the number of concurrent `manim` processes never exceeds the render slots.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the waiting queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Render queue is full. Retry after {retry_after} seconds.")
+        self.retry_after = retry_after
+
+
+def default_render_slots() -> int:
+    """
+    Number of concurrent renders that fits the machine.
+
+    A Manim render keeps one core busy with Cairo plus a second one with the
+    ffmpeg encoder, so we size the pool to half the available cores.
+    """
+    cores = os.cpu_count() or 2
+    return max(1, cores // 2)
+
+
+class RenderScheduler:
+    """
+    Priority job queue with separate render and LLM concurrency limits.
+
+    Example:
+        >>> scheduler = RenderScheduler(render_slots=2, llm_slots=4, max_queued=20)
+        >>> scheduler.submit(job_id, lambda: generator.generate_video(job_id))
+        >>> async with scheduler.render_slot():
+        ...     await render()
+    """
+
+    # Used for Retry-After until we have seen a job finish
+    DEFAULT_JOB_SECONDS = 300
+
+    def __init__(
+        self,
+        render_slots: int,
+        llm_slots: int,
+        max_queued: int,
+        max_active_jobs: Optional[int] = None,
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            render_slots: Maximum number of concurrent Manim renders
+            llm_slots: Maximum number of concurrent LLM calls
+            max_queued: Maximum number of jobs waiting for a slot
+            max_active_jobs: Maximum number of jobs in flight at once
+                (defaults to render_slots + llm_slots so LLM-bound jobs
+                can overlap with rendering ones)
+        """
+        self.render_slots = max(1, render_slots)
+        self.llm_slots = max(1, llm_slots)
+        self.max_queued = max(0, max_queued)
+        self.max_active_jobs = max_active_jobs or (self.render_slots + self.llm_slots)
+
+        self._render_sem = asyncio.Semaphore(self.render_slots)
+        self._llm_sem = asyncio.Semaphore(self.llm_slots)
+        self._render_in_use = 0
+        self._llm_in_use = 0
+
+        # Heap of (-priority, sequence, job_id); one ticket per entry wakes a worker
+        self._heap: List[Tuple[int, int, str]] = []
+        self._factories: Dict[str, Callable[[], Awaitable[None]]] = {}
+        self._tickets: Optional[asyncio.Queue] = None
+        self._sequence = itertools.count()
+        self._active: Dict[str, float] = {}
+        self._workers: List[asyncio.Task] = []
+        self._recent_durations: deque = deque(maxlen=20)
+
+    # ------------------------------------------------------------------
+    # Admission
+    # ------------------------------------------------------------------
+
+    def has_capacity(self) -> bool:
+        """Whether a new job can be accepted right now."""
+        free_slots = self.max_active_jobs - len(self._active)
+        return len(self._heap) < self.max_queued + free_slots
+
+    def retry_after(self) -> int:
+        """Estimated seconds until a queue slot frees up."""
+        if self._recent_durations:
+            avg = sum(self._recent_durations) / len(self._recent_durations)
+        else:
+            avg = self.DEFAULT_JOB_SECONDS
+        waves = (len(self._heap) + 1) / self.max_active_jobs
+        return int(min(3600, max(1, math.ceil(avg * waves))))
+
+    def submit(
+        self,
+        job_id: str,
+        factory: Callable[[], Awaitable[None]],
+        priority: int = 0,
+        force: bool = False,
+    ) -> int:
+        """
+        Queue a job for execution.
+
+        Must be called from inside the running event loop.
+
+        Args:
+            job_id: Job identifier
+            factory: Zero-argument callable returning the job coroutine
+            priority: Higher values run first; equal priorities are FIFO
+            force: Queue even if the waiting queue is full (jobs recovered
+                after a restart were already admitted once)
+
+        Returns:
+            1-based position in the waiting queue
+
+        Raises:
+            QueueFullError: If the waiting queue is at capacity
+        """
+        if not force and not self.has_capacity():
+            raise QueueFullError(self.retry_after())
+
+        self._ensure_workers()
+        heapq.heappush(self._heap, (-priority, next(self._sequence), job_id))
+        self._factories[job_id] = factory
+        self._tickets.put_nowait(None)
+        return self.position(job_id) or 1
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based queue position of a waiting job, or None if not queued."""
+        if job_id not in self._factories:
+            return None
+        for index, entry in enumerate(sorted(self._heap)):
+            if entry[2] == job_id:
+                return index + 1
+        return None
+
+    # ------------------------------------------------------------------
+    # Concurrency limits used inside a running job
+    # ------------------------------------------------------------------
+
+    @asynccontextmanager
+    async def render_slot(self):
+        """Hold one render slot for the duration of the block."""
+        async with self._render_sem:
+            self._render_in_use += 1
+            try:
+                yield
+            finally:
+                self._render_in_use -= 1
+
+    @asynccontextmanager
+    async def llm_slot(self):
+        """Hold one LLM slot for the duration of the block."""
+        async with self._llm_sem:
+            self._llm_in_use += 1
+            try:
+                yield
+            finally:
+                self._llm_in_use -= 1
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of queue and slot usage for /health."""
+        return {
+            "queued": len(self._heap),
+            "active_jobs": len(self._active),
+            "max_queued": self.max_queued,
+            "max_active_jobs": self.max_active_jobs,
+            "render_slots": self.render_slots,
+            "render_in_use": self._render_in_use,
+            "llm_slots": self.llm_slots,
+            "llm_in_use": self._llm_in_use,
+        }
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def _ensure_workers(self):
+        """Start the worker tasks on first use inside the running loop."""
+        if self._tickets is None:
+            self._tickets = asyncio.Queue()
+        self._workers = [task for task in self._workers if not task.done()]
+        for _ in range(self.max_active_jobs - len(self._workers)):
+            self._workers.append(asyncio.get_running_loop().create_task(self._worker()))
+
+    async def _worker(self):
+        while True:
+            await self._tickets.get()
+            _, _, job_id = heapq.heappop(self._heap)
+            factory = self._factories.pop(job_id)
+
+            started = time.monotonic()
+            self._active[job_id] = started
+            try:
+                await factory()
+            except Exception:
+                logger.exception(f"Scheduled job {job_id[:8]}... raised")
+            finally:
+                self._active.pop(job_id, None)
+                self._recent_durations.append(time.monotonic() - started)
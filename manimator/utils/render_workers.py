@@ -0,0 +1,383 @@
+"""
+Warm Manim Worker Pool
+
+Every `manim` CLI invocation pays for Python start-up, importing manim,
+numpy, cairo and pango, and config parsing before the first frame. This
+module keeps a pool of long-lived worker processes that import manim
+once and then render scenes on request over a local pipe.
+
+Workers are recycled after a fixed number of jobs or when their resident
+memory grows past a limit, which contains leaks from generated scenes.
+
+Environment Variables:
+    MANIM_WARM_WORKERS: Set to "1" to route renders through the pool
+    MANIM_WORKERS: Number of worker processes (default: CPU count // 2)
+    MANIM_WORKER_MAX_JOBS: Jobs before a worker is recycled (default: 20)
+    MANIM_WORKER_MAX_RSS_MB: RSS above which a worker is recycled (default: 2048)
+"""
+
+import asyncio
+import importlib.util
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# manim config.quality names for the API quality levels and CLI flags
+QUALITY_NAMES = {
+    "low": "low_quality",
+    "medium": "medium_quality",
+    "high": "high_quality",
+    "ultra": "fourk_quality",
+    "-ql": "low_quality",
+    "-qm": "medium_quality",
+    "-qh": "high_quality",
+    "-qk": "fourk_quality",
+}
+
+
+class WorkerError(Exception):
+    """Raised when a render fails inside a worker or the worker dies."""
+
+    def __init__(self, message: str, logs: Optional[List[Dict[str, str]]] = None):
+        super().__init__(message)
+        self.logs = logs or []
+
+
+def warm_workers_enabled() -> bool:
+    """Whether renders should go through the warm worker pool."""
+    return os.getenv("MANIM_WARM_WORKERS", "0") == "1"
+
+
+# ============================================================================
+# Worker process side
+# ============================================================================
+
+class _LogCollector(logging.Handler):
+    """Collects manim log records for the structured response."""
+
+    def __init__(self):
+        super().__init__(level=logging.INFO)
+        self.records: List[Dict[str, str]] = []
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append({"level": record.levelname, "message": record.getMessage()})
+
+
+def _current_rss_mb() -> float:
+    """Resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def load_scene_class(code_file: str, scene_name: Optional[str], module_name: str):
+    """Import the scene module and pick the class manim's CLI would render."""
+    from manim import Scene
+
+    spec = importlib.util.spec_from_file_location(module_name, code_file)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+
+    if scene_name and isinstance(getattr(module, scene_name, None), type):
+        return getattr(module, scene_name)
+
+    # Same fallback as the CLI: the only Scene subclass defined in the file
+    scenes = [
+        obj for obj in vars(module).values()
+        if isinstance(obj, type) and issubclass(obj, Scene) and obj.__module__ == module_name
+    ]
+    if len(scenes) != 1:
+        raise ValueError(f"Scene {scene_name!r} not found in {code_file}")
+    return scenes[0]
+
+
+def _render_request(request: Dict[str, Any], job_number: int) -> Dict[str, Any]:
+    from manim import config, tempconfig
+    from manim import logger as manim_logger
+
+    collector = _LogCollector()
+    manim_logger.addHandler(collector)
+    module_name = f"manimator_warm_scene_{os.getpid()}_{job_number}"
+    started = time.monotonic()
+    try:
+        os.chdir(request["cwd"])
+        os.environ.update(request.get("env", {}))
+        with tempconfig({}):
+            config.quality = QUALITY_NAMES.get(request["quality"], request["quality"])
+            config.media_dir = request["media_dir"]
+            config.input_file = request["code_file"]
+            config.preview = False
+            config.write_to_movie = True
+            for key, value in request.get("config", {}).items():
+                setattr(config, key, value)
+
+            scene_class = load_scene_class(request["code_file"], request.get("scene_name"), module_name)
+            scene = scene_class()
+            scene.render()
+            video_path = str(scene.renderer.file_writer.movie_file_path)
+
+        return {
+            "ok": True,
+            "video_path": video_path,
+            "scene_class": scene_class.__name__,
+            "seconds": time.monotonic() - started,
+            "logs": collector.records,
+        }
+    except BaseException as e:
+        return {
+            "ok": False,
+            "error": f"{type(e).__name__}: {e}",
+            "traceback": traceback.format_exc(),
+            "seconds": time.monotonic() - started,
+            "logs": collector.records,
+        }
+    finally:
+        manim_logger.removeHandler(collector)
+        sys.modules.pop(module_name, None)
+
+
+def _worker_main(conn, cwd: str):
+    """Entry point of a worker process: import manim once, then serve requests."""
+    os.chdir(cwd)
+    import manim  # noqa: F401  (the expensive import we want to pay only once)
+    from manimator.utils.tex_cache import install as install_tex_cache
+
+    install_tex_cache()
+
+    conn.send({"ready": True, "pid": os.getpid()})
+    for job_number in itertools.count(1):
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        response = _render_request(request, job_number)
+        response["rss_mb"] = _current_rss_mb()
+        conn.send(response)
+    conn.close()
+
+
+# ============================================================================
+# Parent side
+# ============================================================================
+
+class _Worker:
+    """Handle for one worker process."""
+
+    def __init__(self, context, cwd: str):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, cwd), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs_done = 0
+        self.ready = False
+
+    def wait_ready(self, timeout: float):
+        if not self.ready:
+            if not self.conn.poll(timeout):
+                raise WorkerError("Manim worker did not start in time")
+            self.conn.recv()
+            self.ready = True
+
+    def stop(self):
+        if not self.ready:
+            # Still importing manim; it cannot read the stop message yet
+            self.process.kill()
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ManimWorkerPool:
+    """
+    Pool of warm Manim render processes.
+
+    Example:
+        >>> pool = ManimWorkerPool(size=2)
+        >>> result = pool.render("scene.py", "MyScene", "high", media_dir="media")
+        >>> print(result["video_path"])
+    """
+
+    def __init__(
+        self,
+        size: int,
+        cwd: Optional[Path] = None,
+        max_jobs_per_worker: int = 20,
+        max_rss_mb: float = 2048,
+        start_timeout: float = 120,
+    ):
+        """
+        Initialize the pool. Workers are started lazily on first use.
+
+        Args:
+            size: Number of worker processes
+            cwd: Default working directory for renders
+            max_jobs_per_worker: Jobs before a worker is replaced
+            max_rss_mb: Resident memory above which a worker is replaced
+            start_timeout: Seconds to wait for a worker to import manim
+        """
+        self.size = max(1, size)
+        self.cwd = str(cwd or Path.cwd())
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_rss_mb = max_rss_mb
+        self.start_timeout = start_timeout
+
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[Optional[_Worker]]" = queue.Queue()
+        for _ in range(self.size):
+            self._idle.put(None)  # placeholder, replaced by a real worker on first use
+        self._lock = threading.Lock()
+        self.stats = {"jobs": 0, "failures": 0, "recycled": 0, "started": 0}
+
+    def _spawn(self) -> _Worker:
+        with self._lock:
+            self.stats["started"] += 1
+        return _Worker(self._context, self.cwd)
+
+    def _retire(self, worker: _Worker, reason: str):
+        logger.info(f"♻️  Recycling manim worker {worker.process.pid} ({reason})")
+        with self._lock:
+            self.stats["recycled"] += 1
+        worker.stop()
+
+    def render(
+        self,
+        code_file: str,
+        scene_name: Optional[str],
+        quality: str,
+        media_dir: str,
+        cwd: Optional[str] = None,
+        timeout: Optional[float] = None,
+        config: Optional[Dict[str, Any]] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Render a scene on an idle worker (blocks until a worker is free).
+
+        Args:
+            code_file: Path to the scene file
+            scene_name: Scene class name (falls back to the only Scene in the file)
+            quality: "low"/"medium"/"high"/"ultra" or a CLI flag like "-qh"
+            media_dir: manim media directory
+            cwd: Working directory for the render (defaults to the pool's)
+            timeout: Seconds before the worker is killed
+            config: Extra manim config attributes to set for this render
+            env: Environment variables to set in the worker (e.g. PATH for LaTeX)
+
+        Returns:
+            Dictionary with video_path, scene_class, seconds, rss_mb and logs
+
+        Raises:
+            WorkerError: If the render fails or the worker dies
+        """
+        request = {
+            "code_file": str(Path(code_file).resolve()),
+            "scene_name": scene_name,
+            "quality": quality,
+            "media_dir": str(Path(media_dir).resolve()),
+            "cwd": str(cwd or self.cwd),
+            "config": config or {},
+            "env": env or {},
+        }
+
+        response: Dict[str, Any] = {}
+        worker = self._idle.get()
+        try:
+            if worker is None:
+                worker = self._spawn()
+            worker.wait_ready(self.start_timeout)
+
+            worker.conn.send(request)
+            if not worker.conn.poll(timeout):
+                worker.process.kill()
+                self._retire(worker, "timeout")
+                worker = None
+                with self._lock:
+                    self.stats["failures"] += 1
+                raise WorkerError(f"Render timed out after {timeout} seconds")
+            response = worker.conn.recv()
+        except (EOFError, OSError, BrokenPipeError) as e:
+            if worker is not None:
+                self._retire(worker, "crashed")
+            worker = None
+            with self._lock:
+                self.stats["failures"] += 1
+            raise WorkerError(f"Manim worker died during render: {e}")
+        finally:
+            if worker is not None:
+                worker.jobs_done += 1
+                rss = response.get("rss_mb", 0)
+                if worker.jobs_done >= self.max_jobs_per_worker:
+                    self._retire(worker, f"{worker.jobs_done} jobs")
+                    worker = None
+                elif rss > self.max_rss_mb:
+                    self._retire(worker, f"RSS {rss:.0f} MB")
+                    worker = None
+            self._idle.put(worker)
+
+        with self._lock:
+            self.stats["jobs"] += 1
+            if not response["ok"]:
+                self.stats["failures"] += 1
+        if not response["ok"]:
+            raise WorkerError(
+                f"Manim rendering failed: {response['error']}\n{response.get('traceback', '')}",
+                logs=response.get("logs"),
+            )
+        return response
+
+    async def render_async(self, *args, **kwargs) -> Dict[str, Any]:
+        """Async wrapper around render() that runs it on a thread."""
+        return await asyncio.to_thread(self.render, *args, **kwargs)
+
+    def shutdown(self):
+        """Stop all idle workers."""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.stop()
+
+
+_pool: Optional[ManimWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool(cwd: Optional[Path] = None) -> ManimWorkerPool:
+    """Process-wide worker pool configured from the environment."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ManimWorkerPool(
+                size=int(os.getenv("MANIM_WORKERS", max(1, (os.cpu_count() or 2) // 2))),
+                cwd=cwd,
+                max_jobs_per_worker=int(os.getenv("MANIM_WORKER_MAX_JOBS", "20")),
+                max_rss_mb=float(os.getenv("MANIM_WORKER_MAX_RSS_MB", "2048")),
+            )
+        return _pool
@@ -6,6 +6,9 @@ from contextlib import contextmanager
 from typing import Optional
 from fastapi import HTTPException
 
+from manimator.utils.render_workers import WorkerError, get_worker_pool, warm_workers_enabled
+from manimator.utils.tex_cache import manim_command
+
 
 class ManimProcessor:
     """Handles Manim animation processing, including code extraction and video rendering.
@@ -87,8 +90,7 @@ class ManimProcessor:
             HTTPException: If rendering fails with status code 500
         """
 
-        cmd = [
-            "manim",
+        cmd = manim_command() + [
             "-pqh",
             "--media_dir",
             temp_dir,
@@ -103,10 +105,19 @@ class ManimProcessor:
             env["PATH"] = f"{latex_path}:{env.get('PATH', '')}"
 
         try:
-            subprocess.run(cmd, check=True, capture_output=True, text=True, env=env)
-            video_path = os.path.join(
-                temp_dir, "videos", "scene", "1080p60", f"{scene_name}.mp4"
-            )
+            if warm_workers_enabled():
+                try:
+                    result = get_worker_pool().render(
+                        scene_file, scene_name, "high", media_dir=temp_dir, env={"PATH": env["PATH"]}
+                    )
+                except WorkerError as e:
+                    raise HTTPException(status_code=500, detail=f"Render error: {e}")
+                video_path = result["video_path"]
+            else:
+                subprocess.run(cmd, check=True, capture_output=True, text=True, env=env)
+                video_path = os.path.join(
+                    temp_dir, "videos", "scene", "1080p60", f"{scene_name}.mp4"
+                )
 
             if not os.path.exists(video_path):
                 return None
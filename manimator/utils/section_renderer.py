@@ -0,0 +1,508 @@
+"""
+Section-Parallel Renderer
+
+Generated scenes are a construct() that calls 8-12 independent section
+methods one after another. This module splits such a scene into one
+subclass per section, renders the sections as separate `manim` processes
+in parallel, and joins the resulting MP4s (video + voiceover audio) with
+ffmpeg's concat demuxer without re-encoding.
+
+Scenes whose sections share state (locals in construct, instance
+attributes written in one section and read in another, camera moves,
+statements between section calls) are reported as not splittable so the
+caller can fall back to a normal serial render. Each section is assumed
+to clean up the screen before the next one starts, which the generation
+prompt already requires.
+
+Rendered sections are cached under a fingerprint of the section method's
+source plus everything it can depend on (module code, helper methods,
+construct preamble, quality). When the verification loop edits a scene,
+only sections whose fingerprint changed are re-rendered; the rest are
+spliced back in from the cache in their original order. The cache is per
+scene file and only useful while its job runs; remove_section_files()
+deletes it together with the generated sections module.
+"""
+
+import ast
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import textwrap
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from manimator.utils.tex_cache import manim_command
+from manimator.utils.tracing import child_process, span
+
+logger = logging.getLogger(__name__)
+
+SCENE_BASES = {"VoiceoverScene", "Scene", "MovingCameraScene", "ThreeDScene", "ZoomedScene"}
+
+# Camera state persists from one section into the next
+CAMERA_METHODS = {
+    "set_camera_orientation", "move_camera", "begin_ambient_camera_rotation",
+    "stop_ambient_camera_rotation", "begin_3dillusion_camera_rotation",
+}
+
+
+class SectionRenderError(Exception):
+    """Raised when a section fails to render or the parts cannot be joined."""
+
+
+@dataclass
+class SceneSections:
+    """Result of splitting a scene into its top-level section methods."""
+    class_name: Optional[str]
+    sections: List[str] = field(default_factory=list)
+    preamble: List[str] = field(default_factory=list)
+    splittable: bool = False
+    reason: str = ""
+    # Source of each section method, and of everything the sections share
+    sources: Dict[str, str] = field(default_factory=dict)
+    shared_source: str = ""
+
+    def fingerprint(self, section: str, salt: str = "") -> str:
+        """Content hash of one section and everything it depends on."""
+        payload = "\0".join([self.shared_source, self.sources.get(section, ""), salt])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+@dataclass
+class SectionRenderResult:
+    """Output of a section-parallel render."""
+    video_path: Path
+    sections: List[str]
+    reused: List[str] = field(default_factory=list)
+    rerendered: List[str] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, List[str]]:
+        return {"sections": self.sections, "reused": self.reused, "rerendered": self.rerendered}
+
+
+def _base_names(node: ast.ClassDef) -> Set[str]:
+    names = set()
+    for base in node.bases:
+        if isinstance(base, ast.Name):
+            names.add(base.id)
+        elif isinstance(base, ast.Attribute):
+            names.add(base.attr)
+    return names
+
+
+def _self_call(stmt: ast.stmt) -> Optional[ast.Call]:
+    """Return the call if stmt is a bare `self.<name>(...)` expression."""
+    if not isinstance(stmt, ast.Expr) or not isinstance(stmt.value, ast.Call):
+        return None
+    func = stmt.value.func
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == "self":
+        return stmt.value
+    return None
+
+
+def _self_attributes(node: ast.AST) -> Dict[str, Set[str]]:
+    """Instance attributes stored and loaded inside a method."""
+    stores, loads = set(), set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Attribute) and isinstance(child.value, ast.Name) and child.value.id == "self":
+            if isinstance(child.ctx, ast.Store):
+                stores.add(child.attr)
+            else:
+                loads.add(child.attr)
+    return {"stores": stores, "loads": loads}
+
+
+def find_scene_class(tree: ast.Module, scene_name: Optional[str] = None) -> Optional[ast.ClassDef]:
+    """Find the scene class by name, else the first Scene subclass in the module."""
+    classes = [node for node in tree.body if isinstance(node, ast.ClassDef)]
+    if scene_name:
+        for node in classes:
+            if node.name == scene_name:
+                return node
+    for node in classes:
+        if "VoiceoverScene" in _base_names(node):
+            return node
+    for node in classes:
+        if _base_names(node) & SCENE_BASES:
+            return node
+    return None
+
+
+def split_scene(code: str, scene_name: Optional[str] = None) -> SceneSections:
+    """
+    Split a scene into its top-level section methods.
+
+    Args:
+        code: Scene source code
+        scene_name: Scene class name (the first Scene subclass is used if
+            the name does not match a class in the code)
+
+    Returns:
+        SceneSections describing the sections and whether they can be
+        rendered independently
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return SceneSections(class_name=None, reason=f"syntax error: {e.msg}")
+
+    cls = find_scene_class(tree, scene_name)
+    if cls is None:
+        return SceneSections(class_name=None, reason="no Scene subclass found")
+
+    methods = {
+        node.name: node for node in cls.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+    }
+    result = SceneSections(class_name=cls.name)
+    construct = methods.get("construct")
+    if construct is None:
+        result.reason = "scene has no construct()"
+        return result
+
+    for stmt in construct.body:
+        call = _self_call(stmt)
+        is_section = (
+            call is not None
+            and call.func.attr in methods
+            and call.func.attr != "construct"
+            and not call.args
+            and not call.keywords
+        )
+        if is_section:
+            result.sections.append(call.func.attr)
+        elif call is not None and not result.sections and call.func.attr not in methods:
+            # Setup such as self.set_speech_service(...) before the first section
+            result.preamble.append(ast.get_source_segment(code, stmt))
+        elif isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant):
+            continue  # docstring
+        else:
+            result.reason = f"construct() line {stmt.lineno} is not a section call"
+            return result
+
+    if len(result.sections) < 2:
+        result.reason = "fewer than two section methods"
+        return result
+    if len(set(result.sections)) != len(result.sections):
+        result.reason = "a section method is called more than once"
+        return result
+
+    # Sections must not hand state to each other through self.<attr> or the camera
+    attributes = {name: _self_attributes(methods[name]) for name in result.sections}
+    for name, attrs in attributes.items():
+        camera = attrs["loads"] & (CAMERA_METHODS | {"camera"})
+        if camera:
+            result.reason = f"{name}() changes camera state via self.{sorted(camera)[0]}"
+            return result
+        for other, other_attrs in attributes.items():
+            shared = attrs["stores"] & (other_attrs["loads"] - set(methods))
+            if other != name and shared:
+                result.reason = f"{other}() reads self.{sorted(shared)[0]} set by {name}()"
+                return result
+
+    # Split the source into per-section text and the shared remainder
+    lines = code.splitlines()
+    owned = set()
+    for name in result.sections + ["construct"]:
+        node = methods[name]
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        owned.update(range(start - 1, node.end_lineno))
+        if name != "construct":
+            result.sources[name] = "\n".join(lines[start - 1:node.end_lineno])
+    shared = [line for index, line in enumerate(lines) if index not in owned]
+    result.shared_source = "\n".join(shared + result.preamble)
+
+    result.splittable = True
+    return result
+
+
+def diff_sections(old_code: str, new_code: str, scene_name: Optional[str] = None) -> Dict[str, object]:
+    """
+    Compare two versions of a scene section by section.
+
+    Returns:
+        Dictionary with "changed" and "unchanged" section names,
+        "shared_changed" (True if code outside the sections changed, which
+        invalidates every section) and "splittable"
+    """
+    old, new = split_scene(old_code, scene_name), split_scene(new_code, scene_name)
+    if not (old.splittable and new.splittable):
+        return {"splittable": False, "changed": new.sections, "unchanged": [], "shared_changed": True}
+
+    shared_changed = old.shared_source != new.shared_source
+    changed, unchanged = [], []
+    for section in new.sections:
+        if not shared_changed and old.sources.get(section) == new.sources[section]:
+            unchanged.append(section)
+        else:
+            changed.append(section)
+    return {"splittable": True, "changed": changed, "unchanged": unchanged, "shared_changed": shared_changed}
+
+
+def section_class_name(index: int, section: str) -> str:
+    """Class name used for the subclass that renders one section."""
+    return f"Section{index:02d}_{section}"
+
+
+def build_sections_module(code: str, sections: SceneSections) -> str:
+    """
+    Append one subclass per section to the scene code.
+
+    Each subclass overrides construct() to run the original preamble and
+    then a single section method.
+    """
+    preamble = "\n".join(textwrap.dedent(line) for line in sections.preamble)
+    parts = [code.rstrip(), "", "", "# --- Section subclasses generated for parallel rendering ---"]
+    for index, section in enumerate(sections.sections):
+        body = f"{preamble}\nself.{section}()" if preamble else f"self.{section}()"
+        parts.append(
+            f"\n\nclass {section_class_name(index, section)}({sections.class_name}):\n"
+            f"    def construct(self):\n"
+            f"{textwrap.indent(body, ' ' * 8)}\n"
+        )
+    return "\n".join(parts)
+
+
+def remove_section_files(code_file: Path, videos_dir: Path) -> None:
+    """
+    Delete what section renders of a scene file left behind.
+
+    Removes the generated scene_<id>__sections.py module and its
+    media/videos/scene_<id>__sections directory (section renders and the
+    section cache). The joined video is not touched.
+
+    Args:
+        code_file: Scene source file the sections were split from
+        videos_dir: manim's media/videos directory
+    """
+    code_file = Path(code_file)
+    stem = f"{code_file.stem}__sections"
+    code_file.with_name(f"{stem}.py").unlink(missing_ok=True)
+    shutil.rmtree(Path(videos_dir) / stem, ignore_errors=True)
+
+
+async def _run(
+    cmd: List[str],
+    cwd: Path,
+    env: Optional[Dict[str, str]] = None,
+    merge_stderr: bool = True,
+) -> str:
+    """
+    Run a command and return its output.
+
+    Args:
+        cmd: Command and arguments
+        cwd: Working directory
+        env: Environment (default: inherited)
+        merge_stderr: Return stderr interleaved with stdout; set to False
+            when stdout is parsed, so warnings cannot corrupt it
+
+    Raises:
+        SectionRenderError: If the command exits with a non-zero status
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT if merge_stderr else asyncio.subprocess.PIPE,
+        cwd=str(cwd),
+        env=env,
+    )
+    async with child_process(process.pid):
+        output, errors = await process.communicate()
+    text = output.decode("utf-8", errors="replace")
+    if process.returncode != 0:
+        log = text if merge_stderr else errors.decode("utf-8", errors="replace")
+        tail = "\n".join(log.strip().splitlines()[-20:])
+        raise SectionRenderError(f"{cmd[0]} exited with {process.returncode}:\n{tail}")
+    return text
+
+
+@asynccontextmanager
+async def _no_slot():
+    yield
+
+
+class SectionRenderer:
+    """
+    Render a scene section by section across parallel `manim` processes.
+
+    Example:
+        >>> renderer = SectionRenderer(cwd=BASE_DIR, videos_dir=BASE_DIR / "media" / "videos")
+        >>> result = await renderer.render(code_file, "-qh", "1080p60")
+        >>> if result is None:
+        ...     video = await render_serially()
+        >>> print(result.reused, result.rerendered)
+    """
+
+    def __init__(
+        self,
+        cwd: Path,
+        videos_dir: Path,
+        max_workers: Optional[int] = None,
+        slot: Optional[Callable] = None,
+        env: Optional[Dict[str, str]] = None,
+    ):
+        """
+        Initialize the renderer.
+
+        Args:
+            cwd: Working directory for manim (relative asset paths resolve here)
+            videos_dir: manim's media/videos directory
+            max_workers: Sections rendered at once (defaults to CPU count)
+            slot: Optional async context manager factory acquired around each
+                section process, e.g. RenderScheduler.render_slot
+            env: Environment for the manim and ffmpeg processes
+        """
+        self.cwd = Path(cwd)
+        self.videos_dir = Path(videos_dir)
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self.slot = slot or _no_slot
+        self.env = env
+
+    async def render(
+        self,
+        code_file: Path,
+        quality_flag: str,
+        quality_dir: str,
+        scene_name: Optional[str] = None,
+    ) -> Optional[SectionRenderResult]:
+        """
+        Render the scene in parallel sections and join them.
+
+        Sections whose fingerprint matches a previous render of the same
+        scene file are reused instead of being rendered again.
+
+        Args:
+            code_file: Scene source file
+            quality_flag: manim quality flag, e.g. "-pqh" (preview is dropped)
+            quality_dir: manim's output subdirectory for that quality, e.g. "1080p60"
+            scene_name: Scene class name hint
+
+        Returns:
+            SectionRenderResult with the joined MP4 and which sections were
+            reused, or None if the scene cannot be split (the caller should
+            render serially)
+
+        Raises:
+            SectionRenderError: If a section fails to render or join
+        """
+        code_file = Path(code_file)
+        code = code_file.read_text()
+        sections = split_scene(code, scene_name)
+        if not sections.splittable:
+            logger.info(f"  ├─ Section-parallel render not possible ({sections.reason}), rendering serially")
+            return None
+
+        sections_file = code_file.with_name(f"{code_file.stem}__sections.py")
+        flag = "-" + quality_flag.lstrip("-").replace("p", "")
+        output_dir = self.videos_dir / sections_file.stem / quality_dir
+        cache_dir = output_dir / "section_cache"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        result = SectionRenderResult(video_path=Path(), sections=list(sections.sections))
+        cached_parts: Dict[str, Path] = {}
+        for section in sections.sections:
+            cached = cache_dir / f"{sections.fingerprint(section, flag)}.mp4"
+            if cached.exists():
+                cached_parts[section] = cached
+                result.reused.append(section)
+            else:
+                result.rerendered.append(section)
+
+        if result.rerendered:
+            sections_file.write_text(build_sections_module(code, sections))
+            logger.info(
+                f"  ├─ Rendering {len(result.rerendered)}/{len(sections.sections)} sections "
+                f"with up to {self.max_workers} parallel processes"
+            )
+        if result.reused:
+            logger.info(f"  ├─ Reusing {len(result.reused)} unchanged sections: {', '.join(result.reused)}")
+
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def render_one(section: str) -> None:
+            class_name = section_class_name(sections.sections.index(section), section)
+            async with semaphore, self.slot():
+                with span("section_render", section=class_name):
+                    await _run(manim_command() + [flag, str(sections_file), class_name], self.cwd, self.env)
+            rendered = output_dir / f"{class_name}.mp4"
+            if not rendered.exists():
+                raise SectionRenderError(f"Section video not found: {rendered}")
+            cached = cache_dir / f"{sections.fingerprint(section, flag)}.mp4"
+            os.replace(rendered, cached)
+            cached_parts[section] = cached
+            logger.info(f"  ├─ Section {class_name} rendered")
+
+        await asyncio.gather(*(render_one(section) for section in result.rerendered))
+
+        parts = [cached_parts[section] for section in sections.sections]
+        result.video_path = self.videos_dir / code_file.stem / quality_dir / f"{sections.class_name}.mp4"
+        await self.concat(parts, result.video_path)
+        return result
+
+    async def concat(self, parts: List[Path], output: Path) -> Path:
+        """
+        Join MP4 parts with the concat demuxer (stream copy, no re-encode).
+
+        Parts without an audio track get a silent one (audio-only encode)
+        so every part has the same stream layout.
+        """
+        missing = [part for part in parts if not part.exists()]
+        if missing:
+            raise SectionRenderError(f"Section video not found: {missing[0]}")
+
+        with span("ffmpeg_concat", parts=len(parts)):
+            return await self._concat(parts, output)
+
+    async def _concat(self, parts: List[Path], output: Path) -> Path:
+        audio = [await self._audio_format(part) for part in parts]
+        reference = next((fmt for fmt in audio if fmt), None)
+        if reference:
+            parts = [
+                part if fmt else await self._add_silence(part, *reference)
+                for part, fmt in zip(parts, audio)
+            ]
+
+        output.parent.mkdir(parents=True, exist_ok=True)
+        list_file = output.with_suffix(".concat.txt")
+        list_file.write_text("".join(f"file '{part.resolve()}'\n" for part in parts))
+        await _run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+             "-i", str(list_file), "-c", "copy", "-movflags", "+faststart", str(output)],
+            self.cwd, self.env,
+        )
+        list_file.unlink(missing_ok=True)
+        logger.info(f"  └─ Joined {len(parts)} sections into {output.name}")
+        return output
+
+    async def _audio_format(self, path: Path) -> Optional[tuple]:
+        """(sample_rate, channels) of the first audio stream, or None."""
+        output = await _run(
+            ["ffprobe", "-v", "error", "-select_streams", "a:0",
+             "-show_entries", "stream=sample_rate,channels", "-of", "json", str(path)],
+            self.cwd, self.env, merge_stderr=False,
+        )
+        try:
+            streams = json.loads(output or "{}").get("streams", [])
+        except ValueError as e:
+            raise SectionRenderError(f"Unreadable ffprobe output for {path.name}: {e}")
+        if not streams:
+            return None
+        return int(streams[0]["sample_rate"]), int(streams[0]["channels"])
+
+    async def _add_silence(self, path: Path, sample_rate: int, channels: int) -> Path:
+        padded = path.with_name(f"{path.stem}_silent.mp4")
+        if padded.exists():
+            return padded
+        layout = "mono" if channels == 1 else "stereo"
+        await _run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-i", str(path),
+             "-f", "lavfi", "-i", f"anullsrc=r={sample_rate}:cl={layout}",
+             "-shortest", "-c:v", "copy", "-c:a", "aac", str(padded)],
+            self.cwd, self.env,
+        )
+        return padded
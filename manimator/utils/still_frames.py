@@ -0,0 +1,265 @@
+"""
+Still-Frame Renderer
+
+Renders only the stills a layout check needs, without encoding any video.
+
+The scene runs in the layout probe harness (see layout_probe): animations
+are skipped to their end state, voiceovers are stubbed, and no movie file
+or ffmpeg encoder is ever started. After every `play()` the camera draws
+the current scene once and the frame is written as a PNG (or a raw .npy
+array). Optionally the state right before each `play()` is captured too.
+Waits are skipped since their last frame matches the previous play's.
+
+A manifest of the frames is printed after REPORT_MARKER so the parent can
+hand the PNGs straight to VisualLayoutAnalyzer instead of extracting them
+from a rendered video.
+
+Usage:
+    python -m manimator.utils.still_frames scene.py SceneName out_dir [--first] [--format npy]
+
+Environment Variables:
+    STILL_FRAMES_MAX: Frames the API's verification step sends on per pass
+        (default: 12, evenly sampled, always including the last)
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from manimator.utils.layout_probe import REPORT_MARKER
+from manimator.utils.tracing import child_process
+
+FORMATS = ("png", "npy")
+
+
+class StillFrameError(Exception):
+    """Raised when the scene cannot be constructed or no frames were written."""
+
+
+# ============================================================================
+# Renderer side (runs inside the subprocess, imports manim)
+# ============================================================================
+
+def run_still_frames(
+    code_file: str,
+    scene_name: Optional[str],
+    out_dir: str,
+    quality: str = "low",
+    first: bool = False,
+    fmt: str = "png",
+) -> Dict[str, Any]:
+    """
+    Construct the scene and write one still per animation boundary.
+
+    Args:
+        code_file: Scene file
+        scene_name: Scene class name (falls back to the only Scene in the file)
+        out_dir: Directory for the frames
+        quality: Quality tier whose resolution the frames use
+        first: Also capture the state before each play()
+        fmt: "png" or "npy"
+
+    Returns:
+        Manifest with "frames" ({"file", "step", "position", "time"}),
+        "steps", "resolution" and "seconds"
+    """
+    import numpy as np
+
+    from manimator.utils.layout_probe import instrument_scene, probe_config, stub_voiceover
+    from manimator.utils.render_workers import QUALITY_NAMES, load_scene_class
+    from manimator.utils.tex_cache import install as install_tex_cache
+
+    started = time.monotonic()
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    frames: List[Dict[str, Any]] = []
+
+    def capture(scene, kind: str, index: int, position: str):
+        if kind == "wait":
+            return
+        # update_frame draws even while animations are skipped
+        scene.renderer.update_frame(scene)
+        pixels = np.asarray(scene.renderer.get_frame())
+        name = f"frame_{index:04d}_{position}.{fmt}"
+        if fmt == "npy":
+            np.save(out / name, pixels[..., :3])
+        else:
+            from PIL import Image
+            Image.fromarray(pixels[..., :3]).save(out / name, compress_level=1)
+        frames.append({"file": name, "step": index, "position": position, "time": round(scene.probe_time, 2)})
+
+    with probe_config() as config, stub_voiceover():
+        config.quality = QUALITY_NAMES.get(quality, quality)
+        install_tex_cache()
+        scene_class = load_scene_class(str(Path(code_file).resolve()), scene_name, "manimator_still_frames_scene")
+        scene = instrument_scene(
+            scene_class,
+            lambda scene, kind, index: capture(scene, kind, index, "last"),
+            (lambda scene, kind, index: capture(scene, kind, index, "first")) if first else None,
+        )(skip_animations=True)
+        scene.render()
+        resolution = [config.pixel_width, config.pixel_height]
+
+    return {
+        "frames": frames,
+        "steps": scene.probe_steps,
+        "resolution": resolution,
+        "seconds": round(time.monotonic() - started, 2),
+    }
+
+
+# ============================================================================
+# Parent side
+# ============================================================================
+
+def _command(code_file: Path, scene_name: Optional[str], out_dir: Path, quality: str, first: bool, fmt: str) -> List[str]:
+    cmd = [
+        sys.executable, "-m", "manimator.utils.still_frames",
+        str(code_file), scene_name or "", str(out_dir),
+        "--quality", quality, "--format", fmt,
+    ]
+    if first:
+        cmd.append("--first")
+    return cmd
+
+
+def _parse_output(output: str, returncode: int, out_dir: Path) -> Dict[str, Any]:
+    if REPORT_MARKER not in output:
+        tail = "\n".join(output.strip().splitlines()[-20:])
+        raise StillFrameError(f"Still-frame render exited with {returncode}:\n{tail}")
+    # The manifest is the line after the marker; later output is not part of it
+    lines = output.rsplit(REPORT_MARKER, 1)[1].strip().splitlines()
+    try:
+        manifest = json.loads(lines[0])
+    except (IndexError, ValueError) as e:
+        raise StillFrameError(f"Unreadable still-frame manifest: {e}") from e
+    frames = manifest.get("frames") if isinstance(manifest, dict) else None
+    if not isinstance(frames, list) or not all(isinstance(frame, dict) and "file" in frame for frame in frames):
+        raise StillFrameError(f"Still-frame manifest has no frame list: {lines[0][:200]}")
+    if not manifest["frames"]:
+        raise StillFrameError("Scene played no animations, no frames were written")
+    for frame in manifest["frames"]:
+        frame["path"] = str(Path(out_dir) / frame["file"])
+    return manifest
+
+
+def render_still_frames(
+    code_file: Path,
+    scene_name: Optional[str],
+    out_dir: Path,
+    quality: str = "low",
+    first: bool = False,
+    fmt: str = "png",
+    cwd: Optional[Path] = None,
+    timeout: float = 300,
+) -> Dict[str, Any]:
+    """
+    Render still frames in a subprocess.
+
+    Args:
+        code_file: Scene file
+        scene_name: Scene class name
+        out_dir: Directory for the frames (created if missing)
+        quality: Quality tier for the frame resolution ("low", "medium", ...)
+        first: Also capture the state before each play()
+        fmt: "png" or "npy"
+        cwd: Working directory (so relative assets resolve as in the render)
+        timeout: Seconds before the render is killed
+
+    Returns:
+        Manifest (see run_still_frames); each frame also gets an absolute "path"
+
+    Raises:
+        StillFrameError: If the scene fails to construct or plays nothing
+    """
+    out_dir = Path(out_dir).resolve()
+    try:
+        result = subprocess.run(
+            _command(code_file, scene_name, out_dir, quality, first, fmt),
+            cwd=str(cwd) if cwd else None,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        raise StillFrameError(f"Still-frame render timed out after {timeout} seconds")
+    return _parse_output(result.stdout + result.stderr, result.returncode, out_dir)
+
+
+async def render_still_frames_async(
+    code_file: Path,
+    scene_name: Optional[str],
+    out_dir: Path,
+    quality: str = "low",
+    first: bool = False,
+    fmt: str = "png",
+    cwd: Optional[Path] = None,
+    timeout: float = 300,
+) -> Dict[str, Any]:
+    """Async version of render_still_frames."""
+    out_dir = Path(out_dir).resolve()
+    process = await asyncio.create_subprocess_exec(
+        *_command(code_file, scene_name, out_dir, quality, first, fmt),
+        cwd=str(cwd) if cwd else None,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    try:
+        async with child_process(process.pid):
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise StillFrameError(f"Still-frame render timed out after {timeout} seconds")
+    return _parse_output(stdout.decode("utf-8", errors="replace"), process.returncode, out_dir)
+
+
+def sample_frames(frames: List[Dict[str, Any]], max_frames: int) -> List[Dict[str, Any]]:
+    """
+    Evenly pick at most max_frames frames, always keeping the last one.
+
+    Args:
+        frames: Manifest frames in scene order
+        max_frames: Upper bound (0 keeps all)
+
+    Returns:
+        Selected frames in scene order
+    """
+    if max_frames <= 0 or len(frames) <= max_frames:
+        return list(frames)
+    if max_frames == 1:
+        return [frames[-1]]
+    step = (len(frames) - 1) / (max_frames - 1)
+    return [frames[round(i * step)] for i in range(max_frames)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render still frames at animation boundaries")
+    parser.add_argument("code_file")
+    parser.add_argument("scene_name", help="Scene class name ('' picks the only Scene in the file)")
+    parser.add_argument("out_dir")
+    parser.add_argument("--quality", default="low")
+    parser.add_argument("--first", action="store_true", help="Also capture the state before each play()")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    args = parser.parse_args()
+
+    try:
+        manifest = run_still_frames(
+            args.code_file, args.scene_name or None, args.out_dir,
+            quality=args.quality, first=args.first, fmt=args.format,
+        )
+    except Exception:
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    print(REPORT_MARKER)
+    print(json.dumps(manifest))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Incremental Scene Parser
+
+Follows a code generation stream line by line and reports problems while
+the model is still writing.
+
+Generated scenes are one VoiceoverScene subclass whose construct() calls
+8-12 section methods (see section_renderer). The parser keeps track of
+which class and method each completed line belongs to. A method is
+finished once a later line starts at or left of its `def`. At that point
+its source is parsed on its own, so a syntax error is caught when the
+method ends rather than after the whole file. Finished methods are handed
+to a callback, so later stages can start on them early (see
+section_prefetch).
+
+The stream is aborted with StreamAbort when:
+
+- a scene class (one whose bases end in "Scene") does not subclass the
+  required base, e.g. `class Intro(Scene)` instead of VoiceoverScene
+- a finished method does not parse, or a new `def` starts while one of
+  its brackets is still open
+- the finished file does not parse or has no scene class with the base
+
+A small lexer tracks strings and brackets, so lines inside multi-line
+strings or open calls never count as structure.
+"""
+
+import ast
+import re
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+_CLASS = re.compile(r"class\s+(\w+)\s*(?:\((.*)\))?\s*:")
+_DEF = re.compile(r"(?:async\s+)?def\s+(\w+)\s*\(")
+
+
+class StreamAbort(Exception):
+    """Raised when the stream shows a structure the pipeline cannot use."""
+
+
+@dataclass
+class StreamedMethod:
+    """A method whose source is complete; source is dedented to column 0."""
+    class_name: str
+    name: str
+    source: str
+    line: int
+
+
+def _scan(line: str, depth: int, quote: Optional[str]) -> Tuple[int, Optional[str]]:
+    """
+    Update bracket depth and open triple-quote state across one line.
+
+    Single-quoted strings and comments end with the line; only triple
+    quotes and brackets carry over.
+    """
+    i, n = 0, len(line)
+    while i < n:
+        if quote:
+            if line.startswith("\\", i):
+                i += 2
+                continue
+            if line.startswith(quote, i):
+                i += len(quote)
+                quote = None
+                continue
+            if len(quote) == 1 and i == n - 1:
+                # Unterminated single-quoted string (backslash continuation)
+                return depth, None
+            i += 1
+            continue
+        char = line[i]
+        if char == "#":
+            break
+        if char in "\"'":
+            triple = line[i:i + 3]
+            quote = triple if triple in ('"""', "'''") else char
+            i += len(quote)
+            continue
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth = max(0, depth - 1)
+        i += 1
+    if quote and len(quote) == 1:
+        quote = None
+    return depth, quote
+
+
+class IncrementalSceneParser:
+    """
+    Line-based structure tracker for streamed scene code.
+
+    Example:
+        >>> parser = IncrementalSceneParser(on_method=print)
+        >>> for delta in stream:
+        ...     parser.feed(delta)   # may raise StreamAbort
+        >>> code = parser.finish()
+    """
+
+    def __init__(
+        self,
+        on_method: Optional[Callable[[StreamedMethod], None]] = None,
+        required_base: str = "VoiceoverScene",
+    ):
+        """
+        Initialize the parser.
+
+        Args:
+            on_method: Called with every finished method, in order
+            required_base: Base class every scene class must list
+        """
+        self.on_method = on_method
+        self.required_base = required_base
+        self.lines: List[str] = []
+        self.methods: List[StreamedMethod] = []
+        self.scene_classes: List[str] = []
+
+        self._pending = ""
+        self._started = False
+        self._fenced = False
+        self._done = False
+        self._depth = 0
+        self._quote: Optional[str] = None
+        self._class: Optional[Tuple[str, int]] = None
+        self._method: Optional[Tuple[str, int, int]] = None  # name, indent, first line
+
+    @property
+    def code(self) -> str:
+        """Code received so far (inside the ```python fence, if any)."""
+        return "\n".join(self.lines)
+
+    def feed(self, delta: str) -> List[StreamedMethod]:
+        """
+        Consume a chunk of the stream.
+
+        Returns:
+            Methods finished by this chunk
+
+        Raises:
+            StreamAbort: If the structure is already unusable
+        """
+        self._pending += delta
+        *complete, self._pending = self._pending.split("\n")
+        finished = []
+        for line in complete:
+            finished.extend(self._line(line))
+        return finished
+
+    def finish(self) -> str:
+        """
+        Flush the last line and validate the whole file.
+
+        Returns:
+            The code
+
+        Raises:
+            StreamAbort: If a method or the file does not parse, or no
+                scene class subclasses the required base
+        """
+        if self._pending:
+            self._line(self._pending)
+            self._pending = ""
+        self._close_method(len(self.lines))
+        code = self.code
+        try:
+            ast.parse(code)
+        except SyntaxError as e:
+            raise StreamAbort(f"generated code does not parse: {e.msg} (line {e.lineno})")
+        if not self.scene_classes:
+            raise StreamAbort(f"no {self.required_base} subclass in the generated code")
+        return code
+
+    # ------------------------------------------------------------------
+
+    def _line(self, line: str) -> List[StreamedMethod]:
+        if self._done:
+            return []
+        stripped = line.strip()
+        if not self._started:
+            if stripped.startswith("```"):
+                self._started = self._fenced = True
+            elif stripped.startswith(("from ", "import ", "class ", "#", "def ")):
+                # The model skipped the fence; everything from here is code
+                self._started = True
+                return self._code_line(line)
+            return []
+        if self._fenced and "```" in line and self._quote is None:
+            # Closing fence, possibly right after the last line of code
+            self._done = True
+            before = line.split("```", 1)[0]
+            return self._code_line(before) if before.strip() else []
+        return self._code_line(line)
+
+    def _code_line(self, line: str) -> List[StreamedMethod]:
+        index = len(self.lines)
+        self.lines.append(line)
+        structural = self._depth == 0 and self._quote is None
+        self._depth, self._quote = _scan(line, self._depth, self._quote)
+
+        stripped = line.strip()
+        indent = len(line) - len(line.lstrip())
+        if (
+            not structural and self._quote is None and self._method
+            and indent <= self._method[1] and (_DEF.match(stripped) or _CLASS.match(stripped))
+        ):
+            # A new def/class while a bracket is still open: the bracket never closes
+            raise StreamAbort(f"unclosed bracket in {self._method[0]}() before line {index + 1}")
+        if not structural or not stripped or stripped.startswith("#"):
+            return []
+
+        finished = []
+        if self._method and indent <= self._method[1]:
+            finished.extend(self._close_method(index))
+        if self._class and indent <= self._class[1]:
+            self._class = None
+
+        match = _CLASS.match(stripped)
+        if match:
+            name, bases = match.group(1), match.group(2) or ""
+            base_names = {b.strip().split(".")[-1] for b in bases.split(",") if b.strip()}
+            if any(b.endswith("Scene") for b in base_names):
+                if self.required_base not in base_names:
+                    raise StreamAbort(f"scene class {name} does not subclass {self.required_base} ({bases})")
+                self.scene_classes.append(name)
+            self._class = (name, indent)
+            return finished
+
+        match = _DEF.match(stripped)
+        if match and self._class and indent > self._class[1] and self._method is None:
+            self._method = (match.group(1), indent, index)
+        return finished
+
+    def _close_method(self, end: int) -> List[StreamedMethod]:
+        if self._method is None:
+            return []
+        name, indent, start = self._method
+        self._method = None
+        body = self.lines[start:end]
+        # Blank lines and comments between methods belong to neither
+        while body and (not body[-1].strip() or body[-1].lstrip().startswith("#")):
+            body.pop()
+        source = "\n".join(line[indent:] if line[:indent].isspace() else line.lstrip() for line in body)
+        try:
+            ast.parse(source)
+        except SyntaxError as e:
+            raise StreamAbort(f"syntax error in {name}(): {e.msg} (line {start + (e.lineno or 1)})")
+
+        method = StreamedMethod(class_name=self._class[0] if self._class else "", name=name, source=source, line=start + 1)
+        self.methods.append(method)
+        if self.on_method:
+            self.on_method(method)
+        return [method]
@@ -0,0 +1,418 @@
+"""
+Shared Tex Cache
+
+Content-addressed cache of compiled LaTeX SVGs shared by every render path.
+
+Manim already names its Tex outputs after a hash of the generated .tex
+source, but it keeps them under each render's media directory, and
+ManimProcessor throws its temp media directory away after every job, so
+the same equations go through latex and dvisvgm again and again. Here
+`tex_to_svg_file` is wrapped so that every expression is compiled once
+into a private scratch directory and then atomically renamed into one
+global cache directory. A small SQLite index tracks sizes and access
+times for LRU eviction and keeps hit/miss counters across processes.
+
+Manim renders run in their own processes, so the cache is installed
+through a thin wrapper around the manim CLI:
+
+    python -m manimator.utils.tex_cache manim -qh scene.py MyScene
+    python -m manimator.utils.tex_cache warmup [extra_scene.py ...]
+    python -m manimator.utils.tex_cache precompile scene.py|- [...]
+    python -m manimator.utils.tex_cache stats
+
+Environment Variables:
+    TEX_CACHE: Set to "0" to disable the shared cache
+    TEX_CACHE_DIR: Cache directory (default: media/cache/tex in the repo)
+    TEX_CACHE_MAX_MB: Size cap before LRU eviction (default: 512)
+"""
+
+import ast
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+
+# Prompt files whose example scenes show the formulas generated code reuses most
+PROMPT_FILES = [
+    BASE_DIR / "manimator" / "utils" / "system_prompts.py",
+    BASE_DIR / "manimator" / "threed" / "api" / "prompts_3d.py",
+]
+
+# Environments manim wraps expressions in (see MathTex/Tex defaults)
+TEX_ENVIRONMENTS = {"MathTex": "align*", "Tex": "center"}
+
+
+def tex_cache_enabled() -> bool:
+    """Whether render paths should use the shared Tex cache."""
+    return os.getenv("TEX_CACHE", "1") != "0"
+
+
+def manim_command() -> List[str]:
+    """
+    Command prefix for running the manim CLI.
+
+    Returns the cache wrapper when the cache is enabled, otherwise plain
+    `manim`, so callers can write `manim_command() + [flag, file, scene]`.
+    """
+    if tex_cache_enabled():
+        return [sys.executable, "-m", "manimator.utils.tex_cache", "manim"]
+    return ["manim"]
+
+
+class TexCache:
+    """
+    Directory of compiled SVGs keyed by a hash of the full .tex source.
+
+    Example:
+        >>> cache = TexCache(Path("media/cache/tex"))
+        >>> svg = cache.lookup(key)
+        >>> if svg is None:
+        ...     svg = cache.store(key, compile_somewhere_private())
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_access REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access);
+    CREATE TABLE IF NOT EXISTS counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Open (and create if needed) the cache directory and its index.
+
+        Args:
+            cache_dir: Directory holding <key>.svg files and index.db
+            max_bytes: Total size of cached SVGs before LRU eviction
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.cache_dir / "index.db"), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def make_key(tex_source: str, compiler: str, output_format: str) -> str:
+        """Content hash of one compilation (source plus toolchain)."""
+        payload = f"{compiler}\0{output_format}\0{tex_source}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.svg"
+
+    def _bump(self, name: str, amount: int = 1):
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """Return the cached SVG path, or None on a miss."""
+        path = self.path_for(key)
+        with self._lock:
+            if path.exists():
+                now = time.time()
+                size = path.stat().st_size
+                # The file may have been renamed in by another process before it
+                # reached the index; upsert keeps the index consistent either way
+                self._conn.execute(
+                    "INSERT INTO entries (key, size, created_at, last_access) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET last_access = excluded.last_access",
+                    (key, size, now, now),
+                )
+                self._bump("hits")
+                return path
+            self._bump("misses")
+            return None
+
+    def store(self, key: str, svg_file: Path) -> Path:
+        """
+        Move a freshly compiled SVG into the cache.
+
+        The file is copied next to its final name first and then renamed,
+        so concurrent readers only ever see complete SVGs.
+        """
+        path = self.path_for(key)
+        partial = self.cache_dir / f".{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(svg_file, partial)
+        os.replace(partial, path)
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO entries (key, size, created_at, last_access) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET size = excluded.size, last_access = excluded.last_access",
+                (key, path.stat().st_size, now, now),
+            )
+            self._evict_locked(keep=key)
+        return path
+
+    def _evict_locked(self, keep: str):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            # Only the least recently used entries go, never one a running
+            # render has just looked up
+            self.path_for(key).unlink(missing_ok=True)
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self._bump("evictions", evicted)
+
+    def clear(self):
+        """Remove every cached SVG and reset the counters."""
+        with self._lock:
+            for path in self.cache_dir.glob("*.svg"):
+                path.unlink(missing_ok=True)
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM counters")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters (across all processes) and current size."""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "evictions": counters.get("evictions", 0),
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "cache_dir": str(self.cache_dir),
+        }
+
+
+_cache: Optional[TexCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_tex_cache() -> Optional[TexCache]:
+    """
+    Process-wide Tex cache configured from the environment.
+
+    Returns:
+        TexCache instance, or None if disabled with TEX_CACHE=0
+    """
+    global _cache
+    if not tex_cache_enabled():
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TexCache(
+                Path(os.getenv("TEX_CACHE_DIR", str(BASE_DIR / "media" / "cache" / "tex"))),
+                max_bytes=int(float(os.getenv("TEX_CACHE_MAX_MB", "512")) * 1024 * 1024),
+            )
+        return _cache
+
+
+# ============================================================================
+# Manim integration
+# ============================================================================
+
+_installed = False
+
+
+def install() -> bool:
+    """
+    Route manim's Tex compilation through the shared cache in this process.
+
+    Returns:
+        True if the cache is active, False if it is disabled
+    """
+    global _installed
+    cache = get_tex_cache()
+    if cache is None:
+        return False
+    if _installed:
+        return True
+
+    from manim import config
+    from manim.mobject.text import tex_mobject
+    from manim.utils import tex_file_writing
+
+    original = tex_file_writing.tex_to_svg_file
+
+    def cached_tex_to_svg_file(expression, environment=None, tex_template=None):
+        if tex_template is None:
+            tex_template = config["tex_template"]
+        if environment is not None:
+            source = tex_template.get_texcode_for_expression_in_env(expression, environment)
+        else:
+            source = tex_template.get_texcode_for_expression(expression)
+        key = cache.make_key(source, tex_template.tex_compiler, tex_template.output_format)
+
+        cached = cache.lookup(key)
+        if cached is not None:
+            return cached
+
+        # Compile in a private directory so concurrent renders never see
+        # half-written .tex/.dvi/.svg files for the same expression
+        previous_tex_dir = config.tex_dir
+        with tempfile.TemporaryDirectory(prefix="manimator-tex-") as scratch:
+            config.tex_dir = scratch
+            try:
+                svg_file = original(expression, environment=environment, tex_template=tex_template)
+            finally:
+                config.tex_dir = previous_tex_dir
+            return cache.store(key, Path(svg_file))
+
+    tex_file_writing.tex_to_svg_file = cached_tex_to_svg_file
+    # tex_mobject imported the function by name
+    tex_mobject.tex_to_svg_file = cached_tex_to_svg_file
+    _installed = True
+    return True
+
+
+# ============================================================================
+# Warm-up
+# ============================================================================
+
+_CALL_PATTERN = re.compile(
+    r"\b(MathTex|Tex)\((\s*r?(?:\"[^\"\n]*\"|'[^'\n]*')(?:\s*,\s*r?(?:\"[^\"\n]*\"|'[^'\n]*'))*)\s*[,)]"
+)
+
+
+def extract_formulas(source: str) -> List[Tuple[str, str]]:
+    """
+    Find MathTex/Tex calls with literal arguments in Python source.
+
+    Works on the raw text rather than the AST because the prompt files keep
+    their example scenes inside (non-raw) string literals, and the model
+    copies those examples exactly as written there.
+
+    Returns:
+        List of (expression, environment) pairs in manim's compiled form
+    """
+    formulas = []
+    for match in _CALL_PATTERN.finditer(source):
+        try:
+            args = ast.literal_eval(f"({match.group(2)},)")
+        except (SyntaxError, ValueError):
+            continue
+        # MathTex/Tex compile all arguments joined with a space
+        formulas.append((" ".join(args), TEX_ENVIRONMENTS[match.group(1)]))
+    return list(dict.fromkeys(formulas))
+
+
+def precompile(formulas: List[Tuple[str, str]]) -> Dict[str, int]:
+    """
+    Compile formulas into the cache ahead of a render.
+
+    Args:
+        formulas: (expression, environment) pairs, e.g. from extract_formulas
+
+    Returns:
+        Counts of formulas found, compiled, already cached and failed
+    """
+    if not install():
+        raise RuntimeError("Tex cache is disabled (TEX_CACHE=0)")
+    from manim.utils import tex_file_writing
+
+    formulas = list(dict.fromkeys(formulas))
+    cache = get_tex_cache()
+    before = cache.stats()["hits"]
+    failed = 0
+    for expression, environment in formulas:
+        try:
+            tex_file_writing.tex_to_svg_file(expression, environment=environment)
+        except Exception as e:
+            failed += 1
+            logger.warning(f"Could not compile {expression!r}: {e}")
+    cached = cache.stats()["hits"] - before
+    return {
+        "found": len(formulas),
+        "compiled": len(formulas) - cached - failed,
+        "cached": cached,
+        "failed": failed,
+    }
+
+
+def warmup(extra_files: Optional[List[Path]] = None) -> Dict[str, int]:
+    """
+    Pre-compile the formulas used in the prompt examples (and extra files).
+
+    Args:
+        extra_files: Additional Python files to harvest formulas from
+
+    Returns:
+        Counts of formulas found, compiled, already cached and failed
+    """
+    formulas: List[Tuple[str, str]] = []
+    for path in PROMPT_FILES + list(extra_files or []):
+        formulas.extend(extract_formulas(Path(path).read_text(encoding="utf-8")))
+    return precompile(formulas)
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    command = argv.pop(0) if argv else "stats"
+
+    if command == "manim":
+        install()
+        from manim.__main__ import main as manim_main
+        sys.argv = ["manim"] + argv
+        manim_main()
+    elif command == "warmup":
+        logging.basicConfig(level=logging.INFO)
+        print(warmup([Path(p) for p in argv]))
+    elif command == "precompile":
+        # Only the given sources ("-" reads stdin), e.g. a freshly generated section
+        logging.basicConfig(level=logging.INFO)
+        formulas = []
+        for arg in argv:
+            source = sys.stdin.read() if arg == "-" else Path(arg).read_text(encoding="utf-8")
+            formulas.extend(extract_formulas(source))
+        print(precompile(formulas))
+    elif command == "stats":
+        cache = get_tex_cache()
+        print(cache.stats() if cache else {"enabled": False})
+    elif command == "clear":
+        cache = get_tex_cache()
+        if cache:
+            cache.clear()
+    else:
+        print(__doc__)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,537 @@
+"""
+Pipeline Tracing
+
+Nested spans for the generation pipeline, so a slow or expensive job can
+be broken down by stage instead of only by its total time.
+
+A job's run is one trace: generate_video opens the root span and every
+stage below it (code generation, layout probe, renders, frame
+extraction, vision checks, fixes, ffmpeg joins) opens a child span.
+Spans nest through a context variable, so they follow awaits and tasks
+without being passed around, and outside a trace they cost nothing.
+
+Each span records:
+
+- wall: seconds from start to end
+- cpu: CPU seconds of the API process meanwhile. Jobs running at the
+  same time share the process, so this is an upper bound under load.
+- child_cpu_seconds / child_peak_rss_bytes: CPU time and peak resident
+  memory of the subprocess tree (manim, LaTeX, ffmpeg) the span ran,
+  sampled from /proc every TRACE_SAMPLE_SECONDS while it runs
+- counters such as prompt_tokens, completion_tokens and upload_bytes of
+  LLM calls
+
+The finished trace is stored on the job under "trace" (with totals over
+all spans) and fed into the MetricsRegistry of the process that ran the
+job, which the API serves in the Prometheus text format on /metrics.
+Registries are per process: with queue workers, the API adds the traces
+workers saved on job records with collect_store_traces.
+
+Environment Variables:
+    TRACING: Record spans and per-stage metrics (default: 1)
+    TRACE_SAMPLE_SECONDS: Seconds between subprocess resource samples (default: 0.5)
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["Span"]] = ContextVar("manimator_span", default=None)
+
+# Counters that keep the largest value instead of a sum
+PEAK_COUNTERS = ("child_peak_rss_bytes",)
+
+
+def tracing_enabled() -> bool:
+    """Whether spans are recorded (TRACING env var, on unless "0")."""
+    return os.getenv("TRACING", "1") != "0"
+
+
+class Span:
+    """
+    One timed stage of a trace.
+
+    Example:
+        >>> with span("final_render", quality="high") as current:
+        ...     ...
+        >>> current.wall
+        12.3
+    """
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, **attrs: Any):
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.counters: Dict[str, float] = {}
+        self.children: List["Span"] = []
+        self.started = time.time()
+        self.wall: Optional[float] = None
+        self.cpu: Optional[float] = None
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        if parent is not None:
+            parent.children.append(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], parent: Optional["Span"] = None) -> "Span":
+        """
+        Rebuild a finished span tree from to_dict() output.
+
+        Args:
+            data: Span dict (e.g. a job's "trace")
+            parent: Parent of the rebuilt span
+
+        Returns:
+            The span, ended, with its children
+        """
+        current = cls(data["name"], parent, **data.get("attrs", {}))
+        current.wall = data.get("wall")
+        current.cpu = data.get("cpu") or 0.0
+        current.counters = dict(data.get("counters", {}))
+        for child in data.get("children", []):
+            cls.from_dict(child, current)
+        return current
+
+    def add(self, counter: str, value: float):
+        """Add to a counter (or raise a peak counter to value)."""
+        if counter in PEAK_COUNTERS:
+            self.counters[counter] = max(self.counters.get(counter, 0), value)
+        else:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def end(self):
+        """Stop the clocks; later calls keep the first end."""
+        if self.wall is None:
+            self.wall = time.perf_counter() - self._wall_start
+            self.cpu = time.process_time() - self._cpu_start
+
+    def walk(self) -> Iterator["Span"]:
+        """This span and all spans below it, depth first."""
+        yield self
+        for child in list(self.children):
+            yield from child.walk()
+
+    def totals(self) -> Dict[str, float]:
+        """Counters summed (peaks maxed) over this span and its descendants."""
+        totals: Dict[str, float] = {}
+        for current in self.walk():
+            for counter, value in current.counters.items():
+                if counter in PEAK_COUNTERS:
+                    totals[counter] = max(totals.get(counter, 0), value)
+                else:
+                    totals[counter] = totals.get(counter, 0) + value
+        return {counter: round(value, 3) for counter, value in totals.items()}
+
+    def to_dict(self, origin: Optional[float] = None) -> Dict[str, Any]:
+        """
+        JSON-ready span tree.
+
+        Args:
+            origin: Epoch seconds that "start" is relative to (default: this span's start)
+
+        Returns:
+            Dict with name, start, wall, cpu and, where present, attrs,
+            counters and children
+        """
+        origin = self.started if origin is None else origin
+        wall = self.wall if self.wall is not None else time.perf_counter() - self._wall_start
+        cpu = self.cpu if self.cpu is not None else time.process_time() - self._cpu_start
+        data: Dict[str, Any] = {
+            "name": self.name,
+            "start": round(self.started - origin, 3),
+            "wall": round(wall, 3),
+            "cpu": round(cpu, 3),
+        }
+        if self.attrs:
+            data["attrs"] = dict(self.attrs)
+        if self.counters:
+            data["counters"] = {counter: round(value, 3) for counter, value in self.counters.items()}
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in list(self.children)]
+        if self.parent is None:
+            data["totals"] = self.totals()
+        return data
+
+
+def current_span() -> Optional[Span]:
+    """The innermost open span of this task, if any."""
+    return _current.get()
+
+
+@contextmanager
+def trace(name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+    """
+    Open the root span of a trace.
+
+    Args:
+        name: Root span name
+        **attrs: Attributes stored with the span
+
+    Yields:
+        The root span, or None when tracing is disabled
+    """
+    if not tracing_enabled():
+        yield None
+        return
+    root = Span(name, **attrs)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        root.end()
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, activate: bool = True, **attrs: Any) -> Iterator[Optional[Span]]:
+    """
+    Time a stage as a child of the current span.
+
+    Outside a trace this does nothing and yields None.
+
+    Args:
+        name: Stage name (the "stage" label in /metrics)
+        activate: Make the span current, so spans opened inside the block
+                  nest under it. Async generators must pass False, since
+                  their context is their consumer's between yields.
+        **attrs: Attributes stored with the span
+
+    Yields:
+        The span, or None outside a trace
+    """
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    current = Span(name, parent, **attrs)
+    token = _current.set(current) if activate else None
+    try:
+        yield current
+    except GeneratorExit:
+        # A stream the caller closed early on purpose
+        raise
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        current.end()
+        if token is not None:
+            _current.reset(token)
+
+
+def add(counter: str, value: float):
+    """Add to a counter of the current span (no-op outside a trace)."""
+    current = _current.get()
+    if current is not None:
+        current.add(counter, value)
+
+
+# ============================================================================
+# Subprocess resources
+# ============================================================================
+
+try:
+    _CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _CLOCK_TICKS = _PAGE_SIZE = 0
+
+
+def _read_stat(pid: int) -> Optional[Tuple[float, int]]:
+    """(CPU seconds including reaped children, RSS bytes) of a process."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces; fields resume after its ")"
+    fields = data[data.rindex(b")") + 2:].split()
+    utime, stime, cutime, cstime = (int(value) for value in fields[11:15])
+    return (utime + stime + cutime + cstime) / _CLOCK_TICKS, int(fields[21]) * _PAGE_SIZE
+
+
+def _children(pid: int) -> List[int]:
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def sample_process_tree(pid: int) -> Optional[Tuple[float, int]]:
+    """
+    CPU seconds and resident memory of a process and its live descendants.
+
+    A process's CPU time includes the children it has reaped, so every
+    CPU second is counted once: at the live process, or at whoever
+    reaped it.
+
+    Args:
+        pid: Root process id
+
+    Returns:
+        (cpu_seconds, rss_bytes), or None once the process is gone or
+        /proc is unavailable
+    """
+    if not _CLOCK_TICKS:
+        return None
+    root = _read_stat(pid)
+    if root is None:
+        return None
+    cpu, rss = root
+    pending = _children(pid)
+    seen = {pid}
+    while pending:
+        child = pending.pop()
+        if child in seen:
+            continue
+        seen.add(child)
+        stat = _read_stat(child)
+        if stat is not None:
+            cpu += stat[0]
+            rss += stat[1]
+            pending.extend(_children(child))
+    return cpu, rss
+
+
+@asynccontextmanager
+async def child_process(pid: int, interval: Optional[float] = None):
+    """
+    Sample a subprocess tree into the current span while the block runs.
+
+    Wrap the wait for the process: sampling stops when the block exits,
+    so CPU used in the last interval before the process ends is missed.
+
+    Args:
+        pid: Subprocess id
+        interval: Seconds between samples (default: TRACE_SAMPLE_SECONDS)
+    """
+    current = _current.get()
+    if current is None or not _CLOCK_TICKS:
+        yield
+        return
+    interval = interval or float(os.getenv("TRACE_SAMPLE_SECONDS", "0.5"))
+    usage = {"cpu": 0.0, "rss": 0}
+
+    async def sample():
+        while True:
+            result = sample_process_tree(pid)
+            if result is not None:
+                usage["cpu"] = max(usage["cpu"], result[0])
+                usage["rss"] = max(usage["rss"], result[1])
+            await asyncio.sleep(interval)
+
+    sampler = asyncio.get_running_loop().create_task(sample())
+    try:
+        yield
+    finally:
+        sampler.cancel()
+        current.add("child_cpu_seconds", usage["cpu"])
+        current.add("child_peak_rss_bytes", usage["rss"])
+
+
+# ============================================================================
+# Metrics
+# ============================================================================
+
+SECONDS_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+BYTES_BUCKETS = tuple(2 ** power * 1024 * 1024 for power in range(5, 14))  # 32 MiB .. 8 GiB
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Per-stage aggregates over finished traces, rendered for Prometheus.
+
+    Stage metrics are inclusive: a span's wall and CPU time include the
+    spans nested under it.
+
+    Example:
+        >>> metrics = get_metrics()
+        >>> metrics.observe_trace(root, outcome="completed")
+        >>> print(metrics.render())
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stage_seconds: Dict[str, Histogram] = {}
+        self._stage_rss: Dict[str, Histogram] = {}
+        self._stage_cpu: Dict[str, float] = {}
+        self._stage_child_cpu: Dict[str, float] = {}
+        self._tokens: Dict[Tuple[str, str], float] = {}
+        self._upload_bytes: Dict[str, float] = {}
+        self._jobs: Dict[str, int] = {}
+
+    def observe_trace(self, root: Span, outcome: str):
+        """
+        Add a finished trace's spans to the aggregates.
+
+        Args:
+            root: Root span
+            outcome: Final job status (e.g. "completed", "failed")
+        """
+        with self._lock:
+            self._jobs[outcome] = self._jobs.get(outcome, 0) + 1
+            for current in root.walk():
+                if current.wall is None:
+                    continue
+                stage = current.name
+                self._stage_seconds.setdefault(stage, Histogram(SECONDS_BUCKETS)).observe(current.wall)
+                self._stage_cpu[stage] = self._stage_cpu.get(stage, 0) + current.cpu
+                counters = current.counters
+                if "child_cpu_seconds" in counters:
+                    self._stage_child_cpu[stage] = self._stage_child_cpu.get(stage, 0) + counters["child_cpu_seconds"]
+                if counters.get("child_peak_rss_bytes"):
+                    self._stage_rss.setdefault(stage, Histogram(BYTES_BUCKETS)).observe(counters["child_peak_rss_bytes"])
+                model = current.attrs.get("model")
+                if model:
+                    for kind in ("prompt", "completion"):
+                        if f"{kind}_tokens" in counters:
+                            key = (model, kind)
+                            self._tokens[key] = self._tokens.get(key, 0) + counters[f"{kind}_tokens"]
+                    if "upload_bytes" in counters:
+                        self._upload_bytes[model] = self._upload_bytes.get(model, 0) + counters["upload_bytes"]
+
+    def render(self, gauges: Optional[Dict[str, Tuple[str, List[Tuple[Dict[str, Any], float]]]]] = None) -> str:
+        """
+        Prometheus text exposition of the aggregates.
+
+        Args:
+            gauges: Extra point-in-time values, {name: (help, [(labels, value)])}
+
+        Returns:
+            The /metrics body
+        """
+        lines: List[str] = []
+
+        def header(name: str, kind: str, text: str):
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histograms(name: str, text: str, series: Dict[str, Histogram]):
+            header(name, "histogram", text)
+            for stage, histogram in sorted(series.items()):
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f"{name}_bucket{_labels({'stage': stage, 'le': _number(bound)})} {count}")
+                lines.append(f"{name}_bucket{_labels({'stage': stage, 'le': '+Inf'})} {histogram.count}")
+                lines.append(f"{name}_sum{_labels({'stage': stage})} {_number(round(histogram.sum, 6))}")
+                lines.append(f"{name}_count{_labels({'stage': stage})} {histogram.count}")
+
+        def counters(name: str, text: str, series: Dict[Any, float], keys: Sequence[str]):
+            header(name, "counter", text)
+            for key, value in sorted(series.items()):
+                values = key if isinstance(key, tuple) else (key,)
+                lines.append(f"{name}{_labels(dict(zip(keys, values)))} {_number(round(value, 6))}")
+
+        with self._lock:
+            histograms("manimator_stage_seconds", "Wall time of pipeline stages", self._stage_seconds)
+            counters("manimator_stage_cpu_seconds_total", "CPU time of the process running the job during pipeline stages", self._stage_cpu, ["stage"])
+            counters("manimator_stage_child_cpu_seconds_total", "CPU time of subprocesses (manim, LaTeX, ffmpeg) run by pipeline stages", self._stage_child_cpu, ["stage"])
+            histograms("manimator_stage_child_peak_rss_bytes", "Peak resident memory of subprocesses run by pipeline stages", self._stage_rss)
+            counters("manimator_llm_tokens_total", "LLM tokens by model and kind", self._tokens, ["model", "kind"])
+            counters("manimator_llm_upload_bytes_total", "Request bytes sent to LLM providers", self._upload_bytes, ["model"])
+            counters("manimator_jobs_traced_total", "Traced job runs by outcome", self._jobs, ["outcome"])
+
+        for name, (text, samples) in (gauges or {}).items():
+            header(name, "gauge", text)
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+_metrics: Optional[MetricsRegistry] = None
+
+
+def get_metrics() -> MetricsRegistry:
+    """Get the process-wide metrics registry."""
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry()
+    return _metrics
+
+
+async def collect_store_traces(store, metrics: Optional[MetricsRegistry] = None, interval: float = 5.0):
+    """
+    Add traces that other processes saved on job records to the metrics.
+
+    Queue workers observe their jobs into their own registries; this lets
+    the API's /metrics cover them too. Runs until cancelled.
+
+    Args:
+        store: JobStore shared with the queue workers
+        metrics: Registry to add to (default: get_metrics())
+        interval: Seconds between store queries
+    """
+    metrics = metrics or get_metrics()
+    cursor = datetime.now().isoformat()
+    # A job record keeps its trace through later updates; count each run once
+    seen: "OrderedDict[Tuple[str, float, float], None]" = OrderedDict()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            jobs = await asyncio.to_thread(store.updated_since, cursor)
+        except Exception as e:
+            logger.warning(f"Trace collection query failed: {e}")
+            continue
+        for job in jobs:
+            cursor = max(cursor, job["updated_at"])
+            data = job.get("trace")
+            if not data:
+                continue
+            key = (job["job_id"], data.get("wall"), data.get("cpu"))
+            if key in seen:
+                continue
+            seen[key] = None
+            if len(seen) > 10000:
+                seen.popitem(last=False)
+            try:
+                root = Span.from_dict(data)
+            except (KeyError, TypeError) as e:
+                logger.warning(f"Unreadable trace on job {job['job_id'][:8]}...: {e}")
+                continue
+            metrics.observe_trace(root, root.attrs.get("status", "unknown"))
@@ -0,0 +1,235 @@
+"""
+Video Delivery
+
+Metadata probing and HTTP range responses for finished videos.
+
+Status polls used to run ffprobe on every request for a completed job,
+blocking the event loop each time. Now the metadata (duration,
+resolution, frame rate, codec, size) is probed once when the job
+completes and stored in the job record. It comes from PyAV in-process
+when available, or from a single ffprobe JSON call otherwise.
+
+Downloads support what browser video players need to seek without
+re-downloading the file:
+
+- `Range: bytes=...` gets a 206 Partial Content with Content-Range. Only
+  the first range of a multi-range request is served. An unsatisfiable
+  range gets a 416.
+- Every response carries a strong ETag derived from the file's size and
+  modification time. `If-None-Match` gets a 304, and `If-Range` with a
+  stale validator falls back to the full file.
+
+The body is read in chunks, so large videos are never held in memory.
+"""
+
+import json
+import logging
+import os
+import re
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+_RANGE = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+# ============================================================================
+# Metadata
+# ============================================================================
+
+def _probe_av(path: Path) -> Dict[str, Any]:
+    import av
+
+    with av.open(str(path)) as container:
+        stream = container.streams.video[0]
+        if stream.duration is not None and stream.time_base is not None:
+            duration = float(stream.duration * stream.time_base)
+        else:
+            duration = (container.duration or 0) / 1_000_000
+        rate = stream.average_rate or stream.guessed_rate
+        return {
+            "duration": round(duration, 3),
+            "width": stream.codec_context.width,
+            "height": stream.codec_context.height,
+            "fps": round(float(rate), 3) if rate else None,
+            "codec": stream.codec_context.name,
+            "has_audio": bool(container.streams.audio),
+        }
+
+
+def _probe_ffprobe(path: Path) -> Dict[str, Any]:
+    result = subprocess.run(
+        [
+            "ffprobe", "-v", "error",
+            "-show_entries", "stream=codec_type,codec_name,width,height,avg_frame_rate:format=duration",
+            "-of", "json", str(path),
+        ],
+        capture_output=True, text=True, check=True,
+    )
+    info = json.loads(result.stdout)
+    streams = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    num, _, den = video.get("avg_frame_rate", "0/1").partition("/")
+    fps = float(num) / float(den) if den and float(den) else None
+    return {
+        "duration": round(float(info.get("format", {}).get("duration") or 0), 3),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "fps": round(fps, 3) if fps else None,
+        "codec": video.get("codec_name"),
+        "has_audio": any(s.get("codec_type") == "audio" for s in streams),
+    }
+
+
+def probe_video_metadata(video_path: Path) -> Optional[Dict[str, Any]]:
+    """
+    Read a video's duration, resolution, frame rate, codec and size.
+
+    Blocking; call it off the event loop (e.g. asyncio.to_thread).
+
+    Args:
+        video_path: MP4 file
+
+    Returns:
+        Metadata dict (duration, width, height, fps, codec, has_audio,
+        size_bytes, etag), or None if the file cannot be probed
+    """
+    path = Path(video_path)
+    try:
+        try:
+            metadata = _probe_av(path)
+        except ImportError:
+            metadata = _probe_ffprobe(path)
+        stat = path.stat()
+    except Exception as e:
+        logger.warning(f"Could not probe {path}: {e}")
+        return None
+    metadata["size_bytes"] = stat.st_size
+    metadata["etag"] = file_etag(stat)
+    return metadata
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+def file_etag(stat: os.stat_result) -> str:
+    """Strong validator from size and modification time (quoted)."""
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse the first range of a Range header.
+
+    Args:
+        header: Header value, e.g. "bytes=0-1023", "bytes=1024-", "bytes=-500"
+        size: File size
+
+    Returns:
+        Inclusive (start, end), or None if the header is malformed (serve
+        the full file)
+
+    Raises:
+        ValueError: If the range cannot be satisfied
+    """
+    match = _RANGE.match(header.split(",", 1)[0])
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(f"range {start}-{end} outside 0-{size - 1}")
+    return start, end
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return etag in tags
+
+
+def _read(path: Path, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def video_response(
+    request: Request,
+    video_path: Path,
+    filename: str,
+    media_type: str = "video/mp4",
+) -> Response:
+    """
+    Serve a video with Range, ETag and conditional request support.
+
+    Args:
+        request: Incoming request (Range, If-None-Match, If-Range)
+        video_path: File to serve
+        filename: Download name for Content-Disposition
+        media_type: Content type
+
+    Returns:
+        200 with the whole file, 206 with one range, 304 or 416
+    """
+    path = Path(video_path)
+    stat = path.stat()
+    size = stat.st_size
+    etag = file_etag(stat)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Accept-Ranges": "bytes"})
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, end, status = 0, size - 1, 200
+    else:
+        (start, end), status = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(0, end - start + 1))
+
+    return StreamingResponse(
+        _read(path, start, end),
+        status_code=status,
+        media_type=media_type,
+        headers=headers,
+    )
@@ -0,0 +1,282 @@
+"""
+Vision Request Batching
+
+Plans the vision-model requests for a set of verification frames.
+
+Sending every frame as a full-resolution PNG in one message either trips
+the provider's payload limit or spends upload time and image tokens on
+detail the layout check does not need. Here each frame is downscaled to
+VISION_MAX_WIDTH and JPEG-compressed in memory, then the frames are packed
+in order into batches that stay under a byte, token and image budget.
+Batches are sent concurrently (at most VISION_CONCURRENCY at a time) and
+their JSON reports are merged, with each batch-local "frame" index mapped
+back to the frame's position in the original list.
+
+Image tokens are estimated with Gemini's tiling rule (258 tokens per
+768x768 tile); for other providers it is only a rough budget.
+
+Environment Variables:
+    VISION_MAX_WIDTH: Downscale frames wider than this (default: 1280, 0 keeps full size)
+    VISION_JPEG_QUALITY: JPEG quality for uploaded frames (default: 80)
+    VISION_BATCH_BYTES: Max base64 payload per request (default: 8000000)
+    VISION_BATCH_TOKENS: Max estimated image tokens per request (default: 8000)
+    VISION_BATCH_IMAGES: Max frames per request (default: 16)
+    VISION_CONCURRENCY: Batches in flight at once (default: 3)
+"""
+
+import asyncio
+import base64
+import io
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+FrameInput = Union[str, Path, Image.Image, np.ndarray]
+
+# Gemini bills images in 768x768 tiles of 258 tokens each
+TILE_SIZE = 768
+TOKENS_PER_TILE = 258
+
+# Worst first, used to merge "overall_quality" across batches
+QUALITY_ORDER = ["poor", "fair", "unknown", "good"]
+
+
+@dataclass
+class PreparedImage:
+    """A frame ready to upload; index is its position in the original list."""
+    index: int
+    data: str  # base64 JPEG
+    width: int
+    height: int
+    tokens: int
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    def to_content(self) -> Dict[str, Any]:
+        """Message content part for litellm."""
+        return {
+            "type": "image_url",
+            "image_url": {"url": f"data:image/jpeg;base64,{self.data}"}
+        }
+
+
+def estimate_tokens(width: int, height: int) -> int:
+    """Estimated image tokens for a width x height image."""
+    return math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE) * TOKENS_PER_TILE
+
+
+def prepare_image(
+    frame: FrameInput,
+    index: int = 0,
+    max_width: Optional[int] = None,
+    quality: Optional[int] = None,
+) -> PreparedImage:
+    """
+    Downscale and JPEG-encode one frame.
+
+    Args:
+        frame: Image path, PIL image or RGB array
+        index: Position of the frame in the caller's list
+        max_width: Downscale wider frames (default: VISION_MAX_WIDTH)
+        quality: JPEG quality (default: VISION_JPEG_QUALITY)
+
+    Returns:
+        PreparedImage
+    """
+    if max_width is None:
+        max_width = int(os.getenv("VISION_MAX_WIDTH", "1280"))
+    if quality is None:
+        quality = int(os.getenv("VISION_JPEG_QUALITY", "80"))
+
+    if isinstance(frame, np.ndarray):
+        image = Image.fromarray(np.ascontiguousarray(frame[..., :3]).astype(np.uint8))
+    elif isinstance(frame, Image.Image):
+        image = frame
+    else:
+        image = Image.open(frame)
+    image = image.convert("RGB")
+
+    if max_width and image.width > max_width:
+        height = max(1, round(image.height * max_width / image.width))
+        image = image.resize((max_width, height), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return PreparedImage(
+        index=index,
+        data=base64.b64encode(buffer.getvalue()).decode("ascii"),
+        width=image.width,
+        height=image.height,
+        tokens=estimate_tokens(image.width, image.height),
+    )
+
+
+def plan_batches(
+    images: Sequence[PreparedImage],
+    max_bytes: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    max_images: Optional[int] = None,
+) -> List[List[PreparedImage]]:
+    """
+    Pack images, in order, into batches under the request budget.
+
+    An image that is over budget on its own still gets a batch of its own
+    rather than being dropped.
+
+    Args:
+        images: Prepared frames in scene order
+        max_bytes: Base64 bytes per batch (default: VISION_BATCH_BYTES)
+        max_tokens: Estimated tokens per batch (default: VISION_BATCH_TOKENS)
+        max_images: Frames per batch (default: VISION_BATCH_IMAGES)
+
+    Returns:
+        Batches in scene order
+    """
+    if max_bytes is None:
+        max_bytes = int(os.getenv("VISION_BATCH_BYTES", "8000000"))
+    if max_tokens is None:
+        max_tokens = int(os.getenv("VISION_BATCH_TOKENS", "8000"))
+    if max_images is None:
+        max_images = int(os.getenv("VISION_BATCH_IMAGES", "16"))
+
+    batches: List[List[PreparedImage]] = []
+    current: List[PreparedImage] = []
+    size = tokens = 0
+    for image in images:
+        if current and (
+            size + image.size > max_bytes
+            or tokens + image.tokens > max_tokens
+            or len(current) >= max_images
+        ):
+            batches.append(current)
+            current, size, tokens = [], 0, 0
+        current.append(image)
+        size += image.size
+        tokens += image.tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def run_batches(
+    batches: List[List[PreparedImage]],
+    send: Callable[[List[PreparedImage]], Dict[str, Any]],
+    concurrency: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Send batches concurrently.
+
+    Args:
+        batches: Result of plan_batches
+        send: Sends one batch and returns its parsed report
+        concurrency: Batches in flight at once (default: VISION_CONCURRENCY)
+
+    Returns:
+        One report per batch, in batch order, each with a "seconds" timing
+    """
+    if concurrency is None:
+        concurrency = int(os.getenv("VISION_CONCURRENCY", "3"))
+
+    def timed(batch: List[PreparedImage]) -> Dict[str, Any]:
+        started = time.monotonic()
+        try:
+            result = send(batch)
+        except Exception as e:
+            result = {"has_issues": False, "issues": [], "overall_quality": "unknown", "error": str(e)}
+        result["seconds"] = round(time.monotonic() - started, 2)
+        return result
+
+    if len(batches) == 1:
+        return [timed(batches[0])]
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches)))) as pool:
+        return list(pool.map(timed, batches))
+
+
+async def arun_batches(
+    batches: List[List[PreparedImage]],
+    send: Callable[[List[PreparedImage]], Awaitable[Dict[str, Any]]],
+    concurrency: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Async version of run_batches; send is a coroutine function."""
+    if concurrency is None:
+        concurrency = int(os.getenv("VISION_CONCURRENCY", "3"))
+    limit = asyncio.Semaphore(max(1, concurrency))
+
+    async def timed(batch: List[PreparedImage]) -> Dict[str, Any]:
+        async with limit:
+            started = time.monotonic()
+            try:
+                result = await send(batch)
+            except Exception as e:
+                result = {"has_issues": False, "issues": [], "overall_quality": "unknown", "error": str(e)}
+            result["seconds"] = round(time.monotonic() - started, 2)
+            return result
+
+    return list(await asyncio.gather(*(timed(batch) for batch in batches)))
+
+
+def merge_results(batches: List[List[PreparedImage]], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine per-batch reports into one analysis.
+
+    Args:
+        batches: Batches in the order they were planned
+        results: Report for each batch
+
+    Returns:
+        Analysis with global frame indices. "error" is set only when every
+        batch failed; otherwise "failed_frames" lists the frames whose
+        batch failed. "batches" summarizes each request.
+    """
+    issues: List[Dict[str, Any]] = []
+    failed: List[int] = []
+    errors: List[str] = []
+    qualities: List[str] = []
+    flagged = False
+    summary: List[Dict[str, Any]] = []
+
+    for batch, result in zip(batches, results):
+        summary.append({
+            "frames": [image.index for image in batch],
+            "bytes": sum(image.size for image in batch),
+            "tokens": sum(image.tokens for image in batch),
+            "seconds": result.get("seconds"),
+            "error": result.get("error"),
+        })
+        if "error" in result:
+            errors.append(result["error"])
+            failed.extend(image.index for image in batch)
+            continue
+        qualities.append(result.get("overall_quality", "unknown"))
+        flagged = flagged or bool(result.get("has_issues"))
+        for issue in result.get("issues", []):
+            local = issue.get("frame")
+            if isinstance(local, int) and 0 <= local < len(batch):
+                issue["frame"] = batch[local].index
+            issues.append(issue)
+
+    analysis: Dict[str, Any] = {
+        "has_issues": flagged or bool(issues),
+        "issues": issues,
+        "overall_quality": min(qualities, key=lambda q: QUALITY_ORDER.index(q) if q in QUALITY_ORDER else 2)
+        if qualities else "unknown",
+        "batches": summary,
+    }
+    if errors and len(errors) == len(results):
+        analysis["error"] = errors[0]
+    elif failed:
+        analysis["failed_frames"] = failed
+        logger.warning(f"{len(errors)} of {len(results)} vision batches failed: {errors[0]}")
+    return analysis
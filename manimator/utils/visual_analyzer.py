@@ -5,15 +5,33 @@ Uses multimodal LLM to analyze rendered frames and provide feedback on layout is
 """
 
 import os
+import re
+import asyncio
 import base64
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Sequence, Tuple, Union
 import litellm
+import numpy as np
 from PIL import Image
 import json
-import subprocess
-import tempfile
 from .dual_model_config import DualModelConfig
+from .frame_dedup import FrameGroup, dedup_summary, expand_issues, group_frames
+from .frame_extraction import encode_jpeg, extract_frames, extract_frames_from_videos
+from .frame_prescreen import FrameReport, prescreen_frames
+from .llm_client import get_llm_client
+from .tracing import span
+from .vision_batching import PreparedImage, arun_batches, merge_results, plan_batches, prepare_image, run_batches
+
+
+@dataclass
+class _AnalysisPlan:
+    """Work prepared for the vision model by VisualLayoutAnalyzer._plan_analysis."""
+    total: int
+    groups: Optional[List[FrameGroup]] = None
+    reports: Optional[List[FrameReport]] = None
+    batches: List[List[PreparedImage]] = field(default_factory=list)
+    error: Optional[str] = None
 
 
 class VisualLayoutAnalyzer:
@@ -27,90 +45,200 @@ class VisualLayoutAnalyzer:
     - Cluttered layouts
     """
     
-    def __init__(self, model: str = DualModelConfig.get_visual_model()):
+    def __init__(
+        self,
+        model: str = DualModelConfig.get_visual_model(),
+        prescreen: bool = True,
+        dedup: bool = True,
+        skip_clean: bool = True
+    ):
         """
         Initialize the visual analyzer.
         
         Args:
             model: Multimodal model to use (default: Gemini 3 Pro)
+            prescreen: Run the local pixel check on every frame
+                       (see frame_prescreen); its findings are kept when
+                       the model call fails
+            dedup: Analyze each group of near-identical frames once
+                   (see frame_dedup)
+            skip_clean: Skip the vision model for frames the prescreen
+                        finds clean; turn off to send every frame
         """
         self.model = model
+        self.prescreen = prescreen
+        self.dedup = dedup
+        self.skip_clean = skip_clean
     
-    def extract_frames(self, video_path: Path, num_frames: int = 1) -> List[Path]:
+    def extract_frames(self, video_path: Path, num_frames: int = 1) -> List[np.ndarray]:
         """
         Extract key frames from video for analysis.
         
+        All frames come from one decoder pass and stay in memory.
+        
         Args:
             video_path: Path to rendered video
             num_frames: Number of frames to extract
         
         Returns:
-            List of paths to extracted frame images
+            List of RGB frame arrays
         """
-        # Get video duration
-        duration_cmd = [
-            "ffprobe", "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1",
-            str(video_path)
-        ]
-        
-        result = subprocess.run(duration_cmd, capture_output=True, text=True)
-        duration = float(result.stdout.strip())
-        
-        # Calculate frame timestamps (evenly distributed)
-        timestamps = [duration * i / (num_frames + 1) for i in range(1, num_frames + 1)]
-        
-        # Extract frames
-        frame_paths = []
-        temp_dir = Path(tempfile.mkdtemp())
+        return [frame.image for frame in extract_frames(video_path, num_frames=num_frames)]
+    
+    def extract_frames_from_videos(self, video_files: List[Path]) -> List[np.ndarray]:
+        """
+        Extract the last frame of each video (e.g. every partial movie file).
         
-        for i, timestamp in enumerate(timestamps):
-            frame_path = temp_dir / f"frame_{i:03d}.png"
-            
-            extract_cmd = [
-                "ffmpeg", "-ss", str(timestamp),
-                "-i", str(video_path),
-                "-frames:v", "1",
-                "-q:v", "2",  # High quality
-                str(frame_path),
-                "-y"
-            ]
-            
-            subprocess.run(extract_cmd, capture_output=True, check=True)
-            frame_paths.append(frame_path)
+        Args:
+            video_files: Videos in playback order
         
-        return frame_paths
+        Returns:
+            List of RGB frame arrays, one per readable video
+        """
+        return [frame.image for frame in extract_frames_from_videos(video_files)]
     
-    def encode_image(self, image_path: Path) -> str:
-        """Encode image to base64 for API."""
-        with open(image_path, "rb") as f:
+    def encode_image(self, image: Union[Path, np.ndarray]) -> str:
+        """Encode an image file or RGB array to base64 for API."""
+        if isinstance(image, np.ndarray):
+            return base64.b64encode(encode_jpeg(image)).decode('utf-8')
+        with open(image, "rb") as f:
             return base64.b64encode(f.read()).decode('utf-8')
     
-    def analyze_frames(self, frame_paths: List[Path]) -> Dict[str, any]:
+    def analyze_frames(
+        self,
+        frame_paths: List[Union[Path, np.ndarray]],
+        timestamps: Optional[Sequence[float]] = None
+    ) -> Dict[str, any]:
         """
         Analyze frames for layout issues using vision model.
         
+        Near-identical frames are grouped first and only one frame per
+        group is analyzed; each issue is then reported for every frame of
+        its group ("frames", and "timestamps" when given). The remaining
+        frames are prescreened locally and, with skip_clean, only frames
+        the pixel check flags or is unsure about are sent to the model. Frames
+        are downscaled and split into batches under the request budget
+        (see vision_batching). Issue frame
+        indices are mapped back to positions in frame_paths.
+        
         Args:
-            frame_paths: List of frame image paths
+            frame_paths: List of frame image paths or RGB arrays
+            timestamps: Optional timestamp per frame, copied onto issues
         
         Returns:
             Analysis results with identified issues
         """
-        # Prepare images for the model
-        image_contents = []
-        for frame_path in frame_paths:
-            image_contents.append({
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/png;base64,{self.encode_image(frame_path)}"
-                }
-            })
+        plan = self._plan_analysis(frame_paths)
+        results = run_batches(plan.batches, self._analyze_batch) if plan.batches else []
+        return self._finish_analysis(plan, results, timestamps)
+    
+    async def aanalyze_frames(
+        self,
+        frame_paths: List[Union[Path, np.ndarray]],
+        timestamps: Optional[Sequence[float]] = None
+    ) -> Dict[str, any]:
+        """
+        Async version of analyze_frames.
+        
+        Dedup, prescreen and encoding run in a thread; the model calls run
+        on the event loop through the shared LLM client.
+        """
+        plan = await asyncio.to_thread(self._plan_analysis, frame_paths)
+        results = await arun_batches(plan.batches, self._aanalyze_batch) if plan.batches else []
+        return self._finish_analysis(plan, results, timestamps)
+    
+    def _plan_analysis(self, frame_paths: List[Union[Path, np.ndarray]]) -> "_AnalysisPlan":
+        """Group, prescreen and encode frames; everything before the model call."""
+        plan = _AnalysisPlan(total=len(frame_paths))
+        unique = list(frame_paths)
+        if self.dedup and len(frame_paths) >= 2:
+            plan.groups = group_frames(frame_paths)
+            unique = [frame_paths[g.representative] for g in plan.groups]
+            if len(unique) < len(frame_paths):
+                print(f"🧬 Dedup: {len(frame_paths)} frames -> {len(unique)} unique layouts")
+        
+        to_send = list(range(len(unique)))
+        if self.prescreen:
+            plan.reports = prescreen_frames(unique)
+            if self.skip_clean:
+                to_send = [r.frame for r in plan.reports if r.status != "clean"]
+                if not to_send:
+                    print(f"✅ Prescreen: all {len(unique)} frames clean, skipping vision model")
+                    return plan
+                print(f"🔎 Prescreen: sending {len(to_send)}/{len(unique)} frames to the vision model")
+        
+        images = []
+        for index in to_send:
+            try:
+                images.append(prepare_image(unique[index], index))
+            except Exception as e:
+                print(f"⚠️  Could not read frame {index}: {e}")
+        if not images:
+            plan.error = "no readable frames"
+            return plan
+        plan.batches = plan_batches(images)
+        if len(plan.batches) > 1:
+            print(f"📦 Sending {len(images)} frames to the vision model in {len(plan.batches)} batches")
+        return plan
+    
+    def _finish_analysis(
+        self,
+        plan: "_AnalysisPlan",
+        results: List[Dict[str, any]],
+        timestamps: Optional[Sequence[float]]
+    ) -> Dict[str, any]:
+        """Merge batch reports and map frame indices back to the input list."""
+        if plan.batches:
+            analysis = merge_results(plan.batches, results)
+        else:
+            analysis = {"has_issues": False, "issues": [], "overall_quality": "unknown" if plan.error else "good"}
+            if plan.error:
+                analysis["error"] = plan.error
+        if "error" in analysis:
+            print(f"⚠️  Visual analysis failed: {analysis['error']}")
+        
+        reports = plan.reports
+        if reports is not None:
+            if "error" in analysis:
+                # The model call failed; fall back to what the prescreen is sure about
+                local_issues = [issue for r in reports for issue in r.issues]
+                analysis["has_issues"] = bool(local_issues)
+                analysis["issues"] = local_issues
+            elif analysis.get("failed_frames"):
+                # Some batches failed; keep the prescreen's findings for their frames
+                failed = set(analysis["failed_frames"])
+                local_issues = [issue for r in reports if r.frame in failed for issue in r.issues]
+                analysis["issues"].extend(local_issues)
+                analysis["has_issues"] = analysis["has_issues"] or bool(local_issues)
+            sent = sum(len(batch) for batch in plan.batches)
+            analysis["prescreen"] = {
+                "frames": len(reports),
+                "sent_to_model": sent,
+                "skipped": len(reports) - sent,
+                "reports": [r.to_dict() for r in reports]
+            }
+        
+        groups = plan.groups
+        if groups is not None:
+            expand_issues(analysis.get("issues", []), groups, timestamps)
+            for report in analysis.get("prescreen", {}).get("reports", []):
+                report["frame"] = groups[report["frame"]].representative
+            for batch in analysis.get("batches", []):
+                batch["frames"] = [groups[i].representative for i in batch["frames"]]
+            if analysis.get("failed_frames"):
+                analysis["failed_frames"] = [m for i in analysis["failed_frames"] for m in groups[i].members]
+            analysis["dedup"] = dedup_summary(groups, plan.total)
+        return analysis
+    
+    def _batch_messages(self, images: List[PreparedImage]) -> List[Dict[str, any]]:
+        """Prompt plus attached frames for one vision request."""
+        image_contents = [image.to_content() for image in images]
         
         # Create analysis prompt
         prompt = """Analyze these frames from a Manim animation.
 Check for any VISUAL OVERLAPS between text, equations, graphs, or other elements.
 Even a slight overlap is a critical issue.
+Frames are numbered from 0 in the order they are attached.
 
 If you see ANY overlap, return "has_issues": true.
 
@@ -131,7 +259,7 @@ Respond in JSON format:
 """
         
         # Build message with images
-        messages = [
+        return [
             {
                 "role": "user",
                 "content": [
@@ -139,39 +267,35 @@ Respond in JSON format:
                 ] + image_contents
             }
         ]
-        
-        try:
-            response = litellm.completion(
-                model=self.model,
-                messages=messages,
-                max_tokens=20000,
-                temperature=0.3
-            )
-            
-            # Parse response
-            response_text = response.choices[0].message.content
-            
-            # Extract JSON from response (handle markdown code blocks)
-            import re
-            import json
-            
-            json_match = re.search(r'```json\n(.*?)\n```', response_text, re.DOTALL)
-            if json_match:
-                analysis = json.loads(json_match.group(1))
-            else:
-                # Try to parse directly
-                analysis = json.loads(response_text)
-            
-            return analysis
-            
-        except Exception as e:
-            print(f"⚠️  Visual analysis failed: {e}")
-            return {
-                "has_issues": False,
-                "issues": [],
-                "overall_quality": "unknown",
-                "error": str(e)
-            }
+    
+    @staticmethod
+    def _parse_report(response_text: str) -> Dict[str, any]:
+        """Extract the JSON report (handle markdown code blocks)."""
+        json_match = re.search(r'```json\n(.*?)\n```', response_text, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group(1))
+        # Try to parse directly
+        return json.loads(response_text)
+    
+    def _analyze_batch(self, images: List[PreparedImage]) -> Dict[str, any]:
+        """Send one batch to the vision model and parse its JSON report."""
+        response = litellm.completion(
+            model=self.model,
+            messages=self._batch_messages(images),
+            max_tokens=20000,
+            temperature=0.3
+        )
+        return self._parse_report(response.choices[0].message.content)
+    
+    async def _aanalyze_batch(self, images: List[PreparedImage]) -> Dict[str, any]:
+        """Async version of _analyze_batch."""
+        response_text = await get_llm_client().complete(
+            self.model,
+            self._batch_messages(images),
+            max_tokens=20000,
+            temperature=0.3
+        )
+        return self._parse_report(response_text)
     
     def suggest_fixes(self, analysis: Dict, original_code: str) -> Tuple[str, List[str]]:
         """
@@ -184,12 +308,40 @@ Respond in JSON format:
         Returns:
             Tuple of (fixed_code, list_of_changes)
         """
-        if not analysis.get("has_issues", False):
+        messages = self._fix_messages(analysis, original_code)
+        if messages is None:
             return original_code, []
         
+        try:
+            # Use Claude (Code Model) to fix the code
+            fixed_code = DualModelConfig.generate_with_claude(messages)
+            return self._clean_fix(fixed_code, analysis)
+            
+        except Exception as e:
+            print(f"⚠️ AI code fix failed: {e}")
+            return original_code, []
+    
+    async def asuggest_fixes(self, analysis: Dict, original_code: str) -> Tuple[str, List[str]]:
+        """Async version of suggest_fixes."""
+        messages = self._fix_messages(analysis, original_code)
+        if messages is None:
+            return original_code, []
+        
+        try:
+            fixed_code = await DualModelConfig.agenerate_with_claude(messages)
+            return self._clean_fix(fixed_code, analysis)
+        except Exception as e:
+            print(f"⚠️ AI code fix failed: {e}")
+            return original_code, []
+    
+    def _fix_messages(self, analysis: Dict, original_code: str) -> Optional[List[Dict[str, str]]]:
+        """Repair request for the code model, or None if there is nothing to fix."""
+        if not analysis.get("has_issues", False):
+            return None
+        
         issues = analysis.get("issues", [])
         if not issues:
-            return original_code, []
+            return None
             
         print(f"🔧 Requesting AI code fix for {len(issues)} issues...")
         
@@ -216,30 +368,25 @@ Your task is to FIX the code to resolve these specific issues while keeping the
 4. Do not add markdown backticks or explanations. Just the code.
 """
 
-        messages = [
+        return [
             {"role": "system", "content": "You are a strict code repair assistant. Output only valid Python code."},
             {"role": "user", "content": prompt}
         ]
+    
+    @staticmethod
+    def _clean_fix(fixed_code: str, analysis: Dict) -> Tuple[str, List[str]]:
+        # Clean up code block formatting if present
+        fixed_code = fixed_code.replace("```python", "").replace("```", "").strip()
         
-        try:
-            # Use Claude (Code Model) to fix the code
-            fixed_code = DualModelConfig.generate_with_claude(messages)
-            
-            # Clean up code block formatting if present
-            fixed_code = fixed_code.replace("```python", "").replace("```", "").strip()
-            
-            changes = [f"AI fixed {len(issues)} layout issues using Claude 4.5 Sonnet"]
-            return fixed_code, changes
-            
-        except Exception as e:
-            print(f"⚠️ AI code fix failed: {e}")
-            return original_code, []
+        changes = [f"AI fixed {len(analysis.get('issues', []))} layout issues using Claude 4.5 Sonnet"]
+        return fixed_code, changes
     
     def analyze_and_fix(
         self,
         code: str,
-        video_path: Path,
-        max_iterations: int = 2
+        video_path: Optional[Path] = None,
+        max_iterations: int = 2,
+        frame_paths: Optional[List[Path]] = None
     ) -> Tuple[str, Dict]:
         """
         Complete analysis and fixing workflow.
@@ -248,6 +395,9 @@ Your task is to FIX the code to resolve these specific issues while keeping the
             code: Generated Manim code
             video_path: Path to rendered preview video
             max_iterations: Maximum fix iterations
+            frame_paths: Already rendered stills (see still_frames); used
+                         instead of extracting frames from video_path and
+                         left in place for the caller to clean up
         
         Returns:
             Tuple of (final_code, analysis_report)
@@ -259,15 +409,11 @@ Your task is to FIX the code to resolve these specific issues while keeping the
         while iteration < max_iterations:
             # Extract frames
             print(f"🔍 Analyzing visual layout (iteration {iteration + 1})...")
-            frames = self.extract_frames(video_path)
+            frames = frame_paths or self.extract_frames(video_path)
             
             # Analyze
             analysis = self.analyze_frames(frames)
             
-            # Clean up frames
-            for frame in frames:
-                frame.unlink()
-            
             # Check if there are issues
             if not analysis.get("has_issues", False):
                 print(f"✅ No layout issues detected! Quality: {analysis.get('overall_quality')}")
@@ -296,21 +442,79 @@ Your task is to FIX the code to resolve these specific issues while keeping the
         }
         
         return current_code, report
+    
+    async def aanalyze_and_fix(
+        self,
+        code: str,
+        video_path: Optional[Path] = None,
+        frame_paths: Optional[List[Path]] = None
+    ) -> Tuple[str, Dict]:
+        """
+        Async version of analyze_and_fix for a single pass.
+        
+        Frame extraction and prescreening run in a thread; the vision and
+        code model calls run on the event loop through the shared LLM client.
+        """
+        print("🔍 Analyzing visual layout...")
+        frames = frame_paths
+        if not frames:
+            with span("frame_extraction"):
+                frames = await asyncio.to_thread(self.extract_frames, video_path)
+        with span("vision_analysis", frames=len(frames)):
+            analysis = await self.aanalyze_frames(frames)
+        
+        changes = []
+        current_code = code
+        if not analysis.get("has_issues", False):
+            print(f"✅ No layout issues detected! Quality: {analysis.get('overall_quality')}")
+        else:
+            with span("fix_suggestion"):
+                fixed_code, changes = await self.asuggest_fixes(analysis, code)
+            if not changes or fixed_code == code:
+                print(f"ℹ️  No automatic fixes available for detected issues")
+                changes = []
+            else:
+                current_code = fixed_code
+        
+        report = {
+            "iterations": 1 + bool(changes),
+            "changes_applied": changes,
+            "final_analysis": analysis
+        }
+        return current_code, report
 
 
 from .dual_model_config import DualModelConfig
 
-def create_visual_analyzer(model: str = None) -> VisualLayoutAnalyzer:
+def create_visual_analyzer(
+    model: str = None,
+    prescreen: bool = None,
+    dedup: bool = None,
+    skip_clean: bool = None
+) -> VisualLayoutAnalyzer:
     """
     Factory function to create visual analyzer.
     
     Args:
         model: Model to use (defaults to DualModelConfig.VISUAL_MODEL)
+        prescreen: Use the local frame prescreen (defaults to the
+                   VISUAL_PRESCREEN env var, on unless set to "0")
+        dedup: Group near-identical frames (defaults to the VISUAL_DEDUP
+               env var, on unless set to "0")
+        skip_clean: Skip the model for frames the prescreen finds clean
+                    (defaults to the VISUAL_PRESCREEN_SKIP_CLEAN env var,
+                    on unless set to "0")
     
     Returns:
         VisualLayoutAnalyzer instance
     """
     if model is None:
         model = DualModelConfig.get_visual_model()
+    if prescreen is None:
+        prescreen = os.getenv("VISUAL_PRESCREEN", "1") != "0"
+    if dedup is None:
+        dedup = os.getenv("VISUAL_DEDUP", "1") != "0"
+    if skip_clean is None:
+        skip_clean = os.getenv("VISUAL_PRESCREEN_SKIP_CLEAN", "1") != "0"
     
-    return VisualLayoutAnalyzer(model=model)
+    return VisualLayoutAnalyzer(model=model, prescreen=prescreen, dedup=dedup, skip_clean=skip_clean)
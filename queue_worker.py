@@ -0,0 +1,246 @@
+"""
+Queue Worker
+
+Runs video generation jobs from the shared job queue, so rendering can
+scale past the machine the API runs on.
+
+Start the API with JOB_QUEUE=sqlite (or redis) and it only records and
+enqueues jobs. Each worker claims jobs and runs them with the server's
+own VideoGenerator/VideoGenerator3D pipeline, so progress, caches and
+verification behave exactly as in-process. Run as many workers as the
+hosts allow; they share the job store, the queue and the media directory.
+
+While a job runs, the worker renews its lease every third of
+JOB_LEASE_SECONDS. If the worker dies, the lease expires and the next
+worker to poll re-queues the job (or fails it after JOB_MAX_ATTEMPTS).
+SIGINT/SIGTERM stops claiming and lets running jobs finish; a second
+signal hands them back to the queue immediately.
+
+Usage:
+    JOB_QUEUE=sqlite python queue_worker.py
+    JOB_QUEUE=sqlite python queue_worker.py --server 3d --concurrency 2
+
+Environment Variables:
+    WORKER_CONCURRENCY: Jobs run at once by one worker (default: RENDER_SLOTS, or 1 for 3D)
+    WORKER_POLL_SECONDS: Seconds between claims while the queue is empty (default: 1)
+"""
+
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import signal
+from typing import Dict, Optional
+
+from manimator.utils.job_queue import JobQueue, Lease, worker_name
+
+logger = logging.getLogger("queue_worker")
+
+SERVERS = {"2d": "api_server", "3d": "api_server_3d"}
+
+
+class QueueWorker:
+    """
+    Claims jobs from a queue and runs them while keeping their leases alive.
+
+    Example:
+        >>> worker = QueueWorker(job_queue, "2d", video_generator, job_manager, JobStatus)
+        >>> await worker.run()
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        queue_name: str,
+        generator,
+        job_manager,
+        job_status,
+        concurrency: int = 1,
+        poll_seconds: float = 1.0,
+        name: Optional[str] = None,
+    ):
+        """
+        Initialize the worker.
+
+        Args:
+            queue: Shared job queue
+            queue_name: Queue to claim from ("2d" or "3d")
+            generator: Object with an async generate_video(job_id)
+            job_manager: JobManager of the same server (shared store)
+            job_status: The server's JobStatus enum
+            concurrency: Jobs run at once
+            poll_seconds: Seconds between claims while the queue is empty
+            name: Worker id (default: host-pid-random)
+        """
+        self.queue = queue
+        self.queue_name = queue_name
+        self.generator = generator
+        self.job_manager = job_manager
+        self.job_status = job_status
+        self.concurrency = max(1, concurrency)
+        self.poll_seconds = poll_seconds
+        self.name = name or worker_name()
+        self.stats = {"claimed": 0, "completed": 0, "lost": 0, "released": 0, "requeued": 0, "dead": 0, "missing": 0}
+
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+        self._abort = False
+
+    def stop(self):
+        """First call: stop claiming and drain. Second call: release running jobs."""
+        if self._stopping.is_set():
+            logger.info(f"🛑 Worker {self.name}: handing {len(self._running)} running jobs back to the queue")
+            self._abort = True
+            for task in self._running.values():
+                task.cancel()
+        else:
+            logger.info(f"🛑 Worker {self.name}: finishing {len(self._running)} running jobs (signal again to abort)")
+            self._stopping.set()
+
+    async def run(self):
+        """Claim and run jobs until stopped, then wait for running jobs."""
+        logger.info(f"👷 Worker {self.name} on queue '{self.queue_name}' (concurrency {self.concurrency})")
+        try:
+            while not self._stopping.is_set():
+                await asyncio.to_thread(self._expire)
+                await asyncio.to_thread(
+                    self.queue.register_worker, self.name, self.queue_name, self.concurrency, len(self._running)
+                )
+                if len(self._running) < self.concurrency:
+                    lease = await asyncio.to_thread(self.queue.claim, self.queue_name, self.name)
+                    if lease is not None:
+                        self.stats["claimed"] += 1
+                        self._running[lease.job_id] = asyncio.get_running_loop().create_task(self._run(lease))
+                        continue
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+            if self._running:
+                await asyncio.gather(*self._running.values(), return_exceptions=True)
+        finally:
+            await asyncio.to_thread(self.queue.unregister_worker, self.name)
+        logger.info(f"👋 Worker {self.name} stopped: {self.stats}")
+
+    def _expire(self):
+        """Re-queue jobs of workers that stopped renewing their leases."""
+        for item in self.queue.expire():
+            try:
+                if item.dead:
+                    self.stats["dead"] += 1
+                    message = f"Render worker {item.worker} stopped responding ({item.attempts} attempts)"
+                    self.job_manager.update_job(
+                        item.job_id,
+                        status=self.job_status.FAILED,
+                        error=message,
+                        progress={"stage": "failed", "percentage": 0, "message": message}
+                    )
+                else:
+                    self.stats["requeued"] += 1
+                    self.job_manager.update_job(
+                        item.job_id,
+                        status=self.job_status.PENDING,
+                        progress={
+                            "stage": "queued",
+                            "percentage": 0,
+                            "message": f"Re-queued after render worker {item.worker} stopped responding"
+                        }
+                    )
+            except ValueError:
+                pass  # job record deleted meanwhile
+            logger.warning(
+                f"⏰ Lease of job {item.job_id[:8]}... on {item.worker} expired: "
+                f"{'giving up' if item.dead else 're-queued'} after {item.attempts} attempts"
+            )
+
+    async def _heartbeat(self, lease: Lease, job_task: asyncio.Task):
+        """Renew the lease until cancelled; cancel the job if the lease is lost."""
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                alive = await asyncio.to_thread(self.queue.heartbeat, lease)
+            except Exception as e:
+                # Transient broker error: keep going, the lease has slack
+                logger.warning(f"Heartbeat for job {lease.job_id[:8]}... failed: {e}")
+                continue
+            if not alive:
+                logger.warning(f"💔 Lost the lease on job {lease.job_id[:8]}..., stopping it here")
+                self.stats["lost"] += 1
+                job_task.cancel()
+                return
+
+    async def _run(self, lease: Lease):
+        job_id = lease.job_id
+        logger.info(f"📥 Claimed job {job_id[:8]}... (attempt {lease.attempt})")
+        heartbeat = asyncio.get_running_loop().create_task(self._heartbeat(lease, asyncio.current_task()))
+        try:
+            if self.job_manager.get_job(job_id) is None:
+                # Not visible in the store (yet): hand the job back by letting the
+                # lease lapse, so the retry counts as an attempt; release() would
+                # refund it and spin on a job whose record is really gone
+                logger.warning(
+                    f"❓ Job {job_id[:8]}... is not in the job store; "
+                    f"leaving it to the queue to retry after its lease expires"
+                )
+                self.stats["missing"] += 1
+                return
+            await self.generator.generate_video(job_id)
+            await asyncio.to_thread(self.queue.complete, lease)
+            self.stats["completed"] += 1
+        except asyncio.CancelledError:
+            if self._abort:
+                await asyncio.to_thread(self.queue.release, lease)
+                self.stats["released"] += 1
+                try:
+                    self.job_manager.update_job(
+                        job_id,
+                        status=self.job_status.PENDING,
+                        progress={"stage": "queued", "percentage": 0, "message": "Re-queued: render worker shut down"}
+                    )
+                except ValueError:
+                    pass
+        except Exception:
+            # generate_video records its own failures; this is a worker bug
+            logger.exception(f"Job {job_id[:8]}... raised in the worker")
+            await asyncio.to_thread(self.queue.complete, lease)
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job_id, None)
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Render worker for the shared job queue")
+    parser.add_argument("--server", choices=sorted(SERVERS), default="2d", help="Which API's jobs to run")
+    parser.add_argument("--concurrency", type=int, default=None, help="Jobs run at once")
+    parser.add_argument("--name", default=None, help="Worker id (default: host-pid-random)")
+    args = parser.parse_args()
+
+    server = importlib.import_module(SERVERS[args.server])
+    if server.job_queue is None:
+        parser.error("set JOB_QUEUE=sqlite or JOB_QUEUE=redis (the API must use the same queue)")
+
+    default_concurrency = getattr(server.Config, "RENDER_SLOTS", 1)
+    worker = QueueWorker(
+        queue=server.job_queue,
+        queue_name=server.QUEUE_NAME,
+        generator=server.video_generator,
+        job_manager=server.job_manager,
+        job_status=server.JobStatus,
+        concurrency=args.concurrency or int(os.getenv("WORKER_CONCURRENCY", default_concurrency)),
+        poll_seconds=float(os.getenv("WORKER_POLL_SECONDS", "1")),
+        name=args.name,
+    )
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, worker.stop)
+        await worker.run()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
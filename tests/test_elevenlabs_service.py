@@ -0,0 +1,93 @@
+"""Tests for ElevenLabsService retries and fallback against the local stub server."""
+
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("manim_voiceover.services.base")
+
+from manimator.services.elevenlabs_service import ElevenLabsService
+from manimator.services.elevenlabs_stub import run_stub_server
+
+
+class RecordingFallback:
+    """Stands in for gTTS so the fallback path runs without network access."""
+
+    def __init__(self):
+        self.texts = []
+
+    def generate_from_text(self, text, cache_dir=None, path=None, **kwargs):
+        self.texts.append(text)
+        return {"original_audio": "fallback.mp3", "final_audio": "fallback.mp3", "text": text}
+
+
+@pytest.fixture
+def make_service(tmp_path, monkeypatch):
+    """Build services against a running stub; records every backoff delay in .delays."""
+
+    def make(stub, max_retries=4):
+        monkeypatch.setenv("ELEVENLABS_BASE_URL", stub.base_url)
+        monkeypatch.setenv("ELEVENLABS_MAX_RETRIES", str(max_retries))
+        service = ElevenLabsService(api_key="stub", cache_dir=str(tmp_path))
+        service.backoff_base = 0.01
+        service.delays = []
+        backoff = service._backoff
+
+        def recording_backoff(attempt, retry_after=None):
+            delay = backoff(attempt, retry_after)
+            service.delays.append((attempt, retry_after, delay))
+            return delay
+
+        service._backoff = recording_backoff
+        return service
+
+    return make
+
+
+def test_rate_limit_is_retried_after_retry_after(make_service):
+    with run_stub_server(fail_first=1, retry_after=0.3) as stub:
+        service = make_service(stub)
+        started = time.monotonic()
+
+        assert service.prefetch("Rate limited once.") is True
+
+        elapsed = time.monotonic() - started
+        assert stub.counts == {"requests": 2, "ok": 1, "rate_limited": 1, "errors": 0}
+    assert service.get_stats()["retries"] == 1
+    (attempt, retry_after, delay), = service.delays
+    assert retry_after == pytest.approx(0.3)
+    assert delay >= 0.3
+    assert elapsed >= 0.3
+
+
+def test_server_errors_are_retried_with_backoff(make_service):
+    with run_stub_server(fail_first=3, fail_status=503) as stub:
+        service = make_service(stub)
+
+        assert service.prefetch("Unavailable three times.") is True
+
+        assert stub.counts == {"requests": 4, "ok": 1, "rate_limited": 0, "errors": 3}
+    stats = service.get_stats()
+    assert stats["retries"] == 3
+    assert stats["failures"] == 0
+    assert [attempt for attempt, _, _ in service.delays] == [1, 2, 3]
+    for attempt, retry_after, delay in service.delays:
+        assert retry_after is None
+        assert 0 <= delay <= service.backoff_base * 2 ** attempt
+
+
+def test_exhausted_retries_fall_back(make_service):
+    with run_stub_server(error_rate=1.0) as stub:
+        service = make_service(stub, max_retries=2)
+        service.fallback_service = RecordingFallback()
+
+        result = service.generate_from_text("Never answered.")
+
+        assert stub.counts["requests"] == 3
+    assert result["final_audio"] == "fallback.mp3"
+    assert service.fallback_service.texts == ["Never answered."]
+    stats = service.get_stats()
+    assert stats["retries"] == 2
+    assert stats["failures"] == 1
+    assert stats["fallbacks"] == 1
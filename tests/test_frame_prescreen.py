@@ -0,0 +1,62 @@
+"""Tests for the local frame prescreen."""
+
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from manimator.utils.frame_prescreen import prescreen_frame
+
+
+def render(labels, size=48, fill="white"):
+    """1080p black frame with each (text, (x, y)) label drawn in one colour."""
+    image = Image.new("RGB", (1920, 1080), "black")
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=size)
+    for text, position in labels:
+        draw.text(position, text, fill=fill, font=font)
+    return image
+
+
+@pytest.mark.parametrize("size", [36, 48, 72])
+def test_separate_labels_are_clean(size):
+    frame = render([
+        ("Title Here", (600, 100)),
+        ("Jumping gypsy quickly", (500, 500)),
+        ("Footnote text", (800, 800)),
+    ], size=size)
+
+    assert prescreen_frame(frame).status == "clean"
+
+
+@pytest.mark.parametrize("size", [28, 48, 72])
+@pytest.mark.parametrize("offset", [(30, 20), (60, 5), (0, 0)])
+def test_same_colour_overlapping_labels_are_not_clean(size, offset):
+    dx, dy = offset
+    frame = render([
+        ("Kinetic Energy", (700, 500)),
+        ("Potential Energy", (700 + dx, 500 + dy)),
+    ], size=size)
+
+    report = prescreen_frame(frame)
+
+    assert report.status != "clean"
+    assert any("overlapping text" in reason for reason in report.reasons)
+
+
+def test_overlapping_labels_among_clean_ones_are_not_clean():
+    frame = render([
+        ("Title Here", (800, 100)),
+        ("Kinetic Energy", (700, 500)),
+        ("Potential Energy", (730, 520)),
+        ("Footnote", (800, 900)),
+    ])
+
+    assert prescreen_frame(frame).status != "clean"
+
+
+def test_cut_off_label_is_flagged():
+    frame = render([("Falls off the edge", (1800, 500))])
+
+    report = prescreen_frame(frame)
+
+    assert report.status == "flagged"
+    assert report.issues[0]["type"] == "cutoff"
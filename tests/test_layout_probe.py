@@ -0,0 +1,27 @@
+"""Tests for reading the layout probe's report from the subprocess output."""
+
+import pytest
+
+from manimator.utils.layout_probe import REPORT_MARKER, LayoutProbeError, _parse_output
+
+REPORT = '{"has_issues": false, "issues": [], "overall_quality": "good", "steps": 4, "seconds": 0.5}'
+
+
+def test_output_after_the_report_is_ignored():
+    output = f"Manim Community v0.18\n{REPORT_MARKER}\n{REPORT}\nException ignored in atexit callback\n"
+
+    report = _parse_output(output, 0)
+
+    assert report["steps"] == 4
+    assert report["has_issues"] is False
+
+
+@pytest.mark.parametrize("tail", ["", "{not json", "[]", '{"issues": []}'])
+def test_unreadable_report_raises_probe_error(tail):
+    with pytest.raises(LayoutProbeError):
+        _parse_output(f"{REPORT_MARKER}\n{tail}\n", 0)
+
+
+def test_missing_marker_raises_probe_error():
+    with pytest.raises(LayoutProbeError, match="exited with 1"):
+        _parse_output("Traceback (most recent call last):\nNameError: x\n", 1)
@@ -0,0 +1,28 @@
+"""Tests for reading the still-frame manifest from the subprocess output."""
+
+from pathlib import Path
+
+import pytest
+
+from manimator.utils.still_frames import REPORT_MARKER, StillFrameError, _parse_output
+
+MANIFEST = '{"frames": [{"file": "step_000.png", "step": 0, "position": "end", "time": 1.0}]}'
+
+
+def test_output_after_the_manifest_is_ignored(tmp_path):
+    output = f"{REPORT_MARKER}\n{MANIFEST}\nWARNING: leaked semaphore objects\n"
+
+    manifest = _parse_output(output, 0, tmp_path)
+
+    assert manifest["frames"][0]["path"] == str(Path(tmp_path) / "step_000.png")
+
+
+@pytest.mark.parametrize("tail", ["", "{not json", "{}", '{"frames": [{"step": 0}]}'])
+def test_unreadable_manifest_raises_still_frame_error(tail, tmp_path):
+    with pytest.raises(StillFrameError):
+        _parse_output(f"{REPORT_MARKER}\n{tail}\n", 0, tmp_path)
+
+
+def test_no_frames_raises_still_frame_error(tmp_path):
+    with pytest.raises(StillFrameError, match="no animations"):
+        _parse_output(f'{REPORT_MARKER}\n{{"frames": []}}\n', 0, tmp_path)